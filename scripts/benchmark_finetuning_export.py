@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Benchmark: FineTuningDataExporter merge steps, dict indexes vs list scans
+
+Builds a synthetic database with the campaign_* tables and the
+encyclopedia tables (clans, settlements, settlements_fts, heroes,
+kingdoms) and times export_clans / export_settlements / export_lords /
+export_factions twice: with the exporter's RecordIndex (dicts by id and
+by normalized name) and with ScanIndex, the linear scans the exporter
+used before (next()/any() over the records list for every merged row).
+
+The scans are quadratic, so they run on a smaller database (--scan-rows)
+and their time at --rows is extrapolated. Both runs on the small database
+must write identical JSON files.
+
+Usage:
+    python benchmark_finetuning_export.py [--rows 100000] [--scan-rows 10000]
+"""
+
+import argparse
+import contextlib
+import io
+import random
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict
+
+from export_finetuning_data import FineTuningDataExporter, RecordIndex
+
+# Share of the rows in each table
+TABLE_SHARES = {
+    'campaign_clans': 0.05, 'clans': 0.05,
+    'campaign_settlements': 0.2, 'settlements': 0.2, 'settlements_fts': 0.1,
+    'campaign_heroes': 0.15, 'heroes': 0.15,
+    'campaign_kingdoms': 0.05, 'kingdoms': 0.05,
+}
+
+EXPORTS = ('clans', 'settlements', 'lords', 'factions')
+
+
+class ScanIndex(RecordIndex):
+    """The exporter's former lookups: a scan of the records list per merged row"""
+
+    def add(self, record):
+        self.records.append(record)
+        return record
+
+    def get(self, record_id):
+        return next((r for r in self.records if r['id'] == record_id), None)
+
+    def __contains__(self, record_id):
+        return any(r['id'] == record_id for r in self.records)
+
+    def find_name(self, name):
+        # Exact comparison, as before; synthetic names carry no localization markers
+        return next((r for r in self.records if r.get(self.name_field) == name), None)
+
+
+class ScanExporter(FineTuningDataExporter):
+    record_index = ScanIndex
+
+
+def text(rng: random.Random, words: int = 12) -> str:
+    return ' '.join(rng.choice(('war', 'clan', 'river', 'keep', 'horse', 'silver', 'lord', 'banner', 'vlandia',
+                                'steppe', 'grain', 'iron', 'wall', 'oath'))
+                    for _ in range(words))
+
+
+def build_db(path: Path, rows: int, seed: int = 1) -> Path:
+    """Synthetic database; about half of the encyclopedia rows match a campaign row by id"""
+    rng = random.Random(seed)
+    count = {table: max(1, int(rows * share)) for table, share in TABLE_SHARES.items()}
+    conn = sqlite3.connect(str(path))
+    conn.executescript('''
+        CREATE TABLE campaign_clans (id TEXT PRIMARY KEY, name TEXT, name_ru TEXT, name_tr TEXT, description TEXT,
+                                     description_ru TEXT, description_tr TEXT, culture TEXT, kingdom TEXT);
+        CREATE TABLE clans (id TEXT PRIMARY KEY, name TEXT, text TEXT, wiki_description TEXT);
+        CREATE TABLE campaign_settlements (id TEXT PRIMARY KEY, name TEXT, name_ru TEXT, name_tr TEXT,
+                                           settlement_type TEXT, culture TEXT, owner_name TEXT,
+                                           owner_name_ru TEXT, owner_name_tr TEXT);
+        CREATE TABLE settlements (id TEXT PRIMARY KEY, name TEXT, text TEXT, type TEXT, culture TEXT,
+                                  wiki_description TEXT);
+        CREATE VIRTUAL TABLE settlements_fts USING fts5(name, text);
+        CREATE TABLE campaign_heroes (id TEXT PRIMARY KEY, name TEXT, name_ru TEXT, name_tr TEXT, culture TEXT,
+                                      clan_id TEXT, age INTEGER, is_female INTEGER);
+        CREATE TABLE heroes (id TEXT PRIMARY KEY, text TEXT, wiki_biography TEXT);
+        CREATE TABLE campaign_kingdoms (id TEXT PRIMARY KEY, name TEXT, name_ru TEXT, name_tr TEXT, culture TEXT,
+                                        ruler_name TEXT, ruler_name_ru TEXT, ruler_name_tr TEXT);
+        CREATE TABLE kingdoms (id TEXT PRIMARY KEY, name TEXT, text TEXT, wiki_description TEXT);
+    ''')
+
+    def campaign_ids(prefix, n):
+        return [f"{prefix}_{i}" for i in range(n)]
+
+    def encyclopedia_ids(prefix, n, campaign_n):
+        # Half overlap the campaign ids, the rest exist only in the encyclopedia
+        return [f"{prefix}_{i}" for i in range(campaign_n - n // 2, campaign_n - n // 2 + n)]
+
+    n = count['campaign_clans']
+    conn.executemany("INSERT INTO campaign_clans VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", [
+        (cid, f"Clan {cid}", f"Клан {cid}", None, text(rng), text(rng) if rng.random() < 0.5 else None, None,
+         'vlandia', 'kingdom_1') for cid in campaign_ids('clan', n)])
+    conn.executemany("INSERT INTO clans VALUES (?, ?, ?, ?)", [
+        (cid, f"Clan {cid}", text(rng), None) for cid in encyclopedia_ids('clan', count['clans'], n)])
+
+    n = count['campaign_settlements']
+    conn.executemany("INSERT INTO campaign_settlements VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", [
+        (sid, f"Town {sid}", f"Город {sid}", None, rng.choice(('town', 'castle', 'village')), 'empire',
+         f"Lord {i}", None, None) for i, sid in enumerate(campaign_ids('town', n))])
+    settlement_ids = encyclopedia_ids('town', count['settlements'], n)
+    conn.executemany("INSERT INTO settlements VALUES (?, ?, ?, ?, ?, ?)", [
+        (sid, f"Town {sid}", text(rng) if rng.random() < 0.7 else None, 'town', 'empire', text(rng))
+        for sid in settlement_ids])
+    names = [f"Town town_{i}" for i in range(n)] + [f"Town {sid}" for sid in settlement_ids]
+    conn.executemany("INSERT INTO settlements_fts VALUES (?, ?)", [
+        (rng.choice(names) if rng.random() < 0.8 else f"Ruins {i}", text(rng))
+        for i in range(count['settlements_fts'])])
+
+    n = count['campaign_heroes']
+    conn.executemany("INSERT INTO campaign_heroes VALUES (?, ?, ?, ?, ?, ?, ?, ?)", [
+        (hid, f"Lord {hid}", f"Лорд {hid}", None, 'sturgia', f"clan_{i % 50}", 20 + i % 40, i % 3 == 0)
+        for i, hid in enumerate(campaign_ids('lord', n))])
+    conn.executemany("INSERT INTO heroes VALUES (?, ?, ?)", [
+        (hid, text(rng), None) for hid in encyclopedia_ids('lord', count['heroes'], n)])
+
+    n = count['campaign_kingdoms']
+    conn.executemany("INSERT INTO campaign_kingdoms VALUES (?, ?, ?, ?, ?, ?, ?, ?)", [
+        (kid, f"Kingdom {kid}", None, None, 'aserai', f"Ruler {kid}", None, None)
+        for kid in campaign_ids('kingdom', n)])
+    conn.executemany("INSERT INTO kingdoms VALUES (?, ?, ?, ?)", [
+        (kid, f"Kingdom {kid}", text(rng), None) for kid in encyclopedia_ids('kingdom', count['kingdoms'], n)])
+
+    conn.commit()
+    conn.close()
+    return path
+
+
+def run_exports(exporter_class, db_path: Path, output_dir: Path) -> Dict[str, float]:
+    """Seconds per export step"""
+    exporter = exporter_class(db_path, output_dir)
+    exporter.connect()
+    timings = {}
+    try:
+        for name in EXPORTS:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                getattr(exporter, f'export_{name}')()
+            timings[name] = time.perf_counter() - start
+    finally:
+        exporter.close()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the fine-tuning exporter merge steps')
+    parser.add_argument('--rows', type=int, default=100000, help='Rows in the synthetic database (default: 100000)')
+    parser.add_argument('--scan-rows', type=int, default=10000,
+                        help='Rows for the list-scan run, extrapolated to --rows (default: 10000)')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp = Path(tmp_dir)
+        small_db = build_db(tmp / 'small.db', args.scan_rows, args.seed)
+        indexed_small = run_exports(FineTuningDataExporter, small_db, tmp / 'indexed')
+        scan_small = run_exports(ScanExporter, small_db, tmp / 'scan')
+        for name in EXPORTS:
+            indexed_file = (tmp / 'indexed' / f'{name}.json').read_bytes()
+            if indexed_file != (tmp / 'scan' / f'{name}.json').read_bytes():
+                raise SystemExit(f"ERROR: {name}.json differs between the two runs")
+        print(f"{args.scan_rows} rows: identical output from both runs")
+
+        large_db = build_db(tmp / 'large.db', args.rows, args.seed)
+        indexed_large = run_exports(FineTuningDataExporter, large_db, tmp / 'large')
+
+    growth = (args.rows / args.scan_rows) ** 2
+    print(f"\n{'step':<12} {'scan ' + str(args.scan_rows):>12} {'dict ' + str(args.scan_rows):>12} "
+          f"{'scan ' + str(args.rows) + '*':>13} {'dict ' + str(args.rows):>13}")
+    for name in EXPORTS + ('total',):
+        if name == 'total':
+            values = [sum(timings.values()) for timings in (scan_small, indexed_small, indexed_large)]
+        else:
+            values = [scan_small[name], indexed_small[name], indexed_large[name]]
+        # The scans' extra time grows quadratically, the rest like the indexed run
+        scan_large = (values[0] - values[1]) * growth + values[2]
+        print(f"{name:<12} {values[0]:>11.2f}s {values[1]:>11.2f}s {scan_large:>12.1f}s {values[2]:>12.2f}s")
+    print(f"\n* extrapolated from {args.scan_rows} rows: scan overhead x{growth:g} + the indexed time")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Benchmark: LoreSearch query latency (p50/p95/p99)
+
+Runs a mix of one- and two-word queries, with and without entity-type
+filters and paging, against an existing bannerlord_lore.db or a synthetic
+one built with EncyclopediaImporter. Query words are sampled from the
+indexed text, so most queries have matches. Each language passes when
+its p99 is below TARGET_P99_MS.
+
+Usage:
+    python benchmark_lore_search.py [--db-path Database/bannerlord_lore.db]
+    python benchmark_lore_search.py --synthetic 2000 [--queries 2000]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+from create_database_from_encyclopedia import EncyclopediaImporter
+from lore_search import ENTITY_TYPES, LoreSearch
+
+# p99 latency target per query
+TARGET_P99_MS = 5.0
+
+SYLLABLES = {
+    'EN': ['dar', 'vel', 'ion', 'mar', 'tha', 'ros', 'ken', 'ula', 'bor', 'esh', 'al', 'tir', 'gon', 'sa'],
+    'RU': ['дар', 'вел', 'ион', 'мар', 'та', 'рос', 'кен', 'ула', 'бор', 'еш', 'ал', 'тир', 'гон', 'са'],
+    'TR': ['dar', 'vel', 'iyon', 'mar', 'ta', 'roş', 'ken', 'ula', 'bör', 'eş', 'al', 'tır', 'gön', 'sa'],
+}
+
+
+def synthetic_text(rng: random.Random, language: str, words: int) -> str:
+    syllables = SYLLABLES[language]
+    return ' '.join(''.join(rng.choice(syllables) for _ in range(rng.randint(1, 3))) for _ in range(words))
+
+
+def build_synthetic_db(work_dir: Path, scale: int) -> Path:
+    """Write EN/RU/TR encyclopedia JSON with `scale` settlements/characters and import it"""
+    encyclopedia_dir = work_dir / 'encyclopedia'
+    sizes = {
+        'settlements.json': ('settlement', scale, 'name'),
+        'npc_characters.json': ('lord', scale * 3, 'name'),
+        'kingdoms.json': ('kingdom', max(scale // 50, 1), 'name'),
+        'world_lore.json': ('lore', max(scale // 10, 1), 'title'),
+    }
+    for language in SYLLABLES:
+        (encyclopedia_dir / language).mkdir(parents=True)
+        for file_name, (prefix, count, name_field) in sizes.items():
+            records = []
+            for i in range(count):
+                # Same seed for every language: the entity is the same, only its words differ
+                rng = random.Random(f"{file_name}{i}")
+                records.append({
+                    'id': f"{prefix}_{i}",
+                    name_field: synthetic_text(rng, language, 2).title(),
+                    'text': synthetic_text(rng, language, rng.randint(20, 80)),
+                })
+            with open(encyclopedia_dir / language / file_name, 'w', encoding='utf-8') as f:
+                json.dump(records, f, ensure_ascii=False)
+
+    db_path = work_dir / 'bannerlord_lore.db'
+    with contextlib.redirect_stdout(io.StringIO()):
+        EncyclopediaImporter(db_path, encyclopedia_dir).import_all(['EN', 'RU', 'TR'])
+    return db_path
+
+
+def sample_words(db_path: Path, language: str, count: int, rng: random.Random) -> List[str]:
+    """Words from the indexed text of the given language"""
+    suffix = f"_{language.lower()}"
+    conn = sqlite3.connect(str(db_path))
+    texts = [row[0] for row in conn.execute(
+        f"SELECT description{suffix} FROM settlements_lore WHERE description{suffix} != '' "
+        f"ORDER BY random() LIMIT 500"
+    ) if row[0]]
+    conn.close()
+    words = [word.strip('.,;:!?"()') for text in texts for word in text.split()]
+    words = [word for word in words if len(word) > 2]
+    return [rng.choice(words) for _ in range(count)] if words else []
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark LoreSearch latency')
+    parser.add_argument('--db-path', type=str, default='Database/bannerlord_lore.db',
+                        help='Database to query (ignored with --synthetic)')
+    parser.add_argument('--synthetic', type=int, metavar='SCALE',
+                        help='Build a synthetic database with SCALE settlements (3x characters)')
+    parser.add_argument('--queries', type=int, default=2000, help='Queries per language (default: 2000)')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.synthetic:
+            start = time.perf_counter()
+            db_path = build_synthetic_db(Path(tmp_dir), args.synthetic)
+            print(f"Synthetic database: scale={args.synthetic} ({time.perf_counter() - start:.1f}s to build)")
+        else:
+            db_path = Path(args.db_path)
+            if not db_path.exists():
+                print(f"ERROR: Database not found: {db_path}")
+                return False
+
+        search = LoreSearch(db_path)
+        types = list(ENTITY_TYPES)
+        print(f"{'language':<9} {'queries':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} "
+              f"{'avg hits':>9}  p99 < {TARGET_P99_MS:g} ms")
+        failed = []
+        for language in ('EN', 'RU', 'TR'):
+            words = sample_words(db_path, language, args.queries * 2, rng)
+            if not words:
+                continue
+            latencies = []
+            hits = 0
+            for i in range(args.queries):
+                query = words[2 * i] if i % 2 else f"{words[2 * i]} {words[2 * i + 1]}"
+                # A third of the queries filter by type, a quarter ask for the second page
+                query_types = [rng.choice(types)] if i % 3 == 0 else None
+                offset = 10 if i % 4 == 0 else 0
+                start = time.perf_counter()
+                results = search.search(query, language, query_types, limit=10, offset=offset)
+                latencies.append((time.perf_counter() - start) * 1000)
+                hits += len(results)
+            latencies.sort()
+            p99 = percentile(latencies, 0.99)
+            if p99 >= TARGET_P99_MS:
+                failed.append(language)
+            print(f"{language:<9} {len(latencies):>8} {statistics.median(latencies):>8.2f} "
+                  f"{percentile(latencies, 0.95):>8.2f} {p99:>8.2f} "
+                  f"{latencies[-1]:>8.2f} {hits / len(latencies):>9.1f}  {'FAIL' if p99 >= TARGET_P99_MS else 'PASS'}")
+        search.close()
+        print(f"\n{'FAIL: ' + ', '.join(failed) if failed else 'PASS'} (p99 target {TARGET_P99_MS:g} ms)")
+        return not failed
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
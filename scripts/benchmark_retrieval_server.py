@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Load generator for retrieval_server.py
+
+Opens CONCURRENCY keep-alive connections and sends a mix of /search,
+/names, /entity and /context requests as fast as the server answers,
+then reports throughput, latency percentiles per endpoint and the
+server's batching counters (/stats).
+
+By default a server is started as a subprocess on a synthetic database
+(see benchmark_lore_search.py); --url targets one that is already running.
+
+Usage:
+    python benchmark_retrieval_server.py --synthetic 2000 [--workers 4] [--concurrency 64] [--duration 10]
+    python benchmark_retrieval_server.py --db-path Database/bannerlord_lore.db
+    python benchmark_retrieval_server.py --url http://127.0.0.1:8765 --db-path Database/bannerlord_lore.db
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+from urllib.parse import quote, urlparse
+
+from benchmark_lore_search import build_synthetic_db, percentile, sample_words
+from lore_search import ENTITY_TYPES
+
+# Share of each endpoint in the request mix
+MIX = (('search', 0.5), ('entity', 0.2), ('names', 0.2), ('context', 0.1))
+
+# Distinct queries in the pool; requests pick from it with a skew, like repeated NPC questions
+QUERY_POOL = 2000
+
+
+def build_requests(db_path: Path, count: int, rng: random.Random) -> List[Tuple[str, str]]:
+    """(endpoint, path) pairs in the MIX proportions"""
+    words = {language: sample_words(db_path, language, QUERY_POOL, rng) for language in ('EN', 'RU', 'TR')}
+    words = {language: pool for language, pool in words.items() if pool}
+
+    conn = sqlite3.connect(str(db_path))
+    entities = []
+    for entity_type, (table, _, name_column) in ENTITY_TYPES.items():
+        for encyclopedia_id, name in conn.execute(
+                f"SELECT encyclopedia_id, {name_column} FROM {table} ORDER BY random() LIMIT 500"):
+            entities.append((entity_type, encyclopedia_id, name or ''))
+    conn.close()
+
+    def skewed(pool):
+        # Pareto-like skew: a few items are asked for much more often than the rest
+        return pool[min(len(pool) - 1, int(rng.paretovariate(1.2)) - 1)]
+
+    endpoints = [endpoint for endpoint, _ in MIX]
+    weights = [weight for _, weight in MIX]
+    requests = []
+    for _ in range(count):
+        endpoint = rng.choices(endpoints, weights)[0]
+        language = rng.choice(list(words))
+        if endpoint == 'search':
+            query = skewed(words[language])
+            if rng.random() < 0.5:
+                query += ' ' + rng.choice(words[language])
+            path = f"/search?q={quote(query)}&lang={language}&limit=10"
+        elif endpoint == 'entity':
+            entity_type, encyclopedia_id, _ = skewed(entities)
+            path = f"/entity/{entity_type}/{quote(encyclopedia_id)}"
+        elif endpoint == 'names':
+            name = skewed(entities)[2]
+            start = rng.randint(0, max(0, len(name) - 4))
+            path = f"/names?q={quote(name[start:start + 4] or 'dar')}&limit=10"
+        else:
+            query = f"{skewed(words[language])} {rng.choice(words[language])}"
+            path = f"/context?q={quote(query)}&lang={language}&budget={rng.choice((500, 1500, 3000))}"
+        requests.append((endpoint, path))
+    return requests
+
+
+async def client(host: str, port: int, requests: List[Tuple[str, str]], deadline: float,
+                 latencies: Dict[str, List[float]], errors: List[int], rng: random.Random):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            endpoint, path = rng.choice(requests)
+            start = time.perf_counter()
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode('latin-1'))
+            status_line = await reader.readline()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                if line.lower().startswith(b'content-length:'):
+                    length = int(line.split(b':', 1)[1])
+            await reader.readexactly(length)
+            latencies[endpoint].append((time.perf_counter() - start) * 1000)
+            if not status_line.startswith(b'HTTP/1.1 200'):
+                errors.append(int(status_line.split()[1]))
+    finally:
+        writer.close()
+
+
+async def fetch_stats(host: str, port: int) -> Dict:
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET /stats HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode('latin-1'))
+    response = await reader.read()
+    writer.close()
+    return json.loads(response.split(b'\r\n\r\n', 1)[1])
+
+
+async def run_load(host: str, port: int, requests: List[Tuple[str, str]], concurrency: int,
+                   duration: float, seed: int) -> Tuple[Dict[str, List[float]], List[int], float]:
+    latencies = {endpoint: [] for endpoint, _ in MIX}
+    errors: List[int] = []
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(*(client(host, port, requests, deadline, latencies, errors, random.Random(seed + i))
+                           for i in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+
+def wait_for_port(host: str, port: int, process: subprocess.Popen, timeout: float = 60.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("Server exited during startup")
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("Server did not start in time")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test retrieval_server.py')
+    parser.add_argument('--db-path', type=str, default='Database/bannerlord_lore.db',
+                        help='Database to serve and sample queries from (ignored with --synthetic)')
+    parser.add_argument('--synthetic', type=int, metavar='SCALE',
+                        help='Build a synthetic database with SCALE settlements (3x characters)')
+    parser.add_argument('--url', type=str, help='Use a running server instead of starting one')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4, help='Server worker threads')
+    parser.add_argument('--concurrency', type=int, default=64, help='Open connections (default: 64)')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds of load (default: 10)')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.synthetic:
+            db_path = build_synthetic_db(Path(tmp_dir), args.synthetic)
+            print(f"Synthetic database: scale={args.synthetic}")
+        else:
+            db_path = Path(args.db_path)
+            if not db_path.exists():
+                print(f"ERROR: Database not found: {db_path}")
+                return
+
+        requests = build_requests(db_path, 20000, rng)
+
+        process = None
+        if args.url:
+            url = urlparse(args.url)
+            host, port = url.hostname, url.port
+        else:
+            host, port = '127.0.0.1', free_port()
+            process = subprocess.Popen(
+                [sys.executable, str(Path(__file__).parent / 'retrieval_server.py'), '--db-path', str(db_path),
+                 '--host', host, '--port', str(port), '--workers', str(args.workers)],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            wait_for_port(host, port, process)
+
+        try:
+            latencies, errors, elapsed = asyncio.run(
+                run_load(host, port, requests, args.concurrency, args.duration, args.seed))
+            stats = asyncio.run(fetch_stats(host, port))
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+    total = sum(len(values) for values in latencies.values())
+    print(f"\n{total} requests in {elapsed:.1f}s: {total / elapsed:,.0f} req/s "
+          f"({args.concurrency} connections, {stats['workers']} worker(s), {len(errors)} non-200)")
+    print(f"{'endpoint':<9} {'requests':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for endpoint, values in latencies.items():
+        if not values:
+            continue
+        values.sort()
+        print(f"{endpoint:<9} {len(values):>9} {statistics.median(values):>8.2f} {percentile(values, 0.95):>8.2f} "
+              f"{percentile(values, 0.99):>8.2f} {values[-1]:>8.2f}")
+    print(f"\nServer: {stats['cache_hits']} cached responses, {stats['lookups']} lookups in {stats['batches']} "
+          f"batches (avg {stats['avg_batch']}), {stats['coalesced']} coalesced, {stats['errors']} errors")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Benchmark: row-at-a-time INSERT vs batched executemany writer for encyclopedia.db
+
+Builds synthetic extractor records (heroes, NPCs with skills, settlements,
+items, ...) and writes them twice:
+  - per-row path: one cursor.execute() per row, default PRAGMAs
+    (how save_to_sqlite() used to work)
+  - bulk path: EncyclopediaExtractor.save_to_sqlite() (executemany per table,
+    build PRAGMAs, indexes created after the load)
+
+Usage:
+    python benchmark_sqlite_writer.py [--scale N] [--repeat R]
+"""
+
+import argparse
+import contextlib
+import io
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from extract_encyclopedia_data import EncyclopediaExtractor
+
+
+def build_synthetic_data(extractor: EncyclopediaExtractor, scale: int):
+    """Fill extractor.data with `scale` heroes/NPCs/settlements and 3x items"""
+    data = extractor.data
+    for i in range(scale):
+        data['heroes'].append({
+            'id': f"lord_{i}", 'faction': f"clan_{i % 200}", 'alive': i % 7 != 0,
+            'spouse': f"lord_{i + 1}", 'father': f"lord_{i - 1}", 'mother': "",
+            'text': f"Lord {i} is a member of clan {i % 200}. " * 4,
+        })
+        data['npc_characters'].append({
+            'id': f"lord_{i}", 'name': f"Lord {i}", 'culture': "Culture.empire",
+            'is_hero': True, 'is_female': i % 2 == 1, 'age': "35", 'occupation': "Lord",
+            'voice': "earnest", 'default_group': "Cavalry",
+            'skills': {skill: str((i * 7 + n) % 300) for n, skill in enumerate(
+                ["OneHanded", "TwoHanded", "Polearm", "Bow", "Riding", "Athletics", "Leadership", "Tactics"])},
+        })
+        data['settlements'].append({
+            'id': f"town_{i}", 'name': f"Town {i}", 'owner': f"Faction.clan_{i % 200}",
+            'culture': "Culture.vlandia", 'posX': str(i * 1.5), 'posY': str(i * 0.5),
+            'text': f"Town {i} lies on the river. " * 3, 'type': "village",
+            'village_type': "VillageType.wheat_farm", 'bound': f"town_{i // 4}",
+        })
+    for i in range(scale * 3):
+        data['items'].append({
+            'id': f"item_{i}", 'name': f"Item {i}", 'type': "OneHandedWeapon",
+            'culture': "Culture.aserai", 'value': str(i), 'weight': "1.5", 'is_merchandise': True,
+            'weapon_class': "OneHandedSword", 'weapon_length': "95",
+            'swing_damage': "30", 'thrust_damage': "20", 'source_file': "weapons.xml",
+        })
+    for i in range(max(scale // 50, 1)):
+        data['kingdoms'].append({
+            'id': f"kingdom_{i}", 'name': f"Kingdom {i}", 'short_name': f"K{i}", 'title': "",
+            'ruler_title': "", 'culture': "Culture.battania", 'owner': f"lord_{i}",
+            'initial_home_settlement': f"town_{i}", 'text': "A kingdom.",
+            'relationships': [{'kingdom': f"kingdom_{j}", 'value': "-1", 'isAtWar': j % 2 == 0}
+                              for j in range(10)],
+            'policies': [f"policy_{j}" for j in range(6)],
+        })
+        data['clans'].append({
+            'id': f"clan_{i}", 'name': f"Clan {i}", 'culture': "Culture.sturgia",
+            'faction': f"kingdom_{i}", 'text': "A clan.", 'members': [f"lord_{j}" for j in range(20)],
+        })
+
+
+def count_rows(db_file: Path) -> int:
+    conn = sqlite3.connect(db_file)
+    tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+    total = sum(conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in tables)
+    conn.close()
+    return total
+
+
+def write_per_row(extractor: EncyclopediaExtractor, db_file: Path):
+    """Previous writer: default PRAGMAs, one execute() per row, single commit"""
+    conn = sqlite3.connect(db_file)
+    cursor = conn.cursor()
+    extractor._create_sqlite_tables(cursor)
+    for data_type, records in extractor.data.items():
+        for record in records:
+            for sql, rows in extractor._table_rows(data_type, [record]):
+                for row in rows:
+                    cursor.execute(sql, row)
+    conn.commit()
+    conn.close()
+
+
+def write_bulk(extractor: EncyclopediaExtractor, db_file: Path):
+    """Current writer (save_to_sqlite)"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        extractor.save_to_sqlite()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark encyclopedia.db writers')
+    parser.add_argument('--scale', type=int, default=20000,
+                        help='Number of heroes/NPCs/settlements (items = 3x, default: 20000)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per writer (best is reported)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        extractor = EncyclopediaExtractor(tmp_dir, tmp_dir, "EN")
+        build_synthetic_data(extractor, args.scale)
+        db_file = Path(tmp_dir) / "encyclopedia.db"
+
+        results = {}
+        for name, writer in (("per-row execute", write_per_row), ("bulk executemany", write_bulk)):
+            best = None
+            for _ in range(args.repeat):
+                for suffix in ("", "-wal", "-shm", "-journal"):
+                    Path(str(db_file) + suffix).unlink(missing_ok=True)
+                start = time.perf_counter()
+                writer(extractor, db_file)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            rows = count_rows(db_file)
+            results[name] = (rows, best)
+
+        print(f"Synthetic data: scale={args.scale}")
+        for name, (rows, elapsed) in results.items():
+            print(f"  {name:<18} {rows:>9} rows  {elapsed:7.3f}s  {rows / elapsed:>12,.0f} rows/s")
+        baseline = results["per-row execute"][1]
+        print(f"Speedup: {baseline / results['bulk executemany'][1]:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
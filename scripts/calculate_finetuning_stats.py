@@ -1,12 +1,22 @@
 #!/usr/bin/env python3
 """
 Подсчет итоговой статистики по всем данным для fine-tuning
+
+Кроме объема данных считает почти одинаковые тексты между источниками
+(MinHash + LSH, minhash_dedup.py): одно описание фракции или поселения
+приходит из encyclopedia_all, wiki_data/factions и экспорта кампании.
+
+Usage:
+    python calculate_finetuning_stats.py [--dedup-thresholds 0.7 0.8 0.9]
 """
 
+import argparse
 import json
 import sys
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Sequence
+
+from minhash_dedup import dedup_report, minhash_signatures, near_duplicates, print_report
 
 # Настройка кодировки для Windows
 if sys.platform == 'win32':
@@ -15,15 +25,32 @@ if sys.platform == 'win32':
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
 
 
+# Пороги сходства Жаккара для отчета о почти одинаковых текстах
+DEDUP_THRESHOLDS = (0.7, 0.8, 0.9)
+
+# Более короткие строки (id, имена) в поиске дубликатов не участвуют
+MIN_DEDUP_CHARS = 50
+
+
 class FineTuningStats:
     """Подсчет статистики по данным для fine-tuning"""
     
-    def __init__(self, data_dir: Path):
+    def __init__(self, data_dir: Path, dedup_thresholds: Sequence[float] = DEDUP_THRESHOLDS):
         self.data_dir = data_dir
+        self.dedup_thresholds = dedup_thresholds
         self.stats = {}
-        
-    def count_file(self, file_path: Path) -> Dict[str, Any]:
-        """Подсчет статистики для одного файла"""
+        # Тексты всех источников для поиска дубликатов и их источники ("файл.поле")
+        self.texts: List[str] = []
+        self.text_sources: List[str] = []
+    
+    def collect_text(self, source: Optional[str], value: Any):
+        """Запоминает текст для поиска почти одинаковых записей"""
+        if source and isinstance(value, str) and len(value.strip()) >= MIN_DEDUP_CHARS:
+            self.texts.append(value)
+            self.text_sources.append(source)
+        
+    def count_file(self, file_path: Path, source: Optional[str] = None) -> Dict[str, Any]:
+        """Подсчет статистики для одного файла (source: имя источника для поиска дубликатов)"""
         if not file_path.exists():
             return {'exists': False}
         
@@ -47,6 +74,7 @@ class FineTuningStats:
                     for key, value in item.items():
                         if isinstance(value, str) and value:
                             total_text_length += len(value)
+                            self.collect_text(f"{source}.{key}", value)
                             if key.endswith('_ru') or key.endswith('_tr'):
                                 multilingual_count += 1
             
@@ -59,6 +87,8 @@ class FineTuningStats:
             if 'chapters' in data:
                 file_stats['chapters'] = len(data.get('chapters', []))
                 total_text = sum(len(ch.get('text', '')) for ch in data.get('chapters', []))
+                for ch in data.get('chapters', []):
+                    self.collect_text(f"{source}.chapters", ch.get('text'))
                 file_stats['total_text_length'] = total_text
                 file_stats['total_text_length_kb'] = round(total_text / 1024, 2)
             else:
@@ -72,8 +102,10 @@ class FineTuningStats:
                                 for k, v in item.items():
                                     if isinstance(v, str):
                                         total_text_length += len(v)
+                                        self.collect_text(f"{source}.{key}.{k}", v)
                     elif isinstance(value, str):
                         total_text_length += len(value)
+                        self.collect_text(source, value)
                 
                 file_stats['total_text_length'] = total_text_length
                 file_stats['total_text_length_kb'] = round(total_text_length / 1024, 2)
@@ -121,7 +153,8 @@ class FineTuningStats:
             if name.startswith('wiki_'):
                 continue  # Обработаем отдельно
             
-            stats = self.count_file(file_path)
+            # Старый travels_calradia_finetuning.json повторяет русскую версию
+            stats = self.count_file(file_path, None if name == 'travels_calradia' else name)
             self.stats[name] = stats
             
             if stats.get('exists'):
@@ -157,11 +190,13 @@ class FineTuningStats:
                         for section in ['overview', 'history', 'troops', 'tactics', 'economy']:
                             if section in data['sections'] and data['sections'][section]:
                                 total_faction_text += len(data['sections'][section])
+                                self.collect_text(f"wiki_factions.{section}", data['sections'][section])
                     else:
                         # Старая структура без sections
                         for section in ['overview', 'history', 'troops', 'tactics', 'economy']:
                             if section in data and data[section]:
                                 total_faction_text += len(data[section])
+                                self.collect_text(f"wiki_factions.{section}", data[section])
             
             print(f"✅ wiki_factions: {len(faction_files)} files, {round(total_faction_text/1024, 2)} KB text")
             total_stats['total_text_length'] += total_faction_text
@@ -176,6 +211,7 @@ class FineTuningStats:
                     data = json.load(file)
                     if 'content' in data and data['content']:
                         total_devblog_text += len(data['content'])
+                        self.collect_text('wiki_devblogs', data['content'])
             
             print(f"✅ wiki_devblogs: {len(devblog_files)} files, {round(total_devblog_text/1024, 2)} KB text")
             total_stats['total_text_length'] += total_devblog_text
@@ -190,6 +226,7 @@ class FineTuningStats:
                     data = json.load(file)
                     if 'content' in data and data['content']:
                         total_wiki_text += len(data['content'])
+                        self.collect_text('wiki_pages', data['content'])
             
             print(f"✅ wiki_pages: {len(wiki_page_files)} files, {round(total_wiki_text/1024, 2)} KB text")
             total_stats['total_text_length'] += total_wiki_text
@@ -226,6 +263,8 @@ class FineTuningStats:
                 print(f"✅ faction_descriptions: {len(factions_data)} descriptions, {round(total_factions_text/1024, 2)} KB text")
                 total_stats['total_text_length'] += total_factions_text
         
+        total_stats['near_duplicates'] = self.near_duplicate_stats()
+        
         # Итоговая статистика
         print("\n" + "=" * 80)
         print("📈 TOTAL STATISTICS")
@@ -296,6 +335,16 @@ class FineTuningStats:
         else:
             quality_notes.append(f"❌ Few data types ({len(data_types)} types)")
         
+        # Доля дубликатов при среднем пороге (на оценку не влияет)
+        if total_stats['near_duplicates']:
+            report = total_stats['near_duplicates'][len(total_stats['near_duplicates']) // 2]
+            if report['removed_share'] > 0.1:
+                quality_notes.append(f"⚠️  Many near-duplicate texts ({report['removed_share']:.1%} at "
+                                     f"Jaccard >= {report['threshold']})")
+            else:
+                quality_notes.append(f"✅ Few near-duplicate texts ({report['removed_share']:.1%} at "
+                                     f"Jaccard >= {report['threshold']})")
+        
         for note in quality_notes:
             print(f"   {note}")
         
@@ -323,10 +372,39 @@ class FineTuningStats:
         print(f"\n💾 Statistics saved to: {stats_file.name}")
         
         return total_stats
+    
+    def near_duplicate_stats(self) -> List[Dict[str, Any]]:
+        """Почти одинаковые тексты всех источников: отчет minhash_dedup для каждого порога"""
+        print("\n🧹 NEAR-DUPLICATES ACROSS SOURCES:")
+        print("-" * 80)
+        
+        if not self.dedup_thresholds:
+            print("   Skipped (no thresholds)")
+            return []
+        if not self.texts:
+            print("   No texts to compare")
+            return []
+        
+        print(f"   {len(self.texts):,} texts of {MIN_DEDUP_CHARS}+ characters")
+        signatures = minhash_signatures(self.texts)
+        reports = []
+        for threshold in sorted(self.dedup_thresholds):
+            report = dedup_report(near_duplicates(signatures, threshold), self.texts, self.text_sources,
+                                  examples=5)
+            print()
+            print_report(report, top=5)
+            reports.append(report)
+        return reports
 
 
 def main():
     """Main entry point"""
+    parser = argparse.ArgumentParser(description='Fine-tuning dataset statistics')
+    parser.add_argument('--dedup-thresholds', type=float, nargs='*', default=list(DEDUP_THRESHOLDS),
+                        help='Jaccard thresholds for the near-duplicate report (default: 0.7 0.8 0.9; '
+                             'none to skip it)')
+    args = parser.parse_args()
+    
     project_root = Path(__file__).parent.parent
     data_dir = project_root / 'finetuning_data'
     
@@ -334,7 +412,7 @@ def main():
         print(f"❌ Data directory not found: {data_dir}")
         return
     
-    stats = FineTuningStats(data_dir)
+    stats = FineTuningStats(data_dir, args.dedup_thresholds)
     stats.calculate_all_stats()
 
 
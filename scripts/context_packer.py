@@ -0,0 +1,525 @@
+#!/usr/bin/env python3
+"""
+Token-budgeted lore context for NPC prompts
+
+ContextPacker turns a player question into a context block that fits a
+token budget (the mod aims at 5-7K token prompts):
+
+    packer = ContextPacker(Path('Database/bannerlord_lore.db'))
+    packed = packer.pack('What do the Battanians think of the Empire?', budget=1500, language='EN')
+    print(packed['context'], packed['tokens'])
+
+1. Candidates: lore entries ranked by LoreSearch (any word of the
+   question may match) and campaign rows (campaign_settlements,
+   campaign_heroes, campaign_clans, campaign_kingdoms) whose name is
+   mentioned in the question, in any language.
+2. Scoring: lore relevance is the bm25 score relative to the best hit of
+   the same FTS index (scores of different indexes are not comparable),
+   campaign rows named in the question rank above them. Long texts are
+   split into chunks; later chunks of an entry are worth less than
+   earlier ones.
+3. Dedupe: a chunk that repeats most of the word shingles of text already
+   packed (encyclopedia and campaign descriptions overlap a lot) is
+   skipped.
+4. Packing: chunks are taken greedily, most valuable first, while they fit;
+   the assembled context is then counted again as a whole and trimmed if
+   needed, so the budget holds for the real tokenizer.
+
+Token counts come from the fine-tuned model's tokenizer (`tokenizers` or
+`transformers`, Qwen3 by default). Without either package installed the
+count is a conservative estimate and a warning is printed.
+
+Results are cached per (query, budget, language, types); the cache is
+dropped when the database changes. The mod's ContextRetriever can fetch
+packed context over HTTP:
+
+    python context_packer.py --serve 8765
+    GET http://127.0.0.1:8765/context?q=Who+rules+Pravend&budget=1500&lang=EN
+
+Usage:
+    python context_packer.py "question" [--budget N] [--language EN|RU|TR] [--types ...]
+    python context_packer.py --serve PORT [--host 127.0.0.1]
+"""
+
+import argparse
+import json
+import re
+import sqlite3
+import sys
+from collections import OrderedDict
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from fts_index import table_columns
+from lore_search import ENTITY_TYPES, LANGUAGES, LoreSearch, connect_read_only
+
+# Tokenizer of the fine-tuned model (train_unsloth_v2.py); a path to tokenizer.json also works
+DEFAULT_TOKENIZER = 'unsloth/Qwen3-8B'
+
+# Estimate when no tokenizer is installed: ASCII text ~4 chars/token, Cyrillic and others ~2
+ASCII_CHARS_PER_TOKEN = 4
+OTHER_CHARS_PER_TOKEN = 2
+
+DEFAULT_BUDGET = 1500
+
+# Lore entries taken from the search before scoring
+LORE_CANDIDATES = 30
+
+# Lore hits scoring below this fraction of the best hit in their index are dropped
+MIN_RELEVANCE = 0.15
+
+# Text column(s) per lore entity type, in packing order
+LORE_TEXT_COLUMNS = {
+    'settlement': ('description',),
+    'character': ('description', 'biography'),
+    'faction': ('description',),
+    'world_lore': ('content',),
+}
+
+# Campaign table -> (lore entity type, label, fact columns, description column).
+# Rows are packed under the same header as the lore entry with their encyclopedia id.
+CAMPAIGN_TABLES = {
+    'campaign_settlements': ('settlement', 'settlement', ('settlement_type', 'culture', 'owner_name'), None),
+    'campaign_heroes': ('character', 'hero', ('culture', 'age', 'clan_id'), None),
+    'campaign_clans': ('clan', 'clan', ('culture', 'kingdom'), 'description'),
+    'campaign_kingdoms': ('faction', 'kingdom', ('culture', 'ruler_name'), None),
+}
+
+# Labels for campaign fact columns
+FACT_LABELS = {
+    'settlement_type': 'type',
+    'owner_name': 'owner',
+    'ruler_name': 'ruler',
+    'clan_id': 'clan',
+}
+
+# Fact columns holding ids of other campaign rows, shown by name
+FACT_REFERENCES = {
+    'clan_id': 'campaign_clans',
+}
+
+# Campaign rows named in the question describe the current game state
+CAMPAIGN_RELEVANCE = 1.2
+
+# Longest entity name looked up in a question, in words
+MAX_NAME_WORDS = 4
+
+# Chunking: target chunk length in characters, value of each further chunk of an entry
+CHUNK_CHARS = 600
+CHUNK_DECAY = 0.7
+
+# Dedupe: shingle length in words, share of known shingles that makes a chunk a duplicate
+SHINGLE_WORDS = 4
+DUPLICATE_OVERLAP = 0.5
+
+CACHE_SIZE = 256
+
+# Same header as ContextRetriever.RetrieveContextForMessage
+HEADER = "=== Information about {name} ==="
+
+WORD_RE = re.compile(r'\w+')
+SENTENCE_RE = re.compile(r'(?<=[.!?…])\s+')
+
+
+class TokenCounter:
+    """Token count with the model tokenizer, or a conservative estimate without one"""
+
+    def __init__(self, tokenizer: Optional[str] = DEFAULT_TOKENIZER):
+        self.name = 'estimate'
+        self._encode = None
+
+        if tokenizer:
+            self._encode = self._load(tokenizer)
+            if self._encode is not None:
+                self.name = tokenizer
+        if self._encode is None:
+            print("⚠️  Warning: No tokenizer available (pip install tokenizers), "
+                  "token counts are estimates", file=sys.stderr)
+
+        self.count = lru_cache(maxsize=65536)(self._count)
+
+    @staticmethod
+    def _load(tokenizer: str):
+        try:
+            from tokenizers import Tokenizer
+            if Path(tokenizer).is_file():
+                fast = Tokenizer.from_file(tokenizer)
+            else:
+                fast = Tokenizer.from_pretrained(tokenizer)
+            return lambda text: len(fast.encode(text, add_special_tokens=False).ids)
+        except ImportError:
+            pass
+        except Exception as e:
+            print(f"⚠️  Warning: Cannot load tokenizer {tokenizer}: {e}", file=sys.stderr)
+            return None
+
+        try:
+            from transformers import AutoTokenizer
+            auto = AutoTokenizer.from_pretrained(tokenizer)
+            return lambda text: len(auto.encode(text, add_special_tokens=False))
+        except ImportError:
+            return None
+        except Exception as e:
+            print(f"⚠️  Warning: Cannot load tokenizer {tokenizer}: {e}", file=sys.stderr)
+            return None
+
+    @property
+    def exact(self) -> bool:
+        return self._encode is not None
+
+    def _count(self, text: str) -> int:
+        if self._encode is not None:
+            return self._encode(text)
+        ascii_chars = len(text.encode('ascii', 'ignore'))
+        other_chars = len(text) - ascii_chars
+        return -(-ascii_chars // ASCII_CHARS_PER_TOKEN) - (-other_chars // OTHER_CHARS_PER_TOKEN)
+
+
+def normalize_query(query: str) -> str:
+    return ' '.join(WORD_RE.findall(query.lower()))
+
+
+def split_chunks(text: str, chunk_chars: int = CHUNK_CHARS) -> List[str]:
+    """Split text into chunks of whole sentences, about chunk_chars long"""
+    chunks = []
+    for paragraph in text.split('\n'):
+        current = ''
+        for sentence in SENTENCE_RE.split(paragraph.strip()):
+            if current and len(current) + len(sentence) + 1 > chunk_chars:
+                chunks.append(current)
+                current = sentence
+            else:
+                current = f"{current} {sentence}" if current else sentence
+        if current:
+            chunks.append(current)
+    return chunks
+
+
+def shingles(text: str) -> set:
+    words = WORD_RE.findall(text.lower())
+    if len(words) < SHINGLE_WORDS:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def localized(row: sqlite3.Row, column: str, language: str):
+    """Value of column in the given language, falling back to the base column"""
+    keys = row.keys()
+    localized_column = f"{column}_{language.lower()}"
+    if localized_column in keys and row[localized_column]:
+        return row[localized_column]
+    return row[column] if column in keys else None
+
+
+class ContextPacker:
+    """Builds token-budgeted context blocks from bannerlord_lore.db"""
+
+    def __init__(self, db_path: Path, conn: Optional[sqlite3.Connection] = None,
+                 counter: Optional[TokenCounter] = None, cache_size: int = CACHE_SIZE):
+        self.db_path = db_path
+        self.conn = conn or connect_read_only(db_path)
+        self.search = LoreSearch(db_path, conn=self.conn)
+        self.counter = counter or TokenCounter()
+        self.cache_size = cache_size
+        self._cache: OrderedDict = OrderedDict()
+        self._data_version = None
+        self.hits = 0
+        self.misses = 0
+
+        # Campaign tables present in this database and their columns
+        self._campaign_columns = {}
+        for table in CAMPAIGN_TABLES:
+            columns = table_columns(self.conn, table)
+            if 'name' in columns:
+                self._campaign_columns[table] = columns
+        self._campaign_names = self._load_campaign_names()
+
+    def _load_campaign_names(self) -> Dict[str, List[Tuple[str, str]]]:
+        """Lowercase name (any language) -> [(campaign table, id)]"""
+        names: Dict[str, List[Tuple[str, str]]] = {}
+        for table, columns in self._campaign_columns.items():
+            name_columns = [column for column in ('name', 'name_ru', 'name_tr') if column in columns]
+            for row in self.conn.execute(f"SELECT id, {', '.join(name_columns)} FROM {table}"):
+                for name in set(row[1:]):
+                    if name:
+                        key = normalize_query(name)
+                        if key:
+                            names.setdefault(key, []).append((table, row[0]))
+        return names
+
+    def close(self):
+        self.conn.close()
+
+    def _check_data_version(self):
+        # data_version changes when another connection commits
+        version = self.conn.execute('PRAGMA data_version').fetchone()[0]
+        if version != self._data_version:
+            if self._data_version is not None:
+                self._cache.clear()
+                self._campaign_names = self._load_campaign_names()
+            self._data_version = version
+
+    def pack(self, query: str, budget: int = DEFAULT_BUDGET, language: str = 'EN',
+             types: Optional[Sequence[str]] = None) -> Dict:
+        """Context for a question within `budget` tokens.
+
+        Returns a dict with context (text), tokens (its token count),
+        budget, items (what was packed: type, id, name, tokens, value),
+        tokenizer and cached.
+        """
+        language = language.upper()
+        self._check_data_version()
+        key = (normalize_query(query), budget, language, tuple(sorted(types)) if types else None)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            # Copies down to the items, as hybrid_search returns them: callers may edit the result
+            return dict(cached, items=[dict(item) for item in cached['items']], cached=True)
+
+        self.misses += 1
+        result = self._pack(query, budget, language, types)
+        self._cache[key] = result
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return dict(result, items=[dict(item) for item in result['items']], cached=False)
+
+    def candidates(self, query: str, language: str = 'EN',
+                   types: Optional[Sequence[str]] = None) -> List[Dict]:
+        """Scored chunks: dicts with type, id, name, text and value"""
+        entries = self._campaign_entries(query, language) if not types else []
+        entries += self._lore_entries(query, language, types)
+
+        chunks = []
+        for entry in entries:
+            for i, text in enumerate(entry['chunks']):
+                chunks.append({
+                    'type': entry['type'],
+                    'id': entry['id'],
+                    'name': entry['name'],
+                    'index': i,
+                    'text': text,
+                    'value': entry['relevance'] * CHUNK_DECAY ** i,
+                })
+        chunks.sort(key=lambda chunk: chunk['value'], reverse=True)
+        return chunks
+
+    def _lore_entries(self, query: str, language: str, types: Optional[Sequence[str]]) -> List[Dict]:
+        hits = self.search.search(query, language, types, limit=LORE_CANDIDATES,
+                                  snippets=False, any_word=True)
+        entries = []
+        for hit in hits:
+            # Hits come ordered by relevance within their own index
+            relevance = hit['relevance']
+            if relevance < MIN_RELEVANCE:
+                break
+            row = self.search.get_entity(hit['type'], hit['encyclopedia_id'])
+            if row is None:
+                continue
+            chunks = []
+            for column in LORE_TEXT_COLUMNS[hit['type']]:
+                # Text in the requested language, English if there is no translation
+                text = row[f"{column}_{language.lower()}"] or row[f"{column}_en"]
+                if text:
+                    chunks.extend(split_chunks(text))
+            if chunks:
+                # Untitled lore entries are headed by their encyclopedia id
+                entries.append({'type': hit['type'], 'id': hit['encyclopedia_id'],
+                                'name': hit['name'] or hit['encyclopedia_id'],
+                                'relevance': relevance, 'chunks': chunks})
+        return entries
+
+    def _campaign_entries(self, query: str, language: str) -> List[Dict]:
+        words = normalize_query(query).split()
+        found = []
+        for size in range(min(MAX_NAME_WORDS, len(words)), 0, -1):
+            for start in range(len(words) - size + 1):
+                for match in self._campaign_names.get(' '.join(words[start:start + size]), ()):
+                    if match not in found:
+                        found.append(match)
+
+        entries = []
+        for table, row_id in found:
+            entity_type, label, fact_columns, description_column = CAMPAIGN_TABLES[table]
+            row = self.conn.execute(f"SELECT * FROM {table} WHERE id = ?", (row_id,)).fetchone()
+            if row is None:
+                continue
+            name = localized(row, 'name', language)
+            facts = []
+            for column in fact_columns:
+                value = localized(row, column, language)
+                if value in (None, ''):
+                    continue
+                if column in FACT_REFERENCES and FACT_REFERENCES[column] in self._campaign_columns:
+                    referenced = self.conn.execute(
+                        f"SELECT * FROM {FACT_REFERENCES[column]} WHERE id = ?", (value,)).fetchone()
+                    if referenced is not None:
+                        value = localized(referenced, 'name', language) or value
+                facts.append(f"{FACT_LABELS.get(column, column)}: {value}")
+            chunks = [f"{name} ({label}) - {'; '.join(facts)}" if facts else f"{name} ({label})"]
+            if description_column:
+                description = localized(row, description_column, language)
+                if description:
+                    chunks.extend(split_chunks(description))
+            entries.append({'type': entity_type, 'id': row['encyclopedia_id'] if 'encyclopedia_id' in row.keys()
+                            and row['encyclopedia_id'] else row_id,
+                            'name': name, 'relevance': CAMPAIGN_RELEVANCE, 'chunks': chunks})
+        return entries
+
+    def _pack(self, query: str, budget: int, language: str, types: Optional[Sequence[str]]) -> Dict:
+        count = self.counter.count
+        selected = []       # chunks in packing order
+        seen = set()        # shingles of packed text
+        headed = set()      # entities whose header is already counted
+        used = 0
+
+        for chunk in self.candidates(query, language, types):
+            chunk_shingles = shingles(chunk['text'])
+            if chunk_shingles and len(chunk_shingles & seen) >= DUPLICATE_OVERLAP * len(chunk_shingles):
+                continue
+
+            entity = (chunk['type'], chunk['id'])
+            cost = count(chunk['text']) + 1
+            if entity not in headed:
+                cost += count(HEADER.format(name=chunk['name'])) + 2
+            if used + cost > budget:
+                continue
+
+            used += cost
+            headed.add(entity)
+            seen |= chunk_shingles
+            chunk['tokens'] = cost
+            selected.append(chunk)
+
+        # Per-piece counts can differ from the whole text at the joins: check and trim
+        context = self._render(selected)
+        tokens = count(context) if context else 0
+        while tokens > budget and selected:
+            selected.pop()
+            context = self._render(selected)
+            tokens = count(context) if context else 0
+
+        return {
+            'query': query,
+            'budget': budget,
+            'language': language,
+            'tokens': tokens,
+            'tokenizer': self.counter.name,
+            'context': context,
+            'items': [{'type': chunk['type'], 'id': chunk['id'], 'name': chunk['name'],
+                       'tokens': chunk['tokens'], 'value': round(chunk['value'], 4)} for chunk in selected],
+        }
+
+    @staticmethod
+    def _render(selected: List[Dict]) -> str:
+        """Group packed chunks by entity (in order of value), chunks in text order"""
+        entities: Dict[tuple, Dict] = {}
+        for chunk in selected:
+            entity = entities.setdefault((chunk['type'], chunk['id']), {'name': chunk['name'], 'chunks': []})
+            entity['chunks'].append(chunk)
+        blocks = []
+        for entity in entities.values():
+            texts = [chunk['text'] for chunk in sorted(entity['chunks'], key=lambda chunk: chunk['index'])]
+            blocks.append(HEADER.format(name=entity['name']) + '\n' + '\n'.join(texts))
+        return '\n\n'.join(blocks)
+
+
+class ContextRequestHandler(BaseHTTPRequestHandler):
+    """GET /context?q=...&budget=N&lang=EN&types=settlement,character"""
+
+    packer: ContextPacker = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != '/context':
+            self._reply(404, {'error': 'not found'})
+            return
+
+        params = parse_qs(url.query)
+        query = params.get('q', [''])[0]
+        language = params.get('lang', ['EN'])[0].upper()
+        types = params['types'][0].split(',') if params.get('types') else None
+        try:
+            budget = int(params.get('budget', [DEFAULT_BUDGET])[0])
+        except ValueError:
+            self._reply(400, {'error': 'budget must be an integer'})
+            return
+        if not query or budget <= 0 or language not in LANGUAGES:
+            self._reply(400, {'error': 'q, a positive budget and lang (EN, RU, TR) are required'})
+            return
+
+        try:
+            self._reply(200, self.packer.pack(query, budget, language, types))
+        except ValueError as e:
+            self._reply(400, {'error': str(e)})
+
+    def _reply(self, status: int, payload: Dict):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(packer: ContextPacker, host: str, port: int):
+    ContextRequestHandler.packer = packer
+    server = HTTPServer((host, port), ContextRequestHandler)
+    print(f"✅ Serving packed context on http://{host}:{port}/context (tokenizer: {packer.counter.name})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pack lore context for a question into a token budget')
+    parser.add_argument('query', type=str, nargs='?', help='Question or search text')
+    parser.add_argument('--db-path', type=str, default='Database/bannerlord_lore.db',
+                        help='Path to database (default: Database/bannerlord_lore.db)')
+    parser.add_argument('--budget', type=int, default=DEFAULT_BUDGET,
+                        help=f'Token budget (default: {DEFAULT_BUDGET})')
+    parser.add_argument('--language', type=str, default='EN', choices=LANGUAGES, help='Language (default: EN)')
+    parser.add_argument('--types', nargs='+', choices=list(ENTITY_TYPES),
+                        help='Lore entity types (default: all, plus campaign rows)')
+    parser.add_argument('--tokenizer', type=str, default=DEFAULT_TOKENIZER,
+                        help=f'Tokenizer name or tokenizer.json path (default: {DEFAULT_TOKENIZER})')
+    parser.add_argument('--serve', type=int, metavar='PORT', help='Serve GET /context on this port')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Address to serve on (default: 127.0.0.1)')
+    args = parser.parse_args()
+
+    db_path = Path(args.db_path)
+    if not db_path.exists():
+        print(f"ERROR: Database not found: {db_path}")
+        sys.exit(1)
+    if not args.serve and not args.query:
+        parser.error('a query is required unless --serve is given')
+
+    packer = ContextPacker(db_path, counter=TokenCounter(args.tokenizer))
+    if args.serve:
+        # HTTPServer handles one request at a time, so the connection stays on one thread
+        serve(packer, args.host, args.serve)
+    else:
+        packed = packer.pack(args.query, args.budget, args.language, args.types)
+        print(packed['context'] or "No context")
+        print(f"\n--- {packed['tokens']}/{packed['budget']} tokens ({packed['tokenizer']}), "
+              f"{len(packed['items'])} chunk(s) ---")
+    packer.close()
+
+
+if __name__ == '__main__':
+    # Настройка кодировки для Windows (только при запуске как скрипт)
+    if sys.platform == 'win32':
+        import io
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+        sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+    main()
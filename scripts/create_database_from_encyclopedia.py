@@ -4,14 +4,26 @@
 
 Сначала импортируем структурированные данные из игры,
 потом можно дополнять данными из вики.
+
+Повторный запуск не пересоздаёт БД: схема обновляется миграциями
+(PRAGMA user_version), а строки вставляются/обновляются по encyclopedia_id
+и пропускаются, если их content_hash не изменился. Обновление идёт одной
+транзакцией в режиме WAL, так что БД остаётся доступной для чтения.
+FTS таблицы обновляются триггерами (fts_index.py) и не перестраиваются;
+после импорта сегменты индексов изменённых таблиц сливаются в один.
 """
 
+import hashlib
 import json
 import sqlite3
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, List, Any, Optional, Sequence, Tuple
 import sys
 
+from fts_index import (TRIGRAM_TOKENIZER, WORD_TOKENIZER, create_synced_fts, optimize as optimize_fts,
+                       rebuild as rebuild_fts, table_columns)
+from text_dedup import collapse_repeat, collapse_repeats
+
 # Настройка кодировки для Windows
 if sys.platform == 'win32':
     import io
@@ -22,15 +34,71 @@ if sys.platform == 'win32':
 class EncyclopediaImporter:
     """Импорт данных из Ingame Encyclopedia в SQLite"""
     
+    # Миграции схемы: (версия, метод). Текущая версия хранится в PRAGMA user_version
+    SCHEMA_MIGRATIONS = [
+        (1, 'create_schema'),
+        (2, 'add_content_hash'),
+        (3, 'add_fts_triggers'),
+        (4, 'add_multilingual_fts'),
+    ]
+    
+    # Поля записей с длинным текстом: повторы в них ищет text_dedup (clean_text()),
+    # остальные поля проходят через clean_duplicate()
+    DUPLICATE_FIELDS = ('text',)
+    
+    # Таблицы с данными из энциклопедии
+    LORE_TABLES = ['settlements_lore', 'characters_lore', 'factions_lore', 'clans_lore', 'world_lore', 'concepts']
+    
+    # FTS таблица -> (content-таблица, индексируемые колонки, токенизатор)
+    FTS_INDEXES = {
+        # EN поля
+        'settlements_fts': ('settlements_lore', ['name', 'name_en', 'description_en'], None),
+        'characters_fts': ('characters_lore', ['name', 'name_en', 'description_en', 'biography_en'], None),
+        'factions_fts': ('factions_lore', ['name', 'name_en', 'description_en'], None),
+        'world_lore_fts': ('world_lore', ['title', 'title_en', 'content_en'], None),
+        # RU/TR поля: регистр не учитывается, латинская диакритика снимается (ş = s)
+        'settlements_ru_fts': ('settlements_lore', ['name_ru', 'description_ru'], WORD_TOKENIZER),
+        'settlements_tr_fts': ('settlements_lore', ['name_tr', 'description_tr'], WORD_TOKENIZER),
+        'characters_ru_fts': ('characters_lore', ['name_ru', 'description_ru', 'biography_ru'], WORD_TOKENIZER),
+        'characters_tr_fts': ('characters_lore', ['name_tr', 'description_tr', 'biography_tr'], WORD_TOKENIZER),
+        'factions_ru_fts': ('factions_lore', ['name_ru', 'description_ru'], WORD_TOKENIZER),
+        'factions_tr_fts': ('factions_lore', ['name_tr', 'description_tr'], WORD_TOKENIZER),
+        'world_lore_ru_fts': ('world_lore', ['title_ru', 'content_ru'], WORD_TOKENIZER),
+        'world_lore_tr_fts': ('world_lore', ['title_tr', 'content_tr'], WORD_TOKENIZER),
+        # Названия на всех языках: поиск по подстроке / части имени
+        'settlements_names_trigram': ('settlements_lore', ['name', 'name_ru', 'name_tr'], TRIGRAM_TOKENIZER),
+        'characters_names_trigram': ('characters_lore', ['name', 'name_ru', 'name_tr'], TRIGRAM_TOKENIZER),
+        'factions_names_trigram': ('factions_lore', ['name', 'name_ru', 'name_tr'], TRIGRAM_TOKENIZER),
+        'world_lore_titles_trigram': ('world_lore', ['title', 'title_ru', 'title_tr'], TRIGRAM_TOKENIZER),
+    }
+    
+    # Ключевые слова для связанной фракции world_lore (проверяются по порядку)
+    LORE_FACTIONS = [
+        ('northern', 'Northern Empire'),
+        ('southern', 'Southern Empire'),
+        ('western', 'Western Empire'),
+        ('aserai', 'Aserai'),
+        ('battania', 'Battania'),
+        ('khuzait', 'Khuzait'),
+        ('sturgia', 'Sturgia'),
+        ('vlandia', 'Vlandia'),
+    ]
+    
     def __init__(self, db_path: Path, encyclopedia_dir: Path):
         self.db_path = db_path
         self.encyclopedia_dir = encyclopedia_dir
         self.conn = None
+        self.changed_rows = 0
+        self.changed_tables = set()
+        # Значение поля -> значение без повторов, заполняется collapse_duplicates()
+        self.deduplicated: Dict[str, str] = {}
         
     def connect(self):
         """Подключиться к БД"""
         self.conn = sqlite3.connect(str(self.db_path))
         self.conn.row_factory = sqlite3.Row
+        # WAL: читатели видят последнюю закоммиченную версию, пока идёт обновление
+        self.conn.execute('PRAGMA journal_mode=WAL')
         return self.conn
     
     def close(self):
@@ -38,23 +106,47 @@ class EncyclopediaImporter:
         if self.conn:
             self.conn.close()
     
+    def get_schema_version(self) -> int:
+        """Текущая версия схемы БД (0 для новой или старой БД без версии)"""
+        return self.conn.execute('PRAGMA user_version').fetchone()[0]
+    
+    def migrate(self) -> int:
+        """Применить недостающие миграции схемы, не удаляя данные"""
+        version = self.get_schema_version()
+        for target, step in self.SCHEMA_MIGRATIONS:
+            if target <= version:
+                continue
+            # Каждая миграция - отдельная транзакция вместе с новым user_version
+            self.conn.execute('BEGIN')
+            try:
+                getattr(self, step)()
+                self.conn.execute(f'PRAGMA user_version = {target}')
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+            version = target
+            print(f"✅ Schema migrated to v{version} ({step})")
+        return version
+    
+    def create_schema(self):
+        """Миграция 1: таблицы, индексы и FTS таблицы"""
+        self.create_tables()
+        self.create_indexes()
+        self.create_fts_tables()
+    
+    def add_content_hash(self):
+        """Миграция 2: колонка content_hash для пропуска неизменённых строк"""
+        cursor = self.conn.cursor()
+        for table in self.LORE_TABLES:
+            columns = {row['name'] for row in cursor.execute(f'PRAGMA table_info({table})')}
+            if 'content_hash' not in columns:
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN content_hash TEXT')
+    
     def create_tables(self):
         """Создать таблицы в БД"""
         cursor = self.conn.cursor()
         
-        # Удаляем старые таблицы если они есть (для пересоздания)
-        cursor.execute('DROP TABLE IF EXISTS settlements_fts')
-        cursor.execute('DROP TABLE IF EXISTS characters_fts')
-        cursor.execute('DROP TABLE IF EXISTS factions_fts')
-        cursor.execute('DROP TABLE IF EXISTS world_lore_fts')
-        cursor.execute('DROP TABLE IF EXISTS settlements_lore')
-        cursor.execute('DROP TABLE IF EXISTS characters_lore')
-        cursor.execute('DROP TABLE IF EXISTS factions_lore')
-        cursor.execute('DROP TABLE IF EXISTS clans_lore')
-        cursor.execute('DROP TABLE IF EXISTS world_lore')
-        cursor.execute('DROP TABLE IF EXISTS concepts')
-        self.conn.commit()
-        
         # Таблица: settlements_lore (поселения)
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS settlements_lore (
@@ -183,7 +275,6 @@ class EncyclopediaImporter:
             )
         ''')
         
-        self.conn.commit()
         print("✅ Tables created")
     
     def create_indexes(self):
@@ -215,379 +306,302 @@ class EncyclopediaImporter:
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_concepts_name ON concepts(name)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_concepts_category ON concepts(category)')
         
-        self.conn.commit()
         print("✅ Indexes created")
     
-    def create_fts_tables(self):
-        """Создать FTS5 таблицы для полнотекстового поиска"""
-        cursor = self.conn.cursor()
-        
-        # FTS для settlements (только EN поля)
-        cursor.execute('''
-            CREATE VIRTUAL TABLE IF NOT EXISTS settlements_fts USING fts5(
-                name, name_en, description_en,
-                content='settlements_lore',
-                content_rowid='rowid'
-            )
-        ''')
+    def create_fts_tables(self, multilingual: Optional[bool] = None):
+        """Создать FTS5 таблицы и триггеры, которые поддерживают их в актуальном состоянии.
         
-        # FTS для characters (только EN поля)
-        cursor.execute('''
-            CREATE VIRTUAL TABLE IF NOT EXISTS characters_fts USING fts5(
-                name, name_en, description_en, biography_en,
-                content='characters_lore',
-                content_rowid='rowid'
-            )
-        ''')
-        
-        # FTS для factions (только EN поля)
-        cursor.execute('''
-            CREATE VIRTUAL TABLE IF NOT EXISTS factions_fts USING fts5(
-                name, name_en, description_en,
-                content='factions_lore',
-                content_rowid='rowid'
-            )
-        ''')
+        multilingual=False - только EN индексы, True - только RU/TR и trigram, None - все.
+        """
+        for fts_table, (content_table, columns, tokenize) in self.FTS_INDEXES.items():
+            if multilingual is None or multilingual == (tokenize is not None):
+                create_synced_fts(self.conn, fts_table, content_table, columns, tokenize)
         
-        # FTS для world_lore (только EN поля)
-        cursor.execute('''
-            CREATE VIRTUAL TABLE IF NOT EXISTS world_lore_fts USING fts5(
-                title, title_en, content_en,
-                content='world_lore',
-                content_rowid='rowid'
-            )
-        ''')
-        
-        self.conn.commit()
         print("✅ FTS tables created")
     
-    def import_settlements(self, language: str = 'EN'):
-        """Импортировать поселения из settlements.json"""
-        json_file = self.encyclopedia_dir / language / 'settlements.json'
-        
-        if not json_file.exists():
-            print(f"⚠️  File not found: {json_file}")
-            return 0
-        
-        with open(json_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+    def add_fts_triggers(self):
+        """Миграция 3: триггеры синхронизации для EN FTS таблиц из v1"""
+        self.create_fts_tables(multilingual=False)
+    
+    def add_multilingual_fts(self):
+        """Миграция 4: RU/TR и trigram индексы"""
+        self.create_fts_tables(multilingual=True)
+    
+    @staticmethod
+    def content_hash(values: Sequence[Any]) -> str:
+        """Хеш значений одной группы колонок"""
+        # repr кортежа строк/чисел/None однозначен и заметно дешевле json.dumps
+        return hashlib.sha1(repr(tuple(values)).encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def group_hashes(value: Optional[str]) -> Dict[str, str]:
+        """Хеши групп колонок из content_hash ({} для пустого значения и старого формата)"""
+        try:
+            hashes = json.loads(value) if value else {}
+        except json.JSONDecodeError:
+            return {}
+        return hashes if isinstance(hashes, dict) else {}
+    
+    def upsert_rows(self, table: str, columns: List[str], rows: List[Tuple],
+                    groups: Optional[List[str]] = None) -> int:
+        """Вставить или обновить строки (encyclopedia_id, *значения columns).
+        
+        content_hash хранит хеш каждой группы колонок: groups - группа каждой
+        колонки ('' - общие колонки, 'en'/'ru'/'tr' - колонки языка). Хеши
+        групп, которые импорт не пишет, берутся из БД: обновление одного языка
+        в БД с несколькими языками не трогает строки, где его колонки не
+        изменились. Колонки, которых нет в columns (другие языки,
+        wiki_url, created_at), сохраняются. Строки из энциклопедии, которых
+        больше нет в источнике, удаляются.
+        Возвращает количество изменённых строк.
+        """
+        # При повторяющихся ID побеждает последняя запись, как с INSERT OR REPLACE
+        unique_rows = {row[0]: row for row in rows}
+        group_columns: Dict[str, List[int]] = {}
+        for index, group in enumerate(groups or [''] * len(columns)):
+            group_columns.setdefault(group, []).append(index)
         
         cursor = self.conn.cursor()
-        count = 0
-        
-        for item in data:
+        existing = cursor.execute(f'SELECT encyclopedia_id, content_hash, source FROM {table}').fetchall()
+        stored_hashes = {row[0]: row[1] for row in existing}
+        
+        def with_hash(row: Tuple) -> Tuple:
+            hashes = self.group_hashes(stored_hashes.get(row[0]))
+            for group, indices in group_columns.items():
+                hashes[group] = self.content_hash([row[1 + index] for index in indices])
+            return (*row, json.dumps(hashes, sort_keys=True, separators=(',', ':')))
+        
+        write_columns = columns + ['content_hash']
+        sql = f'''
+            INSERT INTO {table} (encyclopedia_id, {', '.join(write_columns)}, source, updated_at)
+            VALUES (?, {', '.join('?' * len(write_columns))}, 'encyclopedia', CURRENT_TIMESTAMP)
+            ON CONFLICT(encyclopedia_id) DO UPDATE SET
+                {', '.join(f'{column} = excluded.{column}' for column in write_columns)},
+                source = excluded.source,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE {table}.content_hash IS NOT excluded.content_hash
+        '''
+        cursor.executemany(sql, (with_hash(row) for row in unique_rows.values()))
+        # rowcount не включает строки, изменённые триггерами (FTS)
+        changed = cursor.rowcount
+        
+        stale_ids = [(row[0],) for row in existing if row[2] == 'encyclopedia' and row[0] not in unique_rows]
+        cursor.executemany(f'DELETE FROM {table} WHERE encyclopedia_id = ?', stale_ids)
+        changed += cursor.rowcount
+        
+        self.changed_rows += changed
+        if changed:
+            self.changed_tables.add(table)
+        return changed
+    
+    @staticmethod
+    def clean_duplicate(value: Optional[str]) -> str:
+        """Убрать дублирование (например "OmorOmor" -> "Omor")"""
+        if not value:
+            return ''
+        half = len(value) // 2
+        if value[:half] == value[half:]:
+            return value[:half]
+        return value
+    
+    def clean_text(self, value: Optional[str]) -> str:
+        """Убрать из длинного текста копию, вставленную повторно (text_dedup).
+        
+        Значения полей DUPLICATE_FIELDS уже обработаны пакетом в collapse_duplicates().
+        """
+        if not value:
+            return ''
+        cleaned = self.deduplicated.get(value)
+        return cleaned if cleaned is not None else collapse_repeat(value)
+    
+    def collapse_duplicates(self, items_by_language: Dict[str, Dict[str, Dict]]):
+        """Найти повторы в полях DUPLICATE_FIELDS всех языков одним пакетом (text_dedup)"""
+        values = list({item[field] for items in items_by_language.values() for item in items.values()
+                       for field in self.DUPLICATE_FIELDS if isinstance(item.get(field), str)})
+        self.deduplicated = dict(zip(values, collapse_repeats(values)))
+    
+    def load_language_items(self, file_names: List[str], languages: List[str]) -> Dict[str, Dict[str, Dict]]:
+        """Загрузить JSON всех языков: {язык: {encyclopedia_id: запись}}.
+        
+        Берётся первый существующий файл из file_names; языки без файла пропускаются.
+        """
+        items_by_language = {}
+        for language in languages:
+            language_dir = self.encyclopedia_dir / language
+            json_file = next((language_dir / name for name in file_names if (language_dir / name).exists()), None)
+            if json_file is None:
+                print(f"⚠️  File not found: {language_dir / file_names[-1]}")
+                continue
+            
+            with open(json_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            # При повторяющихся ID побеждает последняя запись
+            items_by_language[language] = {item.get('id', ''): item for item in data}
+        return items_by_language
+    
+    def import_table(self, table: str, file_names: List[str], languages: List[str],
+                     shared_columns: List[str], shared_values: Callable[[Dict], Tuple],
+                     localized: Dict[str, str]) -> int:
+        """Импортировать таблицу сразу для всех языков.
+        
+        Записи языков объединяются по encyclopedia_id в памяти, и таблица
+        пишется одним upsert'ом полностью собранных строк. Набор строк задаёт
+        первый язык (EN, если он есть); shared_values(запись) даёт общие
+        колонки, localized - колонки с переводом: префикс -> поле записи
+        (name -> name_en, name_ru, ...). Колонки незагруженных языков не трогаются.
+        """
+        items_by_language = self.load_language_items(file_names, languages)
+        base_language = 'EN' if 'EN' in languages else languages[0]
+        if base_language not in items_by_language:
+            return 0
+        self.collapse_duplicates(items_by_language)
+        loaded = [language for language in languages if language in items_by_language]
+        
+        columns = list(shared_columns)
+        groups = [''] * len(shared_columns)
+        for language in loaded:
+            columns.extend(f"{prefix}_{language.lower()}" for prefix in localized)
+            groups.extend(language.lower() for _ in localized)
+        
+        rows = []
+        for encyclopedia_id, item in items_by_language[base_language].items():
+            row = [encyclopedia_id, *shared_values(item)]
+            for language in loaded:
+                translated = items_by_language[language].get(encyclopedia_id)
+                for field in localized.values():
+                    # Нет перевода - NULL, как раньше при пропущенном UPDATE
+                    if translated is None:
+                        row.append(None)
+                    elif field in self.DUPLICATE_FIELDS:
+                        row.append(self.clean_text(translated.get(field)))
+                    else:
+                        row.append(self.clean_duplicate(translated.get(field)))
+            rows.append(tuple(row))
+        
+        changed = self.upsert_rows(table, columns, rows, groups)
+        print(f"✅ Imported {len(rows)} {table} ({', '.join(loaded)}; {changed} changed)")
+        return len(rows)
+    
+    def import_settlements(self, languages: List[str] = ['EN']):
+        """Импортировать поселения из settlements.json"""
+        def shared_values(item):
             # Определяем тип поселения
+            settlement_id = item.get('id', '').lower()
             settlement_type = None
-            if 'town' in item.get('id', '').lower():
+            if 'town' in settlement_id:
                 settlement_type = 'town'
-            elif 'castle' in item.get('id', '').lower():
+            elif 'castle' in settlement_id:
                 settlement_type = 'castle'
-            elif 'village' in item.get('id', '').lower():
+            elif 'village' in settlement_id:
                 settlement_type = 'village'
-            
-            # Извлекаем название
-            name = item.get('name', '')
-            if name:
-                # Убираем дублирование (например "OmorOmor" -> "Omor")
-                if len(name) > 0 and name[:len(name)//2] == name[len(name)//2:]:
-                    name = name[:len(name)//2]
-            
-            # Извлекаем текст описания
-            text = item.get('text', '')
-            if text:
-                # Убираем дублирование
-                if len(text) > 0 and text[:len(text)//2] == text[len(text)//2:]:
-                    text = text[:len(text)//2]
-            
-            encyclopedia_id = item.get('id', '')
-            
-            if language == 'EN':
-                # Для EN используем INSERT OR REPLACE
-                cursor.execute('''
-                    INSERT OR REPLACE INTO settlements_lore 
-                    (encyclopedia_id, name, name_en, type, description_en, source, updated_at)
-                    VALUES (?, ?, ?, ?, ?, 'encyclopedia', CURRENT_TIMESTAMP)
-                ''', (encyclopedia_id, name, name, settlement_type, text))
-            elif language == 'RU':
-                cursor.execute('''
-                    UPDATE settlements_lore 
-                    SET name_ru = ?, description_ru = ?, updated_at = CURRENT_TIMESTAMP
-                    WHERE encyclopedia_id = ?
-                ''', (name, text, encyclopedia_id))
-            elif language == 'TR':
-                cursor.execute('''
-                    UPDATE settlements_lore 
-                    SET name_tr = ?, description_tr = ?, updated_at = CURRENT_TIMESTAMP
-                    WHERE encyclopedia_id = ?
-                ''', (name, text, encyclopedia_id))
-            
-            count += 1
+            return self.clean_duplicate(item.get('name')), settlement_type
         
-        self.conn.commit()
-        print(f"✅ Imported {count} settlements from {language}")
-        return count
+        return self.import_table('settlements_lore', ['settlements.json'], languages,
+                                 ['name', 'type'], shared_values,
+                                 {'name': 'name', 'description': 'text'})
     
-    def import_factions(self, language: str = 'EN'):
+    def import_factions(self, languages: List[str] = ['EN']):
         """Импортировать фракции из kingdoms.json"""
-        json_file = self.encyclopedia_dir / language / 'kingdoms.json'
-        
-        if not json_file.exists():
-            print(f"⚠️  File not found: {json_file}")
-            return 0
-        
-        with open(json_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        def shared_values(item):
+            return (self.clean_duplicate(item.get('name')), item.get('short_name', ''), item.get('title', ''),
+                    item.get('ruler_title', ''), item.get('culture', ''))
         
-        cursor = self.conn.cursor()
-        count = 0
-        
-        for item in data:
-            name = item.get('name', '')
-            if name:
-                # Убираем дублирование
-                if len(name) > 0 and name[:len(name)//2] == name[len(name)//2:]:
-                    name = name[:len(name)//2]
-            
-            text = item.get('text', '')
-            if text:
-                # Убираем дублирование
-                if len(text) > 0 and text[:len(text)//2] == text[len(text)//2:]:
-                    text = text[:len(text)//2]
-            
-            encyclopedia_id = item.get('id', '')
-            
-            # Используем INSERT OR REPLACE для простоты (только EN)
-            cursor.execute('''
-                INSERT OR REPLACE INTO factions_lore 
-                (encyclopedia_id, name, name_en, short_name, title, ruler_title, culture, 
-                 description_en, source, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'encyclopedia', CURRENT_TIMESTAMP)
-            ''', (encyclopedia_id, name, name, item.get('short_name', ''), item.get('title', ''),
-                  item.get('ruler_title', ''), item.get('culture', ''), text))
-            
-            count += 1
-        
-        self.conn.commit()
-        print(f"✅ Imported {count} factions from {language}")
-        return count
+        return self.import_table('factions_lore', ['kingdoms.json'], languages,
+                                 ['name', 'short_name', 'title', 'ruler_title', 'culture'], shared_values,
+                                 {'name': 'name', 'description': 'text'})
     
-    def import_world_lore(self, language: str = 'EN'):
+    def import_world_lore(self, languages: List[str] = ['EN']):
         """Импортировать world_lore из world_lore.json"""
-        json_file = self.encyclopedia_dir / language / 'world_lore.json'
-        
-        if not json_file.exists():
-            print(f"⚠️  File not found: {json_file}")
-            return 0
-        
-        with open(json_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        cursor = self.conn.cursor()
-        count = 0
-        
-        for item in data:
-            title = item.get('title', '')
-            if title:
-                # Убираем дублирование
-                if len(title) > 0 and title[:len(title)//2] == title[len(title)//2:]:
-                    title = title[:len(title)//2]
-            
-            text = item.get('text', '')
-            if text:
-                # Убираем дублирование
-                if len(text) > 0 and text[:len(text)//2] == text[len(text)//2:]:
-                    text = text[:len(text)//2]
+        def shared_values(item):
+            text = self.clean_text(item.get('text'))
             
             # Определяем категорию и связанную фракцию
             category = 'philosophy'  # По умолчанию
             related_faction = None
             
             # Пытаемся определить фракцию из ID или текста
-            lore_id = item.get('id', '')
-            if 'northern' in lore_id.lower() or 'northern' in text.lower():
-                related_faction = 'Northern Empire'
-            elif 'southern' in lore_id.lower() or 'southern' in text.lower():
-                related_faction = 'Southern Empire'
-            elif 'western' in lore_id.lower() or 'western' in text.lower():
-                related_faction = 'Western Empire'
-            elif 'aserai' in lore_id.lower() or 'aserai' in text.lower():
-                related_faction = 'Aserai'
-            elif 'battania' in lore_id.lower() or 'battania' in text.lower():
-                related_faction = 'Battania'
-            elif 'khuzait' in lore_id.lower() or 'khuzait' in text.lower():
-                related_faction = 'Khuzait'
-            elif 'sturgia' in lore_id.lower() or 'sturgia' in text.lower():
-                related_faction = 'Sturgia'
-            elif 'vlandia' in lore_id.lower() or 'vlandia' in text.lower():
-                related_faction = 'Vlandia'
-            
-            encyclopedia_id = item.get('id', '')
+            lore_id = item.get('id', '').lower()
+            text = text.lower()
+            for keyword, faction in self.LORE_FACTIONS:
+                if keyword in lore_id or keyword in text:
+                    related_faction = faction
+                    break
             
-            # Используем INSERT OR REPLACE для простоты (только EN)
-            cursor.execute('''
-                INSERT OR REPLACE INTO world_lore 
-                (encyclopedia_id, title, title_en, category, content_en, related_faction, 
-                 source, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?, 'encyclopedia', CURRENT_TIMESTAMP)
-            ''', (encyclopedia_id, title, title, category, text, related_faction))
-            
-            count += 1
+            return self.clean_duplicate(item.get('title')), category, related_faction
         
-        self.conn.commit()
-        print(f"✅ Imported {count} world_lore entries from {language}")
-        return count
+        return self.import_table('world_lore', ['world_lore.json'], languages,
+                                 ['title', 'category', 'related_faction'], shared_values,
+                                 {'title': 'title', 'content': 'text'})
     
-    def import_concepts(self, language: str = 'EN'):
+    def import_concepts(self, languages: List[str] = ['EN']):
         """Импортировать концепции из concepts.json"""
-        json_file = self.encyclopedia_dir / language / 'concepts.json'
+        def shared_values(item):
+            return self.clean_duplicate(item.get('name')), item.get('category', '')
         
-        if not json_file.exists():
-            print(f"⚠️  File not found: {json_file}")
-            return 0
-        
-        with open(json_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        cursor = self.conn.cursor()
-        count = 0
-        
-        for item in data:
-            name = item.get('name', '')
-            if name:
-                # Убираем дублирование
-                if len(name) > 0 and name[:len(name)//2] == name[len(name)//2:]:
-                    name = name[:len(name)//2]
-            
-            text = item.get('text', '')
-            if text:
-                # Убираем дублирование
-                if len(text) > 0 and text[:len(text)//2] == text[len(text)//2:]:
-                    text = text[:len(text)//2]
-            
-            encyclopedia_id = item.get('id', '')
-            
-            # Используем INSERT OR REPLACE для простоты (только EN)
-            cursor.execute('''
-                INSERT OR REPLACE INTO concepts 
-                (encyclopedia_id, name, name_en, category, description_en, source, updated_at)
-                VALUES (?, ?, ?, ?, ?, 'encyclopedia', CURRENT_TIMESTAMP)
-            ''', (encyclopedia_id, name, name, item.get('category', ''), text))
-            
-            count += 1
-        
-        self.conn.commit()
-        print(f"✅ Imported {count} concepts from {language}")
-        return count
+        return self.import_table('concepts', ['concepts.json'], languages,
+                                 ['name', 'category'], shared_values,
+                                 {'name': 'name', 'description': 'text'})
     
-    def import_characters(self, language: str = 'EN'):
+    def import_characters(self, languages: List[str] = ['EN']):
         """Импортировать персонажей из npc_characters.json или heroes.json"""
-        # Пробуем npc_characters.json
-        json_file = self.encyclopedia_dir / language / 'npc_characters.json'
-        if not json_file.exists():
-            json_file = self.encyclopedia_dir / language / 'heroes.json'
-        
-        if not json_file.exists():
-            print(f"⚠️  File not found: {json_file}")
-            return 0
-        
-        with open(json_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        cursor = self.conn.cursor()
-        count = 0
-        
-        for item in data:
-            name = item.get('name', '')
-            if name:
-                # Убираем дублирование
-                if len(name) > 0 and name[:len(name)//2] == name[len(name)//2:]:
-                    name = name[:len(name)//2]
-            
-            text = item.get('text', '')
-            if text:
-                # Убираем дублирование
-                if len(text) > 0 and text[:len(text)//2] == text[len(text)//2:]:
-                    text = text[:len(text)//2]
-            
-            encyclopedia_id = item.get('id', '')
-            
-            # Используем INSERT OR REPLACE для простоты (только EN)
-            cursor.execute('''
-                INSERT OR REPLACE INTO characters_lore 
-                (encyclopedia_id, name, name_en, description_en, source, updated_at)
-                VALUES (?, ?, ?, ?, 'encyclopedia', CURRENT_TIMESTAMP)
-            ''', (encyclopedia_id, name, name, text))
-            
-            count += 1
+        def shared_values(item):
+            return (self.clean_duplicate(item.get('name')),)
         
-        self.conn.commit()
-        print(f"✅ Imported {count} characters from {language}")
-        return count
+        return self.import_table('characters_lore', ['npc_characters.json', 'heroes.json'], languages,
+                                 ['name'], shared_values,
+                                 {'name': 'name', 'description': 'text'})
     
     def populate_fts(self):
-        """Заполнить FTS таблицы"""
-        cursor = self.conn.cursor()
-        
-        # Заполняем FTS для settlements (только EN поля)
-        cursor.execute('''
-            INSERT INTO settlements_fts(rowid, name, name_en, description_en)
-            SELECT rowid, name, name_en, description_en
-            FROM settlements_lore
-        ''')
-        
-        # Заполняем FTS для characters (только EN поля)
-        cursor.execute('''
-            INSERT INTO characters_fts(rowid, name, name_en, description_en, biography_en)
-            SELECT rowid, name, name_en, description_en, biography_en
-            FROM characters_lore
-        ''')
+        """Полностью перестроить FTS таблицы (только для восстановления).
         
-        # Заполняем FTS для factions (только EN поля)
-        cursor.execute('''
-            INSERT INTO factions_fts(rowid, name, name_en, description_en)
-            SELECT rowid, name, name_en, description_en
-            FROM factions_lore
-        ''')
+        При импорте индексы обновляются триггерами, см. fts_index.py.
+        """
+        for fts_table in self.FTS_INDEXES:
+            rebuild_fts(self.conn, fts_table)
         
-        # Заполняем FTS для world_lore (только EN поля)
-        cursor.execute('''
-            INSERT INTO world_lore_fts(rowid, title, title_en, content_en)
-            SELECT rowid, title, title_en, content_en
-            FROM world_lore
-        ''')
-        
-        self.conn.commit()
         print("✅ FTS tables populated")
     
+    def optimize_fts(self, tables: Sequence[str]):
+        """Слить сегменты FTS индексов над изменёнными таблицами в один.
+        
+        Триггеры оставляют после импорта много мелких сегментов, а поиск
+        (lore_search.py) читает каждый из них; с одним сегментом bm25-запросы
+        заметно быстрее.
+        """
+        for fts_table, (content_table, _, _) in self.FTS_INDEXES.items():
+            if content_table in tables and table_columns(self.conn, fts_table):
+                optimize_fts(self.conn, fts_table)
+        self.conn.commit()
+    
     def import_all(self, languages: List[str] = ['EN']):
-        """Импортировать все данные (только английский язык)"""
+        """Импортировать все данные для указанных языков"""
         print("=" * 60)
-        print("Creating database from Ingame Encyclopedia (EN only)")
+        print(f"Creating database from Ingame Encyclopedia ({', '.join(languages)})")
         print("=" * 60)
         
         self.connect()
-        self.create_tables()
-        self.create_indexes()
-        self.create_fts_tables()
-        
-        print("\n--- Importing data (EN only) ---")
-        
-        # Импортируем только EN
-        language = 'EN'
-        print(f"\n[{language}]")
-        self.import_settlements(language)
-        self.conn.commit()
-        self.import_factions(language)
-        self.conn.commit()
-        self.import_world_lore(language)
-        self.conn.commit()
-        self.import_concepts(language)
-        self.conn.commit()
-        self.import_characters(language)
-        self.conn.commit()
-        
-        print("\n--- Populating FTS tables ---")
-        self.populate_fts()
+        version = self.migrate()
+        print(f"Schema version: {version}")
+        
+        print(f"\n--- Importing data ({', '.join(languages)}) ---")
+        
+        # Всё обновление - одна транзакция: читатели видят либо старые, либо новые данные
+        self.changed_rows = 0
+        self.changed_tables = set()
+        self.conn.execute('BEGIN')
+        try:
+            # Каждая таблица пишется один раз со всеми языками сразу
+            self.import_settlements(languages)
+            self.import_factions(languages)
+            self.import_world_lore(languages)
+            self.import_concepts(languages)
+            self.import_characters(languages)
+            # FTS таблицы уже обновлены триггерами
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        self.optimize_fts(self.changed_tables)
         
         # Статистика
         cursor = self.conn.cursor()
@@ -610,6 +624,7 @@ class EncyclopediaImporter:
         print(f"Characters: {characters_count}")
         print(f"World Lore: {world_lore_count}")
         print(f"Concepts: {concepts_count}")
+        print(f"Changed rows: {self.changed_rows}")
         print(f"\nDatabase saved to: {self.db_path}")
         
         self.close()
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Reading and writing fine-tuning data as JSON Lines
+
+One JSON record per line, optionally gzip (.gz) or zstd (.zst)
+compressed. When reading, the compression is taken from the file suffix.
+iter_jsonl() yields one record at a time, so consumers never hold a
+whole export in memory:
+
+    with JsonlWriter(Path('finetuning_data/settlements.jsonl.gz'), 'gzip') as writer:
+        for record in records:
+            writer.write(record)
+
+    for record in iter_jsonl(Path('finetuning_data/settlements.jsonl.gz')):
+        print(record['id'], record.get('description_en'))
+
+Large datasets are written as size-bounded shards (name-00000.jsonl,
+name-00001.jsonl, ...) plus name.manifest.json with the row count, row
+and byte offsets and SHA-256 of every shard. Readers open the manifest
+and read only the shards they need, or hand shards to worker processes:
+
+    with ShardedDatasetWriter(Path('finetuning_data'), 'unsloth_training_dataset') as writer:
+        for record in records:
+            writer.write(record)
+
+    dataset = ShardedDataset(Path('finetuning_data/unsloth_training_dataset.manifest.json'))
+    for shard in dataset.shards_for_rows(1000, 2000):
+        for record in dataset.iter_shard(shard):
+            ...
+
+Writing a dataset in one layout removes files of the other layouts with the
+same name (remove_dataset), and find_dataset prefers the manifest, so a
+stale name.json never shadows fresh shards.
+
+JsonArrayWriter writes a plain JSON array (as json.dump with indent=2) one
+record at a time, for outputs that stay JSON.
+
+zstd needs the zstandard package (pip install zstandard).
+"""
+
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, TextIO
+
+COMPRESSION_SUFFIXES = {'gzip': '.gz', 'zstd': '.zst'}
+COMPRESSIONS = list(COMPRESSION_SUFFIXES)
+
+# gzip level 6: close to level 9 in size on text, noticeably faster
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+# Uncompressed bytes per shard
+DEFAULT_SHARD_BYTES = 64 * 1024 * 1024
+
+MANIFEST_SUFFIX = '.manifest.json'
+
+_SCALARS = (str, int, float, bool, type(None))
+_ENCODER = json.JSONEncoder(ensure_ascii=False)
+
+
+def jsonl_path(directory: Path, name: str, compression: Optional[str] = None) -> Path:
+    """directory/name.jsonl plus the compression suffix"""
+    return directory / f"{name}.jsonl{COMPRESSION_SUFFIXES[compression] if compression else ''}"
+
+
+def manifest_path(directory: Path, name: str) -> Path:
+    return directory / f"{name}{MANIFEST_SUFFIX}"
+
+
+def compression_of(path: Path) -> Optional[str]:
+    for compression, suffix in COMPRESSION_SUFFIXES.items():
+        if path.suffix == suffix:
+            return compression
+    return None
+
+
+def open_binary(path: Path, mode: str = 'r', compression: Optional[str] = None) -> BinaryIO:
+    """Binary file ('r' or 'w'), compressed as given or, by default, as the suffix says"""
+    compression = compression or compression_of(path)
+    if compression is None:
+        return open(path, mode + 'b')
+    if compression == 'gzip':
+        # mtime=0: the same records always give the same bytes
+        return gzip.GzipFile(path, mode + 'b', compresslevel=GZIP_LEVEL, mtime=0)
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("zstd compression needs the zstandard package: pip install zstandard")
+        context = zstandard.ZstdCompressor(level=ZSTD_LEVEL) if mode == 'w' else None
+        return zstandard.open(path, mode + 'b', cctx=context)
+    raise ValueError(f"Unknown compression: {compression} (expected one of {', '.join(COMPRESSIONS)})")
+
+
+def open_text(path: Path, mode: str = 'r', compression: Optional[str] = None) -> TextIO:
+    """UTF-8 text file ('r' or 'w'), compressed as given or, by default, as the suffix says"""
+    # Always '\n' line ends, so files are byte-identical across platforms
+    newline = '\n' if mode == 'w' else None
+    return io.TextIOWrapper(open_binary(path, mode, compression), encoding='utf-8', newline=newline)
+
+
+def encode_record(record: Any) -> bytes:
+    """One JSON Lines line"""
+    return (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+class JsonlWriter:
+    """Writes records one per line; `count` is the number written so far"""
+
+    def __init__(self, path: Path, compression: Optional[str] = None):
+        self.path = path
+        self.count = 0
+        self._file = open_binary(path, 'w', compression)
+
+    def write(self, record: Dict[str, Any]):
+        self._file.write(encode_record(record))
+        self.count += 1
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class JsonArrayWriter:
+    """
+    Writes a JSON array one record at a time: the file holds exactly what
+    json.dump(records, f, ensure_ascii=False, indent=2) gives, without the list
+    in memory. `count` is the number of records written so far.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.count = 0
+        self._file = open(path, 'w', encoding='utf-8', newline='\n')
+
+    def write(self, record: Any):
+        self._file.write(('[\n  ' if self.count == 0 else ',\n  ') + self._dump(record))
+        self.count += 1
+
+    @staticmethod
+    def _dump(record: Any) -> str:
+        if isinstance(record, dict) and record and all(
+                isinstance(key, str) and isinstance(value, _SCALARS) for key, value in record.items()):
+            # Flat records: every key and value through the C encoder (indent= always takes the Python one)
+            return '{\n    ' + ',\n    '.join(
+                f"{_ENCODER.encode(key)}: {_ENCODER.encode(value)}"
+                for key, value in record.items()) + '\n  }'
+        # Strings are escaped, so every newline in the dump is indentation
+        return json.dumps(record, ensure_ascii=False, indent=2).replace('\n', '\n  ')
+
+    def append_file(self, path: Path, count: int):
+        """Append the `count` records of an array written by JsonArrayWriter, copied without decoding"""
+        if not count:
+            return
+        self._file.write('[\n' if self.count == 0 else ',\n')
+        self._file.flush()
+        with open(path, 'rb') as f:
+            # Everything between "[\n" and "\n]", in blocks
+            remaining = f.seek(0, os.SEEK_END) - 4
+            f.seek(2)
+            while remaining > 0:
+                block = f.read(min(remaining, 1024 * 1024))
+                self._file.buffer.write(block)
+                remaining -= len(block)
+        self._file.buffer.flush()
+        self.count += count
+
+    def close(self):
+        self._file.write('\n]' if self.count else '[]')
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def iter_jsonl(path: Path) -> Iterator[Dict[str, Any]]:
+    """Records of a (possibly compressed) JSON Lines file, read lazily"""
+    with open_text(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+class ShardedDatasetWriter:
+    """
+    Writes records into shards of at most `shard_bytes` uncompressed bytes (a record
+    larger than that gets a shard of its own) and, on close, the manifest.
+
+    Shards of an earlier run with the same name that the new manifest does not list
+    are deleted. `count` is the number of records written so far.
+    """
+
+    def __init__(self, directory: Path, name: str, shard_bytes: int = DEFAULT_SHARD_BYTES,
+                 compression: Optional[str] = None, metadata: Optional[Dict[str, Any]] = None):
+        if shard_bytes <= 0:
+            raise ValueError("shard_bytes must be positive")
+        self.directory = directory
+        self.name = name
+        self.shard_bytes = shard_bytes
+        self.compression = compression
+        self.metadata = metadata or {}
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path = manifest_path(directory, name)
+        self.count = 0
+        self.shards: List[Dict[str, Any]] = []
+        self._bytes = 0
+        self._file: Optional[BinaryIO] = None
+        self._shard: Optional[Dict[str, Any]] = None
+        self._hash = None
+
+    def _shard_file(self, index: int) -> str:
+        return f"{self.name}-{index:05d}.jsonl{COMPRESSION_SUFFIXES[self.compression] if self.compression else ''}"
+
+    def _finish_shard(self):
+        if self._file is None:
+            return
+        self._file.close()
+        self._shard['sha256'] = self._hash.hexdigest()
+        self._shard['file_bytes'] = (self.directory / self._shard['file']).stat().st_size
+        self.shards.append(self._shard)
+        self._file = None
+
+    def _start_shard(self):
+        self._finish_shard()
+        file_name = self._shard_file(len(self.shards))
+        self._file = open_binary(self.directory / file_name, 'w', self.compression)
+        self._shard = {'file': file_name, 'rows': 0, 'first_row': self.count, 'byte_offset': self._bytes, 'bytes': 0}
+        self._hash = hashlib.sha256()
+
+    def write(self, record: Any):
+        line = encode_record(record)
+        if self._file is None or (self._shard['bytes'] and self._shard['bytes'] + len(line) > self.shard_bytes):
+            self._start_shard()
+        self._file.write(line)
+        self._hash.update(line)
+        self._shard['rows'] += 1
+        self._shard['bytes'] += len(line)
+        self._bytes += len(line)
+        self.count += 1
+
+    def close(self):
+        self._finish_shard()
+        manifest = {
+            'name': self.name,
+            'format': 'jsonl',
+            'compression': self.compression,
+            'shard_bytes': self.shard_bytes,
+            'rows': self.count,
+            'bytes': self._bytes,
+            'metadata': self.metadata,
+            # sha256 and bytes are over the uncompressed JSON Lines; file_bytes is the size on disk
+            'shards': self.shards,
+        }
+        temporary = self.path.with_name(self.path.name + '.tmp')
+        with open(temporary, 'w', encoding='utf-8', newline='\n') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(temporary, self.path)
+
+        current = {shard['file'] for shard in self.shards}
+        for path in shard_files(self.directory, self.name):
+            if path.name not in current:
+                path.unlink()
+        # The manifest replaces name.json / name.jsonl of an earlier unsharded run
+        remove_dataset(self.directory, self.name, keep=self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.close()
+        elif self._file is not None:
+            # No manifest for a failed write; the previous one's verify() flags overwritten shards
+            self._file.close()
+
+
+class ShardedDataset:
+    """Reader for a dataset written by ShardedDatasetWriter, opened through its manifest"""
+
+    def __init__(self, manifest: Path):
+        self.manifest_path = manifest
+        self.directory = manifest.parent
+        with open(manifest, 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        self.name: str = self.manifest['name']
+        self.rows: int = self.manifest['rows']
+        self.shards: List[Dict[str, Any]] = self.manifest['shards']
+
+    def shard_path(self, shard: Dict[str, Any]) -> Path:
+        return self.directory / shard['file']
+
+    def shards_for_rows(self, start: int, stop: int) -> List[Dict[str, Any]]:
+        """Shards holding rows start..stop-1"""
+        return [shard for shard in self.shards
+                if shard['first_row'] < stop and shard['first_row'] + shard['rows'] > start]
+
+    def iter_shard(self, shard: Dict[str, Any]) -> Iterator[Any]:
+        return iter_jsonl(self.shard_path(shard))
+
+    def __iter__(self) -> Iterator[Any]:
+        for shard in self.shards:
+            yield from self.iter_shard(shard)
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def verify(self) -> List[str]:
+        """Files of shards that are missing or whose content does not match the manifest"""
+        bad = []
+        for shard in self.shards:
+            path = self.shard_path(shard)
+            if not path.exists():
+                bad.append(shard['file'])
+                continue
+            digest = hashlib.sha256()
+            size = 0
+            with open_binary(path) as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(block)
+                    size += len(block)
+            if size != shard['bytes'] or digest.hexdigest() != shard['sha256']:
+                bad.append(shard['file'])
+        return bad
+
+
+def shard_files(directory: Path, name: str) -> List[Path]:
+    """Files in directory named like shards of name (name-NNNNN.jsonl[.gz|.zst])"""
+    pattern = re.compile(re.escape(name) + r'-\d{5}\.jsonl(\.gz|\.zst)?$')
+    return [path for path in directory.iterdir() if pattern.match(path.name)]
+
+
+def remove_dataset(directory: Path, name: str, keep: Optional[Path] = None):
+    """Delete name.json, name.jsonl[.gz|.zst] and name.manifest.json with its shards in directory,
+    except keep (keeping the manifest keeps its shards too)"""
+    paths = [directory / f"{name}.json", jsonl_path(directory, name)]
+    paths += [jsonl_path(directory, name, compression) for compression in COMPRESSIONS]
+    if keep != manifest_path(directory, name) and directory.is_dir():
+        paths.append(manifest_path(directory, name))
+        paths += shard_files(directory, name)
+    for path in paths:
+        if path != keep and path.exists():
+            path.unlink()
+
+
+def find_dataset(directory: Path, name: str) -> Optional[Path]:
+    """name.manifest.json, name.json or name.jsonl[.gz|.zst] in directory, whichever exists first"""
+    candidates = [manifest_path(directory, name), directory / f"{name}.json", jsonl_path(directory, name)]
+    candidates += [jsonl_path(directory, name, compression) for compression in COMPRESSIONS]
+    return next((path for path in candidates if path.exists()), None)
+
+
+def iter_records(path: Path) -> Iterator[Any]:
+    """Records of a manifest, a JSON Lines file or a JSON array, lazily except for the JSON array"""
+    if path.name.endswith(MANIFEST_SUFFIX):
+        return iter(ShardedDataset(path))
+    if path.suffix == '.json':
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return iter(data if isinstance(data, list) else [data])
+    return iter_jsonl(path)
@@ -3,36 +3,273 @@
 Экспорт данных из SQL базы для fine-tuning
 Извлекает описания кланов, городов, замков, деревень, лордов, фракций
 и данные только из английского экземпляра
+
+Usage:
+    python export_finetuning_data.py                                  # JSON-массивы
+    python export_finetuning_data.py --format jsonl --compression gzip  # потоковый JSON Lines
+    python export_finetuning_data.py --jobs 4                          # таблицы параллельно
+    python export_finetuning_data.py --format jsonl --shard-size 64    # шарды по 64 МБ + манифест
 """
 
+import argparse
+import contextlib
+import io
+import os
 import sqlite3
 import json
+import re
 import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, Iterator, List, Any, Optional, Tuple
+
+from dataset_io import COMPRESSIONS, JsonlWriter, ShardedDatasetWriter, jsonl_path, remove_dataset
 
 # Настройка кодировки для Windows
 if sys.platform == 'win32':
-    import io
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
 
+# Маркеры локализации вида {=xyz123} в именах из энциклопедии
+LOCALIZATION_MARKER = re.compile(r'\{=[^}]*\}')
+
+
+def normalize_name(name: Optional[str]) -> Optional[str]:
+    """Ключ для сопоставления по имени: без маркеров локализации, лишних пробелов и регистра"""
+    if not name:
+        return None
+    return ' '.join(LOCALIZATION_MARKER.sub('', name).split()).casefold() or None
+
+
+class RecordIndex:
+    """
+    Записи экспорта в исходном порядке + словари по id и по нормализованному имени.
+    Как и прежний линейный поиск, оба индекса возвращают первую добавленную запись.
+    """
+
+    def __init__(self, name_field: str = 'name_en'):
+        self.name_field = name_field
+        self.records: List[Dict[str, Any]] = []
+        self.by_id: Dict[Any, Dict[str, Any]] = {}
+        self.by_name: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        self.records.append(record)
+        self.by_id.setdefault(record['id'], record)
+        name = normalize_name(record.get(self.name_field))
+        if name:
+            self.by_name.setdefault(name, record)
+        return record
+
+    def get(self, record_id) -> Optional[Dict[str, Any]]:
+        return self.by_id.get(record_id)
+
+    def find_name(self, name: Optional[str]) -> Optional[Dict[str, Any]]:
+        key = normalize_name(name)
+        return self.by_name.get(key) if key else None
+
+    def __contains__(self, record_id) -> bool:
+        return record_id in self.by_id
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+
+# Потоковый режим (jsonl): строк за один fetchmany
+STREAM_CHUNK_ROWS = 1000
+
+OUTPUT_FORMATS = ['json', 'jsonl']
+
+# Экспорт по таблицам: метка -> метод (порядок = порядок последовательного запуска)
+EXPORT_TASKS = {
+    'clans': 'export_clans',
+    'settlements': 'export_settlements',
+    'lords': 'export_lords',
+    'factions': 'export_factions',
+    'english_only': 'export_english_only_data',
+}
+
+CAMPAIGN_CLANS_SQL = '''
+    SELECT 
+        id,
+        name AS name_en,
+        name_ru,
+        name_tr,
+        description AS description_en,
+        description_ru,
+        description_tr,
+        culture,
+        kingdom
+    FROM campaign_clans
+    WHERE description IS NOT NULL 
+       OR description_ru IS NOT NULL 
+       OR description_tr IS NOT NULL
+'''
+
+CLANS_SQL = '''
+    SELECT 
+        id,
+        name,
+        text,
+        wiki_description
+    FROM clans
+    WHERE text IS NOT NULL OR wiki_description IS NOT NULL
+'''
+
+CAMPAIGN_SETTLEMENTS_SQL = '''
+    SELECT 
+        id,
+        name AS name_en,
+        name_ru,
+        name_tr,
+        settlement_type,
+        culture,
+        owner_name AS owner_name_en,
+        owner_name_ru,
+        owner_name_tr
+    FROM campaign_settlements
+'''
+
+SETTLEMENTS_SQL = '''
+    SELECT 
+        id,
+        name,
+        text,
+        type,
+        culture,
+        wiki_description
+    FROM settlements
+    WHERE text IS NOT NULL OR wiki_description IS NOT NULL
+'''
+
+SETTLEMENTS_FTS_SQL = '''
+    SELECT 
+        name,
+        text
+    FROM settlements_fts
+    WHERE text IS NOT NULL AND text != ''
+'''
+
+CAMPAIGN_HEROES_SQL = '''
+    SELECT 
+        id,
+        name AS name_en,
+        name_ru,
+        name_tr,
+        culture,
+        clan_id,
+        age,
+        is_female
+    FROM campaign_heroes
+'''
+
+HEROES_SQL = '''
+    SELECT 
+        id,
+        text,
+        wiki_biography
+    FROM heroes
+    WHERE text IS NOT NULL OR wiki_biography IS NOT NULL
+'''
+
+CAMPAIGN_KINGDOMS_SQL = '''
+    SELECT 
+        id,
+        name AS name_en,
+        name_ru,
+        name_tr,
+        culture,
+        ruler_name AS ruler_name_en,
+        ruler_name_ru,
+        ruler_name_tr
+    FROM campaign_kingdoms
+'''
+
+KINGDOMS_SQL = '''
+    SELECT 
+        id,
+        name,
+        text,
+        wiki_description
+    FROM kingdoms
+    WHERE text IS NOT NULL OR wiki_description IS NOT NULL
+'''
+
+# Данные только из английского экземпляра: (ключ, запрос, колонки "пусто -> None", что экспортируется)
+ENGLISH_ONLY_TABLES = [
+    ('kingdoms', 'SELECT id, name, text FROM kingdoms WHERE text IS NOT NULL', (), 'texts'),
+    ('settlements_fts', 'SELECT name, text FROM settlements_fts WHERE text IS NOT NULL AND text != ""', (), 'texts'),
+    ('cultures', 'SELECT id, name, text FROM cultures WHERE text IS NOT NULL', (), 'texts'),
+    # concepts - используем title вместо name
+    ('concepts', 'SELECT id, title, text, group_name FROM concepts WHERE text IS NOT NULL',
+     ('title', 'group_name'), 'texts'),
+    # world_lore - нет колонки name, используем wiki_title
+    ('world_lore', 'SELECT id, text, wiki_title FROM world_lore WHERE text IS NOT NULL', ('wiki_title',), 'texts'),
+    ('world_lore_fts', 'SELECT text FROM world_lore_fts WHERE text IS NOT NULL AND text != ""', (), 'texts'),
+    ('items', 'SELECT id, name FROM items WHERE name IS NOT NULL', (), 'names'),
+]
+
+
+def describe(text: Optional[str], fallback: Optional[str]) -> Optional[str]:
+    """Описание из энциклопедии: text, иначе вики-описание"""
+    return text if text else (fallback if fallback else None)
+
 
 class FineTuningDataExporter:
-    """Экспорт данных для fine-tuning"""
+    """
+    Экспорт данных для fine-tuning.
+    
+    output_format='json' - по файлу JSON-массива на таблицу (как раньше);
+    output_format='jsonl' - потоковый режим: строки читаются из курсора пачками,
+    объединение с энциклопедией делает SQLite, записи сразу пишутся в JSON Lines
+    (опционально gzip/zstd), так что память не растёт с размером таблиц.
+    Записи и их порядок в обоих режимах одинаковые.
+    
+    shard_bytes (только jsonl): писать каждую таблицу шардами не больше shard_bytes
+    несжатых байт плюс <таблица>.manifest.json (см. dataset_io.ShardedDatasetWriter).
+    """
+    
+    # Индекс для объединения записей кампании и энциклопедии
+    record_index = RecordIndex
     
-    def __init__(self, db_path: Path, output_dir: Path):
+    def __init__(self, db_path: Path, output_dir: Path, output_format: str = 'json',
+                 compression: Optional[str] = None, shard_bytes: Optional[int] = None):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format: {output_format}")
+        if (compression or shard_bytes) and output_format != 'jsonl':
+            raise ValueError("Compression and sharding are only supported for jsonl output")
         self.db_path = db_path
         self.output_dir = output_dir
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.output_format = output_format
+        self.compression = compression
+        self.shard_bytes = shard_bytes
         self.conn = None
         
-    def connect(self):
-        """Подключиться к БД"""
-        self.conn = sqlite3.connect(str(self.db_path))
+    def connect(self, snapshot: bool = False):
+        """Подключиться к БД (snapshot=True: неизменяемый снимок, только чтение, без блокировок)"""
+        if snapshot:
+            self.conn = sqlite3.connect(f"{self.db_path.resolve().as_uri()}?mode=ro&immutable=1", uri=True)
+        else:
+            self.conn = sqlite3.connect(str(self.db_path))
         self.conn.row_factory = sqlite3.Row
         return self.conn
     
+    def create_snapshot(self, directory: Path) -> Path:
+        """
+        Согласованная копия БД (backup API, одна транзакция чтения) для параллельного экспорта:
+        все процессы читают одно и то же состояние, даже если БД тем временем обновляется
+        """
+        path = directory / self.db_path.name
+        target = sqlite3.connect(str(path))
+        try:
+            self.conn.backup(target)
+        finally:
+            target.close()
+        return path
+    
     def close(self):
         """Закрыть соединение"""
         if self.conn:
@@ -44,405 +281,479 @@ class FineTuningDataExporter:
         cursor.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name")
         return [row[0] for row in cursor.fetchall()]
     
+    @property
+    def streaming(self) -> bool:
+        return self.output_format == 'jsonl'
+    
+    # --- Записи (общие для обоих режимов) ---
+    
+    @staticmethod
+    def _campaign_clan(row) -> Dict[str, Any]:
+        return {
+            'id': row['id'],
+            'name_en': row['name_en'],
+            'name_ru': row['name_ru'] if row['name_ru'] else None,
+            'name_tr': row['name_tr'] if row['name_tr'] else None,
+            'description_en': row['description_en'] if row['description_en'] else None,
+            'description_ru': row['description_ru'] if row['description_ru'] else None,
+            'description_tr': row['description_tr'] if row['description_tr'] else None,
+            'culture': row['culture'] if row['culture'] else None,
+            'kingdom': row['kingdom'] if row['kingdom'] else None
+        }
+    
+    @staticmethod
+    def _encyclopedia_clan(row) -> Dict[str, Any]:
+        return {
+            'id': row['id'],
+            'name_en': row['name'] if row['name'] else None,
+            'description_en': describe(row['text'], row['wiki_description']),
+            'source': 'encyclopedia'
+        }
+    
+    @staticmethod
+    def _campaign_settlement(row) -> Dict[str, Any]:
+        return {
+            'id': row['id'],
+            'name_en': row['name_en'],
+            'name_ru': row['name_ru'] if row['name_ru'] else None,
+            'name_tr': row['name_tr'] if row['name_tr'] else None,
+            'type': row['settlement_type'] if row['settlement_type'] else None,
+            'culture': row['culture'] if row['culture'] else None,
+            'owner_name_en': row['owner_name_en'] if row['owner_name_en'] else None,
+            'owner_name_ru': row['owner_name_ru'] if row['owner_name_ru'] else None,
+            'owner_name_tr': row['owner_name_tr'] if row['owner_name_tr'] else None
+        }
+    
+    @staticmethod
+    def _encyclopedia_settlement(row) -> Dict[str, Any]:
+        return {
+            'id': row['id'],
+            'name_en': row['name'] if row['name'] else None,
+            'description_en': describe(row['text'], row['wiki_description']),
+            'type': row['type'] if row['type'] else None,
+            'culture': row['culture'] if row['culture'] else None,
+            'source': 'encyclopedia'
+        }
+    
+    @staticmethod
+    def _campaign_lord(row) -> Dict[str, Any]:
+        return {
+            'id': row['id'],
+            'name_en': row['name_en'],
+            'name_ru': row['name_ru'] if row['name_ru'] else None,
+            'name_tr': row['name_tr'] if row['name_tr'] else None,
+            'culture': row['culture'] if row['culture'] else None,
+            'clan_id': row['clan_id'] if row['clan_id'] else None,
+            'age': row['age'] if row['age'] else None,
+            'is_female': bool(row['is_female']) if row['is_female'] is not None else False
+        }
+    
+    @staticmethod
+    def _encyclopedia_lord(row) -> Dict[str, Any]:
+        return {
+            'id': row['id'],
+            'description_en': describe(row['text'], row['wiki_biography']),
+            'source': 'encyclopedia'
+        }
+    
+    @staticmethod
+    def _campaign_faction(row) -> Dict[str, Any]:
+        return {
+            'id': row['id'],
+            'name_en': row['name_en'],
+            'name_ru': row['name_ru'] if row['name_ru'] else None,
+            'name_tr': row['name_tr'] if row['name_tr'] else None,
+            'culture': row['culture'] if row['culture'] else None,
+            'ruler_name_en': row['ruler_name_en'] if row['ruler_name_en'] else None,
+            'ruler_name_ru': row['ruler_name_ru'] if row['ruler_name_ru'] else None,
+            'ruler_name_tr': row['ruler_name_tr'] if row['ruler_name_tr'] else None
+        }
+    
+    @staticmethod
+    def _encyclopedia_faction(row) -> Dict[str, Any]:
+        return {
+            'id': row['id'],
+            'name_en': row['name'] if row['name'] else None,
+            'description_en': describe(row['text'], row['wiki_description']),
+            'source': 'encyclopedia'
+        }
+    
+    @staticmethod
+    def _english_record(row, optional_columns) -> Dict[str, Any]:
+        record = dict(row)
+        for column in optional_columns:
+            record[column] = record[column] if record[column] else None
+        return record
+    
+    # --- Запись файлов ---
+    
+    def _write_json(self, name: str, records: List[Dict[str, Any]]) -> int:
+        output_file = self.output_dir / f'{name}.json'
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(records, f, ensure_ascii=False, indent=2)
+        remove_dataset(self.output_dir, name, keep=output_file)
+        
+        print(f"✅ Exported {len(records)} {name} to {output_file.name}")
+        return len(records)
+    
+    def _jsonl_writer(self, name: str):
+        """JsonlWriter в name.jsonl или, при shard_bytes, шарды с манифестом"""
+        if self.shard_bytes:
+            return ShardedDatasetWriter(self.output_dir, name, self.shard_bytes, self.compression,
+                                        metadata={'source': self.db_path.name})
+        return JsonlWriter(jsonl_path(self.output_dir, name, self.compression), self.compression)
+    
+    @staticmethod
+    def _written(writer) -> str:
+        if isinstance(writer, ShardedDatasetWriter):
+            return f"{writer.path.name} ({len(writer.shards)} shards)"
+        return writer.path.name
+    
+    def _write_jsonl(self, name: str, records: Iterator[Dict[str, Any]]) -> int:
+        with self._jsonl_writer(name) as writer:
+            for record in records:
+                writer.write(record)
+        # Файлы таблицы от прошлого запуска в другом формате
+        remove_dataset(self.output_dir, name, keep=writer.path)
+        
+        print(f"✅ Exported {writer.count} {name} to {self._written(writer)}")
+        return writer.count
+    
+    # --- Потоковый режим ---
+    
+    def _iter_rows(self, sql: str) -> Iterator[sqlite3.Row]:
+        """Строки запроса пачками по STREAM_CHUNK_ROWS (запрос выполняется сразу)"""
+        cursor = self.conn.execute(sql)
+        
+        def rows():
+            while True:
+                chunk = cursor.fetchmany(STREAM_CHUNK_ROWS)
+                if not chunk:
+                    return
+                yield from chunk
+        
+        return rows()
+    
+    def _queryable(self, sql: str) -> bool:
+        """Есть ли таблица и колонки запроса (без чтения строк)"""
+        try:
+            self.conn.execute(f"SELECT 1 FROM ({sql}) LIMIT 0")
+            return True
+        except sqlite3.OperationalError:
+            return False
+    
+    def _unique_ids(self, sql: str) -> bool:
+        """Все id запроса заданы и не повторяются (по индексу первичного ключа это быстро)"""
+        return not self.conn.execute(
+            f"SELECT EXISTS (SELECT 1 FROM ({sql}) GROUP BY id HAVING COUNT(*) > 1 OR id IS NULL)").fetchone()[0]
+    
+    def _stream_merged(self, campaign_sql: str, campaign_record, encyclopedia_sql: str, encyclopedia_record,
+                       description_columns: Optional[tuple] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Потоковый аналог объединения через RecordIndex: записи кампании (с description_en из
+        энциклопедии по id, если заданы description_columns), затем записи только из энциклопедии.
+        Соединение по id делает SQLite.
+        
+        Если id повторяются или бывают NULL, действуют те же правила, что и у RecordIndex
+        (id сравниваются через IS, как ключи словаря, строки нумеруются в порядке выдачи запроса):
+        - description_en получает только первая запись кампании с данным id, из последней
+          строки энциклопедии с этим id (в режиме json каждая следующая перезаписывает описание);
+        - из энциклопедии добавляется первая строка с id, которого нет в кампании,
+          с описанием из последней строки с этим id.
+        Для уникальных непустых id (первичный ключ) хватает простого соединения без нумерации.
+        """
+        has_encyclopedia = self._queryable(encyclopedia_sql)
+        merge = has_encyclopedia and description_columns is not None
+        unique = has_encyclopedia and self._unique_ids(campaign_sql) and self._unique_ids(encyclopedia_sql)
+        numbered = "SELECT *, ROW_NUMBER() OVER () AS _position FROM ({})"
+        by_id = "SELECT *, ROW_NUMBER() OVER (PARTITION BY id ORDER BY _position {}) AS _nth FROM ({})"
+        if merge:
+            text_column, fallback_column = description_columns
+            if unique:
+                descriptions = encyclopedia_sql
+            else:
+                # Последняя строка энциклопедии для каждого id
+                descriptions = f"SELECT * FROM ({by_id.format('DESC', numbered.format(encyclopedia_sql))}) WHERE _nth = 1"
+            rows = self._iter_rows(f'''
+                SELECT c.*, e.{text_column} AS _text, e.{fallback_column} AS _fallback, e._found IS NOT NULL AS _matched
+                FROM ({campaign_sql if unique else by_id.format('', numbered.format(campaign_sql))}) c
+                LEFT JOIN (SELECT *, 1 AS _found FROM ({descriptions})) e
+                    ON e.id IS c.id{'' if unique else ' AND c._nth = 1'}
+                {'' if unique else 'ORDER BY c._position'}
+            ''')
+        else:
+            rows = self._iter_rows(campaign_sql)
+        for row in rows:
+            record = campaign_record(row)
+            if merge and row['_matched']:
+                record['description_en'] = describe(row['_text'], row['_fallback'])
+            yield record
+        
+        if not has_encyclopedia:
+            return
+        if unique:
+            rows = self._iter_rows(f'''
+                SELECT * FROM ({encyclopedia_sql})
+                WHERE id NOT IN (SELECT id FROM ({campaign_sql}))
+            ''')
+        else:
+            join = f'''
+                LEFT JOIN ({descriptions}) d ON d.id IS e.id
+            ''' if merge else ''
+            rows = self._iter_rows(f'''
+                SELECT e.*{f', d.{text_column} AS _text, d.{fallback_column} AS _fallback' if merge else ''}
+                FROM ({by_id.format('', numbered.format(encyclopedia_sql))}) e {join}
+                WHERE e._nth = 1 AND NOT EXISTS (SELECT 1 FROM ({campaign_sql}) c WHERE c.id IS e.id)
+                ORDER BY e._position
+            ''')
+        for row in rows:
+            record = encyclopedia_record(row)
+            if merge and not unique:
+                record['description_en'] = describe(row['_text'], row['_fallback'])
+            yield record
+    
+    def _stream_fts_descriptions(self, records: Iterator[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        Потоковый аналог шага settlements_fts: первая запись с данным нормализованным именем
+        без описания получает текст первой строки settlements_fts с этим именем.
+        Тексты и уже встреченные имена хранятся во временных таблицах SQLite, а не в памяти.
+        """
+        if not self._queryable(SETTLEMENTS_FTS_SQL):
+            yield from records
+            return
+        
+        self.conn.create_function('normalize_name', 1, normalize_name, deterministic=True)
+        self.conn.executescript('''
+            DROP TABLE IF EXISTS temp.fts_descriptions;
+            DROP TABLE IF EXISTS temp.seen_names;
+            CREATE TEMP TABLE fts_descriptions (name_key TEXT PRIMARY KEY, text TEXT);
+            CREATE TEMP TABLE seen_names (name_key TEXT PRIMARY KEY);
+        ''')
+        try:
+            # OR IGNORE: остаётся первая строка с этим именем, как при прежнем проходе по settlements_fts
+            self.conn.execute(f'''
+                INSERT OR IGNORE INTO temp.fts_descriptions
+                SELECT normalize_name(name), text FROM ({SETTLEMENTS_FTS_SQL}) WHERE normalize_name(name) IS NOT NULL
+            ''')
+            for record in records:
+                key = normalize_name(record.get('name_en'))
+                first = key and self.conn.execute(
+                    "INSERT OR IGNORE INTO temp.seen_names VALUES (?)", (key,)).rowcount == 1
+                if first and not record.get('description_en'):
+                    row = self.conn.execute(
+                        "SELECT text FROM temp.fts_descriptions WHERE name_key = ?", (key,)).fetchone()
+                    if row is not None:
+                        record['description_en'] = row[0] if row[0] else None
+                yield record
+        finally:
+            self.conn.rollback()
+            self.conn.executescript('''
+                DROP TABLE IF EXISTS temp.fts_descriptions;
+                DROP TABLE IF EXISTS temp.seen_names;
+            ''')
+    
+    # --- Экспорт ---
+    
     def export_clans(self):
         """Экспорт описаний кланов"""
+        if self.streaming:
+            return self._write_jsonl('clans', self._stream_merged(
+                CAMPAIGN_CLANS_SQL, self._campaign_clan, CLANS_SQL, self._encyclopedia_clan))
+        
         cursor = self.conn.cursor()
+        clans = self.record_index()
         
         # Из campaign_clans (мультиязычные данные)
-        cursor.execute('''
-            SELECT 
-                id,
-                name AS name_en,
-                name_ru,
-                name_tr,
-                description AS description_en,
-                description_ru,
-                description_tr,
-                culture,
-                kingdom
-            FROM campaign_clans
-            WHERE description IS NOT NULL 
-               OR description_ru IS NOT NULL 
-               OR description_tr IS NOT NULL
-        ''')
-        
-        clans = []
+        cursor.execute(CAMPAIGN_CLANS_SQL)
         for row in cursor.fetchall():
-            clan_data = {
-                'id': row['id'],
-                'name_en': row['name_en'],
-                'name_ru': row['name_ru'] if 'name_ru' in row.keys() and row['name_ru'] else None,
-                'name_tr': row['name_tr'] if 'name_tr' in row.keys() and row['name_tr'] else None,
-                'description_en': row['description_en'] if row['description_en'] else None,
-                'description_ru': row['description_ru'] if 'description_ru' in row.keys() and row['description_ru'] else None,
-                'description_tr': row['description_tr'] if 'description_tr' in row.keys() and row['description_tr'] else None,
-                'culture': row['culture'] if row['culture'] else None,
-                'kingdom': row['kingdom'] if row['kingdom'] else None
-            }
-            clans.append(clan_data)
+            clans.add(self._campaign_clan(row))
         
         # Также из таблицы clans (если есть)
         try:
-            cursor.execute('''
-                SELECT 
-                    id,
-                    name,
-                    text,
-                    wiki_description
-                FROM clans
-                WHERE text IS NOT NULL OR wiki_description IS NOT NULL
-            ''')
-            
+            cursor.execute(CLANS_SQL)
             for row in cursor.fetchall():
                 # Проверяем, нет ли уже этого клана
-                if not any(c['id'] == row['id'] for c in clans):
-                    clans.append({
-                        'id': row['id'],
-                        'name_en': row['name'] if row['name'] else None,
-                        'description_en': row['text'] if row['text'] else (row['wiki_description'] if 'wiki_description' in row.keys() and row['wiki_description'] else None),
-                        'source': 'encyclopedia'
-                    })
+                if row['id'] not in clans:
+                    clans.add(self._encyclopedia_clan(row))
         except sqlite3.OperationalError:
             pass  # Таблица clans может не существовать
         
-        output_file = self.output_dir / 'clans.json'
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(clans, f, ensure_ascii=False, indent=2)
-        
-        print(f"✅ Exported {len(clans)} clans to {output_file.name}")
-        return len(clans)
+        return self._write_json('clans', clans.records)
     
     def export_settlements(self):
         """Экспорт описаний городов, замков, деревень"""
-        cursor = self.conn.cursor()
+        if self.streaming:
+            return self._write_jsonl('settlements', self._stream_fts_descriptions(self._stream_merged(
+                CAMPAIGN_SETTLEMENTS_SQL, self._campaign_settlement, SETTLEMENTS_SQL,
+                self._encyclopedia_settlement, ('text', 'wiki_description'))))
         
-        settlements = []
+        cursor = self.conn.cursor()
+        settlements = self.record_index()
         
         # Из campaign_settlements
-        cursor.execute('''
-            SELECT 
-                id,
-                name AS name_en,
-                name_ru,
-                name_tr,
-                settlement_type,
-                culture,
-                owner_name AS owner_name_en,
-                owner_name_ru,
-                owner_name_tr
-            FROM campaign_settlements
-        ''')
-        
+        cursor.execute(CAMPAIGN_SETTLEMENTS_SQL)
         for row in cursor.fetchall():
-            settlement_data = {
-                'id': row['id'],
-                'name_en': row['name_en'],
-                'name_ru': row['name_ru'] if 'name_ru' in row.keys() and row['name_ru'] else None,
-                'name_tr': row['name_tr'] if 'name_tr' in row.keys() and row['name_tr'] else None,
-                'type': row['settlement_type'] if row['settlement_type'] else None,
-                'culture': row['culture'] if row['culture'] else None,
-                'owner_name_en': row['owner_name_en'] if row['owner_name_en'] else None,
-                'owner_name_ru': row['owner_name_ru'] if 'owner_name_ru' in row.keys() and row['owner_name_ru'] else None,
-                'owner_name_tr': row['owner_name_tr'] if 'owner_name_tr' in row.keys() and row['owner_name_tr'] else None
-            }
-            settlements.append(settlement_data)
+            settlements.add(self._campaign_settlement(row))
         
         # Из settlements (энциклопедия) - только английский
         try:
-            cursor.execute('''
-                SELECT 
-                    id,
-                    name,
-                    text,
-                    type,
-                    culture,
-                    wiki_description
-                FROM settlements
-                WHERE text IS NOT NULL OR wiki_description IS NOT NULL
-            ''')
-            
+            cursor.execute(SETTLEMENTS_SQL)
             for row in cursor.fetchall():
                 # Объединяем с существующими или добавляем новые
-                existing = next((s for s in settlements if s['id'] == row['id']), None)
+                existing = settlements.get(row['id'])
                 if existing:
-                    existing['description_en'] = row['text'] if row['text'] else (row['wiki_description'] if 'wiki_description' in row.keys() and row['wiki_description'] else None)
+                    existing['description_en'] = describe(row['text'], row['wiki_description'])
                 else:
-                    settlements.append({
-                        'id': row['id'],
-                        'name_en': row['name'] if row['name'] else None,
-                        'description_en': row['text'] if row['text'] else (row['wiki_description'] if 'wiki_description' in row.keys() and row['wiki_description'] else None),
-                        'type': row['type'] if row['type'] else None,
-                        'culture': row['culture'] if row['culture'] else None,
-                        'source': 'encyclopedia'
-                    })
+                    settlements.add(self._encyclopedia_settlement(row))
         except sqlite3.OperationalError:
             pass
         
         # Из settlements_fts (только английский)
         try:
-            cursor.execute('''
-                SELECT 
-                    name,
-                    text
-                FROM settlements_fts
-                WHERE text IS NOT NULL AND text != ''
-            ''')
-            
+            cursor.execute(SETTLEMENTS_FTS_SQL)
             for row in cursor.fetchall():
-                # Ищем по имени и добавляем описание
-                for settlement in settlements:
-                    if settlement.get('name_en') == row['name']:
-                        if 'description_en' not in settlement or not settlement['description_en']:
-                            settlement['description_en'] = row['text'] if row['text'] else None
-                        break
+                # Ищем по имени (первое совпадение) и добавляем описание
+                settlement = settlements.find_name(row['name'])
+                if settlement is not None and not settlement.get('description_en'):
+                    settlement['description_en'] = row['text'] if row['text'] else None
         except sqlite3.OperationalError:
             pass
         
-        output_file = self.output_dir / 'settlements.json'
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(settlements, f, ensure_ascii=False, indent=2)
-        
-        print(f"✅ Exported {len(settlements)} settlements to {output_file.name}")
-        return len(settlements)
+        return self._write_json('settlements', settlements.records)
     
     def export_lords(self):
         """Экспорт описаний лордов (героев)"""
-        cursor = self.conn.cursor()
+        if self.streaming:
+            return self._write_jsonl('lords', self._stream_merged(
+                CAMPAIGN_HEROES_SQL, self._campaign_lord, HEROES_SQL, self._encyclopedia_lord,
+                ('text', 'wiki_biography')))
         
-        lords = []
+        cursor = self.conn.cursor()
+        lords = self.record_index()
         
         # Из campaign_heroes
-        cursor.execute('''
-            SELECT 
-                id,
-                name AS name_en,
-                name_ru,
-                name_tr,
-                culture,
-                clan_id,
-                age,
-                is_female
-            FROM campaign_heroes
-        ''')
-        
+        cursor.execute(CAMPAIGN_HEROES_SQL)
         for row in cursor.fetchall():
-            lord_data = {
-                'id': row['id'],
-                'name_en': row['name_en'],
-                'name_ru': row['name_ru'] if 'name_ru' in row.keys() and row['name_ru'] else None,
-                'name_tr': row['name_tr'] if 'name_tr' in row.keys() and row['name_tr'] else None,
-                'culture': row['culture'] if row['culture'] else None,
-                'clan_id': row['clan_id'] if row['clan_id'] else None,
-                'age': row['age'] if row['age'] else None,
-                'is_female': bool(row['is_female']) if row['is_female'] is not None else False
-            }
-            lords.append(lord_data)
+            lords.add(self._campaign_lord(row))
         
         # Из heroes (энциклопедия) - только английский
         try:
-            cursor.execute('''
-                SELECT 
-                    id,
-                    text,
-                    wiki_biography
-                FROM heroes
-                WHERE text IS NOT NULL OR wiki_biography IS NOT NULL
-            ''')
-            
+            cursor.execute(HEROES_SQL)
             for row in cursor.fetchall():
-                existing = next((l for l in lords if l['id'] == row['id']), None)
+                existing = lords.get(row['id'])
                 if existing:
-                    existing['description_en'] = row['text'] if row['text'] else (row['wiki_biography'] if 'wiki_biography' in row.keys() and row['wiki_biography'] else None)
+                    existing['description_en'] = describe(row['text'], row['wiki_biography'])
                 else:
-                    lords.append({
-                        'id': row['id'],
-                        'description_en': row['text'] if row['text'] else (row['wiki_biography'] if 'wiki_biography' in row.keys() and row['wiki_biography'] else None),
-                        'source': 'encyclopedia'
-                    })
+                    lords.add(self._encyclopedia_lord(row))
         except sqlite3.OperationalError:
             pass
         
-        output_file = self.output_dir / 'lords.json'
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(lords, f, ensure_ascii=False, indent=2)
-        
-        print(f"✅ Exported {len(lords)} lords to {output_file.name}")
-        return len(lords)
+        return self._write_json('lords', lords.records)
     
     def export_factions(self):
         """Экспорт описаний фракций (королевств)"""
-        cursor = self.conn.cursor()
+        if self.streaming:
+            return self._write_jsonl('factions', self._stream_merged(
+                CAMPAIGN_KINGDOMS_SQL, self._campaign_faction, KINGDOMS_SQL, self._encyclopedia_faction,
+                ('text', 'wiki_description')))
         
-        factions = []
+        cursor = self.conn.cursor()
+        factions = self.record_index()
         
         # Из campaign_kingdoms
-        cursor.execute('''
-            SELECT 
-                id,
-                name AS name_en,
-                name_ru,
-                name_tr,
-                culture,
-                ruler_name AS ruler_name_en,
-                ruler_name_ru,
-                ruler_name_tr
-            FROM campaign_kingdoms
-        ''')
-        
+        cursor.execute(CAMPAIGN_KINGDOMS_SQL)
         for row in cursor.fetchall():
-            faction_data = {
-                'id': row['id'],
-                'name_en': row['name_en'],
-                'name_ru': row['name_ru'] if 'name_ru' in row.keys() and row['name_ru'] else None,
-                'name_tr': row['name_tr'] if 'name_tr' in row.keys() and row['name_tr'] else None,
-                'culture': row['culture'] if row['culture'] else None,
-                'ruler_name_en': row['ruler_name_en'] if row['ruler_name_en'] else None,
-                'ruler_name_ru': row['ruler_name_ru'] if 'ruler_name_ru' in row.keys() and row['ruler_name_ru'] else None,
-                'ruler_name_tr': row['ruler_name_tr'] if 'ruler_name_tr' in row.keys() and row['ruler_name_tr'] else None
-            }
-            factions.append(faction_data)
+            factions.add(self._campaign_faction(row))
         
         # Из kingdoms (энциклопедия) - только английский
         try:
-            cursor.execute('''
-                SELECT 
-                    id,
-                    name,
-                    text,
-                    wiki_description
-                FROM kingdoms
-                WHERE text IS NOT NULL OR wiki_description IS NOT NULL
-            ''')
-            
+            cursor.execute(KINGDOMS_SQL)
             for row in cursor.fetchall():
-                existing = next((f for f in factions if f['id'] == row['id']), None)
+                existing = factions.get(row['id'])
                 if existing:
-                    existing['description_en'] = row['text'] if row['text'] else (row['wiki_description'] if 'wiki_description' in row.keys() and row['wiki_description'] else None)
+                    existing['description_en'] = describe(row['text'], row['wiki_description'])
                 else:
-                    factions.append({
-                        'id': row['id'],
-                        'name_en': row['name'] if row['name'] else None,
-                        'description_en': row['text'] if row['text'] else (row['wiki_description'] if 'wiki_description' in row.keys() and row['wiki_description'] else None),
-                        'source': 'encyclopedia'
-                    })
+                    factions.add(self._encyclopedia_faction(row))
         except sqlite3.OperationalError:
             pass
         
-        output_file = self.output_dir / 'factions.json'
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(factions, f, ensure_ascii=False, indent=2)
-        
-        print(f"✅ Exported {len(factions)} factions to {output_file.name}")
-        return len(factions)
+        return self._write_json('factions', factions.records)
     
     def export_english_only_data(self):
-        """Экспорт данных только из английского экземпляра"""
+        """
+        Экспорт данных только из английского экземпляра.
+        В jsonl-режиме все таблицы пишутся в один english_only.jsonl, у каждой записи поле table.
+        """
+        if self.streaming:
+            with self._jsonl_writer('english_only') as writer:
+                for key, sql, optional_columns, label in ENGLISH_ONLY_TABLES:
+                    try:
+                        rows = self._iter_rows(sql)
+                    except sqlite3.OperationalError as e:
+                        print(f"   ⚠️  Error exporting {key}: {e}")
+                        continue
+                    before = writer.count
+                    for row in rows:
+                        writer.write({'table': key, **self._english_record(row, optional_columns)})
+                    print(f"   ✅ Exported {writer.count - before} {key} {label}")
+            remove_dataset(self.output_dir, 'english_only', keep=writer.path)
+            
+            print(f"✅ Exported {writer.count} English-only records to {self._written(writer)}")
+            return writer.count
+        
         cursor = self.conn.cursor()
         english_data = {}
         
-        # kingdoms - text
-        try:
-            cursor.execute('SELECT id, name, text FROM kingdoms WHERE text IS NOT NULL')
-            english_data['kingdoms'] = [
-                {'id': row['id'], 'name': row['name'], 'text': row['text']}
-                for row in cursor.fetchall()
-            ]
-            print(f"   ✅ Exported {len(english_data['kingdoms'])} kingdoms texts")
-        except sqlite3.OperationalError as e:
-            print(f"   ⚠️  Error exporting kingdoms: {e}")
-            english_data['kingdoms'] = []
-        
-        # settlements_fts - text
-        try:
-            cursor.execute('SELECT name, text FROM settlements_fts WHERE text IS NOT NULL AND text != ""')
-            english_data['settlements_fts'] = [
-                {'name': row['name'], 'text': row['text']}
-                for row in cursor.fetchall()
-            ]
-            print(f"   ✅ Exported {len(english_data['settlements_fts'])} settlements_fts texts")
-        except sqlite3.OperationalError as e:
-            print(f"   ⚠️  Error exporting settlements_fts: {e}")
-            english_data['settlements_fts'] = []
-        
-        # cultures - text
-        try:
-            cursor.execute('SELECT id, name, text FROM cultures WHERE text IS NOT NULL')
-            english_data['cultures'] = [
-                {'id': row['id'], 'name': row['name'], 'text': row['text']}
-                for row in cursor.fetchall()
-            ]
-            print(f"   ✅ Exported {len(english_data['cultures'])} cultures texts")
-        except sqlite3.OperationalError as e:
-            print(f"   ⚠️  Error exporting cultures: {e}")
-            english_data['cultures'] = []
-        
-        # concepts - text (используем title вместо name)
-        try:
-            cursor.execute('SELECT id, title, text, group_name FROM concepts WHERE text IS NOT NULL')
-            english_data['concepts'] = [
-                {
-                    'id': row['id'], 
-                    'title': row['title'] if row['title'] else None,
-                    'text': row['text'],
-                    'group_name': row['group_name'] if 'group_name' in row.keys() and row['group_name'] else None
-                }
-                for row in cursor.fetchall()
-            ]
-            print(f"   ✅ Exported {len(english_data['concepts'])} concepts texts")
-        except sqlite3.OperationalError as e:
-            print(f"   ⚠️  Error exporting concepts: {e}")
-            english_data['concepts'] = []
-        
-        # world_lore - text (нет колонки name, используем wiki_title)
-        try:
-            cursor.execute('SELECT id, text, wiki_title FROM world_lore WHERE text IS NOT NULL')
-            english_data['world_lore'] = [
-                {
-                    'id': row['id'], 
-                    'text': row['text'],
-                    'wiki_title': row['wiki_title'] if 'wiki_title' in row.keys() and row['wiki_title'] else None
-                }
-                for row in cursor.fetchall()
-            ]
-            print(f"   ✅ Exported {len(english_data['world_lore'])} world_lore texts")
-        except sqlite3.OperationalError as e:
-            print(f"   ⚠️  Error exporting world_lore: {e}")
-            english_data['world_lore'] = []
-        
-        # world_lore_fts - text
-        try:
-            cursor.execute('SELECT text FROM world_lore_fts WHERE text IS NOT NULL AND text != ""')
-            english_data['world_lore_fts'] = [
-                {'text': row['text']}
-                for row in cursor.fetchall()
-            ]
-            print(f"   ✅ Exported {len(english_data['world_lore_fts'])} world_lore_fts texts")
-        except sqlite3.OperationalError as e:
-            print(f"   ⚠️  Error exporting world_lore_fts: {e}")
-            english_data['world_lore_fts'] = []
-        
-        # items - name
-        try:
-            cursor.execute('SELECT id, name FROM items WHERE name IS NOT NULL')
-            english_data['items'] = [
-                {'id': row['id'], 'name': row['name']}
-                for row in cursor.fetchall()
-            ]
-            print(f"   ✅ Exported {len(english_data['items'])} items names")
-        except sqlite3.OperationalError as e:
-            print(f"   ⚠️  Error exporting items: {e}")
-            english_data['items'] = []
+        for key, sql, optional_columns, label in ENGLISH_ONLY_TABLES:
+            try:
+                cursor.execute(sql)
+                english_data[key] = [self._english_record(row, optional_columns) for row in cursor.fetchall()]
+                print(f"   ✅ Exported {len(english_data[key])} {key} {label}")
+            except sqlite3.OperationalError as e:
+                print(f"   ⚠️  Error exporting {key}: {e}")
+                english_data[key] = []
         
         output_file = self.output_dir / 'english_only.json'
         with open(output_file, 'w', encoding='utf-8') as f:
             json.dump(english_data, f, ensure_ascii=False, indent=2)
+        remove_dataset(self.output_dir, 'english_only', keep=output_file)
         
         total = sum(len(v) for v in english_data.values())
         print(f"✅ Exported {total} English-only records to {output_file.name}")
         return total
     
-    def export_all(self):
-        """Экспортировать все данные"""
+    def run_exports(self, jobs: int = 1) -> Iterator[Tuple[str, int, str, float, int]]:
+        """
+        Выполнить все экспорты и вернуть (метка, количество, лог, время, pid) в порядке EXPORT_TASKS.
+        
+        При jobs > 1 экспорты идут параллельно в процессах, которые читают один снимок БД;
+        файлы получаются те же, что и при последовательном запуске.
+        """
+        if jobs > 1:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                snapshot = self.create_snapshot(Path(tmp_dir))
+                with ProcessPoolExecutor(max_workers=min(jobs, len(EXPORT_TASKS)), initializer=_init_export_worker,
+                                         initargs=(str(snapshot), str(self.output_dir), self.output_format,
+                                                   self.compression, self.shard_bytes)) as pool:
+                    for label, result in zip(EXPORT_TASKS, pool.map(_run_export_task, EXPORT_TASKS.values())):
+                        yield (label,) + result
+            return
+        
+        for label, method_name in EXPORT_TASKS.items():
+            yield (label,) + _execute_export(self, method_name)
+    
+    @staticmethod
+    def _print_export_timings(timings: List[Tuple[str, int, float]], wall_time: float):
+        print("\n⏱️  Table timings:")
+        for label, pid, elapsed in timings:
+            print(f"   {label:<14} {elapsed:8.3f}s  (process {pid})")
+        print(f"   Wall time: {wall_time:.3f}s")
+    
+    def export_all(self, jobs: int = 1):
+        """Экспортировать все данные
+        
+        jobs: Число процессов (1 = всё в этом процессе)
+        """
         print("=" * 60)
         print("EXPORTING DATA FOR FINE-TUNING")
         print("=" * 60)
@@ -453,49 +764,96 @@ class FineTuningDataExporter:
         tables = self.get_all_tables()
         print(f"\n📊 Available tables: {len(tables)}")
         print(f"   {', '.join(tables[:10])}{'...' if len(tables) > 10 else ''}")
+        if jobs > 1:
+            print(f"   Workers: {min(jobs, len(EXPORT_TASKS))} (reading one snapshot of the database)")
         
         print("\n" + "=" * 60)
         print("EXPORTING MULTILINGUAL DATA")
         print("=" * 60)
         
-        clans_count = self.export_clans()
-        settlements_count = self.export_settlements()
-        lords_count = self.export_lords()
-        factions_count = self.export_factions()
-        
-        print("\n" + "=" * 60)
-        print("EXPORTING ENGLISH-ONLY DATA")
-        print("=" * 60)
-        
-        english_count = self.export_english_only_data()
+        counts = {}
+        timings = []
+        start = time.perf_counter()
+        for label, count, log, elapsed, pid in self.run_exports(jobs):
+            if label == 'english_only':
+                print("\n" + "=" * 60)
+                print("EXPORTING ENGLISH-ONLY DATA")
+                print("=" * 60)
+            print(log, end='')
+            counts[label] = count
+            timings.append((label, pid, elapsed))
+        wall_time = time.perf_counter() - start
         
         print("\n" + "=" * 60)
         print("✅ EXPORT COMPLETED!")
         print("=" * 60)
         print(f"\n📊 Export statistics:")
-        print(f"   Clans: {clans_count}")
-        print(f"   Settlements: {settlements_count}")
-        print(f"   Lords: {lords_count}")
-        print(f"   Factions: {factions_count}")
-        print(f"   English-only records: {english_count}")
-        print(f"   Total records: {clans_count + settlements_count + lords_count + factions_count + english_count}")
+        print(f"   Clans: {counts['clans']}")
+        print(f"   Settlements: {counts['settlements']}")
+        print(f"   Lords: {counts['lords']}")
+        print(f"   Factions: {counts['factions']}")
+        print(f"   English-only records: {counts['english_only']}")
+        print(f"   Total records: {sum(counts.values())}")
+        self._print_export_timings(timings, wall_time)
         print(f"\n📁 Output directory: {self.output_dir}")
         
         self.close()
 
 
+_worker_exporter: Optional[FineTuningDataExporter] = None
+
+
+def _init_export_worker(snapshot: str, output_dir: str, output_format: str, compression: Optional[str],
+                        shard_bytes: Optional[int]):
+    """Инициализация процесса пула: своё подключение к снимку БД"""
+    global _worker_exporter
+    _worker_exporter = FineTuningDataExporter(Path(snapshot), Path(output_dir), output_format, compression,
+                                              shard_bytes)
+    _worker_exporter.connect(snapshot=True)
+
+
+def _run_export_task(method_name: str):
+    """Выполнить один экспорт в процессе пула"""
+    return _execute_export(_worker_exporter, method_name)
+
+
+def _execute_export(exporter: FineTuningDataExporter, method_name: str):
+    """Выполнить экспорт и вернуть количество записей, его лог, время и pid"""
+    log = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(log):
+        count = getattr(exporter, method_name)()
+    return count, log.getvalue(), time.perf_counter() - start, os.getpid()
+
 def main():
     """Main entry point"""
     project_root = Path(__file__).parent.parent
-    db_path = project_root / 'Database' / 'bannerlord_lore.db'
-    output_dir = project_root / 'finetuning_data'
     
+    parser = argparse.ArgumentParser(description='Export bannerlord_lore.db data for fine-tuning')
+    parser.add_argument('--db-path', type=str, default=str(project_root / 'Database' / 'bannerlord_lore.db'),
+                        help='Path to database (default: Database/bannerlord_lore.db)')
+    parser.add_argument('--output-dir', type=str, default=str(project_root / 'finetuning_data'),
+                        help='Output directory (default: finetuning_data)')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='json',
+                        help='json: one JSON array per table; jsonl: streamed JSON Lines (default: json)')
+    parser.add_argument('--compression', choices=COMPRESSIONS, help='Compress jsonl output')
+    parser.add_argument('--shard-size', type=int, metavar='MB',
+                        help='Write jsonl output as shards of at most MB megabytes plus a manifest')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='Export tables in N worker processes from one database snapshot '
+                             '(0 = all CPU cores, default: 1)')
+    args = parser.parse_args()
+    
+    db_path = Path(args.db_path)
     if not db_path.exists():
         print(f"❌ Database not found: {db_path}")
         return
+    if (args.compression or args.shard_size) and args.format != 'jsonl':
+        parser.error('--compression and --shard-size need --format jsonl')
     
-    exporter = FineTuningDataExporter(db_path, output_dir)
-    exporter.export_all()
+    shard_bytes = args.shard_size * 1024 * 1024 if args.shard_size else None
+    exporter = FineTuningDataExporter(db_path, Path(args.output_dir), args.format, args.compression, shard_bytes)
+    exporter.export_all(jobs=args.jobs if args.jobs > 0 else (os.cpu_count() or 1))
 
 
 if __name__ == '__main__':
@@ -19,35 +19,13 @@ echo Game path: %GAME_PATH%
 echo Output base: %OUTPUT_BASE%
 echo.
 
-REM Extract English
+REM Extract EN, RU and TR in a single pass (XML is parsed once)
 echo.
-echo [1/3] Extracting English (EN)...
+echo Extracting EN, RU, TR...
 echo ----------------------------------------
-py extract_encyclopedia_data.py "%GAME_PATH%" "%OUTPUT_BASE%\EN" "EN"
+py extract_encyclopedia_data.py "%GAME_PATH%" "%OUTPUT_BASE%" --languages EN RU TR
 if %ERRORLEVEL% NEQ 0 (
-    echo ERROR: Failed to extract English data
-    pause
-    exit /b 1
-)
-
-REM Extract Russian
-echo.
-echo [2/3] Extracting Russian (RU)...
-echo ----------------------------------------
-py extract_encyclopedia_data.py "%GAME_PATH%" "%OUTPUT_BASE%\RU" "RU"
-if %ERRORLEVEL% NEQ 0 (
-    echo ERROR: Failed to extract Russian data
-    pause
-    exit /b 1
-)
-
-REM Extract Turkish
-echo.
-echo [3/3] Extracting Turkish (TR)...
-echo ----------------------------------------
-py extract_encyclopedia_data.py "%GAME_PATH%" "%OUTPUT_BASE%\TR" "TR"
-if %ERRORLEVEL% NEQ 0 (
-    echo ERROR: Failed to extract Turkish data
+    echo ERROR: Failed to extract encyclopedia data
     pause
     exit /b 1
 )
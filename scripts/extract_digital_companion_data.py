@@ -10,6 +10,9 @@ from pathlib import Path
 from typing import Dict, List, Any, Optional
 import re
 
+from dataset_io import JsonArrayWriter
+from unity_bundle import UnityBundle, iter_shared_tables, iter_string_tables, table_records
+
 class DigitalCompanionExtractor:
     def __init__(self, companion_path: str, output_dir: str = "Database/Digital Companion"):
         """
@@ -168,8 +171,8 @@ class DigitalCompanionExtractor:
         self.data['bundle_info'] = bundle_info
     
     def try_extract_localization_from_bundles(self):
-        """Try to extract text data from localization bundles"""
-        print("Attempting to extract localization from bundles...")
+        """Extract localization string tables from bundles as records"""
+        print("Extracting localization from bundles...")
         
         bundles_dir = self.streaming_assets / "StandaloneWindows64"
         if not bundles_dir.exists():
@@ -177,54 +180,54 @@ class DigitalCompanionExtractor:
         
         localization_data = {}
         
-        # Find localization bundles
-        loc_bundles = [
-            'localization-string-tables-english(en)_assets_all.bundle',
-            'localization-string-tables-russian(ru)_assets_all.bundle',
-            'localization-string-tables-turkish(tr)_assets_all.bundle'
-        ]
-        
-        for bundle_name in loc_bundles:
-            bundle_file = bundles_dir / bundle_name
-            if not bundle_file.exists():
-                continue
-            
-            print(f"  Processing {bundle_name}...")
-            
-            # Try to extract text strings from bundle
-            # Unity bundles are binary, but may contain readable strings
+        # Localization bundles: string tables (one bundle per language) and shared table data (entry keys)
+        loc_bundles = sorted(bundles_dir.glob("localization-*.bundle"))
+        
+        # Entry keys are shared by all languages, so read them first
+        shared_tables = {}
+        for bundle_file in loc_bundles:
             try:
-                with open(bundle_file, 'rb') as f:
-                    content = f.read()
-                
-                # Try to find JSON-like structures or text strings
-                # Look for common patterns
-                text_content = content.decode('utf-8', errors='ignore')
-                
-                # Try to find JSON structures
-                json_patterns = [
-                    r'\{[^{}]*"text"[^{}]*\}',
-                    r'\{[^{}]*"value"[^{}]*\}',
-                    r'\{[^{}]*"name"[^{}]*\}'
-                ]
-                
-                found_strings = []
-                for pattern in json_patterns:
-                    matches = re.findall(pattern, text_content, re.DOTALL)
-                    found_strings.extend(matches[:100])  # Limit to first 100
-                
-                if found_strings:
-                    lang_code = bundle_name.split('(')[1].split(')')[0] if '(' in bundle_name else 'unknown'
-                    localization_data[lang_code] = {
-                        'bundle_name': bundle_name,
-                        'size': bundle_file.stat().st_size,
-                        'extracted_strings_count': len(found_strings),
-                        'sample_strings': found_strings[:50]  # First 50 as samples
-                    }
-                    print(f"    Found {len(found_strings)} potential strings")
-                
+                with UnityBundle(bundle_file) as bundle:
+                    shared_tables.update(iter_shared_tables(bundle))
             except Exception as e:
-                print(f"    Warning: Could not process {bundle_name}: {e}")
+                print(f"    Warning: Could not read {bundle_file.name}: {e}")
+        print(f"  Found {len(shared_tables)} shared table data assets")
+        
+        # Records are written as they are read
+        output_file = self.output_dir / "localization_strings.json"
+        with JsonArrayWriter(output_file) as writer:
+            for bundle_file in loc_bundles:
+                if 'string-tables' not in bundle_file.name:
+                    continue
+                
+                print(f"  Processing {bundle_file.name}...")
+                try:
+                    with UnityBundle(bundle_file) as bundle:
+                        found = 0
+                        for table in iter_string_tables(bundle):
+                            shared = shared_tables.get(table.shared_data)
+                            count = 0
+                            for record in table_records(table, shared):
+                                writer.write(record)
+                                count += 1
+                            found += count
+                            
+                            lang_data = localization_data.setdefault(table.locale, {
+                                'bundle_name': bundle_file.name,
+                                'size': bundle_file.stat().st_size,
+                                'extracted_strings_count': 0,
+                                'tables': {}
+                            })
+                            lang_data['extracted_strings_count'] += count
+                            table_name = shared.collection if shared is not None else table.name
+                            lang_data['tables'][table_name] = lang_data['tables'].get(table_name, 0) + count
+                        
+                        print(f"    Found {found} strings "
+                              f"({bundle.blocks_read} of {len(bundle.blocks)} blocks decompressed)")
+                    
+                except Exception as e:
+                    print(f"    Warning: Could not process {bundle_file.name}: {e}")
+        print(f"Saved {writer.count} localization strings to {output_file}")
         
         if localization_data:
             output_file = self.output_dir / "localization_extracted.json"
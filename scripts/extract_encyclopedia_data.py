@@ -7,48 +7,224 @@ import xml.etree.ElementTree as ET
 import os
 import json
 import sqlite3
-import re
+import io
+import time
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Iterator, Mapping, Tuple
 from collections import defaultdict
 
+from dataset_io import JsonArrayWriter
+from record_store import RecordStore
+from localization_index import LocalizationIndex, TextResolver, file_fingerprint, fingerprint_matches
+
+class UnresolvedText(str):
+    """Raw XML text whose localization keys are resolved later, once per language"""
+    __slots__ = ()
+
+
 class EncyclopediaExtractor:
-    def __init__(self, game_path: str, output_dir: str = "Database/encyclopedia", language: str = "RU"):
+    # Extraction steps in serial order (items are split per file, see build_extraction_tasks)
+    EXTRACTION_STEPS = [
+        'extract_heroes',
+        'extract_npc_characters',
+        'extract_settlements',
+        'extract_kingdoms',
+        'extract_clans',
+        'extract_cultures',
+        'extract_concepts',
+        'extract_world_lore',
+        'extract_items',
+        'extract_traits',
+    ]
+    
+    # Data types in output order
+    DATA_TYPES = [
+        'heroes',
+        'npc_characters',
+        'settlements',
+        'kingdoms',
+        'clans',
+        'cultures',
+        'concepts',
+        'world_lore',
+        'items',
+        'traits',
+        'factions',
+    ]
+    
+    # Source XML of each single-file step, relative to Modules/
+    STEP_SOURCES = {
+        'extract_heroes': "SandBox/ModuleData/heroes.xml",
+        'extract_npc_characters': "SandBox/ModuleData/lords.xml",
+        'extract_settlements': "SandBox/ModuleData/settlements.xml",
+        'extract_kingdoms': "SandBox/ModuleData/spkingdoms.xml",
+        'extract_clans': "SandBox/ModuleData/spclans.xml",
+        'extract_cultures': "SandBoxCore/ModuleData/spcultures.xml",
+        'extract_concepts': "SandBox/ModuleData/concept_strings.xml",
+        'extract_world_lore': "SandBox/ModuleData/world_lore_strings.xml",
+        'extract_traits': "SandBox/ModuleData/trait_strings.xml",
+    }
+    
+    # Directory whose XML files are split into one extract_item_file step each
+    ITEMS_DIR = "SandBoxCore/ModuleData/items"
+    
+    # Data type produced by each step
+    STEP_DATA_TYPES = {
+        'extract_heroes': 'heroes',
+        'extract_npc_characters': 'npc_characters',
+        'extract_settlements': 'settlements',
+        'extract_kingdoms': 'kingdoms',
+        'extract_clans': 'clans',
+        'extract_cultures': 'cultures',
+        'extract_concepts': 'concepts',
+        'extract_world_lore': 'world_lore',
+        'extract_traits': 'traits',
+        'extract_item_file': 'items',
+    }
+    
+    # Child tables filled for each record of a data type: (table, column holding the record id)
+    CHILD_TABLES = {
+        'kingdoms': [('kingdom_relationships', 'kingdom_id'), ('kingdom_policies', 'kingdom_id')],
+        'clans': [('clan_members', 'clan_id')],
+        'world_lore': [('world_lore_tags', 'lore_id'), ('world_lore_chars', 'lore_id')],
+        'npc_characters': [('npc_skills', 'npc_id')],
+    }
+    
+    # Records buffered per data type before an executemany in streaming mode
+    SQLITE_BATCH_SIZE = 1000
+    
+    # Incremental mode: fingerprints of the sources and the ids each task produced
+    MANIFEST_FILE = "extraction_manifest.json"
+    MANIFEST_VERSION = 1
+    
+    # Records of these types are dropped when the resolved field is empty
+    REQUIRED_TEXT_FIELDS = {
+        'world_lore': 'text',
+        'traits': 'text',
+    }
+    
+    def __init__(self, game_path: str, output_dir: str = "Database/encyclopedia", language: str = "RU",
+                 streaming: bool = False, localization_cache: Optional[str] = None,
+                 languages: Optional[List[str]] = None, incremental: bool = False):
         """
         game_path: Path to Mount & Blade II Bannerlord installation folder
         output_dir: Directory to save extracted data
         language: Language code for localization (RU, EN, etc.)
+        streaming: Parse XML incrementally and write records straight to the
+            JSON/SQLite outputs instead of keeping them in self.data
+        localization_cache: Directory for the persistent localization index
+            (None = parse language files on every run)
+        languages: Extract several languages in one pass; the XML is parsed once
+            and each language is written to output_dir/<LANG>
+        incremental: Re-extract only tasks whose source XML changed since the last
+            run (see MANIFEST_FILE) and upsert just their rows into encyclopedia.db
         """
         self.game_path = Path(game_path)
         self.output_dir = Path(output_dir)
         self.language = language
+        self.streaming = streaming
+        self.incremental = incremental
         self.modules_path = self.game_path / "Modules"
         
         # Create output directory
         self.output_dir.mkdir(parents=True, exist_ok=True)
         
-        # Storage for localization strings
-        self.localization_strings: Dict[str, str] = {}
-        
-        # Storage for extracted data
-        self.data = {
-            'heroes': [],
-            'npc_characters': [],
-            'settlements': [],
-            'kingdoms': [],
-            'clans': [],
-            'cultures': [],
-            'concepts': [],
-            'world_lore': [],
-            'items': [],
-            'traits': [],
-            'factions': []
-        }
+        # Storage for localization strings (dict or memory-mapped LocalizationIndex)
+        self.localization_strings: Mapping[str, str] = {}
+        self.localization_cache = Path(localization_cache) if localization_cache else None
+        self._resolver: Optional[TextResolver] = None
+        
+        # Storage for extracted data (columnar, iterates as plain dicts)
+        self.data: Dict[str, RecordStore] = {data_type: RecordStore() for data_type in self.DATA_TYPES}
+        
+        # Records emitted per data type (self.data stays empty in streaming mode)
+        self.counts: Dict[str, int] = defaultdict(int)
+        
+        # Output sinks used in streaming mode
+        self._json_writers: Dict[str, JsonArrayWriter] = {}
+        self._sqlite_conn: Optional[sqlite3.Connection] = None
+        self._sqlite_batches: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        
+        # Multi-language mode: this extractor only parses the XML and keeps text
+        # unresolved; every record is localized and stored by one extractor per language
+        self.language_extractors: List['EncyclopediaExtractor'] = [
+            EncyclopediaExtractor(game_path, str(self.output_dir / lang), lang,
+                                  streaming=streaming, localization_cache=localization_cache)
+            for lang in (languages or [])
+        ]
+        self.defer_text_resolution = bool(self.language_extractors)
+        
+    def _iter_xml(self, xml_file: Path, tags, nested: bool = False) -> Iterator[ET.Element]:
+        """Yield elements with the given tag(s) from an XML file.
+        
+        By default only direct children of the root are matched (root.findall("Tag")),
+        nested=True matches at any depth (root.findall(".//tag")).
+        In streaming mode the file is read with iterparse and every element is
+        detached from the tree once it has been handled, so memory use does not
+        grow with the file size.
+        """
+        if isinstance(tags, str):
+            tags = (tags,)
+        
+        if not self.streaming:
+            root = ET.parse(xml_file).getroot()
+            for elem in root.iter() if nested else root:
+                if elem.tag in tags and elem is not root:
+                    yield elem
+            return
         
-    def load_localization(self):
-        """Load localization strings from language files"""
-        print("Loading localization strings...")
+        stack = []
+        open_records = 0
+        for event, elem in ET.iterparse(str(xml_file), events=("start", "end")):
+            if event == "start":
+                is_record = (bool(stack) and elem.tag in tags and (nested or len(stack) == 1)
+                             and not open_records)
+                stack.append((elem, is_record))
+                if is_record:
+                    open_records += 1
+                continue
+            
+            _, is_record = stack.pop()
+            if is_record:
+                open_records -= 1
+                yield elem
+            
+            # Drop finished elements that are not part of a record still being built
+            if stack and not open_records:
+                stack[-1][0].remove(elem)
+    
+    def _emit(self, data_type: str, record: Dict[str, Any]):
+        """Hand an extracted record to the output (self.data or streaming sinks)"""
+        self.counts[data_type] += 1
+        
+        if self.language_extractors:
+            for lang_extractor in self.language_extractors:
+                localized = lang_extractor.localize_record(data_type, record)
+                if localized is not None:
+                    lang_extractor._emit(data_type, localized)
+            return
+        
+        if not self.streaming:
+            self.data[data_type].append(record)
+            return
         
+        writer = self._json_writers.get(data_type)
+        if writer is None:
+            writer = JsonArrayWriter(self.output_dir / f"{data_type}.json")
+            self._json_writers[data_type] = writer
+        writer.write(record)
+        
+        if self._sqlite_conn is not None:
+            batch = self._sqlite_batches[data_type]
+            batch.append(record)
+            if len(batch) >= self.SQLITE_BATCH_SIZE:
+                self._insert_records(self._sqlite_conn.cursor(), data_type, batch)
+                batch.clear()
+    
+    def get_localization_files(self) -> List[Path]:
+        """List language XML files for self.language, in load order"""
         # Search for language files in all modules
         lang_files = []
         for module_dir in self.modules_path.iterdir():
@@ -86,60 +262,79 @@ class EncyclopediaExtractor:
                     for xml_file in lang_subdir.glob("*.xml"):
                         lang_files.append(xml_file)
         
-        # Load strings from all found files
-        for lang_file in lang_files:
-            try:
-                tree = ET.parse(lang_file)
-                root = tree.getroot()
-                
-                # Find all string elements
-                for string_elem in root.findall(".//string"):
-                    string_id = string_elem.get("id", "")
-                    text = string_elem.get("text", "")
-                    if string_id and text:
-                        self.localization_strings[string_id] = text
-            except Exception as e:
-                print(f"Warning: Could not parse {lang_file}: {e}")
+        return lang_files
+    
+    def parse_localization_file(self, lang_file: Path) -> List[tuple]:
+        """Read (string_id, text) pairs from one language file"""
+        strings = []
+        try:
+            # Find all string elements
+            for string_elem in self._iter_xml(lang_file, "string", nested=True):
+                string_id = string_elem.get("id", "")
+                text = string_elem.get("text", "")
+                if string_id and text:
+                    strings.append((string_id, text))
+        except Exception as e:
+            print(f"Warning: Could not parse {lang_file}: {e}")
+        return strings
+    
+    def localize_record(self, data_type: str, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Resolve the UnresolvedText fields of a record for this extractor's language"""
+        localized = {
+            key: self.resolve_text(value) if isinstance(value, UnresolvedText) else value
+            for key, value in record.items()
+        }
+        required = self.REQUIRED_TEXT_FIELDS.get(data_type)
+        if required and not localized[required]:
+            return None
+        return localized
+    
+    def load_localization(self):
+        """Load localization strings from language files"""
+        if self.language_extractors:
+            for lang_extractor in self.language_extractors:
+                print(f"[{lang_extractor.language}] ", end='')
+                lang_extractor.load_localization()
+            return
+        
+        print("Loading localization strings...")
+        lang_files = self.get_localization_files()
+        
+        if self.localization_cache is not None:
+            # Memory-mapped index, rebuilt only when a language file changed
+            index_file = self.localization_cache / f"localization_{self.language or 'EN'}.idx"
+            index, rebuilt = LocalizationIndex.load_or_build(index_file, lang_files,
+                                                             self.parse_localization_file)
+            self.localization_strings = index
+            state = "Rebuilt" if rebuilt else "Using cached"
+            print(f"{state} localization index: {index_file}")
+        else:
+            # Load strings from all found files
+            for lang_file in lang_files:
+                for string_id, text in self.parse_localization_file(lang_file):
+                    self.localization_strings[string_id] = text
         
         print(f"Loaded {len(self.localization_strings)} localization strings")
     
     def resolve_text(self, text: str) -> str:
         """Resolve localization keys in text (e.g., {=abc123} -> actual text)"""
-        if not text:
-            return ""
-        
-        # Pattern: {=string_id} or {=string_id}text
-        pattern = r'\{=([^}]+)\}'
-        
-        def replace_key(match):
-            key = match.group(1)
-            # Try to find in localization
-            if key in self.localization_strings:
-                return self.localization_strings[key]
-            # If not found, return empty or keep original
-            return match.group(0)
-        
-        resolved = re.sub(pattern, replace_key, text)
-        
-        # Also handle other patterns like {.MA} tags (formatting)
-        resolved = re.sub(r'\{\.\w+\}', '', resolved)
-        
-        return resolved.strip()
+        if self.defer_text_resolution:
+            return UnresolvedText(text or "")
+        if self._resolver is None or self._resolver.strings is not self.localization_strings:
+            self._resolver = TextResolver(self.localization_strings)
+        return self._resolver.resolve(text)
     
     def extract_heroes(self):
         """Extract heroes data from heroes.xml"""
         print("Extracting heroes...")
-        heroes_file = self.modules_path / "SandBox" / "ModuleData" / "heroes.xml"
+        heroes_file = self.modules_path / self.STEP_SOURCES['extract_heroes']
         
         if not heroes_file.exists():
             print(f"Warning: {heroes_file} not found")
             return
         
         try:
-            tree = ET.parse(heroes_file)
-            root = tree.getroot()
-            
-            for hero_elem in root.findall("Hero"):
+            for hero_elem in self._iter_xml(heroes_file, "Hero"):
                 hero_data = {
                     'id': hero_elem.get("id", ""),
                     'faction': hero_elem.get("faction", ""),
@@ -151,26 +346,23 @@ class EncyclopediaExtractor:
                 }
                 
                 if hero_data['id']:
-                    self.data['heroes'].append(hero_data)
+                    self._emit('heroes', hero_data)
             
-            print(f"Extracted {len(self.data['heroes'])} heroes")
+            print(f"Extracted {self.counts['heroes']} heroes")
         except Exception as e:
             print(f"Error extracting heroes: {e}")
     
     def extract_settlements(self):
         """Extract settlements data from settlements.xml"""
         print("Extracting settlements...")
-        settlements_file = self.modules_path / "SandBox" / "ModuleData" / "settlements.xml"
+        settlements_file = self.modules_path / self.STEP_SOURCES['extract_settlements']
         
         if not settlements_file.exists():
             print(f"Warning: {settlements_file} not found")
             return
         
         try:
-            tree = ET.parse(settlements_file)
-            root = tree.getroot()
-            
-            for settlement_elem in root.findall("Settlement"):
+            for settlement_elem in self._iter_xml(settlements_file, "Settlement"):
                 settlement_data = {
                     'id': settlement_elem.get("id", ""),
                     'name': self.resolve_text(settlement_elem.get("name", "")),
@@ -197,26 +389,23 @@ class EncyclopediaExtractor:
                     settlement_data['bound'] = village_elem.get("bound", "")
                 
                 if settlement_data['id']:
-                    self.data['settlements'].append(settlement_data)
+                    self._emit('settlements', settlement_data)
             
-            print(f"Extracted {len(self.data['settlements'])} settlements")
+            print(f"Extracted {self.counts['settlements']} settlements")
         except Exception as e:
             print(f"Error extracting settlements: {e}")
     
     def extract_kingdoms(self):
         """Extract kingdoms data from spkingdoms.xml"""
         print("Extracting kingdoms...")
-        kingdoms_file = self.modules_path / "SandBox" / "ModuleData" / "spkingdoms.xml"
+        kingdoms_file = self.modules_path / self.STEP_SOURCES['extract_kingdoms']
         
         if not kingdoms_file.exists():
             print(f"Warning: {kingdoms_file} not found")
             return
         
         try:
-            tree = ET.parse(kingdoms_file)
-            root = tree.getroot()
-            
-            for kingdom_elem in root.findall("Kingdom"):
+            for kingdom_elem in self._iter_xml(kingdoms_file, "Kingdom"):
                 kingdom_data = {
                     'id': kingdom_elem.get("id", ""),
                     'name': self.resolve_text(kingdom_elem.get("name", "")),
@@ -244,26 +433,23 @@ class EncyclopediaExtractor:
                     kingdom_data['policies'].append(policy_elem.get("id", ""))
                 
                 if kingdom_data['id']:
-                    self.data['kingdoms'].append(kingdom_data)
+                    self._emit('kingdoms', kingdom_data)
             
-            print(f"Extracted {len(self.data['kingdoms'])} kingdoms")
+            print(f"Extracted {self.counts['kingdoms']} kingdoms")
         except Exception as e:
             print(f"Error extracting kingdoms: {e}")
     
     def extract_clans(self):
         """Extract clans data from spclans.xml"""
         print("Extracting clans...")
-        clans_file = self.modules_path / "SandBox" / "ModuleData" / "spclans.xml"
+        clans_file = self.modules_path / self.STEP_SOURCES['extract_clans']
         
         if not clans_file.exists():
             print(f"Warning: {clans_file} not found")
             return
         
         try:
-            tree = ET.parse(clans_file)
-            root = tree.getroot()
-            
-            for clan_elem in root.findall("Clan"):
+            for clan_elem in self._iter_xml(clans_file, "Clan"):
                 clan_data = {
                     'id': clan_elem.get("id", ""),
                     'name': self.resolve_text(clan_elem.get("name", "")),
@@ -278,26 +464,23 @@ class EncyclopediaExtractor:
                     clan_data['members'].append(member_elem.get("id", ""))
                 
                 if clan_data['id']:
-                    self.data['clans'].append(clan_data)
+                    self._emit('clans', clan_data)
             
-            print(f"Extracted {len(self.data['clans'])} clans")
+            print(f"Extracted {self.counts['clans']} clans")
         except Exception as e:
             print(f"Error extracting clans: {e}")
     
     def extract_cultures(self):
         """Extract cultures data from spcultures.xml"""
         print("Extracting cultures...")
-        cultures_file = self.modules_path / "SandBoxCore" / "ModuleData" / "spcultures.xml"
+        cultures_file = self.modules_path / self.STEP_SOURCES['extract_cultures']
         
         if not cultures_file.exists():
             print(f"Warning: {cultures_file} not found")
             return
         
         try:
-            tree = ET.parse(cultures_file)
-            root = tree.getroot()
-            
-            for culture_elem in root.findall("Culture"):
+            for culture_elem in self._iter_xml(cultures_file, "Culture"):
                 culture_data = {
                     'id': culture_elem.get("id", ""),
                     'name': self.resolve_text(culture_elem.get("name", "")),
@@ -305,26 +488,23 @@ class EncyclopediaExtractor:
                 }
                 
                 if culture_data['id']:
-                    self.data['cultures'].append(culture_data)
+                    self._emit('cultures', culture_data)
             
-            print(f"Extracted {len(self.data['cultures'])} cultures")
+            print(f"Extracted {self.counts['cultures']} cultures")
         except Exception as e:
             print(f"Error extracting cultures: {e}")
     
     def extract_concepts(self):
         """Extract concepts data from concept_strings.xml"""
         print("Extracting concepts...")
-        concepts_file = self.modules_path / "SandBox" / "ModuleData" / "concept_strings.xml"
+        concepts_file = self.modules_path / self.STEP_SOURCES['extract_concepts']
         
         if not concepts_file.exists():
             print(f"Warning: {concepts_file} not found")
             return
         
         try:
-            tree = ET.parse(concepts_file)
-            root = tree.getroot()
-            
-            for concept_elem in root.findall("Concept"):
+            for concept_elem in self._iter_xml(concepts_file, "Concept"):
                 concept_data = {
                     'id': concept_elem.get("id", ""),
                     'title': self.resolve_text(concept_elem.get("title", "")),
@@ -334,26 +514,23 @@ class EncyclopediaExtractor:
                 }
                 
                 if concept_data['id']:
-                    self.data['concepts'].append(concept_data)
+                    self._emit('concepts', concept_data)
             
-            print(f"Extracted {len(self.data['concepts'])} concepts")
+            print(f"Extracted {self.counts['concepts']} concepts")
         except Exception as e:
             print(f"Error extracting concepts: {e}")
     
     def extract_world_lore(self):
         """Extract world lore strings from world_lore_strings.xml"""
         print("Extracting world lore...")
-        lore_file = self.modules_path / "SandBox" / "ModuleData" / "world_lore_strings.xml"
+        lore_file = self.modules_path / self.STEP_SOURCES['extract_world_lore']
         
         if not lore_file.exists():
             print(f"Warning: {lore_file} not found")
             return
         
         try:
-            tree = ET.parse(lore_file)
-            root = tree.getroot()
-            
-            for string_elem in root.findall(".//string"):
+            for string_elem in self._iter_xml(lore_file, "string", nested=True):
                 lore_data = {
                     'id': string_elem.get("id", ""),
                     'text': self.resolve_text(string_elem.get("text", "")),
@@ -370,26 +547,23 @@ class EncyclopediaExtractor:
                     lore_data['chars'].append(char_elem.get("char_name", ""))
                 
                 if lore_data['id'] and lore_data['text']:
-                    self.data['world_lore'].append(lore_data)
+                    self._emit('world_lore', lore_data)
             
-            print(f"Extracted {len(self.data['world_lore'])} world lore entries")
+            print(f"Extracted {self.counts['world_lore']} world lore entries")
         except Exception as e:
             print(f"Error extracting world lore: {e}")
     
     def extract_npc_characters(self):
         """Extract NPC characters data from lords.xml"""
         print("Extracting NPC characters...")
-        lords_file = self.modules_path / "SandBox" / "ModuleData" / "lords.xml"
+        lords_file = self.modules_path / self.STEP_SOURCES['extract_npc_characters']
         
         if not lords_file.exists():
             print(f"Warning: {lords_file} not found")
             return
         
         try:
-            tree = ET.parse(lords_file)
-            root = tree.getroot()
-            
-            for npc_elem in root.findall("NPCCharacter"):
+            for npc_elem in self._iter_xml(lords_file, "NPCCharacter"):
                 npc_data = {
                     'id': npc_elem.get("id", ""),
                     'name': self.resolve_text(npc_elem.get("name", "")),
@@ -411,95 +585,102 @@ class EncyclopediaExtractor:
                         npc_data['skills'][skill_id] = skill_value
                 
                 if npc_data['id']:
-                    self.data['npc_characters'].append(npc_data)
+                    self._emit('npc_characters', npc_data)
             
-            print(f"Extracted {len(self.data['npc_characters'])} NPC characters")
+            print(f"Extracted {self.counts['npc_characters']} NPC characters")
         except Exception as e:
             print(f"Error extracting NPC characters: {e}")
     
-    def extract_items(self):
-        """Extract items data from items XML files"""
-        print("Extracting items...")
-        items_dir = self.modules_path / "SandBoxCore" / "ModuleData" / "items"
+    def get_item_files(self) -> List[Path]:
+        """List items XML files in SandBoxCore/ModuleData/items"""
+        items_dir = self.modules_path / self.ITEMS_DIR
         
         if not items_dir.exists():
             print(f"Warning: {items_dir} not found")
-            return
+            return []
         
-        item_files = list(items_dir.glob("*.xml"))
+        return list(items_dir.glob("*.xml"))
+    
+    def extract_items(self):
+        """Extract items data from items XML files"""
+        print("Extracting items...")
         
-        for item_file in item_files:
-            try:
-                tree = ET.parse(item_file)
-                root = tree.getroot()
-                
-                # Process Item elements
-                for item_elem in root.findall("Item"):
+        for item_file in self.get_item_files():
+            self.extract_item_file(item_file)
+        
+        print(f"Extracted {self.counts['items']} items")
+    
+    def extract_item_file(self, item_file: Path):
+        """Extract Item and CraftedItem entries from one items XML file"""
+        try:
+            # CraftedItem records are emitted after all Item records of
+            # the file (same order as before); only they are buffered
+            crafted_items = []
+            
+            for item_elem in self._iter_xml(item_file, ("Item", "CraftedItem")):
+                if item_elem.tag == "CraftedItem":
                     item_data = {
                         'id': item_elem.get("id", ""),
                         'name': self.resolve_text(item_elem.get("name", "")),
-                        'type': item_elem.get("Type", ""),
+                        'type': 'CraftedItem',
                         'culture': item_elem.get("culture", ""),
-                        'value': item_elem.get("value", ""),
-                        'weight': item_elem.get("weight", ""),
+                        'crafting_template': item_elem.get("crafting_template", ""),
                         'is_merchandise': item_elem.get("is_merchandise", "true") == "true",
                         'source_file': item_file.name
                     }
                     
-                    # Extract weapon data if present
-                    weapon_elem = item_elem.find(".//Weapon")
-                    if weapon_elem is not None:
-                        item_data['weapon_class'] = weapon_elem.get("weapon_class", "")
-                        item_data['weapon_length'] = weapon_elem.get("weapon_length", "")
-                        item_data['swing_damage'] = weapon_elem.get("swing_damage", "")
-                        item_data['thrust_damage'] = weapon_elem.get("thrust_damage", "")
-                    
                     if item_data['id']:
-                        self.data['items'].append(item_data)
+                        crafted_items.append(item_data)
+                    continue
                 
-                # Process CraftedItem elements
-                for crafted_elem in root.findall("CraftedItem"):
-                    item_data = {
-                        'id': crafted_elem.get("id", ""),
-                        'name': self.resolve_text(crafted_elem.get("name", "")),
-                        'type': 'CraftedItem',
-                        'culture': crafted_elem.get("culture", ""),
-                        'crafting_template': crafted_elem.get("crafting_template", ""),
-                        'is_merchandise': crafted_elem.get("is_merchandise", "true") == "true",
-                        'source_file': item_file.name
-                    }
+                item_data = {
+                    'id': item_elem.get("id", ""),
+                    'name': self.resolve_text(item_elem.get("name", "")),
+                    'type': item_elem.get("Type", ""),
+                    'culture': item_elem.get("culture", ""),
+                    'value': item_elem.get("value", ""),
+                    'weight': item_elem.get("weight", ""),
+                    'is_merchandise': item_elem.get("is_merchandise", "true") == "true",
+                    'source_file': item_file.name
+                }
+                
+                # Extract weapon data if present
+                weapon_elem = item_elem.find(".//Weapon")
+                if weapon_elem is not None:
+                    item_data['weapon_class'] = weapon_elem.get("weapon_class", "")
+                    item_data['weapon_length'] = weapon_elem.get("weapon_length", "")
+                    item_data['swing_damage'] = weapon_elem.get("swing_damage", "")
+                    item_data['thrust_damage'] = weapon_elem.get("thrust_damage", "")
+                
+                if item_data['id']:
+                    self._emit('items', item_data)
+            
+            for item_data in crafted_items:
+                self._emit('items', item_data)
                     
-                    if item_data['id']:
-                        self.data['items'].append(item_data)
-                        
-            except Exception as e:
-                print(f"Warning: Could not parse {item_file}: {e}")
-        
-        print(f"Extracted {len(self.data['items'])} items")
+        except Exception as e:
+            print(f"Warning: Could not parse {item_file}: {e}")
     
     def extract_traits(self):
         """Extract personality traits from trait_strings.xml"""
         print("Extracting traits...")
-        traits_file = self.modules_path / "SandBox" / "ModuleData" / "trait_strings.xml"
+        traits_file = self.modules_path / self.STEP_SOURCES['extract_traits']
         
         if not traits_file.exists():
             print(f"Warning: {traits_file} not found")
             return
         
         try:
-            tree = ET.parse(traits_file)
-            root = tree.getroot()
-            
-            for string_elem in root.findall(".//string"):
+            for string_elem in self._iter_xml(traits_file, "string", nested=True):
                 trait_data = {
                     'id': string_elem.get("id", ""),
                     'text': self.resolve_text(string_elem.get("text", ""))
                 }
                 
                 if trait_data['id'] and trait_data['text']:
-                    self.data['traits'].append(trait_data)
+                    self._emit('traits', trait_data)
             
-            print(f"Extracted {len(self.data['traits'])} traits")
+            print(f"Extracted {self.counts['traits']} traits")
         except Exception as e:
             print(f"Error extracting traits: {e}")
     
@@ -509,20 +690,15 @@ class EncyclopediaExtractor:
         
         for data_type, items in self.data.items():
             if items:
-                output_file = self.output_dir / f"{data_type}.json"
-                with open(output_file, 'w', encoding='utf-8') as f:
-                    json.dump(items, f, ensure_ascii=False, indent=2)
-                print(f"Saved {len(items)} {data_type} to {output_file}")
+                # Records are written one by one so the store is never copied into a list
+                writer = JsonArrayWriter(self.output_dir / f"{data_type}.json")
+                for item in items:
+                    writer.write(item)
+                writer.close()
+                print(f"Saved {len(items)} {data_type} to {writer.path}")
     
-    def save_to_sqlite(self):
-        """Save extracted data to SQLite database"""
-        print("Saving to SQLite database...")
-        
-        db_file = self.output_dir / "encyclopedia.db"
-        conn = sqlite3.connect(db_file)
-        cursor = conn.cursor()
-        
-        # Create tables
+    def _create_sqlite_tables(self, cursor: sqlite3.Cursor):
+        """Create encyclopedia.db tables"""
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS heroes (
                 id TEXT PRIMARY KEY,
@@ -688,157 +864,671 @@ class EncyclopediaExtractor:
                 text TEXT
             )
         """)
+    
+    def _table_rows(self, data_type: str, records: List[Dict[str, Any]]) -> List[Tuple[str, Iterator[tuple]]]:
+        """(INSERT statement, row generator) pairs writing records of one data type.
         
-        # Insert data
-        for hero in self.data['heroes']:
-            cursor.execute("""
-                INSERT OR REPLACE INTO heroes VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (hero['id'], hero['faction'], 1 if hero['alive'] else 0,
-                  hero['spouse'], hero['father'], hero['mother'], hero['text']))
-        
-        for settlement in self.data['settlements']:
-            cursor.execute("""
-                INSERT OR REPLACE INTO settlements VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (settlement['id'], settlement['name'], settlement['owner'],
-                  settlement['culture'], settlement['posX'], settlement['posY'],
-                  settlement['text'], settlement['type'],
-                  settlement.get('village_type', ''), settlement.get('bound', '')))
-        
-        for kingdom in self.data['kingdoms']:
-            cursor.execute("""
-                INSERT OR REPLACE INTO kingdoms VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (kingdom['id'], kingdom['name'], kingdom['short_name'],
-                  kingdom['title'], kingdom['ruler_title'], kingdom['culture'],
-                  kingdom['owner'], kingdom['initial_home_settlement'], kingdom['text']))
-            
-            for rel in kingdom['relationships']:
-                cursor.execute("""
-                    INSERT INTO kingdom_relationships VALUES (?, ?, ?, ?)
-                """, (kingdom['id'], rel['kingdom'], rel['value'], 1 if rel['isAtWar'] else 0))
-            
-            for policy in kingdom['policies']:
-                cursor.execute("""
-                    INSERT INTO kingdom_policies VALUES (?, ?)
-                """, (kingdom['id'], policy))
-        
-        for clan in self.data['clans']:
-            cursor.execute("""
-                INSERT OR REPLACE INTO clans VALUES (?, ?, ?, ?, ?)
-            """, (clan['id'], clan['name'], clan['culture'], clan['faction'], clan['text']))
-            
-            for member in clan['members']:
-                cursor.execute("""
-                    INSERT INTO clan_members VALUES (?, ?)
-                """, (clan['id'], member))
-        
-        for culture in self.data['cultures']:
-            cursor.execute("""
-                INSERT OR REPLACE INTO cultures VALUES (?, ?, ?)
-            """, (culture['id'], culture['name'], culture['text']))
-        
-        for concept in self.data['concepts']:
-            cursor.execute("""
-                INSERT OR REPLACE INTO concepts VALUES (?, ?, ?, ?, ?)
-            """, (concept['id'], concept['title'], concept['text'],
-                  concept['group'], concept['link_id']))
-        
-        for lore in self.data['world_lore']:
-            cursor.execute("""
-                INSERT OR REPLACE INTO world_lore VALUES (?, ?)
-            """, (lore['id'], lore['text']))
-            
-            for tag in lore['tags']:
-                cursor.execute("""
-                    INSERT INTO world_lore_tags VALUES (?, ?)
-                """, (lore['id'], tag))
-            
-            for char in lore['chars']:
-                cursor.execute("""
-                    INSERT INTO world_lore_chars VALUES (?, ?)
-                """, (lore['id'], char))
-        
-        for npc in self.data['npc_characters']:
-            cursor.execute("""
-                INSERT OR REPLACE INTO npc_characters VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (npc['id'], npc['name'], npc['culture'], 1 if npc['is_hero'] else 0,
-                  1 if npc['is_female'] else 0, npc['age'], npc['occupation'],
-                  npc['voice'], npc['default_group']))
-            
-            for skill_id, skill_value in npc['skills'].items():
-                cursor.execute("""
-                    INSERT INTO npc_skills VALUES (?, ?, ?)
-                """, (npc['id'], skill_id, skill_value))
-        
-        for item in self.data['items']:
-            cursor.execute("""
-                INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (item['id'], item['name'], item['type'], item['culture'],
-                  item.get('value', ''), item.get('weight', ''),
-                  1 if item.get('is_merchandise', True) else 0,
-                  item.get('weapon_class', ''), item.get('weapon_length', ''),
-                  item.get('swing_damage', ''), item.get('thrust_damage', ''),
-                  item.get('crafting_template', ''), item.get('source_file', '')))
-        
-        for trait in self.data['traits']:
-            cursor.execute("""
-                INSERT OR REPLACE INTO traits VALUES (?, ?)
-            """, (trait['id'], trait['text']))
+        Parent rows come first, then child rows; each generator walks records
+        lazily so executemany never materializes the rows.
+        """
+        if data_type == 'heroes':
+            return [
+                ("INSERT OR REPLACE INTO heroes VALUES (?, ?, ?, ?, ?, ?, ?)",
+                 ((hero['id'], hero['faction'], 1 if hero['alive'] else 0,
+                   hero['spouse'], hero['father'], hero['mother'], hero['text'])
+                  for hero in records)),
+            ]
+        
+        if data_type == 'settlements':
+            return [
+                ("INSERT OR REPLACE INTO settlements VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                 ((settlement['id'], settlement['name'], settlement['owner'],
+                   settlement['culture'], settlement['posX'], settlement['posY'],
+                   settlement['text'], settlement['type'],
+                   settlement.get('village_type', ''), settlement.get('bound', ''))
+                  for settlement in records)),
+            ]
+        
+        if data_type == 'kingdoms':
+            return [
+                ("INSERT OR REPLACE INTO kingdoms VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                 ((kingdom['id'], kingdom['name'], kingdom['short_name'],
+                   kingdom['title'], kingdom['ruler_title'], kingdom['culture'],
+                   kingdom['owner'], kingdom['initial_home_settlement'], kingdom['text'])
+                  for kingdom in records)),
+                ("INSERT INTO kingdom_relationships VALUES (?, ?, ?, ?)",
+                 ((kingdom['id'], rel['kingdom'], rel['value'], 1 if rel['isAtWar'] else 0)
+                  for kingdom in records for rel in kingdom['relationships'])),
+                ("INSERT INTO kingdom_policies VALUES (?, ?)",
+                 ((kingdom['id'], policy) for kingdom in records for policy in kingdom['policies'])),
+            ]
+        
+        if data_type == 'clans':
+            return [
+                ("INSERT OR REPLACE INTO clans VALUES (?, ?, ?, ?, ?)",
+                 ((clan['id'], clan['name'], clan['culture'], clan['faction'], clan['text'])
+                  for clan in records)),
+                ("INSERT INTO clan_members VALUES (?, ?)",
+                 ((clan['id'], member) for clan in records for member in clan['members'])),
+            ]
+        
+        if data_type == 'cultures':
+            return [
+                ("INSERT OR REPLACE INTO cultures VALUES (?, ?, ?)",
+                 ((culture['id'], culture['name'], culture['text']) for culture in records)),
+            ]
+        
+        if data_type == 'concepts':
+            return [
+                ("INSERT OR REPLACE INTO concepts VALUES (?, ?, ?, ?, ?)",
+                 ((concept['id'], concept['title'], concept['text'],
+                   concept['group'], concept['link_id'])
+                  for concept in records)),
+            ]
+        
+        if data_type == 'world_lore':
+            return [
+                ("INSERT OR REPLACE INTO world_lore VALUES (?, ?)",
+                 ((lore['id'], lore['text']) for lore in records)),
+                ("INSERT INTO world_lore_tags VALUES (?, ?)",
+                 ((lore['id'], tag) for lore in records for tag in lore['tags'])),
+                ("INSERT INTO world_lore_chars VALUES (?, ?)",
+                 ((lore['id'], char) for lore in records for char in lore['chars'])),
+            ]
+        
+        if data_type == 'npc_characters':
+            return [
+                ("INSERT OR REPLACE INTO npc_characters VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                 ((npc['id'], npc['name'], npc['culture'], 1 if npc['is_hero'] else 0,
+                   1 if npc['is_female'] else 0, npc['age'], npc['occupation'],
+                   npc['voice'], npc['default_group'])
+                  for npc in records)),
+                ("INSERT INTO npc_skills VALUES (?, ?, ?)",
+                 ((npc['id'], skill_id, skill_value)
+                  for npc in records for skill_id, skill_value in npc['skills'].items())),
+            ]
+        
+        if data_type == 'items':
+            return [
+                ("INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                 ((item['id'], item['name'], item['type'], item['culture'],
+                   item.get('value', ''), item.get('weight', ''),
+                   1 if item.get('is_merchandise', True) else 0,
+                   item.get('weapon_class', ''), item.get('weapon_length', ''),
+                   item.get('swing_damage', ''), item.get('thrust_damage', ''),
+                   item.get('crafting_template', ''), item.get('source_file', ''))
+                  for item in records)),
+            ]
+        
+        if data_type == 'traits':
+            return [
+                ("INSERT OR REPLACE INTO traits VALUES (?, ?)",
+                 ((trait['id'], trait['text']) for trait in records)),
+            ]
+        
+        return []
+    
+    def _insert_records(self, cursor: sqlite3.Cursor, data_type: str, records: List[Dict[str, Any]]):
+        """Insert records of one data type (and their child rows) with executemany"""
+        for sql, rows in self._table_rows(data_type, records):
+            cursor.executemany(sql, rows)
+    
+    def _create_sqlite_indexes(self, cursor: sqlite3.Cursor):
+        """Index child table foreign keys (created after the bulk load)"""
+        for tables in self.CHILD_TABLES.values():
+            for table, column in tables:
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{column} ON {table}({column})")
+    
+    @staticmethod
+    def _apply_build_pragmas(conn: sqlite3.Connection):
+        """Speed up bulk writes: WAL journal, no fsync per commit, larger page cache.
+        
+        Also turns on recursive_triggers: INSERT OR REPLACE deletes the old row
+        without firing its DELETE triggers otherwise, and the FTS indexes that
+        use_encyclopedia_db.py keeps in sync with triggers would keep its text.
+        """
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA recursive_triggers = ON")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute(f"PRAGMA cache_size = -{64 * 1024}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+    
+    @staticmethod
+    def _finish_build(conn: sqlite3.Connection):
+        """Checkpoint and go back to a single-file rollback journal after a build"""
+        conn.execute("PRAGMA synchronous = FULL")
+        conn.execute("PRAGMA journal_mode = DELETE")
+    
+    def save_to_sqlite(self):
+        """Save extracted data to SQLite database"""
+        print("Saving to SQLite database...")
+        
+        db_file = self.output_dir / "encyclopedia.db"
+        conn = sqlite3.connect(db_file)
+        self._apply_build_pragmas(conn)
+        cursor = conn.cursor()
+        
+        self._create_sqlite_tables(cursor)
         
+        # Insert data: one executemany per table, all in one transaction
+        for data_type, records in self.data.items():
+            self._insert_records(cursor, data_type, records)
+        
+        self._create_sqlite_indexes(cursor)
         conn.commit()
+        self._finish_build(conn)
         conn.close()
         print(f"Saved to SQLite database: {db_file}")
     
-    def extract_all(self):
-        """Extract all encyclopedia data"""
+    def _open_streaming_sinks(self):
+        """Prepare encyclopedia.db so records can be inserted as they are extracted"""
+        db_file = self.output_dir / "encyclopedia.db"
+        self._sqlite_conn = sqlite3.connect(db_file)
+        self._apply_build_pragmas(self._sqlite_conn)
+        self._create_sqlite_tables(self._sqlite_conn.cursor())
+    
+    def _close_streaming_sinks(self):
+        """Finish the JSON files and commit the SQLite database"""
+        for data_type, writer in self._json_writers.items():
+            writer.close()
+            print(f"Saved {writer.count} {data_type} to {writer.path}")
+        self._json_writers = {}
+        
+        if self._sqlite_conn is not None:
+            cursor = self._sqlite_conn.cursor()
+            for data_type, batch in self._sqlite_batches.items():
+                self._insert_records(cursor, data_type, batch)
+            self._sqlite_batches.clear()
+            self._create_sqlite_indexes(cursor)
+            self._sqlite_conn.commit()
+            self._finish_build(self._sqlite_conn)
+            self._sqlite_conn.close()
+            self._sqlite_conn = None
+            print(f"Saved to SQLite database: {self.output_dir / 'encyclopedia.db'}")
+    
+    @staticmethod
+    def task_key(task: Tuple[str, Optional[Path]]) -> str:
+        """Stable name of a task (method name, plus file name for items files)"""
+        method_name, source_file = task
+        return f"{method_name}:{source_file.name}" if source_file is not None else method_name
+    
+    def task_sources(self, task: Tuple[str, Optional[Path]]) -> List[Path]:
+        """Source XML files read by a task"""
+        method_name, source_file = task
+        if source_file is not None:
+            return [source_file]
+        return [self.modules_path / self.STEP_SOURCES[method_name]]
+    
+    def build_extraction_tasks(self) -> List[Tuple[str, Optional[Path]]]:
+        """Split extraction into (method, source file) tasks, in serial output order"""
+        tasks = []
+        for step in self.EXTRACTION_STEPS:
+            if step == 'extract_items':
+                tasks.extend(('extract_item_file', item_file) for item_file in self.get_item_files())
+            else:
+                tasks.append((step, None))
+        return tasks
+    
+    def extract_parallel(self, jobs: int):
+        """Run extraction tasks in a process pool and merge results in task order.
+        
+        Results are merged in the same order as the serial run, so the JSON files
+        and encyclopedia.db are identical to the single-process output.
+        """
+        tasks = self.build_extraction_tasks()
+        print(f"Running {len(tasks)} extraction tasks on {jobs} worker processes...")
+        
+        item_tasks = [i for i, (method_name, _) in enumerate(tasks) if method_name == 'extract_item_file']
+        
+        start = time.perf_counter()
+        timings = []
+        for i, (task, data, log, elapsed, pid) in enumerate(self.run_tasks(tasks, jobs)):
+            if item_tasks and i == item_tasks[0]:
+                print("Extracting items...")
+            print(log, end='')
+            for data_type, records in data.items():
+                for record in records:
+                    self._emit(data_type, record)
+            if item_tasks and i == item_tasks[-1]:
+                print(f"Extracted {self.counts['items']} items")
+            timings.append((self.task_key(task), pid, elapsed))
+        
+        self._print_task_timings(timings, time.perf_counter() - start)
+    
+    def run_tasks(self, tasks: List[Tuple[str, Optional[Path]]], jobs: int = 1) -> Iterator[tuple]:
+        """Run extraction tasks and yield (task, data, log, elapsed, pid) in task order.
+        
+        Records are collected per task instead of being emitted; jobs > 1 runs
+        the tasks in a process pool.
+        """
+        if jobs > 1:
+            with ProcessPoolExecutor(max_workers=jobs, initializer=_init_extraction_worker,
+                                     initargs=(str(self.game_path), str(self.output_dir), self.language,
+                                               self.localization_strings, self.defer_text_resolution)) as pool:
+                for task, result in zip(tasks, pool.map(_run_extraction_task, tasks)):
+                    yield (task,) + result
+            return
+        
+        # Records are collected per task, like in the pool workers
+        worker = EncyclopediaExtractor(str(self.game_path), str(self.output_dir), self.language,
+                                       streaming=False)
+        worker.localization_strings = self.localization_strings
+        worker.defer_text_resolution = self.defer_text_resolution
+        for task in tasks:
+            yield (task,) + _execute_task(worker, task)
+    
+    @staticmethod
+    def _print_task_timings(timings: List[Tuple[str, int, float]], wall_time: float):
+        print("\nTask timings:")
+        for label, pid, elapsed in timings:
+            print(f"  {label:<40} {elapsed:8.3f}s  (worker {pid})")
+        
+        per_worker = defaultdict(lambda: [0, 0.0])
+        for _, pid, elapsed in timings:
+            per_worker[pid][0] += 1
+            per_worker[pid][1] += elapsed
+        print("Worker timings:")
+        for pid, (task_count, busy) in sorted(per_worker.items()):
+            print(f"  worker {pid}: {task_count} tasks, {busy:.3f}s busy")
+        print(f"Extraction wall time: {wall_time:.3f}s")
+    
+    def extract_all(self, jobs: int = 1):
+        """Extract all encyclopedia data
+        
+        jobs: Number of worker processes (1 = extract in this process)
+        """
         print("Starting encyclopedia data extraction...")
         print(f"Game path: {self.game_path}")
         print(f"Output directory: {self.output_dir}")
-        print(f"Language: {self.language}")
+        if self.language_extractors:
+            print(f"Languages: {', '.join(e.language for e in self.language_extractors)} (single pass)")
+        else:
+            print(f"Language: {self.language}")
+        if jobs > 1:
+            print(f"Workers: {jobs}")
+        if self.streaming:
+            print("Mode: streaming")
+        if self.incremental:
+            print("Mode: incremental")
         
         # Load localization first
         self.load_localization()
         
+        # Extractors that store results (one per language in multi-language mode)
+        outputs = self.language_extractors or [self]
+        
+        if self.incremental:
+            self.extract_incremental(outputs, jobs)
+        else:
+            self._extract_and_save(outputs, jobs)
+        
+        print("\nExtraction complete!")
+        for output in outputs:
+            if self.language_extractors:
+                print(f"Total extracted ({output.language}, {output.output_dir}):")
+            else:
+                print("Total extracted:")
+            for data_type in output.data:
+                print(f"  {data_type}: {output.counts[data_type]}")
+    
+    def _extract_and_save(self, outputs: List['EncyclopediaExtractor'], jobs: int):
+        """Full extraction: run every step and write all outputs"""
+        if self.streaming:
+            for output in outputs:
+                output._open_streaming_sinks()
+        
         # Extract all data types
-        self.extract_heroes()
-        self.extract_npc_characters()
-        self.extract_settlements()
-        self.extract_kingdoms()
-        self.extract_clans()
-        self.extract_cultures()
-        self.extract_concepts()
-        self.extract_world_lore()
-        self.extract_items()
-        self.extract_traits()
+        if jobs > 1:
+            self.extract_parallel(jobs)
+        else:
+            for step in self.EXTRACTION_STEPS:
+                getattr(self, step)()
         
         # Save results
-        self.save_to_json()
-        self.save_to_sqlite()
+        for output in outputs:
+            if self.streaming:
+                output._close_streaming_sinks()
+            else:
+                output.save_to_json()
+                output.save_to_sqlite()
+    
+    def extract_incremental(self, outputs: List['EncyclopediaExtractor'], jobs: int):
+        """Re-extract only the tasks whose sources changed and update the outputs in place"""
+        tasks = self.build_extraction_tasks()
+        plans = [(output, output.plan_incremental(tasks)) for output in outputs]
+        
+        run_keys = set()
+        for _, plan in plans:
+            run_keys |= plan['dirty']
+        tasks_to_run = [task for task in tasks if self.task_key(task) in run_keys]
+        
+        if not tasks_to_run and not any(plan['removed'] for _, plan in plans):
+            print("No source files changed since the last run")
+        else:
+            print(f"Re-extracting {len(tasks_to_run)} of {len(tasks)} tasks...")
+        
+        start = time.perf_counter()
+        timings = []
+        task_records: Dict[str, List[Dict[str, Any]]] = {}
+        for task, data, log, elapsed, pid in self.run_tasks(tasks_to_run, jobs):
+            print(log, end='')
+            key = self.task_key(task)
+            task_records[key] = data.get(self.STEP_DATA_TYPES[task[0]], [])
+            timings.append((key, pid, elapsed))
+        if timings:
+            self._print_task_timings(timings, time.perf_counter() - start)
+        
+        for output, plan in plans:
+            records = {key: task_records[key] for key in plan['dirty']}
+            if self.language_extractors:
+                for task in tasks:
+                    key = self.task_key(task)
+                    if key in records:
+                        data_type = self.STEP_DATA_TYPES[task[0]]
+                        localized = (output.localize_record(data_type, r) for r in records[key])
+                        records[key] = [r for r in localized if r is not None]
+            output.apply_incremental(tasks, plan, records)
+    
+    def _load_manifest(self) -> Optional[Dict[str, Any]]:
+        manifest_file = self.output_dir / self.MANIFEST_FILE
+        if not manifest_file.exists():
+            return None
+        try:
+            with open(manifest_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not read {manifest_file}: {e}")
+            return None
+    
+    def _load_json(self, data_type: str) -> Optional[List[Dict[str, Any]]]:
+        json_file = self.output_dir / f"{data_type}.json"
+        if not json_file.exists():
+            return []
+        try:
+            with open(json_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not read {json_file}: {e}")
+            return None
+    
+    def plan_incremental(self, tasks: List[Tuple[str, Optional[Path]]]) -> Dict[str, Any]:
+        """Work out which tasks have to be re-extracted for this output.
         
-        print("\nExtraction complete!")
-        print(f"Total extracted:")
-        for data_type, items in self.data.items():
-            print(f"  {data_type}: {len(items)}")
+        A task is dirty when one of its source files changed; every task is dirty
+        when there is no usable manifest, the database is missing or the
+        localization files changed. Records of clean tasks are recovered from the
+        existing JSON files using the per-task counts of the manifest.
+        """
+        keys = [self.task_key(task) for task in tasks]
+        manifest = self._load_manifest()
+        plan = {'manifest': manifest, 'full': True, 'dirty': set(keys), 'removed': [], 'segments': {}}
+        
+        if (manifest is None or manifest.get('version') != self.MANIFEST_VERSION
+                or manifest.get('language') != self.language):
+            print(f"[{self.language}] No extraction manifest, extracting everything")
+            return plan
+        if not (self.output_dir / "encyclopedia.db").exists():
+            print(f"[{self.language}] encyclopedia.db not found, extracting everything")
+            return plan
+        
+        lang_files = self.get_localization_files()
+        recorded = manifest['localization']
+        if len(recorded) != len(lang_files) or not all(
+                fingerprint_matches(entry, path) for entry, path in zip(recorded, lang_files)):
+            print(f"[{self.language}] Localization files changed, extracting everything")
+            return plan
+        
+        old = {entry['key']: entry for entry in manifest['tasks']}
+        dirty = set()
+        for task, key in zip(tasks, keys):
+            entry = old.get(key)
+            sources = self.task_sources(task)
+            if (entry is None or len(entry['sources']) != len(sources)
+                    or not all(fingerprint_matches(fp, path) for fp, path in zip(entry['sources'], sources))):
+                dirty.add(key)
+        removed = [key for key in old if key not in set(keys)]
+        
+        # Split existing JSON back into per-task segments for the data types being updated
+        affected = {old[key]['data_type'] for key in removed}
+        affected |= {self.STEP_DATA_TYPES[task[0]] for task, key in zip(tasks, keys) if key in dirty}
+        segments = {}
+        for data_type in affected:
+            entries = [entry for entry in manifest['tasks'] if entry['data_type'] == data_type]
+            records = self._load_json(data_type)
+            if records is None or len(records) != sum(entry['count'] for entry in entries):
+                print(f"[{self.language}] {data_type}.json does not match the manifest, extracting everything")
+                return plan
+            pos = 0
+            for entry in entries:
+                segments[entry['key']] = records[pos:pos + entry['count']]
+                pos += entry['count']
+        
+        plan.update(full=False, dirty=dirty, removed=removed, segments=segments)
+        return plan
+    
+    def apply_incremental(self, tasks: List[Tuple[str, Optional[Path]]], plan: Dict[str, Any],
+                          task_records: Dict[str, List[Dict[str, Any]]]):
+        """Rewrite JSON files of changed data types and upsert their changed rows"""
+        keys = [self.task_key(task) for task in tasks]
+        old = {} if plan['full'] else {entry['key']: entry for entry in plan['manifest']['tasks']}
+        segments = dict(plan['segments'])
+        segments.update(task_records)
+        
+        keys_by_type = defaultdict(list)
+        for task, key in zip(tasks, keys):
+            keys_by_type[self.STEP_DATA_TYPES[task[0]]].append(key)
+        
+        changed_by_type = defaultdict(list)
+        for task, key in zip(tasks, keys):
+            if key in plan['dirty']:
+                changed_by_type[self.STEP_DATA_TYPES[task[0]]].append(key)
+        for key in plan['removed']:
+            changed_by_type[old[key]['data_type']].append(key)
+        
+        db_file = self.output_dir / "encyclopedia.db"
+        conn = sqlite3.connect(db_file)
+        self._apply_build_pragmas(conn)
+        cursor = conn.cursor()
+        self._create_sqlite_tables(cursor)
+        if plan['full']:
+            self._clear_sqlite_tables(cursor)
+        
+        for data_type in self.data:
+            changed_keys = changed_by_type.get(data_type)
+            if not changed_keys:
+                self.counts[data_type] = sum(old[key]['count'] for key in keys_by_type[data_type])
+                continue
+            
+            records = [record for key in keys_by_type[data_type] for record in segments[key]]
+            self.counts[data_type] = len(records)
+            self._write_json(data_type, records)
+            
+            # Rows produced before or now by a changed task; for duplicate ids the
+            # last record wins, as with INSERT OR REPLACE in a full run
+            ids = set()
+            for key in changed_keys:
+                if key in old:
+                    ids.update(old[key]['ids'])
+                ids.update(record['id'] for record in task_records.get(key, []))
+            latest = {record['id']: record for record in records if record['id'] in ids}
+            
+            self._delete_records(cursor, data_type, ids)
+            self._insert_records(cursor, data_type, list(latest.values()))
+            print(f"[{self.language}] {data_type}: {len(changed_keys)} changed source(s), "
+                  f"{len(ids)} rows refreshed")
+        
+        self._create_sqlite_indexes(cursor)
+        conn.commit()
+        self._finish_build(conn)
+        conn.close()
+        
+        self._write_manifest(tasks, keys, old, segments, plan)
+    
+    def _clear_sqlite_tables(self, cursor: sqlite3.Cursor):
+        """Remove all rows produced by a previous extraction"""
+        for data_type in self.STEP_DATA_TYPES.values():
+            cursor.execute(f"DELETE FROM {data_type}")
+            for table, _ in self.CHILD_TABLES.get(data_type, []):
+                cursor.execute(f"DELETE FROM {table}")
+    
+    def _delete_records(self, cursor: sqlite3.Cursor, data_type: str, ids):
+        """Delete records (and their child rows) by id"""
+        params = [(record_id,) for record_id in ids]
+        cursor.executemany(f"DELETE FROM {data_type} WHERE id = ?", params)
+        for table, column in self.CHILD_TABLES.get(data_type, []):
+            cursor.executemany(f"DELETE FROM {table} WHERE {column} = ?", params)
+    
+    def _write_json(self, data_type: str, records: List[Dict[str, Any]]):
+        output_file = self.output_dir / f"{data_type}.json"
+        if records:
+            with open(output_file, 'w', encoding='utf-8') as f:
+                json.dump(records, f, ensure_ascii=False, indent=2)
+            print(f"Saved {len(records)} {data_type} to {output_file}")
+        elif output_file.exists():
+            output_file.unlink()
+    
+    def _write_manifest(self, tasks, keys, old, segments, plan):
+        def refresh(entry: Optional[Dict], path: Path) -> Dict:
+            # Reuse the recorded fingerprint unless the file changed on disk
+            if entry is not None and fingerprint_matches(entry, path) and not entry.get('missing'):
+                current = file_fingerprint(path, with_hash=False)
+                return dict(entry, mtime_ns=current['mtime_ns'])
+            return file_fingerprint(path)
+        
+        recorded_loc = [] if plan['full'] else plan['manifest']['localization']
+        lang_files = self.get_localization_files()
+        localization = [refresh(recorded_loc[i] if i < len(recorded_loc) else None, path)
+                        for i, path in enumerate(lang_files)]
+        
+        task_entries = []
+        for task, key in zip(tasks, keys):
+            entry = old.get(key)
+            sources = self.task_sources(task)
+            if key in plan['dirty'] or entry is None:
+                records = segments[key]
+                task_entries.append({
+                    'key': key,
+                    'data_type': self.STEP_DATA_TYPES[task[0]],
+                    'sources': [file_fingerprint(path) for path in sources],
+                    'count': len(records),
+                    'ids': [record['id'] for record in records],
+                })
+            else:
+                task_entries.append(dict(entry, sources=[refresh(fp, path)
+                                                         for fp, path in zip(entry['sources'], sources)]))
+        
+        manifest = {
+            'version': self.MANIFEST_VERSION,
+            'language': self.language,
+            'localization': localization,
+            'tasks': task_entries,
+        }
+        with open(self.output_dir / self.MANIFEST_FILE, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+
+# Extractor instance of a worker process (set by _init_extraction_worker)
+_worker_extractor: Optional[EncyclopediaExtractor] = None
+
+
+def _init_extraction_worker(game_path: str, output_dir: str, language: str,
+                            localization_strings: Mapping[str, str], defer_text_resolution: bool):
+    """Process pool initializer: build the worker's extractor once"""
+    global _worker_extractor
+    _worker_extractor = EncyclopediaExtractor(game_path, output_dir, language)
+    _worker_extractor.localization_strings = localization_strings
+    _worker_extractor.defer_text_resolution = defer_text_resolution
+
+
+def _run_extraction_task(task: Tuple[str, Optional[Path]]):
+    """Run one extraction task in a worker process"""
+    return _execute_task(_worker_extractor, task)
+
+
+def _execute_task(extractor: EncyclopediaExtractor, task: Tuple[str, Optional[Path]]):
+    """Run one extraction task on extractor and return its records, log and timing"""
+    method_name, source_file = task
+    extractor.data = {data_type: RecordStore() for data_type in extractor.data}
+    extractor.counts.clear()
+    
+    log = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(log):
+        method = getattr(extractor, method_name)
+        if source_file is not None:
+            method(source_file)
+        else:
+            method()
+    elapsed = time.perf_counter() - start
+    
+    data = {data_type: records for data_type, records in extractor.data.items() if records}
+    return data, log.getvalue(), elapsed, os.getpid()
 
 
 def main():
-    import sys
+    import argparse
     
     # Default paths
     default_game_path = r"C:\TSEBanerAi\Mount & Blade II Bannerlord"
     default_output = "Database/encyclopedia"
     
-    # Get paths from command line or use defaults
-    game_path = sys.argv[1] if len(sys.argv) > 1 else default_game_path
-    output_dir = sys.argv[2] if len(sys.argv) > 2 else default_output
-    language = sys.argv[3] if len(sys.argv) > 3 else "RU"
+    parser = argparse.ArgumentParser(
+        description='Extract encyclopedia data from Bannerlord game files'
+    )
+    parser.add_argument('game_path', nargs='?', default=default_game_path,
+                        help='Path to Mount & Blade II Bannerlord installation')
+    parser.add_argument('output_dir', nargs='?', default=default_output,
+                        help='Directory to save extracted data')
+    parser.add_argument('language', nargs='?', default='RU',
+                        help='Language code for localization (EN, RU, TR, ...)')
+    parser.add_argument(
+        '--languages',
+        nargs='+',
+        help='Extract several languages in one pass (e.g. EN RU TR); '
+             'output goes to output_dir/<LANG> and the language argument is ignored'
+    )
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        default=1,
+        help='Number of worker processes for extraction (0 = all CPU cores, default: 1)'
+    )
+    parser.add_argument(
+        '--loc-cache',
+        type=str,
+        default='Database/.cache/localization',
+        help='Directory for the cached localization index (default: Database/.cache/localization)'
+    )
+    parser.add_argument(
+        '--no-loc-cache',
+        action='store_true',
+        help='Parse language files on every run instead of using the cached index'
+    )
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Re-extract only entity types whose source XML changed since the last run '
+             'and upsert just those rows into encyclopedia.db'
+    )
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help='Parse XML incrementally and write records directly to JSON/SQLite (flat memory use)'
+    )
+    
+    args = parser.parse_args()
     
-    if not os.path.exists(game_path):
-        print(f"Error: Game path not found: {game_path}")
-        print("Usage: python extract_encyclopedia_data.py [game_path] [output_dir] [language]")
+    if not os.path.exists(args.game_path):
+        print(f"Error: Game path not found: {args.game_path}")
+        print("Usage: python extract_encyclopedia_data.py [game_path] [output_dir] [language] [--languages EN RU TR] [--jobs N] [--incremental] [--stream]")
         return
     
-    extractor = EncyclopediaExtractor(game_path, output_dir, language)
-    extractor.extract_all()
+    extractor = EncyclopediaExtractor(args.game_path, args.output_dir, args.language,
+                                      streaming=args.stream,
+                                      localization_cache=None if args.no_loc_cache else args.loc_cache,
+                                      languages=args.languages, incremental=args.incremental)
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    extractor.extract_all(jobs=jobs)
 
 
 if __name__ == "__main__":
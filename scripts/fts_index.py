@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Trigger-synchronized FTS5 indexes for the lore databases
+
+Every FTS table is an external-content FTS5 index over a regular table
+(settlements_fts over settlements_lore, heroes_fts over heroes, ...).
+Instead of dropping and refilling the index after each import, insert,
+update and delete triggers on the content table keep it current, so
+adding wiki descriptions or campaign rows only reindexes those rows.
+Connections that write with INSERT OR REPLACE must enable
+PRAGMA recursive_triggers: without it the row that REPLACE deletes
+skips its delete trigger and its text stays in the index.
+
+Word indexes over RU/TR text use WORD_TOKENIZER: case folding for every
+script and Latin diacritics removed ("ş" matches "s"; Cyrillic letters
+are kept as is, so "ё" and "е" differ). Name indexes use the trigram
+tokenizer, so any 3+ character substring of a name matches.
+word_query() and substring_query() turn user input into MATCH strings.
+Both tokenizers fold "I" to "i", never to the Turkish dotless "ı", so
+queries also try each word with every i dotless ("KILIÇ" and "kilic"
+find "Kılıç", "ılıca" finds "ILICA"); a word mixing both letters in the
+text is only found when typed as written.
+
+The index is rebuilt from its content table once, when the triggers are
+first attached (rows written before that are unknown to it). Incremental
+writes leave many small segments behind; run this module periodically to
+merge them:
+
+    python fts_index.py Database/bannerlord_lore.db --optimize
+    python fts_index.py Database/bannerlord_lore.db --merge 500
+    python fts_index.py Database/bannerlord_lore.db --rebuild
+"""
+
+import argparse
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+
+# Trigger name suffixes: after insert, after delete, after update
+TRIGGER_SUFFIXES = ('ai', 'ad', 'au')
+
+# Tokenizer for word search in any language (case folding, Latin diacritics removed)
+WORD_TOKENIZER = 'unicode61 remove_diacritics 2'
+
+# Tokenizer for substring / partial name search (SQLite 3.34+)
+TRIGRAM_TOKENIZER = 'trigram'
+
+# Shortest query the trigram tokenizer can match
+TRIGRAM_MIN_LENGTH = 3
+
+
+def table_columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    """Column names of a table (empty if the table does not exist)"""
+    return [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+
+
+def has_triggers(conn: sqlite3.Connection, fts_table: str) -> bool:
+    names = [f"{fts_table}_{suffix}" for suffix in TRIGGER_SUFFIXES]
+    found = conn.execute(
+        f"SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name IN ({', '.join('?' * len(names))})",
+        names
+    ).fetchone()[0]
+    return found == len(names)
+
+
+def create_synced_fts(conn: sqlite3.Connection, fts_table: str, content_table: str,
+                      columns: List[str], tokenize: Optional[str] = None) -> bool:
+    """Create an external-content FTS5 table and the triggers that keep it in sync.
+
+    Columns must exist in the content table. If the triggers are new, the
+    index is rebuilt from the content table once. Returns False (and
+    creates nothing) when the content table or a column is missing, or
+    the tokenizer is not supported by this SQLite build.
+    """
+    existing = table_columns(conn, content_table)
+    missing = [column for column in columns if column not in existing]
+    if not existing or missing:
+        print(f"⚠️  Warning: Cannot index {content_table} in {fts_table}: "
+              f"{'table not found' if not existing else 'missing columns ' + ', '.join(missing)}")
+        return False
+
+    cursor = conn.cursor()
+    options = f",\n            tokenize='{tokenize}'" if tokenize else ''
+    try:
+        cursor.execute(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5(
+                {', '.join(columns)},
+                content='{content_table}',
+                content_rowid='rowid'{options}
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        print(f"⚠️  Warning: Cannot create {fts_table}: {e}")
+        return False
+
+    if has_triggers(conn, fts_table):
+        return True
+
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {content_table} BEGIN
+            INSERT INTO {fts_table}(rowid, {column_list}) VALUES (new.rowid, {new_values});
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {content_table} BEGIN
+            INSERT INTO {fts_table}({fts_table}, rowid, {column_list}) VALUES ('delete', old.rowid, {old_values});
+        END
+    ''')
+    # Only changes to indexed columns touch the index
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE OF {column_list} ON {content_table} BEGIN
+            INSERT INTO {fts_table}({fts_table}, rowid, {column_list}) VALUES ('delete', old.rowid, {old_values});
+            INSERT INTO {fts_table}(rowid, {column_list}) VALUES (new.rowid, {new_values});
+        END
+    ''')
+    rebuild(conn, fts_table)
+    return True
+
+
+def dotless_variants(word: str) -> List[str]:
+    """The word, then its spellings with Turkish dotted / dotless i swapped that the
+    tokenizers fold differently (Turkish case mapping, every ı dotted, every i dotless)"""
+    if not any(letter in word for letter in 'Iıİi'):
+        return [word]
+    lower = word.replace('I', 'ı').replace('İ', 'i').lower()
+    variants = {word.replace('İ', 'i').lower(): word}
+    for variant in (lower, lower.replace('ı', 'i'), lower.replace('i', 'ı')):
+        variants.setdefault(variant, variant)
+    return list(variants.values())
+
+
+def _match_any(variants: List[str], suffix: str = '') -> str:
+    terms = ['"' + variant.replace('"', '""') + '"' + suffix for variant in variants]
+    return terms[0] if len(terms) == 1 else '(' + ' OR '.join(terms) + ')'
+
+
+def word_query(text: str, prefix: bool = True, any_word: bool = False) -> Optional[str]:
+    """MATCH string for a word index: every word must occur (in any column).
+
+    Words are quoted, so user input cannot inject FTS5 syntax. With prefix,
+    the last word also matches longer words ("Диат" -> "Диатма"). With
+    any_word, one matching word is enough (bm25 still ranks entries with
+    more of the words higher). A word with i / ı also matches its
+    dotless_variants(). Returns None if the text has no words.
+    """
+    words = text.split()
+    if not words:
+        return None
+    terms = [_match_any(dotless_variants(word), '*' if prefix and i == len(words) - 1 else '')
+             for i, word in enumerate(words)]
+    return (' OR ' if any_word else ' AND ').join(terms)
+
+
+def substring_query(text: str) -> Optional[str]:
+    """MATCH string for a trigram index (None if the text is too short for trigrams)"""
+    text = text.strip()
+    if len(text) < TRIGRAM_MIN_LENGTH:
+        return None
+    return _match_any(dotless_variants(text))
+
+
+def drop_synced_fts(conn: sqlite3.Connection, fts_table: str):
+    """Drop an FTS table together with its triggers"""
+    for suffix in TRIGGER_SUFFIXES:
+        conn.execute(f'DROP TRIGGER IF EXISTS {fts_table}_{suffix}')
+    conn.execute(f'DROP TABLE IF EXISTS {fts_table}')
+
+
+def list_fts_tables(conn: sqlite3.Connection) -> List[str]:
+    """Names of all FTS5 tables in the database"""
+    return [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND sql LIKE 'CREATE VIRTUAL TABLE%fts5%' ORDER BY name"
+    )]
+
+
+def rebuild(conn: sqlite3.Connection, fts_table: str):
+    """Rebuild an index from its content table (recovery, not routine use)"""
+    conn.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+
+
+def optimize(conn: sqlite3.Connection, fts_table: str):
+    """Merge all index segments into one"""
+    conn.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('optimize')")
+
+
+def merge(conn: sqlite3.Connection, fts_table: str, pages: int, max_steps: Optional[int] = None) -> int:
+    """Incrementally merge segments, writing about `pages` pages per step.
+
+    Runs until there is nothing left to merge (or max_steps). Each step is
+    short, so this can run next to readers. Returns the number of steps.
+    """
+    steps = 0
+    while max_steps is None or steps < max_steps:
+        changes_before = conn.total_changes
+        conn.execute(f"INSERT INTO {fts_table}({fts_table}, rank) VALUES ('merge', ?)", (pages,))
+        conn.commit()
+        steps += 1
+        # FTS5 reports fewer than 2 changes once no more work is left
+        if conn.total_changes - changes_before < 2:
+            break
+    return steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Maintain FTS5 indexes of a lore database')
+    parser.add_argument('db_path', type=str, nargs='?', default='Database/bannerlord_lore.db',
+                        help='Path to database (default: Database/bannerlord_lore.db)')
+    parser.add_argument('--tables', nargs='+', help='FTS tables to process (default: all)')
+    action = parser.add_mutually_exclusive_group(required=True)
+    action.add_argument('--optimize', action='store_true', help='Merge every index into a single segment')
+    action.add_argument('--merge', type=int, metavar='PAGES',
+                        help='Incremental merge, PAGES pages per step (e.g. 500)')
+    action.add_argument('--rebuild', action='store_true', help='Rebuild indexes from their content tables')
+    args = parser.parse_args()
+    if args.merge is not None and args.merge < 1:
+        parser.error('--merge needs at least 1 page per step')
+
+    db_path = Path(args.db_path)
+    if not db_path.exists():
+        print(f"ERROR: Database not found: {db_path}")
+        sys.exit(1)
+
+    conn = sqlite3.connect(str(db_path))
+    fts_tables = args.tables or list_fts_tables(conn)
+
+    for fts_table in fts_tables:
+        start = time.perf_counter()
+        if args.merge is not None:
+            steps = merge(conn, fts_table, args.merge)
+            detail = f"merged in {steps} step(s)"
+        elif args.optimize:
+            optimize(conn, fts_table)
+            conn.commit()
+            detail = "optimized"
+        else:
+            rebuild(conn, fts_table)
+            conn.commit()
+            detail = "rebuilt"
+        print(f"✅ {fts_table}: {detail} ({time.perf_counter() - start:.2f}s)")
+
+    conn.close()
+
+
+if __name__ == '__main__':
+    # Настройка кодировки для Windows (только при запуске как скрипт, модуль импортируют другие скрипты)
+    if sys.platform == 'win32':
+        import io
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+        sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+    
+    main()
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Hybrid keyword + vector retrieval over bannerlord_lore.db
+
+HybridRetriever runs the FTS5/bm25 search (LoreSearch) and the semantic
+search (VectorIndex) at the same time, each on its own thread that alone
+uses its index, and merges the two rankings with
+reciprocal-rank fusion: every entry scores sum(1 / (RRF_K + rank)) over
+the rankings it appears in, so entries found by both rank first. Vector
+hits are chunks; each entry keeps its best chunk.
+
+Results are kept in an LRU cache with a time-to-live, keyed by the
+normalized question ("Who rules Battania?" and "who rules battania"
+share an entry), so an NPC asked the same thing again skips both
+searches. stats() reports cache hit rate and search latencies for tuning
+the cache size and TTL.
+
+Without numpy, an embedding backend or a built vector index, the
+retriever falls back to keyword search only. When the vector search
+fails, that question is answered from the keyword index (and not
+cached); after VECTOR_FAILURES failures in a row the vector search is
+paused for VECTOR_BACKOFF seconds, then tried again. Answers given
+while it is paused are not cached either. Cached results are handed
+out as copies.
+
+    retriever = HybridRetriever(Path('Database/bannerlord_lore.db'), Path('Database/lore_vectors'))
+    for hit in retriever.search('desert tribes and their horses', language='EN', limit=5):
+        print(hit['type'], hit['encyclopedia_id'], hit['name'], hit['keyword_rank'], hit['vector_rank'])
+    print(retriever.stats())
+
+Usage:
+    python hybrid_search.py "question" [--language EN] [--types ...] [--limit N] [--repeat N]
+"""
+
+import argparse
+import statistics
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from context_packer import normalize_query
+from lore_search import ENTITY_TYPES, LANGUAGES, LoreSearch, connect_read_only
+
+try:
+    from vector_index import VectorIndex
+except ImportError:
+    VectorIndex = None
+
+# Reciprocal-rank fusion constant (60 is the usual choice)
+RRF_K = 60
+
+# Candidates taken from each search per requested result
+CANDIDATE_FACTOR = 3
+
+CACHE_SIZE = 1024
+CACHE_TTL = 300.0
+
+# Vector search failures in a row before it is paused, and the pause in seconds
+VECTOR_FAILURES = 3
+VECTOR_BACKOFF = 60.0
+
+# Latency samples kept per stage for the percentiles in stats()
+LATENCY_SAMPLES = 1000
+
+
+class TTLCache:
+    """LRU cache whose entries also expire `ttl` seconds after being stored"""
+
+    def __init__(self, size: int = CACHE_SIZE, ttl: float = CACHE_TTL):
+        self.size = size
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+                self.evicted += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+def reciprocal_rank_fusion(rankings: Dict[str, List[tuple]], k: int = RRF_K) -> List[tuple]:
+    """Fuse rankings of keys: {name: [key, ...]} -> [(key, score, {name: rank})], best first"""
+    scores: Dict[tuple, float] = {}
+    ranks: Dict[tuple, Dict[str, int]] = {}
+    for name, ranking in rankings.items():
+        for rank, key in enumerate(ranking, 1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            ranks.setdefault(key, {})[name] = rank
+    fused = sorted(scores, key=lambda key: scores[key], reverse=True)
+    return [(key, scores[key], ranks[key]) for key in fused]
+
+
+class HybridRetriever:
+    """Concurrent bm25 + vector search with rank fusion and a result cache"""
+
+    def __init__(self, db_path: Path, index_dir: Optional[Path] = None,
+                 cache_size: int = CACHE_SIZE, cache_ttl: float = CACHE_TTL, vector_index=None):
+        # Each search runs on its own thread; only that thread uses its connection
+        self.keyword = LoreSearch(db_path, conn=connect_read_only(db_path, check_same_thread=False))
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='keyword')
+        self._vector_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='vector')
+
+        self.vector = vector_index
+        if self.vector is None and index_dir is not None:
+            if VectorIndex is None:
+                print("⚠️  Warning: numpy is not installed, using keyword search only")
+            elif not (Path(index_dir) / 'index.db').exists():
+                print(f"⚠️  Warning: No vector index in {index_dir} (run vector_index.py), "
+                      f"using keyword search only")
+            else:
+                self.vector = VectorIndex(Path(index_dir))
+
+        self._vector_lock = threading.Lock()
+        self._vector_failures = 0
+        self._vector_paused_until = 0.0
+
+        self.cache = TTLCache(cache_size, cache_ttl)
+        self._latencies = {stage: deque(maxlen=LATENCY_SAMPLES) for stage in ('keyword', 'vector', 'total')}
+
+    def close(self):
+        self._executor.shutdown()
+        self._vector_executor.shutdown()
+        self.keyword.close()
+        if self.vector is not None:
+            self.vector.close()
+
+    def _timed(self, stage: str, function, *args):
+        start = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            self._latencies[stage].append((time.perf_counter() - start) * 1000)
+
+    def _keyword_ranking(self, query: str, language: str, types: Optional[Sequence[str]], depth: int) -> List[Dict]:
+        return self.keyword.search(query, language, types, limit=depth, any_word=True)
+
+    def _vector_ranking(self, query: str, language: str, types: Optional[Sequence[str]], depth: int) -> List[Dict]:
+        # Chunks, several per entry: ask for more and keep each entry's best chunk
+        hits = []
+        seen = set()
+        for hit in self.vector.search(query, depth * 2, language, types):
+            key = (hit['type'], hit['encyclopedia_id'])
+            if key not in seen:
+                seen.add(key)
+                hits.append(hit)
+        return hits[:depth]
+
+    def _vector_available(self) -> bool:
+        return self.vector is not None and time.monotonic() >= self._vector_paused_until
+
+    def _vector_result(self, future) -> Optional[List[Dict]]:
+        """Hits of a vector search, or None if it failed (pauses it after VECTOR_FAILURES in a row)"""
+        try:
+            hits = future.result()
+        except Exception as e:
+            # e.g. the embedding model cannot be loaded: keep answering from the keyword index
+            with self._vector_lock:
+                self._vector_failures += 1
+                paused = self._vector_failures >= VECTOR_FAILURES
+                if paused:
+                    self._vector_failures = 0
+                    self._vector_paused_until = time.monotonic() + VECTOR_BACKOFF
+            if paused:
+                print(f"⚠️  Warning: Vector search failed ({e}), "
+                      f"using keyword search only for {VECTOR_BACKOFF:.0f}s")
+            else:
+                print(f"⚠️  Warning: Vector search failed ({e}), using keyword search for this question")
+            return None
+        with self._vector_lock:
+            self._vector_failures = 0
+        return hits
+
+    def search(self, query: str, language: str = 'EN', types: Optional[Sequence[str]] = None,
+               limit: int = 10) -> List[Dict]:
+        """Fused results: dicts with type, encyclopedia_id, name, score (RRF), keyword_rank,
+        vector_rank (None when that search did not find the entry) and text (snippet or chunk)"""
+        language = language.upper()
+        key = (normalize_query(query), language, tuple(sorted(types)) if types else None, limit)
+        if not key[0]:
+            return []
+        cached = self.cache.get(key)
+        if cached is not None:
+            # Copies: callers may change their results without changing the cache
+            return [dict(hit) for hit in cached]
+
+        start = time.perf_counter()
+        depth = limit * CANDIDATE_FACTOR
+        keyword_future = self._executor.submit(self._timed, 'keyword', self._keyword_ranking,
+                                               query, language, types, depth)
+        vector_future = None
+        if self._vector_available():
+            vector_future = self._vector_executor.submit(self._timed, 'vector', self._vector_ranking,
+                                                         query, language, types, depth)
+        keyword_hits = keyword_future.result()
+        vector_hits = self._vector_result(vector_future) if vector_future is not None else []
+        # Failed, or paused after failures
+        vector_skipped = vector_hits is None or (vector_future is None and self.vector is not None)
+        if vector_hits is None:
+            vector_hits = []
+
+        hits = {}
+        for hit in vector_hits:
+            hits[hit['type'], hit['encyclopedia_id']] = {'name': hit['name'], 'text': hit['text']}
+        for hit in keyword_hits:
+            # Keyword snippets show where the question's words matched
+            hits[hit['type'], hit['encyclopedia_id']] = {'name': hit['name'], 'text': hit['snippet']}
+
+        fused = reciprocal_rank_fusion({
+            'keyword': [(hit['type'], hit['encyclopedia_id']) for hit in keyword_hits],
+            'vector': [(hit['type'], hit['encyclopedia_id']) for hit in vector_hits],
+        })
+        results = []
+        for (entity_type, encyclopedia_id), score, ranks in fused[:limit]:
+            hit = hits[entity_type, encyclopedia_id]
+            results.append({
+                'type': entity_type,
+                'encyclopedia_id': encyclopedia_id,
+                'name': hit['name'],
+                'score': score,
+                'keyword_rank': ranks.get('keyword'),
+                'vector_rank': ranks.get('vector'),
+                'text': hit['text'],
+            })
+        self._latencies['total'].append((time.perf_counter() - start) * 1000)
+        if vector_skipped:
+            # Keyword results only: the next ask tries the vector search again
+            return results
+        self.cache.put(key, [dict(hit) for hit in results])
+        return results
+
+    def stats(self) -> Dict:
+        """Cache counters and latency percentiles (ms) of uncached searches"""
+        stats = {
+            'cache_entries': len(self.cache),
+            'cache_hits': self.cache.hits,
+            'cache_misses': self.cache.misses,
+            'cache_expired': self.cache.expired,
+            'cache_evicted': self.cache.evicted,
+            'cache_hit_rate': round(self.cache.hit_rate, 4),
+            'vector_search': self._vector_available(),
+        }
+        for stage, samples in self._latencies.items():
+            values = sorted(samples)
+            if values:
+                stats[f'{stage}_p50_ms'] = round(statistics.median(values), 3)
+                stats[f'{stage}_p95_ms'] = round(values[min(len(values) - 1, int(len(values) * 0.95))], 3)
+        return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Hybrid keyword + vector search over bannerlord_lore.db')
+    parser.add_argument('query', type=str, help='Question or search text')
+    parser.add_argument('--db-path', type=str, default='Database/bannerlord_lore.db',
+                        help='Path to database (default: Database/bannerlord_lore.db)')
+    parser.add_argument('--index-dir', type=str, default='Database/lore_vectors',
+                        help='Vector index directory (default: Database/lore_vectors)')
+    parser.add_argument('--language', type=str, default='EN', choices=LANGUAGES, help='Language (default: EN)')
+    parser.add_argument('--types', nargs='+', choices=list(ENTITY_TYPES), help='Entity types (default: all)')
+    parser.add_argument('--limit', type=int, default=10, help='Results (default: 10)')
+    parser.add_argument('--repeat', type=int, default=1, help='Run the query N times (shows the cache at work)')
+    args = parser.parse_args()
+    if args.repeat < 1:
+        parser.error('--repeat needs at least 1 run')
+
+    db_path = Path(args.db_path)
+    if not db_path.exists():
+        print(f"ERROR: Database not found: {db_path}")
+        sys.exit(1)
+
+    retriever = HybridRetriever(db_path, Path(args.index_dir))
+    for _ in range(args.repeat):
+        results = retriever.search(args.query, args.language, args.types, args.limit)
+    for hit in results:
+        ranks = f"bm25 #{hit['keyword_rank'] or '-'}, vector #{hit['vector_rank'] or '-'}"
+        print(f"[{hit['type']}] {hit['encyclopedia_id']}: {hit['name']} ({hit['score']:.4f}; {ranks})")
+        if hit['text']:
+            print(f"    {hit['text'][:160]}")
+    if not results:
+        print("No results")
+    print(f"\n{retriever.stats()}")
+    retriever.close()
+
+
+if __name__ == '__main__':
+    # Настройка кодировки для Windows (только при запуске как скрипт)
+    if sys.platform == 'win32':
+        import io
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+        sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+    main()
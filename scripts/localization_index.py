@@ -0,0 +1,248 @@
+"""
+Persistent localization index for Bannerlord language files
+
+Parsing every std_*.xml / language subdirectory file on each run is the
+slowest part of extractor startup. LocalizationIndex stores the merged
+string table of one language in a compact binary file that is
+memory-mapped on later runs, and is rebuilt only when one of the source
+files changed (path, mtime, size and content hash are recorded).
+
+File layout (all integers little-endian uint32):
+    magic (8 bytes) | manifest length | string count | slot count
+    manifest (UTF-8 JSON, padded to 4 bytes)
+    key offsets   (count + 1)
+    value offsets (count + 1)
+    slots         (slot count, entry number + 1, 0 = empty)
+    key blob | value blob
+
+Lookups hash the UTF-8 key with CRC-32 into an open-addressing slot table
+(linear probing, load factor <= 0.5), so nothing but the header is read at
+startup and a lookup usually touches a single key in the mapped file.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import zlib
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+MAGIC = b"TSELOC01"
+HEADER = struct.Struct("<8sIII")
+
+# {=string_id} localization keys and {.MA}-style formatting tags
+KEY_PATTERN = re.compile(r'\{=([^}]+)\}')
+TAG_PATTERN = re.compile(r'\{\.\w+\}')
+
+
+def file_fingerprint(path: Path, with_hash: bool = True) -> Dict:
+    """Fingerprint of a source file: path, mtime, size and (optionally) SHA-1"""
+    if not path.exists():
+        return {'path': str(path), 'missing': True}
+    stat = path.stat()
+    fingerprint = {
+        'path': str(path),
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+    }
+    if with_hash:
+        fingerprint['sha1'] = hashlib.sha1(path.read_bytes()).hexdigest()
+    return fingerprint
+
+
+def fingerprint_matches(entry: Dict, path: Path) -> bool:
+    """Check a recorded fingerprint against the file on disk.
+
+    Files whose mtime/size are unchanged are trusted without reading them;
+    otherwise the content hash decides.
+    """
+    if entry.get('path') != str(path):
+        return False
+    current = file_fingerprint(path, with_hash=False)
+    if current.get('missing') or entry.get('missing'):
+        return current.get('missing', False) == entry.get('missing', False)
+    if current['mtime_ns'] == entry['mtime_ns'] and current['size'] == entry['size']:
+        return True
+    if current['size'] != entry['size']:
+        return False
+    return hashlib.sha1(path.read_bytes()).hexdigest() == entry['sha1']
+
+
+class LocalizationIndex(Mapping):
+    """Read-only, memory-mapped string table (string_id -> text)"""
+
+    def __init__(self, index_file: Path):
+        self.index_file = Path(index_file)
+        with open(self.index_file, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, manifest_len, count, slot_count = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self._mm.close()
+            raise ValueError(f"Not a localization index: {self.index_file}")
+
+        pos = HEADER.size
+        self.manifest: List[Dict] = json.loads(self._mm[pos:pos + manifest_len].decode('utf-8'))
+        pos += manifest_len + (-manifest_len % 4)
+
+        self._count = count
+        view = memoryview(self._mm)
+        self._key_offsets = view[pos:pos + 4 * (count + 1)].cast('I')
+        pos += 4 * (count + 1)
+        self._value_offsets = view[pos:pos + 4 * (count + 1)].cast('I')
+        pos += 4 * (count + 1)
+        self._slots = view[pos:pos + 4 * slot_count].cast('I')
+        self._mask = slot_count - 1
+        pos += 4 * slot_count
+        self._keys_start = pos
+        self._values_start = pos + self._key_offsets[count]
+
+    def __reduce__(self):
+        # Worker processes reopen the mapping instead of pickling its contents
+        return (self.__class__, (self.index_file,))
+
+    def _key_at(self, i: int) -> bytes:
+        start = self._keys_start
+        return self._mm[start + self._key_offsets[i]:start + self._key_offsets[i + 1]]
+
+    def _find(self, key: str) -> int:
+        target = key.encode('utf-8')
+        slots = self._slots
+        slot = zlib.crc32(target) & self._mask
+        while True:
+            entry = slots[slot]
+            if not entry:
+                return -1
+            if self._key_at(entry - 1) == target:
+                return entry - 1
+            slot = (slot + 1) & self._mask
+
+    def __getitem__(self, key: str) -> str:
+        i = self._find(key)
+        if i < 0:
+            raise KeyError(key)
+        start = self._values_start
+        return self._mm[start + self._value_offsets[i]:start + self._value_offsets[i + 1]].decode('utf-8')
+
+    def __contains__(self, key) -> bool:
+        return isinstance(key, str) and self._find(key) >= 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(self._count):
+            yield self._key_at(i).decode('utf-8')
+
+    def close(self):
+        self._key_offsets.release()
+        self._value_offsets.release()
+        self._slots.release()
+        self._mm.close()
+
+    def is_current(self, source_files: List[Path]) -> bool:
+        """Check the recorded source files against the given list"""
+        return (len(self.manifest) == len(source_files)
+                and all(fingerprint_matches(entry, path) for entry, path in zip(self.manifest, source_files)))
+
+    @staticmethod
+    def write(index_file: Path, strings: Dict[str, str], manifest: List[Dict]):
+        """Write a string table and its source manifest to index_file"""
+        items: List[Tuple[bytes, bytes]] = sorted(
+            (key.encode('utf-8'), value.encode('utf-8')) for key, value in strings.items()
+        )
+
+        key_offsets = [0]
+        value_offsets = [0]
+        for key, value in items:
+            key_offsets.append(key_offsets[-1] + len(key))
+            value_offsets.append(value_offsets[-1] + len(value))
+
+        slot_count = 1
+        while slot_count < 2 * len(items):
+            slot_count *= 2
+        mask = slot_count - 1
+        slots = [0] * slot_count
+        for i, (key, _) in enumerate(items):
+            slot = zlib.crc32(key) & mask
+            while slots[slot]:
+                slot = (slot + 1) & mask
+            slots[slot] = i + 1
+
+        manifest_bytes = json.dumps(manifest, ensure_ascii=False).encode('utf-8')
+        index_file = Path(index_file)
+        index_file.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write to a temporary file first so readers never see a partial index
+        tmp_file = index_file.with_name(index_file.name + '.tmp')
+        with open(tmp_file, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, len(manifest_bytes), len(items), slot_count))
+            f.write(manifest_bytes)
+            f.write(b'\0' * (-len(manifest_bytes) % 4))
+            f.write(struct.pack(f"<{len(key_offsets)}I", *key_offsets))
+            f.write(struct.pack(f"<{len(value_offsets)}I", *value_offsets))
+            f.write(struct.pack(f"<{slot_count}I", *slots))
+            for key, _ in items:
+                f.write(key)
+            for _, value in items:
+                f.write(value)
+        os.replace(tmp_file, index_file)
+
+    @classmethod
+    def load_or_build(cls, index_file: Path, source_files: List[Path],
+                      parse_file: Callable[[Path], Iterable[Tuple[str, str]]]) -> Tuple['LocalizationIndex', bool]:
+        """Open index_file if it matches source_files, otherwise rebuild it.
+
+        parse_file yields (string_id, text) pairs of one source file; later
+        files override earlier ones. Returns (index, rebuilt).
+        """
+        index_file = Path(index_file)
+        if index_file.exists():
+            try:
+                index = cls(index_file)
+            except (OSError, ValueError) as e:
+                print(f"Warning: Could not open localization index {index_file}: {e}")
+            else:
+                if index.is_current(source_files):
+                    return index, False
+                index.close()
+
+        strings: Dict[str, str] = {}
+        manifest = []
+        for path in source_files:
+            manifest.append(file_fingerprint(path))
+            for string_id, text in parse_file(path):
+                strings[string_id] = text
+
+        cls.write(index_file, strings, manifest)
+        return cls(index_file), True
+
+
+class TextResolver:
+    """Resolves {=string_id} keys against a string table and strips {.XX} tags.
+
+    Patterns are compiled once and the replacement callback is bound once;
+    text without '{' is returned without running any regex.
+    """
+
+    def __init__(self, strings: Mapping):
+        self.strings = strings
+        self._replace = self._replace_key
+
+    def _replace_key(self, match: 're.Match') -> str:
+        value = self.strings.get(match.group(1))
+        # If not found, keep the original key
+        return value if value is not None else match.group(0)
+
+    def resolve(self, text: Optional[str]) -> str:
+        if not text:
+            return ""
+        if '{' in text:
+            text = KEY_PATTERN.sub(self._replace, text)
+            if '{' in text:
+                text = TAG_PATTERN.sub('', text)
+        return text.strip()
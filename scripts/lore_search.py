@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Ranked full-text search over bannerlord_lore.db
+
+LoreSearch queries the FTS5 indexes kept by EncyclopediaImporter
+(settlements_fts, settlements_ru_fts, ..., *_names_trigram) and returns
+ranked lore entries:
+
+    search = LoreSearch(Path('Database/bannerlord_lore.db'))
+    for hit in search.search('imperial senate', language='EN', types=['faction'], limit=5):
+        print(hit['type'], hit['encyclopedia_id'], hit['name'], hit['snippet'])
+
+Ranking is bm25 with per-column weights (names and titles count more than
+descriptions). Each entity type is ranked in its own index; bm25 scores
+depend on the statistics of that index, so the top rows are merged by
+relevance, the score relative to the best hit of the same index, with
+the rank inside the index breaking ties. Snippets are extracted only for
+the returned page. SQL texts are built once per (type, language) and the
+connection keeps a large statement cache, so repeated calls reuse
+prepared statements. The database is opened read-only.
+
+Usage:
+    python lore_search.py "query" [--language EN|RU|TR] [--types settlement character ...] [--limit N] [--offset N]
+"""
+
+import argparse
+import heapq
+import sqlite3
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from fts_index import substring_query, table_columns, word_query
+
+# Entity type -> (lore table, FTS index prefix, name column)
+ENTITY_TYPES = {
+    'settlement': ('settlements_lore', 'settlements', 'name'),
+    'character': ('characters_lore', 'characters', 'name'),
+    'faction': ('factions_lore', 'factions', 'name'),
+    'world_lore': ('world_lore', 'world_lore', 'title'),
+}
+
+# Trigram name index per entity type
+NAME_INDEXES = {
+    'settlement': 'settlements_names_trigram',
+    'character': 'characters_names_trigram',
+    'faction': 'factions_names_trigram',
+    'world_lore': 'world_lore_titles_trigram',
+}
+
+LANGUAGES = ('EN', 'RU', 'TR')
+
+# bm25 weight by column kind (column name without the language suffix)
+COLUMN_WEIGHTS = {
+    'name': 10.0,
+    'title': 10.0,
+    'description': 1.0,
+    'content': 1.0,
+    'biography': 0.5,
+}
+
+# Snippet markers and length in tokens
+SNIPPET_START = '['
+SNIPPET_END = ']'
+SNIPPET_ELLIPSIS = '…'
+SNIPPET_TOKENS = 16
+
+# Prepared statements kept per connection (sqlite3 default is 128)
+STATEMENT_CACHE_SIZE = 512
+
+
+def fts_table_name(prefix: str, language: str) -> str:
+    return f"{prefix}_fts" if language == 'EN' else f"{prefix}_{language.lower()}_fts"
+
+
+def ranked(rows: Sequence[sqlite3.Row], group: int) -> List[tuple]:
+    """Merge keys for rows of one index, best bm25 first.
+
+    Relevance is the bm25 score divided by the best score of the same
+    index (1.0 for the best hit); keys sort by relevance, then by rank
+    in the index and the index's position (group), so a merged order
+    over several indexes does not depend on how many rows were fetched.
+    """
+    if not rows:
+        return []
+    best = rows[0]['score']
+    return [(-(row['score'] / best if best else 1.0), rank, group) for rank, row in enumerate(rows)]
+
+
+def connect_read_only(db_path: Path, shared_cache: bool = False, mmap_size: int = 0,
+                      **kwargs) -> sqlite3.Connection:
+    """Open a database read-only (works while an import is writing in WAL mode).
+
+    shared_cache lets connections of one process share a page cache;
+    mmap_size > 0 reads the file through a memory map of that many bytes.
+    """
+    uri = Path(db_path).resolve().as_uri() + '?mode=ro' + ('&cache=shared' if shared_cache else '')
+    conn = sqlite3.connect(uri, uri=True, cached_statements=STATEMENT_CACHE_SIZE, **kwargs)
+    conn.row_factory = sqlite3.Row
+    if mmap_size:
+        conn.execute(f'PRAGMA mmap_size = {int(mmap_size)}')
+    return conn
+
+
+class LoreSearch:
+    """Ranked search over the lore tables of bannerlord_lore.db"""
+
+    def __init__(self, db_path: Path, conn: Optional[sqlite3.Connection] = None,
+                 column_weights: Optional[Dict[str, float]] = None):
+        self.db_path = db_path
+        self.conn = conn or connect_read_only(db_path)
+        self.column_weights = dict(COLUMN_WEIGHTS, **(column_weights or {}))
+
+        # (type, language) -> (ranking SQL, page SQL); only indexes present in the database
+        self._statements: Dict[tuple, tuple] = {}
+        for entity_type, (table, prefix, name_column) in ENTITY_TYPES.items():
+            for language in LANGUAGES:
+                fts_table = fts_table_name(prefix, language)
+                columns = table_columns(self.conn, fts_table)
+                if columns:
+                    self._statements[entity_type, language] = self._build_statements(
+                        fts_table, table, columns, name_column, language)
+
+        self._name_statements: Dict[str, str] = {}
+        for entity_type, fts_table in NAME_INDEXES.items():
+            if table_columns(self.conn, fts_table):
+                table, _, name_column = ENTITY_TYPES[entity_type]
+                self._name_statements[entity_type] = f'''
+                    SELECT t.encyclopedia_id, t.{name_column} AS name, t.{name_column}_ru AS name_ru,
+                           t.{name_column}_tr AS name_tr, bm25({fts_table}) AS score
+                    FROM {fts_table} JOIN {table} t ON t.rowid = {fts_table}.rowid
+                    WHERE {fts_table} MATCH ?
+                    ORDER BY score
+                    LIMIT ?
+                '''
+
+    def _build_statements(self, fts_table: str, table: str, columns: List[str],
+                          name_column: str, language: str) -> tuple:
+        weights = ', '.join(str(self.column_weights.get(column.split('_')[0], 1.0)) for column in columns)
+        # Name in the requested language, falling back to the base (EN) name
+        if language == 'EN':
+            name = f"t.{name_column}"
+        else:
+            name = f"COALESCE(NULLIF(t.{name_column}_{language.lower()}, ''), t.{name_column})"
+
+        rank_sql = f'''
+            SELECT rowid, bm25({fts_table}, {weights}) AS score
+            FROM {fts_table}
+            WHERE {fts_table} MATCH ?
+            ORDER BY score
+            LIMIT ?
+        '''
+        page_sql = f'''
+            SELECT t.encyclopedia_id, {name} AS name,
+                   snippet({fts_table}, -1, ?, ?, ?, ?) AS snippet
+            FROM {fts_table} JOIN {table} t ON t.rowid = {fts_table}.rowid
+            WHERE {fts_table} MATCH ? AND {fts_table}.rowid = ?
+        '''
+        # Without snippets the page rows come straight from the lore table, no second MATCH
+        row_sql = f'''
+            SELECT t.encyclopedia_id, {name} AS name, NULL AS snippet
+            FROM {table} t
+            WHERE t.rowid = ?
+        '''
+        return rank_sql, page_sql, row_sql
+
+    @property
+    def available_types(self) -> List[str]:
+        return sorted({entity_type for entity_type, _ in self._statements})
+
+    def close(self):
+        self.conn.close()
+
+    def search(self, query: str, language: str = 'EN', types: Optional[Sequence[str]] = None,
+               limit: int = 10, offset: int = 0, prefix: bool = False,
+               snippets: bool = True, any_word: bool = False) -> List[Dict]:
+        """Search lore entries, best first.
+
+        Every word of the query must occur in the entry (prefix=True also
+        matches longer words for the last one; any_word=True needs only one
+        of the words, for free-form questions). Returns dicts with type,
+        encyclopedia_id, name, score (bm25 in the type's index, lower is
+        better), relevance (score relative to the best hit of that index,
+        1.0 for the best) and snippet (matches wrapped in [ ]).
+        """
+        language = language.upper()
+        match = word_query(query, prefix=prefix, any_word=any_word)
+        if match is None or limit <= 0:
+            return []
+
+        wanted = types or list(ENTITY_TYPES)
+        unknown = [entity_type for entity_type in wanted if entity_type not in ENTITY_TYPES]
+        if unknown:
+            raise ValueError(f"Unknown entity type(s): {', '.join(unknown)}")
+
+        # Each index returns at most offset + limit rows; the page is cut after the merge
+        depth = offset + limit
+        candidates = []
+        for group, entity_type in enumerate(wanted):
+            statements = self._statements.get((entity_type, language))
+            if statements is None:
+                continue
+            rows = self.conn.execute(statements[0], (match, depth)).fetchall()
+            for key, row in zip(ranked(rows, group), rows):
+                candidates.append((key, entity_type, row['rowid'], row['score']))
+
+        page = heapq.nsmallest(depth, candidates)[offset:]
+
+        results = []
+        for key, entity_type, rowid, score in page:
+            _, page_sql, row_sql = self._statements[entity_type, language]
+            if snippets:
+                row = self.conn.execute(
+                    page_sql, (SNIPPET_START, SNIPPET_END, SNIPPET_ELLIPSIS, SNIPPET_TOKENS, match, rowid)
+                ).fetchone()
+            else:
+                row = self.conn.execute(row_sql, (rowid,)).fetchone()
+            results.append({
+                'type': entity_type,
+                'encyclopedia_id': row['encyclopedia_id'],
+                'name': row['name'],
+                'score': score,
+                'relevance': -key[0],
+                'snippet': row['snippet'],
+            })
+        return results
+
+    def get_entity(self, entity_type: str, encyclopedia_id: str) -> Optional[Dict]:
+        """All columns of one lore entry (None if there is no such entry)"""
+        if entity_type not in ENTITY_TYPES:
+            raise ValueError(f"Unknown entity type: {entity_type}")
+        table = ENTITY_TYPES[entity_type][0]
+        row = self.conn.execute(f"SELECT * FROM {table} WHERE encyclopedia_id = ?", (encyclopedia_id,)).fetchone()
+        if row is None:
+            return None
+        entity = dict(row)
+        entity.pop('content_hash', None)
+        entity['type'] = entity_type
+        return entity
+
+    def search_names(self, text: str, types: Optional[Sequence[str]] = None, limit: int = 10) -> List[Dict]:
+        """Partial-name lookup in any language (substring of 3+ characters)"""
+        match = substring_query(text)
+        if match is None or limit <= 0:
+            return []
+
+        candidates = []
+        for group, entity_type in enumerate(types or list(NAME_INDEXES)):
+            sql = self._name_statements.get(entity_type)
+            if sql is None:
+                continue
+            rows = self.conn.execute(sql, (match, limit)).fetchall()
+            for key, row in zip(ranked(rows, group), rows):
+                candidates.append((key, entity_type, dict(row)))
+
+        results = []
+        for key, entity_type, row in heapq.nsmallest(limit, candidates, key=lambda item: item[0]):
+            row['type'] = entity_type
+            results.append(row)
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Search bannerlord_lore.db')
+    parser.add_argument('query', type=str, help='Search text')
+    parser.add_argument('--db-path', type=str, default='Database/bannerlord_lore.db',
+                        help='Path to database (default: Database/bannerlord_lore.db)')
+    parser.add_argument('--language', type=str, default='EN', choices=LANGUAGES, help='Index language (default: EN)')
+    parser.add_argument('--types', nargs='+', choices=list(ENTITY_TYPES), help='Entity types (default: all)')
+    parser.add_argument('--limit', type=int, default=10, help='Results per page (default: 10)')
+    parser.add_argument('--offset', type=int, default=0, help='Results to skip (default: 0)')
+    parser.add_argument('--names', action='store_true', help='Partial-name lookup instead of full-text search')
+    args = parser.parse_args()
+
+    db_path = Path(args.db_path)
+    if not db_path.exists():
+        print(f"ERROR: Database not found: {db_path}")
+        sys.exit(1)
+
+    search = LoreSearch(db_path)
+    if args.names:
+        for hit in search.search_names(args.query, args.types, args.limit):
+            names = ' / '.join(name for name in (hit['name'], hit['name_ru'], hit['name_tr']) if name)
+            print(f"[{hit['type']}] {hit['encyclopedia_id']}: {names}")
+    else:
+        hits = search.search(args.query, args.language, args.types, args.limit, args.offset)
+        for hit in hits:
+            print(f"[{hit['type']}] {hit['encyclopedia_id']}: {hit['name']} ({hit['score']:.3f})")
+            if hit['snippet']:
+                print(f"    {hit['snippet']}")
+        if not hits:
+            print("No results")
+    search.close()
+
+
+if __name__ == '__main__':
+    # Настройка кодировки для Windows (только при запуске как скрипт)
+    if sys.platform == 'win32':
+        import io
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+        sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+    main()
@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate records across a whole corpus with MinHash and LSH
+
+The same faction or settlement description reaches the fine-tuning data
+from several sources (encyclopedia JSON, wiki faction files, campaign
+database exports), usually with small differences: another source's
+markers, whitespace, a changed word. near_duplicates() groups texts
+whose estimated Jaccard similarity of character shingles reaches a
+threshold and keeps the first text of each group.
+
+- Texts are normalized (localization markers dropped, lower case, runs
+  of non-word characters as one space) and cut into shingles of SHINGLE
+  characters, hashed to 32 bits with numpy over whole batches.
+- The MinHash signature of a text has NUM_PERM positions; two
+  signatures agree in a position with probability (about) equal to the
+  Jaccard similarity of the shingle sets. Signatures use one-permutation
+  hashing: every shingle is hashed once into one of NUM_PERM bins and a
+  position is the minimum of its bin.
+- Locality-sensitive hashing cuts signatures into `bands` bands of
+  `rows` positions (chosen from the threshold by lsh_parameters()).
+  Texts with an identical band share a bucket; every text of a bucket
+  is compared with the bucket's first text, and pairs whose signatures
+  agree in at least `threshold` of the positions are joined. Groups are
+  the connected components of these pairs; a text is removed only if it
+  reaches the threshold against the group's first (kept) text itself,
+  so the far end of a chain a ~ b ~ c stays when a and c are too far
+  apart. With `keys`, buckets are per key and band, so only texts with
+  equal keys (e.g. the same entity) are compared and grouped.
+
+Cost is linear in the total length of the texts (plus one sort per
+band); no pair of texts is compared unless LSH puts them in a bucket.
+
+    from minhash_dedup import minhash_signatures, near_duplicates, dedup_report
+
+    signatures = minhash_signatures(texts)
+    duplicates = near_duplicates(signatures, threshold=0.8)
+    unique = [text for text, keep in zip(texts, duplicates.keep) if keep]
+    report = dedup_report(duplicates, texts, sources)
+
+Usage:
+    python minhash_dedup.py ../finetuning_data/unsloth_training_dataset.json [--field output]
+                            [--threshold 0.8] [--key-field input] [--report dedup_report.json]
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from text_dedup import _MIX, HASH_BASE, _batches, strip_markers
+
+DEFAULT_THRESHOLD = 0.8
+
+# Signature positions (4 bytes each) and characters per shingle
+NUM_PERM = 128
+SHINGLE = 5
+
+# Candidate pairs verified per numpy pass
+PAIR_BATCH = 1 << 16
+
+# Relative weight of missed duplicates against candidates that the verification rejects
+FALSE_NEGATIVE_WEIGHT = 0.5
+
+_BAND_BASE = np.uint64(0x100000001B3)
+_NON_WORD = re.compile(r'\W+')
+_EMPTY = np.uint32(0xFFFFFFFF)
+
+
+def normalize(text: str) -> str:
+    """Text as it is shingled: no markers, lower case, runs of non-word characters as one space"""
+    return _NON_WORD.sub(' ', strip_markers(text).lower()).strip()
+
+
+def _hash_constants(seed: int) -> np.ndarray:
+    """Random odd multipliers and an offset for the bin and value hashes"""
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 1 << 32, 3, dtype=np.uint64).astype(np.uint32) | np.uint32(1)
+
+
+def _shingle_hashes(texts: Sequence[str], shingle: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Mixed 32-bit hashes of all shingles of the texts, in order, and the text of each.
+
+    Texts shorter than a shingle are padded with spaces, so every text has at least one shingle.
+    """
+    texts = [text.ljust(shingle) for text in texts]
+    lengths = np.fromiter(map(len, texts), dtype=np.int64, count=len(texts))
+    codes = np.frombuffer(''.join(texts).encode('utf-32-le', errors='surrogatepass'), dtype=np.uint32)
+    windows = len(codes) - shingle + 1
+    hashes = codes[:windows].copy()
+    for i in range(1, shingle):
+        hashes *= np.uint32(HASH_BASE)
+        hashes += codes[i:i + windows]
+    # Windows starting in the last shingle-1 characters of a text cross into the next one
+    owner = np.repeat(np.arange(len(texts)), lengths)
+    valid = owner[:windows] == owner[shingle - 1:]
+    return hashes[valid] * _MIX, owner[:windows][valid]
+
+
+def minhash_signatures(texts: Sequence[str], num_perm: int = NUM_PERM, shingle: int = SHINGLE,
+                       seed: int = 1) -> np.ndarray:
+    """MinHash signatures of the normalized texts: uint32 array of shape (len(texts), num_perm)
+
+    One-permutation hashing: each shingle is hashed once, into one of num_perm bins, and a
+    signature position is the minimum value in its bin, so the cost does not grow with num_perm.
+    Empty bins (texts with few shingles) take the value of the next non-empty bin to the right,
+    shifted by the distance, which keeps the agreement rate an estimate of the Jaccard similarity.
+    """
+    constants = _hash_constants(seed)
+    normalized = [normalize(text) for text in texts]
+    signatures = np.empty((len(texts), num_perm), dtype=np.uint32)
+    lengths = [len(text) for text in normalized]
+    for batch in _batches(range(len(texts)), lengths):
+        signatures[batch] = _sign_batch([normalized[i] for i in batch], num_perm, shingle, constants)
+    return signatures
+
+
+def _sign_batch(texts: Sequence[str], num_perm: int, shingle: int, constants: np.ndarray) -> np.ndarray:
+    hashes, owner = _shingle_hashes(texts, shingle)
+    bins = ((hashes * constants[0]).astype(np.uint64) * np.uint64(num_perm) >> np.uint64(32)).astype(np.int64)
+    values = hashes * constants[1] + constants[2]
+    signatures = np.full((len(texts), num_perm), _EMPTY, dtype=np.uint32)
+    np.minimum.at(signatures.ravel(), owner * num_perm + bins, values)
+
+    empty = signatures == _EMPTY
+    if empty.any():
+        # Index of the next non-empty bin to the right, wrapping around (two copies of each row)
+        columns = np.arange(2 * num_perm)
+        filled = np.where(np.concatenate((~empty, ~empty), axis=1), columns, 2 * num_perm)
+        following = np.minimum.accumulate(filled[:, ::-1], axis=1)[:, ::-1][:, :num_perm]
+        rows, bins = np.nonzero(empty)
+        source = following[rows, bins]
+        signatures[rows, bins] = (signatures[rows, source % num_perm]
+                                  + (source - bins).astype(np.uint32) * _MIX)
+    return signatures
+
+
+def lsh_parameters(threshold: float, num_perm: int = NUM_PERM,
+                   false_negative_weight: float = FALSE_NEGATIVE_WEIGHT) -> Tuple[int, int]:
+    """(bands, rows) with bands * rows <= num_perm whose S-curve 1 - (1 - s^rows)^bands best
+    separates similarities below and above the threshold (weighted areas of the two errors)"""
+    step = 0.005
+    jaccard = np.arange(0, 1, step) + step / 2
+    best = None
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        candidate = 1 - (1 - jaccard ** rows) ** bands
+        false_positive = candidate[jaccard < threshold].sum() * step
+        false_negative = (1 - candidate[jaccard >= threshold]).sum() * step
+        error = (1 - false_negative_weight) * false_positive + false_negative_weight * false_negative
+        if best is None or error < best[0]:
+            best = (error, bands, rows)
+    return best[1], best[2]
+
+
+def _band_keys(signatures: np.ndarray, band: int, rows: int) -> np.ndarray:
+    keys = np.zeros(len(signatures), dtype=np.uint64)
+    for column in signatures[:, band * rows:(band + 1) * rows].T:
+        keys *= _BAND_BASE
+        keys ^= column.astype(np.uint64)
+    return keys
+
+
+def _components(count: int, first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    """Connected components of the pairs: the smallest index in each text's component"""
+    parent = np.arange(count)
+    while True:
+        roots_first, roots_second = parent[first], parent[second]
+        joined = roots_first != roots_second
+        if not joined.any():
+            return parent
+        # Hook the larger root under the smaller one, then compress all paths
+        np.minimum.at(parent, np.maximum(roots_first[joined], roots_second[joined]),
+                      np.minimum(roots_first[joined], roots_second[joined]))
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+
+
+def similarity(signatures: np.ndarray, first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    """Estimated Jaccard similarity of pairs of texts: the share of equal signature positions"""
+    result = np.empty(len(first), dtype=np.float64)
+    for start in range(0, len(first), PAIR_BATCH):
+        pairs = slice(start, start + PAIR_BATCH)
+        result[pairs] = (signatures[first[pairs]] == signatures[second[pairs]]).mean(axis=1)
+    return result
+
+
+class NearDuplicates:
+    """Groups of near-duplicate texts found by near_duplicates()
+
+    group[i] is the index of the first text of text i's group (i itself for a kept text),
+    keep[i] is True for the first text of every group, similarity[i] is text i's estimated
+    Jaccard similarity to that first text (1.0 for kept texts, at least the threshold for
+    removed ones).
+    """
+
+    def __init__(self, group: np.ndarray, similarity: np.ndarray, threshold: float,
+                 num_perm: int, bands: int, rows: int, candidates: int):
+        self.group = group
+        self.keep = group == np.arange(len(group))
+        self.similarity = similarity
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = rows
+        self.candidates = candidates
+
+    def __len__(self) -> int:
+        return len(self.group)
+
+    @property
+    def removed(self) -> np.ndarray:
+        return np.flatnonzero(~self.keep)
+
+
+def near_duplicates(signatures: np.ndarray, threshold: float = DEFAULT_THRESHOLD,
+                    bands: Optional[int] = None, rows: Optional[int] = None,
+                    keys: Optional[Sequence] = None) -> NearDuplicates:
+    """Group texts whose signatures agree in at least `threshold` of the positions
+
+    keys: one value per text; texts with different keys are never grouped.
+    """
+    if not 0 < threshold <= 1:
+        raise ValueError("threshold must be in (0, 1]")
+    count, num_perm = signatures.shape
+    if bands is None or rows is None:
+        bands, rows = lsh_parameters(threshold, num_perm)
+    if bands * rows > num_perm:
+        raise ValueError(f"bands * rows ({bands} * {rows}) exceeds the signature length ({num_perm})")
+    if count == 0:
+        return NearDuplicates(np.empty(0, dtype=np.int64), np.empty(0), threshold, num_perm, bands, rows, 0)
+
+    # Buckets are per (key, band): every pair compared below shares a key
+    codes = np.zeros(count, dtype=np.int64)
+    if keys is not None:
+        _, codes = np.unique(np.asarray(keys), return_inverse=True)
+    pairs = []
+    for band in range(bands):
+        buckets = _band_keys(signatures, band, rows)
+        order = np.lexsort((buckets, codes))
+        buckets, bucket_codes = buckets[order], codes[order]
+        # Each text of a bucket is paired with the bucket's first (smallest) index
+        starts = np.concatenate(([True], (buckets[1:] != buckets[:-1]) | (bucket_codes[1:] != bucket_codes[:-1])))
+        first = order[np.flatnonzero(starts)[np.cumsum(starts) - 1]]
+        paired = first != order
+        pairs.append(first[paired].astype(np.int64) * count + order[paired])
+    pairs = np.unique(np.concatenate(pairs)) if pairs else np.empty(0, dtype=np.int64)
+    first, second = pairs // count, pairs % count
+
+    matched = similarity(signatures, first, second) >= threshold
+    group = _components(count, first[matched], second[matched])
+
+    # Components join pairs transitively: texts below the threshold against the
+    # group's first text are kept rather than removed for a chain of other matches
+    scores = similarity(signatures, group, np.arange(count))
+    too_far = scores < threshold
+    group[too_far] = np.flatnonzero(too_far)
+    scores[too_far] = 1.0
+    return NearDuplicates(group, scores, threshold, num_perm, bands, rows, len(pairs))
+
+
+def dedup_report(duplicates: NearDuplicates, texts: Sequence[str], sources: Optional[Sequence[str]] = None,
+                 examples: int = 20) -> Dict[str, Any]:
+    """Summary of a near_duplicates() result: counts overall and per source, which sources
+    duplicate which, a similarity histogram and the removed texts closest to the threshold"""
+    if sources is None:
+        sources = ['all'] * len(texts)
+    removed = duplicates.removed
+    groups = Counter(duplicates.group[removed].tolist())
+
+    by_source: Dict[str, Dict[str, int]] = {}
+    for source in sources:
+        by_source.setdefault(source, {'total': 0, 'removed': 0})['total'] += 1
+    source_pairs = Counter()
+    for i in removed.tolist():
+        by_source[sources[i]]['removed'] += 1
+        source_pairs[f"{sources[i]} -> {sources[duplicates.group[i]]}"] += 1
+
+    bins = np.linspace(duplicates.threshold, 1, 6)
+    histogram, _ = np.histogram(duplicates.similarity[removed], bins=bins)
+
+    closest = removed[np.argsort(duplicates.similarity[removed], kind='stable')[:examples]]
+    return {
+        'threshold': duplicates.threshold,
+        'num_perm': duplicates.num_perm,
+        'bands': duplicates.bands,
+        'rows': duplicates.rows,
+        'total': len(duplicates),
+        'kept': int(duplicates.keep.sum()),
+        'removed': len(removed),
+        'removed_share': round(len(removed) / len(duplicates), 4) if len(duplicates) else 0.0,
+        'groups': len(groups),
+        'largest_group': max(groups.values()) + 1 if groups else 1,
+        'candidate_pairs': duplicates.candidates,
+        'by_source': by_source,
+        # "removed source -> kept source": counts of removed texts by where their kept copy came from
+        'source_pairs': dict(source_pairs.most_common()),
+        'similarity_histogram': {f"{low:.2f}-{high:.2f}": int(n)
+                                 for low, high, n in zip(bins[:-1], bins[1:], histogram)},
+        'examples': [{
+            'removed': int(i),
+            'kept': int(duplicates.group[i]),
+            'similarity': round(float(duplicates.similarity[i]), 4),
+            'removed_source': sources[i],
+            'kept_source': sources[duplicates.group[i]],
+            'removed_text': texts[i][:200],
+            'kept_text': texts[duplicates.group[i]][:200],
+        } for i in closest.tolist()],
+    }
+
+
+def print_report(report: Dict[str, Any], top: int = 10):
+    print(f"🧹 Near-duplicates (Jaccard >= {report['threshold']}, {report['bands']} bands x {report['rows']} rows): "
+          f"{report['removed']:,} of {report['total']:,} removed ({report['removed_share']:.1%}), "
+          f"{report['groups']:,} groups, largest {report['largest_group']}")
+    for source, counts in report['by_source'].items():
+        if counts['removed']:
+            print(f"   {source:30s}: {counts['removed']:6d} of {counts['total']:6d} removed")
+    for pair, count in list(report['source_pairs'].items())[:top]:
+        print(f"   {pair}: {count}")
+
+
+def main():
+    from dataset_io import iter_records
+
+    parser = argparse.ArgumentParser(description='Find near-duplicate records of a dataset with MinHash and LSH')
+    parser.add_argument('path', type=str, help='JSON, JSON Lines or manifest file with records')
+    parser.add_argument('--field', type=str, default='text', help='Record field with the text (default: text)')
+    parser.add_argument('--threshold', type=float, nargs='+', default=[DEFAULT_THRESHOLD],
+                        help=f'Jaccard thresholds, one report each (default: {DEFAULT_THRESHOLD})')
+    parser.add_argument('--num-perm', type=int, default=NUM_PERM, help=f'Signature length (default: {NUM_PERM})')
+    parser.add_argument('--shingle', type=int, default=SHINGLE, help=f'Characters per shingle (default: {SHINGLE})')
+    parser.add_argument('--source-field', type=str, default='type',
+                        help='Record field reported as the source (default: type)')
+    parser.add_argument('--key-field', type=str,
+                        help='Only group records with the same value of this field (default: any records)')
+    parser.add_argument('--report', type=str, help='Write the reports to this JSON file')
+    args = parser.parse_args()
+
+    path = Path(args.path)
+    if not path.exists():
+        print(f"ERROR: File not found: {path}")
+        sys.exit(1)
+    records = [record for record in iter_records(path) if isinstance(record.get(args.field), str)]
+    texts = [record[args.field] for record in records]
+    sources = [str(record.get(args.source_field, path.stem)) for record in records]
+    keys = [str(record.get(args.key_field)) for record in records] if args.key_field else None
+    print(f"📖 {len(texts)} texts, {sum(map(len, texts)):,} characters")
+
+    start = time.perf_counter()
+    signatures = minhash_signatures(texts, args.num_perm, args.shingle)
+    print(f"   signatures: {time.perf_counter() - start:.2f}s")
+
+    reports = []
+    for threshold in args.threshold:
+        start = time.perf_counter()
+        report = dedup_report(near_duplicates(signatures, threshold, keys=keys), texts, sources)
+        print()
+        print_report(report)
+        print(f"   ({time.perf_counter() - start:.2f}s)")
+        reports.append(report)
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Report saved to: {args.report}")
+
+
+if __name__ == '__main__':
+    # Настройка кодировки для Windows (только при запуске как скрипт)
+    if sys.platform == 'win32':
+        import io
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+        sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+    main()
@@ -2,20 +2,43 @@
 """
 Парсинг внутриигровой энциклопедии Bannerlord
 Извлекает данные из JSON файлов на трех языках (EN, RU, TR)
+
+Записи переводов присоединяются к английским по id через словарь, один
+проход по каждому языку. Каждый тип (heroes, settlements, ...) обрабатывается
+отдельно и сразу пишется в encyclopedia_<тип>.json; encyclopedia_all.json
+собирается из этих файлов копированием, без повторной сериализации.
+--jobs N обрабатывает типы параллельно в N процессах (0 = все ядра).
+
+Usage:
+    python parse_ingame_encyclopedia.py [--jobs N]
 """
 
+import argparse
+import contextlib
+import io
 import json
+import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, Iterator, List, Any, Optional, Tuple
 from collections import defaultdict
 
+from dataset_io import JsonArrayWriter
+from text_dedup import collapse_repeats, strip_markers
+
 # Настройка кодировки для Windows
 if sys.platform == 'win32':
-    import io
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
 
+# Языки энциклопедии (подпапки EN, RU, TR). Первый — основной: записи
+# остальных языков присоединяются к его записям по id
+LANGUAGES = ('en', 'ru', 'tr')
+
+# Подпись имени в тексте для fine-tuning
+NAME_LABELS = {'en': 'Name', 'ru': 'Название', 'tr': 'İsim'}
+
 
 class IngameEncyclopediaParser:
     """Парсер для внутриигровой энциклопедии"""
@@ -38,46 +61,44 @@ class IngameEncyclopediaParser:
             'traits.json'
         ]
         
+        # Исходный текст -> очищенный, заполняется clean_all() для каждого файла
+        self.cleaned_texts: Dict[str, str] = {}
+        
     def clean_text(self, text: str) -> str:
         """Очистка текста от тегов локализации и дублирования"""
         if not text:
             return ''
+        cleaned = self.cleaned_texts.get(text)
+        if cleaned is None:
+            cleaned = self.clean_texts([text])[0]
+        return cleaned
+    
+    def clean_texts(self, texts: List[str]) -> List[str]:
+        """Пакетная очистка: теги локализации типа {=bsOLRZyS} и повторы внутри текста.
         
-        # Удаляем теги локализации типа {=bsOLRZyS}
-        import re
-        text = re.sub(r'\{=[^}]+\}', '', text)
-        
-        # Удаляем дублирование текста (если текст повторяется дважды)
-        # Разделяем пополам и проверяем, не одинаковые ли части
-        text_len = len(text)
-        if text_len > 20:
-            mid = text_len // 2
-            first_half = text[:mid].strip()
-            second_half = text[mid:].strip()
-            
-            # Если части очень похожи (80% совпадения), берем только первую
-            if first_half and second_half:
-                similarity = sum(a == b for a, b in zip(first_half[:min(100, len(first_half))], 
-                                                         second_half[:min(100, len(second_half))])) / min(100, len(first_half), len(second_half))
-                if similarity > 0.8:
-                    return first_half
-        
-        return text.strip()
+        Повторы ищет text_dedup для всех текстов сразу: удаляется целая копия
+        текста, стоящего прямо перед ней ("OmorOmor", текст, вставленный дважды).
+        """
+        return [text.strip() for text in collapse_repeats([strip_markers(text) for text in texts])]
+    
+    def cache_cleaned(self, texts: List[str]):
+        """Очистить одним пакетом тексты, которых ещё нет в кэше clean_text()"""
+        new_texts = list({text for text in texts if text and text not in self.cleaned_texts})
+        cleaned = self.clean_texts(new_texts)
+        self.cleaned_texts.update(zip(new_texts, cleaned))
+    
+    def clean_all(self, *datasets: List[Dict[str, Any]]):
+        """Очистить одним пакетом все тексты записей; clean_text() берёт результат из кэша"""
+        self.cleaned_texts = {}
+        self.cache_cleaned([entry[field] for data in datasets for entry in data for field in ('name', 'title', 'text')
+                            if isinstance(entry.get(field), str)])
     
     def extract_text_from_entry(self, entry: Dict[str, Any], file_type: str) -> Dict[str, Any]:
         """Извлечение текста из записи в зависимости от типа файла"""
-        result = {
-            'id': entry.get('id', ''),
-            'text_en': '',
-            'text_ru': '',
-            'text_tr': '',
-            'title_en': '',
-            'title_ru': '',
-            'title_tr': '',
-            'name_en': '',
-            'name_ru': '',
-            'name_tr': ''
-        }
+        result = {'id': entry.get('id', '')}
+        for field in ('text', 'title', 'name'):
+            for language in LANGUAGES:
+                result[f'{field}_{language}'] = ''
         
         # Извлекаем текст в зависимости от типа
         if file_type in ['heroes', 'npc_characters']:
@@ -160,11 +181,22 @@ class IngameEncyclopediaParser:
     
     def merge_multilang_data(self, en_data: List[Dict], ru_data: List[Dict], tr_data: List[Dict], file_type: str) -> List[Dict]:
         """Объединение данных на трех языках"""
+        return self.merge_languages({'en': en_data, 'ru': ru_data, 'tr': tr_data}, file_type)
+    
+    def merge_languages(self, datasets: Dict[str, List[Dict]], file_type: str) -> List[Dict]:
+        """Объединение данных на всех языках LANGUAGES (datasets: язык -> записи).
+        
+        Индекс по id строится один раз по основному языку, каждый перевод
+        присоединяется к нему за один проход: время растет линейно с числом
+        записей и языков.
+        """
+        self.clean_all(*datasets.values())
+        
         # Создаем индекс по ID
         merged = {}
         
-        # Обрабатываем английские данные
-        for entry in en_data:
+        # Обрабатываем записи основного языка
+        for entry in datasets.get(LANGUAGES[0], []):
             entry_id = entry.get('id', '')
             if not entry_id:
                 continue
@@ -172,216 +204,168 @@ class IngameEncyclopediaParser:
             extracted = self.extract_text_from_entry(entry, file_type)
             merged[entry_id] = extracted
         
-        # Обрабатываем русские данные
-        for entry in ru_data:
-            entry_id = entry.get('id', '')
-            if not entry_id or entry_id not in merged:
-                continue
-            
-            extracted = self.extract_text_from_entry(entry, file_type)
-            
-            # Парсим дублированный текст если есть
-            text_ru = extracted.get('text_ru', '') or extracted.get('text_en', '')
-            if text_ru:
-                text_ru = self.clean_text(text_ru)
-                ru_text, en_text = self.parse_duplicate_text(text_ru)
-                merged[entry_id]['text_ru'] = self.clean_text(ru_text if ru_text else text_ru)
-                if en_text and not merged[entry_id]['text_en']:
-                    merged[entry_id]['text_en'] = self.clean_text(en_text)
-            
-            title_ru = extracted.get('title_ru', '') or extracted.get('title_en', '')
-            if title_ru:
-                ru_title, en_title = self.parse_duplicate_text(title_ru)
-                merged[entry_id]['title_ru'] = ru_title if ru_title else title_ru
-                if en_title and not merged[entry_id]['title_en']:
-                    merged[entry_id]['title_en'] = en_title
-            
-            name_ru = extracted.get('name_ru', '') or extracted.get('name_en', '')
-            if name_ru:
-                ru_name, en_name = self.parse_duplicate_text(name_ru)
-                merged[entry_id]['name_ru'] = ru_name if ru_name else name_ru
-                if en_name and not merged[entry_id]['name_en']:
-                    merged[entry_id]['name_en'] = en_name
-        
-        # Обрабатываем турецкие данные
-        for entry in tr_data:
+        # Присоединяем переводы
+        for language in LANGUAGES[1:]:
+            self.merge_translation(merged, datasets.get(language, []), language, file_type)
+        
+        return list(merged.values())
+    
+    def merge_translation(self, merged: Dict[str, Dict], data: List[Dict], language: str, file_type: str):
+        """Добавить в merged поля одного перевода (ru или tr).
+        
+        Текст перевода может содержать и английский текст, его отделяет
+        parse_duplicate_text(); им заполняются пустые EN поля.
+        """
+        entries = []
+        for entry in data:
             entry_id = entry.get('id', '')
             if not entry_id or entry_id not in merged:
                 continue
             
             extracted = self.extract_text_from_entry(entry, file_type)
-            
-            # Парсим дублированный текст если есть
-            text_tr = extracted.get('text_tr', '') or extracted.get('text_en', '')
-            if text_tr:
-                text_tr = self.clean_text(text_tr)
-                tr_text, en_text = self.parse_duplicate_text(text_tr)
-                merged[entry_id]['text_tr'] = self.clean_text(tr_text if tr_text else text_tr)
-                if en_text and not merged[entry_id]['text_en']:
-                    merged[entry_id]['text_en'] = self.clean_text(en_text)
-            
-            title_tr = extracted.get('title_tr', '') or extracted.get('title_en', '')
-            if title_tr:
-                tr_title, en_title = self.parse_duplicate_text(title_tr)
-                merged[entry_id]['title_tr'] = tr_title if tr_title else title_tr
-                if en_title and not merged[entry_id]['title_en']:
-                    merged[entry_id]['title_en'] = en_title
-            
-            name_tr = extracted.get('name_tr', '') or extracted.get('name_en', '')
-            if name_tr:
-                tr_name, en_name = self.parse_duplicate_text(name_tr)
-                merged[entry_id]['name_tr'] = tr_name if tr_name else name_tr
-                if en_name and not merged[entry_id]['name_en']:
-                    merged[entry_id]['name_en'] = en_name
+            entries.append((merged[entry_id], extracted,
+                            extracted.get(f'text_{language}', '') or extracted.get('text_en', '')))
         
-        return list(merged.values())
+        # Уже очищенные тексты очищаются повторно, тоже одним пакетом
+        self.cache_cleaned([text for *_, text in entries])
+        translations = []
+        for target, extracted, text in entries:
+            text = self.clean_text(text)
+            translations.append((target, extracted, text, self.parse_duplicate_text(text)))
+        
+        # Части дублированных текстов и тексты без них очищаются одним пакетом
+        self.cache_cleaned([part for *_, parts in translations for part in parts] +
+                           [text for _, _, text, (own_text, _) in translations if not own_text])
+        
+        for target, extracted, text, (own_text, en_text) in translations:
+            if text:
+                target[f'text_{language}'] = self.clean_text(own_text if own_text else text)
+                if en_text and not target['text_en']:
+                    target['text_en'] = self.clean_text(en_text)
+            
+            for field in ('title', 'name'):
+                value = extracted.get(f'{field}_{language}', '') or extracted.get(f'{field}_en', '')
+                if value:
+                    own_value, en_value = self.parse_duplicate_text(value)
+                    target[f'{field}_{language}'] = own_value if own_value else value
+                    if en_value and not target[f'{field}_en']:
+                        target[f'{field}_en'] = en_value
     
     def create_finetuning_format(self, data: List[Dict], file_type: str) -> List[Dict]:
         """Создание формата для fine-tuning"""
-        finetuning_data = []
-        
+        return list(self.iter_finetuning_format(data, file_type))
+    
+    def iter_finetuning_format(self, data: List[Dict], file_type: str) -> Iterator[Dict]:
+        """Записи для fine-tuning по одной: для каждой записи по одной на язык, если есть текст"""
         for entry in data:
-            # Формируем полный текст
-            text_parts = []
-            
-            # Добавляем название/заголовок
-            if entry.get('name_en') or entry.get('title_en'):
-                name = entry.get('name_en') or entry.get('title_en', '')
+            for language in LANGUAGES:
+                # Формируем полный текст: название/заголовок и основной текст
+                text_parts = []
+                name = entry.get(f'name_{language}') or entry.get(f'title_{language}', '')
                 if name:
-                    text_parts.append(f"Name: {name}")
-            
-            # Добавляем основной текст
-            if entry.get('text_en'):
-                text_parts.append(entry['text_en'])
-            
-            full_text_en = '\n\n'.join(text_parts) if text_parts else ''
-            
-            # Русская версия
-            text_parts_ru = []
-            if entry.get('name_ru') or entry.get('title_ru'):
-                name_ru = entry.get('name_ru') or entry.get('title_ru', '')
-                if name_ru:
-                    text_parts_ru.append(f"Название: {name_ru}")
-            if entry.get('text_ru'):
-                text_parts_ru.append(entry['text_ru'])
-            full_text_ru = '\n\n'.join(text_parts_ru) if text_parts_ru else ''
-            
-            # Турецкая версия
-            text_parts_tr = []
-            if entry.get('name_tr') or entry.get('title_tr'):
-                name_tr = entry.get('name_tr') or entry.get('title_tr', '')
-                if name_tr:
-                    text_parts_tr.append(f"İsim: {name_tr}")
-            if entry.get('text_tr'):
-                text_parts_tr.append(entry['text_tr'])
-            full_text_tr = '\n\n'.join(text_parts_tr) if text_parts_tr else ''
-            
-            # Создаем записи для каждого языка, если есть текст
-            if full_text_en:
-                finetuning_data.append({
-                    'id': f"{entry['id']}_en",
-                    'type': file_type,
-                    'source': 'ingame_encyclopedia',
-                    'language': 'en',
-                    'text': full_text_en
-                })
-            
-            if full_text_ru:
-                finetuning_data.append({
-                    'id': f"{entry['id']}_ru",
-                    'type': file_type,
-                    'source': 'ingame_encyclopedia',
-                    'language': 'ru',
-                    'text': full_text_ru
-                })
-            
-            if full_text_tr:
-                finetuning_data.append({
-                    'id': f"{entry['id']}_tr",
-                    'type': file_type,
-                    'source': 'ingame_encyclopedia',
-                    'language': 'tr',
-                    'text': full_text_tr
-                })
-        
-        return finetuning_data
+                    text_parts.append(f"{NAME_LABELS[language]}: {name}")
+                if entry.get(f'text_{language}'):
+                    text_parts.append(entry[f'text_{language}'])
+                
+                if text_parts:
+                    yield {
+                        'id': f"{entry['id']}_{language}",
+                        'type': file_type,
+                        'source': 'ingame_encyclopedia',
+                        'language': language,
+                        'text': '\n\n'.join(text_parts)
+                    }
     
-    def parse_all(self):
-        """Парсинг всех файлов"""
+    def parse_type(self, file_name: str) -> Dict[str, int]:
+        """Загрузка, объединение и запись одного типа в encyclopedia_<тип>.json.
+        
+        Возвращает число записей по языкам, 'total_text' и 'entries' (0 — файл не записан).
+        """
+        file_type = file_name.replace('.json', '')
+        print(f"\n📖 Processing {file_type}...")
+        
+        # Загружаем файлы на всех языках
+        datasets = {}
+        for language in LANGUAGES:
+            datasets[language] = self.load_file(self.input_dir / language.upper() / file_name)
+            print(f"   {language.upper()}: {len(datasets[language])} entries")
+        
+        # Объединяем данные
+        merged_data = self.merge_languages(datasets, file_type)
+        del datasets
+        
+        # Записи для fine-tuning пишутся в файл по мере создания
+        type_stats = {language: 0 for language in LANGUAGES}
+        type_stats['total_text'] = 0
+        output_file = self.output_dir / f'encyclopedia_{file_type}.json'
+        with JsonArrayWriter(output_file) as writer:
+            for record in self.iter_finetuning_format(merged_data, file_type):
+                writer.write(record)
+                type_stats[record['language']] += 1
+                type_stats['total_text'] += len(record['text'])
+        type_stats['entries'] = writer.count
+        
+        if writer.count:
+            counts = ', '.join(f"{type_stats[language]} {language.upper()}" for language in LANGUAGES)
+            print(f"   ✅ Saved {writer.count} entries ({counts})")
+            print(f"   📊 Text: {round(type_stats['total_text']/1024, 2)} KB")
+        else:
+            output_file.unlink()
+        
+        return type_stats
+    
+    def run_types(self, jobs: int = 1) -> Iterator[Tuple[str, Dict[str, int], str]]:
+        """Обработать все типы и вернуть (тип, статистика, лог) в порядке files_to_process.
+        
+        При jobs > 1 типы обрабатываются параллельно в процессах; файлы те же.
+        """
+        if jobs > 1:
+            with ProcessPoolExecutor(max_workers=min(jobs, len(self.files_to_process)),
+                                     initializer=_init_parse_worker,
+                                     initargs=(str(self.input_dir), str(self.output_dir))) as pool:
+                for file_name, result in zip(self.files_to_process,
+                                             pool.map(_run_parse_task, self.files_to_process)):
+                    yield (file_name.replace('.json', ''),) + result
+            return
+        
+        for file_name in self.files_to_process:
+            yield (file_name.replace('.json', ''),) + _execute_parse(self, file_name)
+    
+    def parse_all(self, jobs: int = 1) -> Dict[str, Dict[str, int]]:
+        """Парсинг всех файлов
+        
+        jobs: Число процессов (1 = всё в этом процессе)
+        Возвращает статистику по типам; записи остаются только в файлах.
+        """
         print("=" * 80)
         print("PARSING INGAME ENCYCLOPEDIA")
         print("=" * 80)
         
-        all_finetuning_data = []
-        stats = defaultdict(lambda: {'en': 0, 'ru': 0, 'tr': 0, 'total_text': 0})
+        stats = defaultdict(lambda: {**{language: 0 for language in LANGUAGES}, 'total_text': 0})
         
-        for file_name in self.files_to_process:
-            file_type = file_name.replace('.json', '')
-            print(f"\n📖 Processing {file_type}...")
-            
-            # Загружаем файлы на всех языках
-            en_file = self.input_dir / 'EN' / file_name
-            ru_file = self.input_dir / 'RU' / file_name
-            tr_file = self.input_dir / 'TR' / file_name
-            
-            en_data = self.load_file(en_file)
-            ru_data = self.load_file(ru_file)
-            tr_data = self.load_file(tr_file)
-            
-            print(f"   EN: {len(en_data)} entries")
-            print(f"   RU: {len(ru_data)} entries")
-            print(f"   TR: {len(tr_data)} entries")
-            
-            # Объединяем данные
-            merged_data = self.merge_multilang_data(en_data, ru_data, tr_data, file_type)
-            
-            # Создаем формат для fine-tuning
-            finetuning_data = self.create_finetuning_format(merged_data, file_type)
-            
-            # Сохраняем отдельный файл для этого типа
-            if finetuning_data:
-                output_file = self.output_dir / f'encyclopedia_{file_type}.json'
-                with open(output_file, 'w', encoding='utf-8') as f:
-                    json.dump(finetuning_data, f, ensure_ascii=False, indent=2)
-                
-                # Статистика
-                en_count = sum(1 for e in finetuning_data if e['language'] == 'en')
-                ru_count = sum(1 for e in finetuning_data if e['language'] == 'ru')
-                tr_count = sum(1 for e in finetuning_data if e['language'] == 'tr')
-                total_text = sum(len(e['text']) for e in finetuning_data)
-                
-                stats[file_type] = {
-                    'en': en_count,
-                    'ru': ru_count,
-                    'tr': tr_count,
-                    'total_text': total_text
-                }
-                
-                print(f"   ✅ Saved {len(finetuning_data)} entries ({en_count} EN, {ru_count} RU, {tr_count} TR)")
-                print(f"   📊 Text: {round(total_text/1024, 2)} KB")
-            
-            all_finetuning_data.extend(finetuning_data)
+        # Объединенный файл собирается из файлов типов по мере их готовности
+        combined_file = self.output_dir / 'encyclopedia_all.json'
+        with JsonArrayWriter(combined_file) as combined:
+            for file_type, type_stats, log in self.run_types(jobs):
+                print(log, end='')
+                if type_stats.pop('entries'):
+                    stats[file_type] = type_stats
+                    combined.append_file(self.output_dir / f'encyclopedia_{file_type}.json',
+                                         sum(type_stats[language] for language in LANGUAGES))
         
-        # Сохраняем объединенный файл
-        if all_finetuning_data:
-            combined_file = self.output_dir / 'encyclopedia_all.json'
-            with open(combined_file, 'w', encoding='utf-8') as f:
-                json.dump(all_finetuning_data, f, ensure_ascii=False, indent=2)
-            
+        if not combined.count:
+            combined_file.unlink()
+        else:
             print("\n" + "=" * 80)
             print("✅ PARSING COMPLETED!")
             print("=" * 80)
             
-            total_en = sum(s['en'] for s in stats.values())
-            total_ru = sum(s['ru'] for s in stats.values())
-            total_tr = sum(s['tr'] for s in stats.values())
             total_text = sum(s['total_text'] for s in stats.values())
             
             print(f"\n📊 TOTAL STATISTICS:")
-            print(f"   EN entries: {total_en}")
-            print(f"   RU entries: {total_ru}")
-            print(f"   TR entries: {total_tr}")
-            print(f"   Total entries: {total_en + total_ru + total_tr}")
+            for language in LANGUAGES:
+                print(f"   {language.upper()} entries: {sum(s[language] for s in stats.values())}")
+            print(f"   Total entries: {combined.count}")
             print(f"   Total text: {round(total_text/1024, 2)} KB ({total_text:,} characters)")
             
             print(f"\n📁 Files saved:")
@@ -389,11 +373,38 @@ class IngameEncyclopediaParser:
             for file_type in stats.keys():
                 print(f"   - encyclopedia_{file_type}.json")
         
-        return all_finetuning_data
+        return dict(stats)
+
+
+_worker_parser: Optional[IngameEncyclopediaParser] = None
+
+
+def _init_parse_worker(input_dir: str, output_dir: str):
+    """Инициализация процесса пула"""
+    global _worker_parser
+    _worker_parser = IngameEncyclopediaParser(Path(input_dir), Path(output_dir))
+
+
+def _run_parse_task(file_name: str):
+    """Обработать один тип в процессе пула"""
+    return _execute_parse(_worker_parser, file_name)
+
+
+def _execute_parse(parser: IngameEncyclopediaParser, file_name: str):
+    """Обработать тип и вернуть его статистику и лог"""
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        type_stats = parser.parse_type(file_name)
+    return type_stats, log.getvalue()
 
 
 def main():
     """Main entry point"""
+    arg_parser = argparse.ArgumentParser(description='Parse the in-game encyclopedia for fine-tuning')
+    arg_parser.add_argument('--jobs', type=int, default=1,
+                            help='Parse file types in N worker processes (0 = all CPU cores, default: 1)')
+    args = arg_parser.parse_args()
+    
     project_root = Path(__file__).parent.parent
     input_dir = project_root / 'wiki_data' / 'Ingame Encyclopedia'
     output_dir = project_root / 'finetuning_data'
@@ -403,7 +414,7 @@ def main():
         return
     
     parser = IngameEncyclopediaParser(input_dir, output_dir)
-    parser.parse_all()
+    parser.parse_all(jobs=args.jobs if args.jobs > 0 else (os.cpu_count() or 1))
 
 
 if __name__ == '__main__':
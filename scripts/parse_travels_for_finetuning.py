@@ -4,12 +4,12 @@
 Извлекает все главы и преобразует в формат для тюнинга
 """
 
-import re
 import json
 import sys
 from pathlib import Path
-from typing import Dict, List, Any, Optional
-from collections import defaultdict
+from typing import Dict, List, Any
+
+from travels_scanner import read_chapters
 
 # Настройка кодировки для Windows
 if sys.platform == 'win32':
@@ -27,77 +27,11 @@ class TravelsParser:
         self.output_dir.mkdir(parents=True, exist_ok=True)
         
     def parse_file(self) -> Dict[int, Dict[str, Any]]:
-        """Парсинг файла и извлечение глав"""
+        """Парсинг файла и извлечение глав (один проход по файлу, см. travels_scanner)"""
         print(f"📖 Reading file: {self.input_file}")
         
-        with open(self.input_file, 'r', encoding='utf-8', errors='ignore') as f:
-            lines = f.readlines()
-        
-        chapters: Dict[int, Dict[str, Any]] = defaultdict(lambda: {
-            'chapter': 0,
-            'title': None,
-            'pages': {}
-        })
-        
-        # Паттерны для поиска
-        start_pattern = r'<string\s+id="travels_in_calradia_chapter_(\d+)_(?:page_(\d+)|title)"\s+text="'
-        end_pattern = r'"\s*/>'
-        
-        i = 0
-        found_count = 0
-        
-        while i < len(lines):
-            line = lines[i]
-            
-            # Ищем начало строки
-            start_match = re.search(start_pattern, line, re.IGNORECASE)
-            if start_match:
-                chapter_num = int(start_match.group(1))
-                page_num = start_match.group(2)
-                
-                chapters[chapter_num]['chapter'] = chapter_num
-                
-                # Извлекаем текст после text="
-                text_start = start_match.end()
-                
-                # Проверяем, есть ли закрывающая кавычка в этой же строке
-                if '" />' in line[text_start:]:
-                    # Текст в одной строке
-                    text_end = line.find('" />', text_start)
-                    text = line[text_start:text_end]
-                else:
-                    # Текст разбит на несколько строк - собираем до закрывающей кавычки
-                    text_parts = [line[text_start:].rstrip()]
-                    i += 1
-                    
-                    while i < len(lines):
-                        next_line = lines[i]
-                        if '" />' in next_line:
-                            # Нашли конец
-                            text_end = next_line.find('" />')
-                            text_parts.append(next_line[:text_end])
-                            break
-                        else:
-                            text_parts.append(next_line.rstrip())
-                        i += 1
-                    
-                    text = ''.join(text_parts)
-                
-                # Очищаем текст от экранированных символов и заменяем {newline} на переносы строк
-                text = text.replace('\\"', '"').replace('\\n', '\n').replace('\\t', '\t')
-                text = text.replace('{newline}', '\n')
-                
-                found_count += 1
-                
-                if page_num is None:
-                    # Это заголовок главы
-                    chapters[chapter_num]['title'] = text
-                else:
-                    # Это страница
-                    page_num_int = int(page_num)
-                    chapters[chapter_num]['pages'][page_num_int] = text
-            
-            i += 1
+        # Строки могут быть перенесены: переносы строк внутри текста склеиваются
+        chapters, found_count = read_chapters(self.input_file, join_lines=True)
         
         print(f"✅ Found {found_count} matches for {len(chapters)} chapters")
         
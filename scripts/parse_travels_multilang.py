@@ -1,16 +1,16 @@
 #!/usr/bin/env python3
 """
 Парсинг Travels in Calradia на разных языках и описаний фракций
-Обрабатывает файлы в разных форматах (XML, string tags)
+Обрабатывает файлы в разных форматах (XML, string tags): все форматы
+читает один сканер travels_scanner, один проход по каждому файлу
 """
 
-import re
 import json
 import sys
-import xml.etree.ElementTree as ET
 from pathlib import Path
-from typing import Dict, List, Any, Optional
-from collections import defaultdict
+from typing import Dict, List, Any
+
+from travels_scanner import read_chapters, scan_strings
 
 # Настройка кодировки для Windows
 if sys.platform == 'win32':
@@ -18,6 +18,18 @@ if sys.platform == 'win32':
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
 
+# Файл каждого языка, нужно ли склеивать перенесенные строки текста и какие
+# экранирования раскрывать в string tags (1.txt — string tags с переносами и \\",
+# 2.txt — string tags с &quot;, 3.txt — XML книги, там всегда &quot;)
+TRAVELS_FILES = {
+    'ru': ('1.txt', True, '\\{'),
+    'en': ('3.txt', False, ''),
+    'tr': ('2.txt', False, '&{'),
+}
+
+# id описаний фракций в 4.txt
+FACTION_DESCRIPTION_IDS = rb'calradia_map_description_\w+|concept_arts_description_\w+'
+
 
 class MultilangTravelsParser:
     """Парсер для Travels in Calradia на разных языках"""
@@ -27,203 +39,32 @@ class MultilangTravelsParser:
         self.output_dir = output_dir
         self.output_dir.mkdir(parents=True, exist_ok=True)
         
-    def parse_russian_file(self, file_path: Path) -> Dict[int, Dict[str, Any]]:
-        """Парсинг русского файла (1.txt) - формат string tags"""
-        print(f"📖 Parsing Russian file: {file_path.name}")
-        
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            lines = f.readlines()
-        
-        chapters: Dict[int, Dict[str, Any]] = defaultdict(lambda: {
-            'chapter': 0,
-            'title': None,
-            'pages': {}
-        })
-        
-        start_pattern = r'<string\s+id="travels_in_calradia_chapter_(\d+)_(?:page_(\d+)|title)"\s+text="'
-        end_pattern = r'"\s*/>'
-        
-        i = 0
-        found_count = 0
-        
-        while i < len(lines):
-            line = lines[i]
-            start_match = re.search(start_pattern, line, re.IGNORECASE)
-            if start_match:
-                chapter_num = int(start_match.group(1))
-                page_num = start_match.group(2)
-                
-                chapters[chapter_num]['chapter'] = chapter_num
-                text_start = start_match.end()
-                
-                if '" />' in line[text_start:]:
-                    text_end = line.find('" />', text_start)
-                    text = line[text_start:text_end]
-                else:
-                    text_parts = [line[text_start:].rstrip()]
-                    i += 1
-                    while i < len(lines):
-                        next_line = lines[i]
-                        if '" />' in next_line:
-                            text_end = next_line.find('" />')
-                            text_parts.append(next_line[:text_end])
-                            break
-                        else:
-                            text_parts.append(next_line.rstrip())
-                        i += 1
-                    text = ''.join(text_parts)
-                
-                text = text.replace('\\"', '"').replace('\\n', '\n').replace('\\t', '\t')
-                text = text.replace('{newline}', '\n')
-                
-                found_count += 1
-                
-                if page_num is None:
-                    chapters[chapter_num]['title'] = text
-                else:
-                    page_num_int = int(page_num)
-                    chapters[chapter_num]['pages'][page_num_int] = text
-            
-            i += 1
-        
-        print(f"   ✅ Found {found_count} matches for {len(chapters)} chapters")
-        return dict(sorted(chapters.items()))
-    
-    def parse_english_xml(self, file_path: Path) -> Dict[int, Dict[str, Any]]:
-        """Парсинг английского файла (3.txt) - формат XML"""
-        print(f"📖 Parsing English XML file: {file_path.name}")
-        
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-        
-        # Используем regex для парсинга, так как XML может быть невалидным
-        return self.parse_english_regex(content)
-    
-    def parse_english_regex(self, content: str) -> Dict[int, Dict[str, Any]]:
-        """Парсинг английского файла через regex"""
-        chapters: Dict[int, Dict[str, Any]] = defaultdict(lambda: {
-            'chapter': 0,
-            'title': None,
-            'pages': {}
-        })
-        
-        # Ищем Chapter теги (многострочный режим)
-        chapter_pattern = r'<Chapter\s+Index="(\d+)"\s+Title="([^"]*)"[^>]*>'
-        
-        # Находим все главы
-        chapter_matches = list(re.finditer(chapter_pattern, content, re.MULTILINE))
-        found_count = 0
-        
-        for i, chapter_match in enumerate(chapter_matches):
-            chapter_num = int(chapter_match.group(1))
-            title = chapter_match.group(2)
-            
-            chapters[chapter_num]['chapter'] = chapter_num
-            chapters[chapter_num]['title'] = title if title else None
-            
-            # Определяем границы главы
-            chapter_start = chapter_match.end()
-            if i + 1 < len(chapter_matches):
-                chapter_end = chapter_matches[i + 1].start()
-            else:
-                chapter_end = content.find('</Book>', chapter_start)
-                if chapter_end == -1:
-                    chapter_end = len(content)
-            
-            chapter_content = content[chapter_start:chapter_end]
-            
-            # Ищем страницы в этой главе (многострочный паттерн)
-            # Формат: <Page Index="0" ... Text="...текст..." />
-            page_pattern = r'<Page\s+Index="(\d+)"[^>]*Text="([^"]*)"\s*/>'
-            
-            for page_match in re.finditer(page_pattern, chapter_content, re.DOTALL):
-                page_num = int(page_match.group(1))
-                text = page_match.group(2).strip()
-                # Очищаем от экранированных символов
-                text = text.replace('&quot;', '"').replace('&lt;', '<').replace('&gt;', '>')
-                chapters[chapter_num]['pages'][page_num] = text
-                found_count += 1
-        
-        print(f"   ✅ Found {found_count} pages for {len(chapters)} chapters")
-        return dict(sorted(chapters.items()))
-    
-    def parse_turkish_xml(self, file_path: Path) -> Dict[int, Dict[str, Any]]:
-        """Парсинг турецкого файла (2.txt) - формат XML"""
-        print(f"📖 Parsing Turkish XML file: {file_path.name}")
-        
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
+    def parse_travels_file(self, file_path: Path, language: str) -> Dict[int, Dict[str, Any]]:
+        """Парсинг главы/страниц из файла любого формата (string tags или XML) за один проход"""
+        print(f"📖 Parsing {language.upper()} file: {file_path.name}")
         
-        chapters: Dict[int, Dict[str, Any]] = defaultdict(lambda: {
-            'chapter': 0,
-            'title': None,
-            'pages': {}
-        })
-        
-        # Парсим string теги
-        pattern = r'<string\s+id="travels_in_calradia_chapter_(\d+)_(?:page_(\d+)|title)"\s+text="([^"]*)"\s*/>'
-        
-        matches = re.finditer(pattern, content, re.IGNORECASE)
-        found_count = 0
-        
-        for match in matches:
-            found_count += 1
-            chapter_num = int(match.group(1))
-            page_num = match.group(2)
-            text = match.group(3)
-            
-            chapters[chapter_num]['chapter'] = chapter_num
-            
-            # Декодируем HTML entities
-            text = text.replace('&quot;', '"').replace('&lt;', '<').replace('&gt;', '>')
-            text = text.replace('{newline}', '\n')
-            
-            if page_num is None:
-                chapters[chapter_num]['title'] = text
-            else:
-                page_num_int = int(page_num)
-                chapters[chapter_num]['pages'][page_num_int] = text
+        _, join_lines, string_escapes = TRAVELS_FILES[language]
+        chapters, found_count = read_chapters(file_path, join_lines, string_escapes)
         
         print(f"   ✅ Found {found_count} matches for {len(chapters)} chapters")
-        return dict(sorted(chapters.items()))
+        return chapters
     
     def parse_faction_descriptions(self, file_path: Path) -> Dict[str, str]:
         """Парсинг описаний фракций из 4.txt"""
         print(f"📖 Parsing faction descriptions: {file_path.name}")
         
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-        
-        descriptions = {}
-        
-        # Паттерн для описаний фракций
-        pattern = r'<string\s+id="calradia_map_description_(\w+)"\s+text="([^"]*)"\s*/>'
-        
-        matches = re.finditer(pattern, content, re.IGNORECASE)
-        found_count = 0
-        
-        for match in matches:
-            faction_id = match.group(1)
-            text = match.group(2)
-            
-            # Декодируем
-            text = text.replace('{newline}', '\n')
-            descriptions[faction_id] = text
-            found_count += 1
-        
-        # Также ищем concept_arts_description
-        pattern2 = r'<string\s+id="concept_arts_description_(\w+)"\s+text="([^"]*)"\s*/>'
-        matches2 = re.finditer(pattern2, content, re.IGNORECASE)
-        
-        for match in matches2:
-            faction_id = match.group(1)
-            text = match.group(2)
-            text = text.replace('{newline}', '\n')
-            key = f"concept_arts_{faction_id}"
-            descriptions[key] = text
-            found_count += 1
+        # Один проход по файлу для обоих видов описаний; concept_arts идут после карты
+        map_descriptions = {}
+        concept_arts = {}
+        # В описаниях раскрывается только {newline}
+        for string_id, text in scan_strings(file_path, FACTION_DESCRIPTION_IDS, escapes='{'):
+            if string_id.lower().startswith('calradia_map_description_'):
+                map_descriptions[string_id[len('calradia_map_description_'):]] = text
+            else:
+                concept_arts[f"concept_arts_{string_id[len('concept_arts_description_'):]}"] = text
         
-        print(f"   ✅ Found {found_count} descriptions")
+        descriptions = {**map_descriptions, **concept_arts}
+        print(f"   ✅ Found {len(descriptions)} descriptions")
         return descriptions
     
     def normalize_chapters(self, chapters: Dict[int, Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
@@ -284,23 +125,11 @@ class MultilangTravelsParser:
             'faction_descriptions': {}
         }
         
-        # Русский (1.txt)
-        ru_file = self.input_dir / '1.txt'
-        if ru_file.exists():
-            all_data['ru'] = self.parse_russian_file(ru_file)
-            all_data['ru'] = self.normalize_chapters(all_data['ru'])
-        
-        # Английский (3.txt)
-        en_file = self.input_dir / '3.txt'
-        if en_file.exists():
-            all_data['en'] = self.parse_english_xml(en_file)
-            all_data['en'] = self.normalize_chapters(all_data['en'])
-        
-        # Турецкий (2.txt)
-        tr_file = self.input_dir / '2.txt'
-        if tr_file.exists():
-            all_data['tr'] = self.parse_turkish_xml(tr_file)
-            all_data['tr'] = self.normalize_chapters(all_data['tr'])
+        # Русский (1.txt), английский (3.txt), турецкий (2.txt)
+        for lang, (file_name, _, _) in TRAVELS_FILES.items():
+            travels_file = self.input_dir / file_name
+            if travels_file.exists():
+                all_data[lang] = self.normalize_chapters(self.parse_travels_file(travels_file, lang))
         
         # Описания фракций (4.txt)
         factions_file = self.input_dir / '4.txt'
@@ -2,12 +2,29 @@
 """
 Подготовка датасета для fine-tuning в формате unsloth (Alpaca format)
 Формат: instruction, input, output
+
+Usage:
+    python prepare_unsloth_dataset.py [--en-only | --ru-only | --test] [--shard-size MB]
+                                      [--dedup-threshold 0.8 | --no-dedup]
+
+--shard-size пишет датасет шардами (unsloth_training_dataset-00000.jsonl, ...)
+с манифестом unsloth_training_dataset.manifest.json вместо одного JSON-файла.
+
+Почти одинаковые примеры об одной сущности из разных источников (одно описание
+в encyclopedia_all и в factions/settlements) удаляются: MinHash + LSH по тексту
+ответа (minhash_dedup.py), остается первый пример группы. Сравниваются только
+примеры с одним id в input — описания разных персонажей по одному шаблону
+сохраняются. Порог — оценка сходства Жаккара (по умолчанию 0.8); отчет пишется
+в unsloth_training_dataset.dedup_report.json.
 """
 
 import json
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 
+from dataset_io import ShardedDatasetWriter, find_dataset, iter_records, remove_dataset
+from minhash_dedup import DEFAULT_THRESHOLD, dedup_report, minhash_signatures, near_duplicates, print_report
+
 def create_alpaca_format(entry: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     """Создание формата Alpaca для unsloth"""
     
@@ -124,13 +141,42 @@ def create_alpaca_format(entry: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         "output": text
     }
 
-def prepare_dataset(input_dir: Path, output_file: Path, languages: List[str] = None, max_entries: int = None):
-    """Подготовка датасета из всех JSON файлов"""
+def entity_key(entry: Dict[str, Any]) -> str:
+    """Сущность примера: id из input без префикса типа ("Character: lord_1_1" -> "lord_1_1")"""
+    return entry['input'].split(':', 1)[-1].strip().lower()
+
+
+def deduplicate(all_data: List[Dict[str, Any]], sources: List[str], threshold: float,
+                report_file: Path) -> List[Dict[str, Any]]:
+    """Удаление почти одинаковых примеров об одной сущности (по output), отчет в report_file"""
+    print("\nRemoving near-duplicates...")
+    texts = [entry['output'] for entry in all_data]
+    duplicates = near_duplicates(minhash_signatures(texts), threshold,
+                                 keys=[entity_key(entry) for entry in all_data])
+    report = dedup_report(duplicates, texts, sources)
+    print_report(report)
+    
+    with open(report_file, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"   Report saved to: {report_file}")
+    
+    return [entry for entry, keep in zip(all_data, duplicates.keep) if keep]
+
+def prepare_dataset(input_dir: Path, output_file: Path, languages: List[str] = None, max_entries: int = None,
+                    shard_bytes: int = None, dedup_threshold: Optional[float] = DEFAULT_THRESHOLD):
+    """Подготовка датасета из всех JSON файлов
+    
+    Экспорт из export_finetuning_data.py читается и в виде JSON Lines или шардов
+    с манифестом (--format jsonl), если JSON-файла нет.
+    shard_bytes: писать результат шардами с манифестом (dataset_io.ShardedDatasetWriter)
+    dedup_threshold: порог сходства для удаления почти одинаковых примеров (None — не удалять)
+    """
     
     if languages is None:
         languages = ['en', 'ru', 'tr']
     
     all_data = []
+    sources = []  # Файл-источник каждого примера (для отчета о дубликатах)
     
     # Файлы для обработки
     files_to_process = [
@@ -151,28 +197,32 @@ def prepare_dataset(input_dir: Path, output_file: Path, languages: List[str] = N
     print("=" * 80)
     
     for file_name in files_to_process:
-        file_path = input_dir / file_name
-        if not file_path.exists():
+        file_path = find_dataset(input_dir, Path(file_name).stem)
+        if file_path is None:
             print(f"WARNING: Skipping {file_name} (not found)")
             continue
         
-        print(f"\nProcessing {file_name}...")
+        print(f"\nProcessing {file_path.name}...")
         
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-        except Exception as e:
-            print(f"   ERROR: Error loading {file_name}: {e}")
-            continue
-        
-        if isinstance(data, list):
-            entries = data
-        elif isinstance(data, dict):
-            # Для словарей (например, faction_descriptions_ru.json)
-            entries = [{"id": k, "text": v, "type": "faction_description", "language": "ru"} 
-                        for k, v in data.items()]
+        if file_path.name != file_name:
+            # JSON Lines или шарды: записи читаются по одной
+            entries = iter_records(file_path)
         else:
-            continue
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except Exception as e:
+                print(f"   ERROR: Error loading {file_name}: {e}")
+                continue
+            
+            if isinstance(data, list):
+                entries = data
+            elif isinstance(data, dict):
+                # Для словарей (например, faction_descriptions_ru.json)
+                entries = [{"id": k, "text": v, "type": "faction_description", "language": "ru"} 
+                            for k, v in data.items()]
+            else:
+                continue
         
         count = 0
         skipped = 0
@@ -261,18 +311,34 @@ def prepare_dataset(input_dir: Path, output_file: Path, languages: List[str] = N
                 break
         
         print(f"   OK: Added {count} entries, skipped {skipped}")
+        sources.extend([Path(file_name).stem] * (len(all_data) - len(sources)))
         
         if max_entries and len(all_data) >= max_entries:
             print(f"   WARNING: Reached max_entries limit ({max_entries})")
             break
     
+    if dedup_threshold and all_data:
+        all_data = deduplicate(all_data, sources, dedup_threshold,
+                               output_file.with_name(f"{output_file.stem}.dedup_report.json"))
+    
     # Сохраняем датасет
     print(f"\nSaving dataset...")
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(all_data, f, ensure_ascii=False, indent=2)
+    if shard_bytes:
+        with ShardedDatasetWriter(output_file.parent, output_file.stem, shard_bytes,
+                                  metadata={'languages': languages, 'format': 'alpaca',
+                                            'dedup_threshold': dedup_threshold}) as writer:
+            for entry in all_data:
+                writer.write(entry)
+        saved_to = f"{writer.path} ({len(writer.shards)} shards)"
+    else:
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(all_data, f, ensure_ascii=False, indent=2)
+        # Манифест и шарды прошлого запуска с --shard-size иначе нашлись бы раньше этого файла
+        remove_dataset(output_file.parent, output_file.stem, keep=output_file)
+        saved_to = output_file
     
     print(f"\nSUCCESS: Dataset prepared: {len(all_data)} entries")
-    print(f"Saved to: {output_file}")
+    print(f"Saved to: {saved_to}")
     
     # Статистика по языкам
     lang_stats = {}
@@ -315,5 +381,18 @@ if __name__ == '__main__':
         elif '--test' in sys.argv:
             max_entries = 1000  # Для быстрого тестирования
     
-    prepare_dataset(input_dir, output_file, languages=languages, max_entries=max_entries)
+    # Шарды по N МБ с манифестом вместо одного JSON
+    shard_bytes = None
+    if '--shard-size' in sys.argv:
+        shard_bytes = int(sys.argv[sys.argv.index('--shard-size') + 1]) * 1024 * 1024
+    
+    # Порог сходства Жаккара для удаления почти одинаковых примеров
+    dedup_threshold = DEFAULT_THRESHOLD
+    if '--dedup-threshold' in sys.argv:
+        dedup_threshold = float(sys.argv[sys.argv.index('--dedup-threshold') + 1])
+    if '--no-dedup' in sys.argv:
+        dedup_threshold = None
+    
+    prepare_dataset(input_dir, output_file, languages=languages, max_entries=max_entries, shard_bytes=shard_bytes,
+                    dedup_threshold=dedup_threshold)
 
@@ -1,11 +1,21 @@
 #!/usr/bin/env python3
-"""Prepare and publish Bannerlord Lore dataset to HuggingFace"""
+"""Prepare and publish Bannerlord Lore dataset to HuggingFace
 
+Usage:
+    python publish_dataset.py                   # one bannerlord_lore.json
+    python publish_dataset.py --shard-size 64   # data/<category>-NNNNN.jsonl shards + manifests
+"""
+
+import argparse
 import json
 import os
+import shutil
 from pathlib import Path
 from huggingface_hub import HfApi, login, create_repo
 
+from dataset_io import (JsonArrayWriter, ShardedDataset, ShardedDatasetWriter, find_dataset, iter_records,
+                        remove_dataset)
+
 # Configuration
 DATASET_NAME = "bannerlord-lore-dataset"
 HF_TOKEN = os.environ.get("HF_TOKEN") or input("Enter HuggingFace token: ")
@@ -109,8 +119,58 @@ def collect_all_data():
     
     return dataset
 
-def create_readme():
-    """Create dataset README"""
+def category_records(data):
+    """Category data as a list of records for sharding"""
+    if isinstance(data, dict):
+        # e.g. faction_descriptions_ru: {faction: text}
+        return [{"id": key, "text": value} for key, value in data.items()]
+    return data
+
+
+def write_sharded(dataset, data_dir, shard_bytes):
+    """Write every category as JSON Lines shards with a manifest; returns the non-empty category names"""
+    categories = {}
+    for category, data in dataset["categories"].items():
+        if category == "novellas":
+            for lang, chapters in data.items():
+                categories[f"novellas_{lang}"] = chapters
+        else:
+            categories[category] = category_records(data)
+    
+    written = []
+    for category, records in categories.items():
+        with ShardedDatasetWriter(data_dir, category, shard_bytes,
+                                  metadata={**dataset["metadata"], "category": category}) as writer:
+            for record in records:
+                writer.write(record)
+        print(f"  - {category}: {writer.count} entries in {len(writer.shards)} shard(s)")
+        if writer.count:
+            written.append(category)
+    return written
+
+
+def sharded_readme_section(categories):
+    """YAML configs (one per category) and usage notes for the sharded layout"""
+    configs = "".join(f"- config_name: {category}\n  data_files: data/{category}-*.jsonl\n"
+                      for category in categories)
+    usage = """
+### Sharded JSON Lines
+
+Each category is stored as `data/<category>-NNNNN.jsonl` shards with a
+`data/<category>.manifest.json` listing row counts, byte offsets and SHA-256
+of every shard, so only the needed categories (and shards) are downloaded:
+
+```python
+from datasets import load_dataset
+
+heroes = load_dataset("TSEOsiris/bannerlord-lore-dataset", "heroes")
+```
+"""
+    return configs, usage
+
+
+def create_readme(sharded_categories=None):
+    """Create dataset README (with per-category configs for the sharded layout)"""
     readme = """---
 language:
 - en
@@ -226,9 +286,20 @@ Found missing lore? Want to add more data?
   - "Travels in Calradia" novellas
   - Historical figures (Emperor Neretzes)
 """
+    if sharded_categories:
+        configs, usage = sharded_readme_section(sharded_categories)
+        readme = readme.replace("---\n\n# Bannerlord Lore Dataset", f"configs:\n{configs}---\n\n# Bannerlord Lore Dataset", 1)
+        readme = readme.replace("\n## Use Cases", f"{usage}\n## Use Cases", 1)
     return readme
 
 def main():
+    parser = argparse.ArgumentParser(description='Prepare and publish the Bannerlord Lore dataset')
+    parser.add_argument('--shard-size', type=int, metavar='MB',
+                        help='Write categories as JSON Lines shards of at most MB megabytes with manifests '
+                             'instead of one bannerlord_lore.json')
+    args = parser.parse_args()
+    shard_bytes = args.shard_size * 1024 * 1024 if args.shard_size else None
+    
     print("=" * 60)
     print("PUBLISHING BANNERLORD LORE DATASET")
     print("=" * 60)
@@ -263,23 +334,53 @@ def main():
     output_dir = Path("dataset_export")
     output_dir.mkdir(exist_ok=True)
     
-    dataset_path = output_dir / "bannerlord_lore.json"
-    print(f"\nSaving dataset to {dataset_path}...")
-    with open(dataset_path, 'w', encoding='utf-8') as f:
-        json.dump(dataset, f, ensure_ascii=False, indent=2)
+    # upload_folder sends the whole directory: drop the outputs of an earlier run, so a
+    # sharded upload carries no stale bannerlord_lore.json / training_format.json and vice versa
+    data_dir = output_dir / "data"
+    if data_dir.exists():
+        shutil.rmtree(data_dir)
+    remove_dataset(output_dir, "bannerlord_lore")
+    remove_dataset(output_dir, "training_format")
+    
+    sharded_categories = None
+    if shard_bytes:
+        print(f"\nSaving sharded dataset to {data_dir}...")
+        sharded_categories = write_sharded(dataset, data_dir, shard_bytes)
+    else:
+        dataset_path = output_dir / "bannerlord_lore.json"
+        print(f"\nSaving dataset to {dataset_path}...")
+        with open(dataset_path, 'w', encoding='utf-8') as f:
+            json.dump(dataset, f, ensure_ascii=False, indent=2)
+    
+    # Also save training format (prepare_unsloth_dataset.py writes a JSON file or, with --shard-size, shards)
+    training_path = find_dataset(Path("finetuning_data"), "unsloth_training_dataset")
+    if training_path is not None and training_path.name.endswith(".manifest.json"):
+        bad = ShardedDataset(training_path).verify()
+        if bad:
+            print(f"WARNING: Training shards do not match their manifest: {', '.join(bad)}")
+    if training_path is not None and shard_bytes:
+        with ShardedDatasetWriter(output_dir / "data", "training_format", shard_bytes,
+                                  metadata={"format": "alpaca"}) as writer:
+            for entry in iter_records(training_path):
+                writer.write(entry)
+        if writer.count:
+            sharded_categories.append("training_format")
+        print(f"Saved training format dataset ({writer.count} entries, {len(writer.shards)} shard(s))")
+    elif training_path is not None and training_path.name == "unsloth_training_dataset.json":
+        shutil.copy(training_path, output_dir / "training_format.json")
+        print("Copied training format dataset")
+    elif training_path is not None:
+        # Shards or JSON Lines: the same training_format.json, streamed record by record
+        with JsonArrayWriter(output_dir / "training_format.json") as writer:
+            for entry in iter_records(training_path):
+                writer.write(entry)
+        print(f"Saved training format dataset ({writer.count} entries from {training_path.name})")
     
     # Save README
     readme_path = output_dir / "README.md"
     print(f"Saving README to {readme_path}...")
     with open(readme_path, 'w', encoding='utf-8') as f:
-        f.write(create_readme())
-    
-    # Also save training format
-    training_path = Path("finetuning_data/unsloth_training_dataset.json")
-    if training_path.exists():
-        import shutil
-        shutil.copy(training_path, output_dir / "training_format.json")
-        print("Copied training format dataset")
+        f.write(create_readme(sharded_categories))
     
     # Create repo and upload
     print(f"\nCreating repository: {repo_id}...")
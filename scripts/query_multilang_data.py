@@ -7,7 +7,9 @@
 import sqlite3
 import sys
 from pathlib import Path
-import re
+
+from fts_index import (TRIGRAM_TOKENIZER, WORD_TOKENIZER, create_synced_fts, substring_query,
+                       table_columns, word_query)
 
 # Настройка кодировки для Windows
 if sys.platform == 'win32':
@@ -16,21 +18,45 @@ if sys.platform == 'win32':
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
 
 
-def is_cyrillic(text):
-    """Проверка, содержит ли текст кириллицу"""
-    if not text:
-        return False
-    return bool(re.search(r'[А-Яа-яЁё]', text))
+# Индексы поиска по названиям поселений кампании: (FTS таблица, токенизатор)
+SETTLEMENT_NAME_INDEXES = [
+    ('campaign_settlements_fts', WORD_TOKENIZER),         # слова, без учёта регистра и диакритики
+    ('campaign_settlements_trigram', TRIGRAM_TOKENIZER),  # подстроки от 3 символов
+]
+
 
+def ensure_search_indexes(conn: sqlite3.Connection):
+    """Создать FTS индексы названий поселений (один раз, дальше их обновляют триггеры)"""
+    existing = table_columns(conn, 'campaign_settlements')
+    columns = [column for column in ('name', 'name_ru', 'name_tr') if column in existing]
+    for fts_table, tokenize in SETTLEMENT_NAME_INDEXES:
+        create_synced_fts(conn, fts_table, 'campaign_settlements', columns, tokenize)
+    conn.commit()
 
-def is_turkish(text):
-    """Проверка, содержит ли текст турецкие символы"""
-    if not text:
-        return False
-    # Турецкие специфичные символы: ç, ğ, ı, ö, ş, ü
-    turkish_chars = re.search(r'[çÇğĞıİöÖşŞüÜ]', text)
-    turkish_words = re.search(r'\b(ve|bir|bu|şu|o|ile|için|gibi|kadar|daha|en|çok|az|var|yok|de|da|ki|mi|mı|mu|mü)\b', text, re.IGNORECASE)
-    return bool(turkish_chars or turkish_words)
+
+def search_settlement(cursor: sqlite3.Cursor, query: str):
+    """Поиск поселения на любом языке (EN, RU, TR) по FTS индексам, без сканирования таблицы.
+    
+    Слова ищутся по всем языкам сразу (последнее слово - как префикс),
+    плюс совпадение по подстроке через trigram индекс.
+    """
+    words = word_query(query)
+    substring = substring_query(query)
+    if words is None:
+        return []
+    
+    matches = ['SELECT rowid FROM campaign_settlements_fts WHERE campaign_settlements_fts MATCH ?']
+    params = [words]
+    if substring is not None:
+        matches.append('SELECT rowid FROM campaign_settlements_trigram WHERE campaign_settlements_trigram MATCH ?')
+        params.append(substring)
+    
+    cursor.execute(f'''
+        SELECT id, name AS name_en, name_ru, name_tr, settlement_type
+        FROM campaign_settlements
+        WHERE rowid IN ({' UNION '.join(matches)})
+    ''', params)
+    return cursor.fetchall()
 
 
 def example_queries(db_path: Path):
@@ -164,44 +190,19 @@ def example_queries(db_path: Path):
         clan = row['clan_name_ru'] or row['clan_name_tr'] or row['clan_name_en'] or 'Unknown'
         print(f"   {name} ({row['id']}) - Clan: {clan}")
     
-    # 5. Универсальная функция поиска (EN или RU)
-    print("\n5. Universal search function (works with EN or RU):")
+    # 5. Универсальная функция поиска (EN, RU или TR)
+    print("\n5. Universal search function (works with EN, RU or TR):")
     print("-" * 60)
-    
-    def search_settlement(query):
-        """Поиск поселения на любом языке (EN, RU, TR)"""
-        is_ru = is_cyrillic(query)
-        is_tr = is_turkish(query)
-        
-        if is_ru:
-            cursor.execute('''
-                SELECT id, name_ru, name AS name_en, name_tr, settlement_type
-                FROM campaign_settlements
-                WHERE name_ru LIKE ? OR name LIKE ? OR name_tr LIKE ?
-            ''', (f'%{query}%', f'%{query}%', f'%{query}%'))
-        elif is_tr:
-            cursor.execute('''
-                SELECT id, name_tr, name AS name_en, name_ru, settlement_type
-                FROM campaign_settlements
-                WHERE name_tr LIKE ? OR name LIKE ? OR name_ru LIKE ?
-            ''', (f'%{query}%', f'%{query}%', f'%{query}%'))
-        else:
-            cursor.execute('''
-                SELECT id, name AS name_en, name_ru, name_tr, settlement_type
-                FROM campaign_settlements
-                WHERE name LIKE ? OR name_ru LIKE ? OR name_tr LIKE ?
-            ''', (f'%{query}%', f'%{query}%', f'%{query}%'))
-        
-        return cursor.fetchall()
+    ensure_search_indexes(conn)
     
     # Тест поиска на русском
-    results = search_settlement('Диатма')
+    results = search_settlement(cursor, 'Диатма')
     print(f"   Search 'Диатма': Found {len(results)} results")
     for row in results:
         print(f"      {row['name_ru'] or row['name_en']} ({row['id']})")
     
     # Тест поиска на английском
-    results = search_settlement('Diathma')
+    results = search_settlement(cursor, 'Diathma')
     print(f"   Search 'Diathma': Found {len(results)} results")
     for row in results:
         print(f"      {row['name_en'] or row['name_ru']} ({row['id']})")
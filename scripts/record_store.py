@@ -0,0 +1,100 @@
+"""
+Compact in-memory storage for extracted encyclopedia records
+
+EncyclopediaExtractor used to keep every hero, settlement and item as its
+own dict, so every record carried a hash table with the same keys. A
+RecordStore keeps one list per field instead, plus a small "shape" number
+per record: the tuple of keys the record had, in order. Records of the
+same kind share their shape, so a row costs one list slot per field and
+one byte of shape id instead of a dict.
+
+Short repeated values (cultures, item types, source file names, ...)
+are interned per store, so equal strings are kept only once.
+
+Iterating a store yields plain dicts with the original keys in the
+original order, so the JSON and SQLite writers see the same records as
+before.
+"""
+
+from array import array
+from typing import Any, Dict, Iterator, List, Tuple
+
+# Placeholder for fields a record does not have
+_MISSING = object()
+
+# Values of these fields are unique per record, interning them would only grow the pool
+UNIQUE_FIELDS = frozenset(('id', 'name', 'text', 'title'))
+
+# Longer strings are almost never repeated
+INTERN_MAX_LENGTH = 64
+
+
+class RecordStore:
+    """Columnar list of records with a per-record key layout"""
+
+    def __init__(self):
+        self._columns: Dict[str, List[Any]] = {}
+        self._shapes: List[Tuple[str, ...]] = []
+        self._shape_ids: Dict[Tuple[str, ...], int] = {}
+        self._row_shapes = array('B')
+        self._pool: Dict[str, str] = {}
+        self._length = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __bool__(self) -> bool:
+        return self._length > 0
+
+    def _shape_id(self, keys: Tuple[str, ...]) -> int:
+        shape_id = self._shape_ids.get(keys)
+        if shape_id is None:
+            shape_id = len(self._shapes)
+            if shape_id > 255 and self._row_shapes.typecode == 'B':
+                self._row_shapes = array('H', self._row_shapes)
+            self._shapes.append(keys)
+            self._shape_ids[keys] = shape_id
+            for key in keys:
+                if key not in self._columns:
+                    self._columns[key] = [_MISSING] * self._length
+        return shape_id
+
+    def append(self, record: Dict[str, Any]):
+        shape_id = self._shape_id(tuple(record))
+        pool = self._pool
+        for key, column in self._columns.items():
+            value = record.get(key, _MISSING)
+            if (value.__class__ is str and key not in UNIQUE_FIELDS
+                    and len(value) <= INTERN_MAX_LENGTH):
+                value = pool.setdefault(value, value)
+            column.append(value)
+        self._row_shapes.append(shape_id)
+        self._length += 1
+
+    def extend(self, records):
+        for record in records:
+            self.append(record)
+
+    def clear(self):
+        self.__init__()
+
+    def _row(self, i: int) -> Dict[str, Any]:
+        columns = self._columns
+        return {key: columns[key][i] for key in self._shapes[self._row_shapes[i]]}
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        if i < 0:
+            i += self._length
+        if not 0 <= i < self._length:
+            raise IndexError("record index out of range")
+        return self._row(i)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(self._length):
+            yield self._row(i)
+
+    def __getstate__(self):
+        # array and lists pickle as is; the intern pool is rebuilt lazily
+        state = self.__dict__.copy()
+        state['_pool'] = {}
+        return state
@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""
+Local retrieval server over bannerlord_lore.db
+
+A long-lived HTTP/1.1 server (asyncio, keep-alive) the game side
+(ContextRetriever, LLMQueryManager) can query instead of starting a
+script per lookup:
+
+    GET /search?q=imperial+senate&lang=EN&types=faction,world_lore&limit=10&offset=0&prefix=1
+    GET /names?q=Диат&types=settlement&limit=10
+    GET /entity/settlement/town_EN1
+    GET /context?q=Who+rules+Pravend&budget=1500&lang=EN
+    GET /stats
+
+Responses are JSON. Lookups run on a pool of worker threads, each with
+its own read-only connection (memory-mapped, optionally sharing one page
+cache), a LoreSearch and a ContextPacker, so statements stay prepared
+between requests. Requests that arrive together are batched: the event
+loop hands each worker a batch of lookups at once, and identical requests
+in flight are answered by a single lookup. Encoded responses are cached
+until the database changes, so repeated questions skip the pool.
+
+Usage:
+    python retrieval_server.py [--db-path Database/bannerlord_lore.db] [--port 8765] [--workers N]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+
+from context_packer import DEFAULT_BUDGET, DEFAULT_TOKENIZER, ContextPacker, TokenCounter
+from lore_search import ENTITY_TYPES, LANGUAGES, connect_read_only
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# Memory map up to 256 MB of the database file per connection (the OS shares the pages)
+MMAP_SIZE = 256 * 1024 * 1024
+
+# Most lookups handed to one worker at once
+MAX_BATCH = 32
+
+# Encoded responses kept for repeated requests; the database is checked for changes at most once a second
+RESPONSE_CACHE_SIZE = 4096
+CACHE_CHECK_INTERVAL = 1.0
+
+# Upper bound for limit/offset and budget parameters
+MAX_LIMIT = 100
+MAX_OFFSET = 1000
+MAX_BUDGET = 32768
+
+# Longest request line / header line accepted
+MAX_LINE = 8192
+
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+               500: 'Internal Server Error'}
+
+
+class NotFoundError(Exception):
+    """A request that is well-formed but asks for something that does not exist"""
+
+
+def encode(payload) -> bytes:
+    return json.dumps(payload, ensure_ascii=False).encode('utf-8')
+
+
+class WorkerState:
+    """Per-thread connection with its search and packer"""
+
+    def __init__(self, db_path: Path, counter: TokenCounter, shared_cache: bool, mmap_size: int):
+        self.conn = connect_read_only(db_path, shared_cache=shared_cache, mmap_size=mmap_size)
+        self.packer = ContextPacker(db_path, conn=self.conn, counter=counter)
+        self.search = self.packer.search
+
+    def run(self, job: Tuple) -> bytes:
+        kind, params = job
+        if kind == 'search':
+            query, language, types, limit, offset, prefix = params
+            return encode({'results': self.search.search(query, language, types, limit, offset, prefix)})
+        if kind == 'names':
+            query, types, limit = params
+            return encode({'results': self.search.search_names(query, types, limit)})
+        if kind == 'entity':
+            entity = self.search.get_entity(*params)
+            if entity is None:
+                raise NotFoundError(f"No {params[0]} with id {params[1]}")
+            return encode(entity)
+        if kind == 'context':
+            query, budget, language, types = params
+            return encode(self.packer.pack(query, budget, language, types))
+        raise ValueError(f"Unknown lookup: {kind}")
+
+    def close(self):
+        self.conn.close()
+
+
+class ConnectionPool:
+    """Worker threads, each owning one read-only connection"""
+
+    def __init__(self, db_path: Path, size: int, counter: TokenCounter,
+                 shared_cache: bool = False, mmap_size: int = MMAP_SIZE):
+        self.size = size
+        self._jobs = queue.SimpleQueue()
+        self._ready = threading.Barrier(size + 1)
+        self._errors: List[Exception] = []
+        self._threads = [
+            threading.Thread(target=self._work, args=(db_path, counter, shared_cache, mmap_size),
+                             name=f'retrieval-{i}', daemon=True)
+            for i in range(size)
+        ]
+        for thread in self._threads:
+            thread.start()
+        self._ready.wait()
+        if self._errors:
+            self.close()
+            raise self._errors[0]
+
+    def _work(self, db_path: Path, counter: TokenCounter, shared_cache: bool, mmap_size: int):
+        try:
+            state = WorkerState(db_path, counter, shared_cache, mmap_size)
+        except Exception as e:
+            self._errors.append(e)
+            self._ready.wait()
+            return
+        self._ready.wait()
+
+        while True:
+            item = self._jobs.get()
+            if item is None:
+                break
+            batch, done = item
+            results = []
+            for job in batch:
+                try:
+                    results.append((True, state.run(job)))
+                except Exception as e:
+                    results.append((False, e))
+            done(results)
+        state.close()
+
+    def submit(self, batch: List[Tuple], done: Callable[[List[Tuple[bool, object]]], None]):
+        """Run a batch of jobs on a free worker; done(results) is called from that worker"""
+        self._jobs.put((batch, done))
+
+    def close(self):
+        for _ in self._threads:
+            self._jobs.put(None)
+        for thread in self._threads:
+            thread.join()
+
+
+class RetrievalServer:
+    """asyncio HTTP front end that batches lookups onto the connection pool"""
+
+    def __init__(self, pool: ConnectionPool, db_path: Path, cache_size: int = RESPONSE_CACHE_SIZE):
+        self.pool = pool
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: List[Tuple[Tuple, asyncio.Future]] = []
+        self._inflight: Dict[Tuple, asyncio.Future] = {}
+        self._flush_scheduled = False
+        self.started = time.time()
+        self.stats = {'requests': 0, 'cache_hits': 0, 'lookups': 0, 'coalesced': 0, 'batches': 0, 'errors': 0}
+
+        # Response cache; the epoch changes whenever it is dropped, so lookups
+        # started before a database change are not stored afterwards
+        self.cache_size = cache_size
+        self._cache: OrderedDict = OrderedDict()
+        self._epoch = 0
+        self._version_conn = connect_read_only(db_path)
+        self._data_version = self._version_conn.execute('PRAGMA data_version').fetchone()[0]
+        self._checked = time.monotonic()
+
+    # --- response cache ---
+
+    def cached(self, job: Tuple) -> Optional[bytes]:
+        now = time.monotonic()
+        if now - self._checked >= CACHE_CHECK_INTERVAL:
+            self._checked = now
+            # data_version changes when another connection commits
+            version = self._version_conn.execute('PRAGMA data_version').fetchone()[0]
+            if version != self._data_version:
+                self._data_version = version
+                self._cache.clear()
+                self._epoch += 1
+
+        body = self._cache.get(job)
+        if body is not None:
+            self._cache.move_to_end(job)
+            self.stats['cache_hits'] += 1
+        return body
+
+    def _store(self, job: Tuple, body: bytes):
+        self._cache[job] = body
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    # --- batching ---
+
+    def lookup(self, job: Tuple) -> asyncio.Future:
+        """Future with the encoded result of a job; identical jobs in flight share one lookup"""
+        future = self._inflight.get(job)
+        if future is not None:
+            self.stats['coalesced'] += 1
+            return future
+
+        future = self._loop.create_future()
+        self._inflight[job] = future
+        self._pending.append((job, future))
+        if not self._flush_scheduled:
+            # Everything queued until the loop is idle again goes out together
+            self._flush_scheduled = True
+            self._loop.call_soon(self._flush)
+        return future
+
+    def _flush(self):
+        self._flush_scheduled = False
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+        # Spread the batch over the workers, at most MAX_BATCH jobs each
+        size = min(MAX_BATCH, max(1, -(-len(pending) // self.pool.size)))
+        for start in range(0, len(pending), size):
+            batch = pending[start:start + size]
+            self.stats['batches'] += 1
+            self.stats['lookups'] += len(batch)
+            self.pool.submit([job for job, _ in batch],
+                             lambda results, batch=batch, epoch=self._epoch: self._loop.call_soon_threadsafe(
+                                 self._resolve, batch, results, epoch))
+
+    def _resolve(self, batch: List[Tuple[Tuple, asyncio.Future]], results: List[Tuple[bool, object]],
+                 epoch: int):
+        for (job, future), (ok, value) in zip(batch, results):
+            del self._inflight[job]
+            if ok and epoch == self._epoch:
+                self._store(job, value)
+            if future.done():
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    # --- routing ---
+
+    async def dispatch(self, method: str, target: str) -> Tuple[int, bytes]:
+        if method != 'GET':
+            return 405, encode({'error': 'only GET is supported'})
+
+        url = urlparse(target)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        parts = [unquote(part) for part in url.path.strip('/').split('/')]
+        try:
+            if parts == ['stats']:
+                return 200, encode(self.get_stats())
+            job = self.parse_job(parts, params)
+            if job is None:
+                return 404, encode({'error': f'unknown path: {url.path}'})
+            body = self.cached(job)
+            if body is None:
+                body = await asyncio.shield(self.lookup(job))
+            return 200, body
+        except NotFoundError as e:
+            return 404, encode({'error': str(e)})
+        except ValueError as e:
+            return 400, encode({'error': str(e)})
+        except Exception as e:
+            self.stats['errors'] += 1
+            return 500, encode({'error': f'{type(e).__name__}: {e}'})
+
+    @staticmethod
+    def parse_job(parts: List[str], params: Dict[str, str]) -> Optional[Tuple]:
+        """Validate request parameters into a hashable job (None for unknown paths)"""
+
+        def integer(name: str, default: int, low: int, high: int) -> int:
+            try:
+                value = int(params.get(name, default))
+            except ValueError:
+                raise ValueError(f"{name} must be an integer")
+            if not low <= value <= high:
+                raise ValueError(f"{name} must be between {low} and {high}")
+            return value
+
+        def language() -> str:
+            value = params.get('lang', 'EN').upper()
+            if value not in LANGUAGES:
+                raise ValueError(f"lang must be one of {', '.join(LANGUAGES)}")
+            return value
+
+        def types() -> Optional[Tuple[str, ...]]:
+            if not params.get('types'):
+                return None
+            values = tuple(sorted(set(params['types'].split(','))))
+            unknown = [value for value in values if value not in ENTITY_TYPES]
+            if unknown:
+                raise ValueError(f"Unknown entity type(s): {', '.join(unknown)}")
+            return values
+
+        def query() -> str:
+            value = params.get('q', '').strip()
+            if not value:
+                raise ValueError("q is required")
+            return value
+
+        if parts == ['search']:
+            return ('search', (query(), language(), types(), integer('limit', 10, 1, MAX_LIMIT),
+                               integer('offset', 0, 0, MAX_OFFSET), params.get('prefix') in ('1', 'true')))
+        if parts == ['names']:
+            return ('names', (query(), types(), integer('limit', 10, 1, MAX_LIMIT)))
+        if parts == ['context']:
+            return ('context', (query(), integer('budget', DEFAULT_BUDGET, 1, MAX_BUDGET), language(), types()))
+        if len(parts) == 3 and parts[0] == 'entity':
+            if parts[1] not in ENTITY_TYPES:
+                raise ValueError(f"Unknown entity type: {parts[1]}")
+            return ('entity', (parts[1], parts[2]))
+        return None
+
+    def get_stats(self) -> Dict:
+        stats = dict(self.stats)
+        stats['workers'] = self.pool.size
+        stats['uptime_s'] = round(time.time() - self.started, 1)
+        stats['avg_batch'] = round(stats['lookups'] / stats['batches'], 2) if stats['batches'] else 0
+        stats['cached_responses'] = len(self._cache)
+        return stats
+
+    # --- HTTP ---
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                parts = request_line.decode('latin-1').split()
+                if len(parts) != 3:
+                    status, body, keep_alive = 400, encode({'error': 'malformed request line'}), False
+                else:
+                    method, target, version = parts
+                    # Request bodies are not used, but must be read to keep the connection in sync
+                    length = int(headers.get('content-length', 0) or 0)
+                    if length:
+                        await reader.readexactly(length)
+                    self.stats['requests'] += 1
+                    status, body = await self.dispatch(method, target)
+                    connection = headers.get('connection', '').lower()
+                    keep_alive = connection == 'keep-alive' if version == 'HTTP/1.0' else connection != 'close'
+
+                writer.write(
+                    f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(body)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + body
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str, port: int) -> asyncio.AbstractServer:
+        self._loop = asyncio.get_running_loop()
+        return await asyncio.start_server(self.handle_connection, host, port, limit=MAX_LINE)
+
+
+async def serve(db_path: Path, host: str, port: int, workers: int, counter: TokenCounter,
+                shared_cache: bool = False, mmap_size: int = MMAP_SIZE):
+    pool = ConnectionPool(db_path, workers, counter, shared_cache, mmap_size)
+    server = RetrievalServer(pool, db_path)
+    listener = await server.start(host, port)
+    print(f"✅ Retrieval server on http://{host}:{port} ({workers} worker(s), tokenizer: {counter.name})")
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve lore search, entities and packed context over HTTP')
+    parser.add_argument('--db-path', type=str, default='Database/bannerlord_lore.db',
+                        help='Path to database (default: Database/bannerlord_lore.db)')
+    parser.add_argument('--host', type=str, default=DEFAULT_HOST, help=f'Address (default: {DEFAULT_HOST})')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'Port (default: {DEFAULT_PORT})')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4,
+                        help='Worker threads / connections (default: CPU count)')
+    parser.add_argument('--tokenizer', type=str, default=DEFAULT_TOKENIZER,
+                        help=f'Tokenizer for /context (default: {DEFAULT_TOKENIZER})')
+    parser.add_argument('--shared-cache', action='store_true',
+                        help='Let the connections share one page cache (less memory, more lock contention)')
+    parser.add_argument('--mmap-size', type=int, default=MMAP_SIZE,
+                        help=f'Bytes of the database to memory-map, 0 to disable (default: {MMAP_SIZE})')
+    args = parser.parse_args()
+
+    db_path = Path(args.db_path)
+    if not db_path.exists():
+        print(f"ERROR: Database not found: {db_path}")
+        sys.exit(1)
+
+    try:
+        asyncio.run(serve(db_path, args.host, args.port, args.workers, TokenCounter(args.tokenizer),
+                          args.shared_cache, args.mmap_size))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    # Настройка кодировки для Windows (только при запуске как скрипт)
+    if sys.platform == 'win32':
+        import io
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+        sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""Tests for FineTuningDataExporter: json and jsonl output (python -m pytest test_export_finetuning_data.py, or run directly)"""
+import contextlib
+import io
+import json
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from export_finetuning_data import FineTuningDataExporter
+
+EXPORTS = ('clans', 'settlements', 'lords', 'factions')
+
+# Tables without primary keys: ids repeat and may be NULL on both sides
+SCHEMA = '''
+    CREATE TABLE campaign_clans (id TEXT, name TEXT, name_ru TEXT, name_tr TEXT, description TEXT,
+                                 description_ru TEXT, description_tr TEXT, culture TEXT, kingdom TEXT);
+    CREATE TABLE clans (id TEXT, name TEXT, text TEXT, wiki_description TEXT);
+    CREATE TABLE campaign_settlements (id TEXT, name TEXT, name_ru TEXT, name_tr TEXT, settlement_type TEXT,
+                                       culture TEXT, owner_name TEXT, owner_name_ru TEXT, owner_name_tr TEXT);
+    CREATE TABLE settlements (id TEXT, name TEXT, text TEXT, type TEXT, culture TEXT, wiki_description TEXT);
+    CREATE VIRTUAL TABLE settlements_fts USING fts5(name, text);
+    CREATE TABLE campaign_heroes (id TEXT, name TEXT, name_ru TEXT, name_tr TEXT, culture TEXT,
+                                  clan_id TEXT, age INTEGER, is_female INTEGER);
+    CREATE TABLE heroes (id TEXT, text TEXT, wiki_biography TEXT);
+    CREATE TABLE campaign_kingdoms (id TEXT, name TEXT, name_ru TEXT, name_tr TEXT, culture TEXT,
+                                    ruler_name TEXT, ruler_name_ru TEXT, ruler_name_tr TEXT);
+    CREATE TABLE kingdoms (id TEXT, name TEXT, text TEXT, wiki_description TEXT);
+'''
+
+# Campaign ids: a repeated id, a NULL id twice, a unique id. Encyclopedia ids: matches of each,
+# repeated and NULL matches, repeated encyclopedia-only ids
+CAMPAIGN_IDS = ['a', 'b', 'a', None, 'c', None]
+ENCYCLOPEDIA_IDS = ['a', 'x', 'a', None, 'y', 'x', None, 'b', 'y', 'z']
+
+
+def build_db(path: Path, campaign_ids=CAMPAIGN_IDS, encyclopedia_ids=ENCYCLOPEDIA_IDS) -> Path:
+    conn = sqlite3.connect(str(path))
+    conn.executescript(SCHEMA)
+    for i, cid in enumerate(campaign_ids):
+        conn.execute("INSERT INTO campaign_clans VALUES (?, ?, ?, '', ?, NULL, NULL, 'vlandia', NULL)",
+                     (cid, f"Clan {i}", f"Клан {i}", f"Campaign clan {i}"))
+        conn.execute("INSERT INTO campaign_settlements VALUES (?, ?, NULL, NULL, 'town', 'empire', ?, NULL, NULL)",
+                     (cid, f"Town {i}", f"Lord {i}"))
+        conn.execute("INSERT INTO campaign_heroes VALUES (?, ?, NULL, NULL, 'sturgia', 'clan_1', ?, ?)",
+                     (cid, f"Lord {i}", 20 + i, i % 2))
+        conn.execute("INSERT INTO campaign_kingdoms VALUES (?, ?, NULL, NULL, 'aserai', ?, NULL, NULL)",
+                     (cid, f"Kingdom {i}", f"Ruler {i}"))
+    for i, eid in enumerate(encyclopedia_ids):
+        # Every other row has only the wiki text
+        text = f"Encyclopedia text {i}" if i % 2 else None
+        conn.execute("INSERT INTO clans VALUES (?, ?, ?, ?)", (eid, f"Clan {eid}", text, f"Wiki clan {i}"))
+        conn.execute("INSERT INTO settlements VALUES (?, ?, ?, 'castle', 'battania', ?)",
+                     (eid, f"Town {eid} {i}", text, f"Wiki town {i}"))
+        conn.execute("INSERT INTO heroes VALUES (?, ?, ?)", (eid, text, f"Wiki lord {i}"))
+        conn.execute("INSERT INTO kingdoms VALUES (?, ?, ?, ?)", (eid, f"Kingdom {eid}", text, f"Wiki kingdom {i}"))
+    conn.executemany("INSERT INTO settlements_fts VALUES (?, ?)",
+                     [('Town 4', 'Fts town 4'), ('Town x 1', 'Fts x'), ('Town 4', 'Second fts town 4')])
+    conn.commit()
+    conn.close()
+    return path
+
+
+def export(db_path: Path, output_dir: Path, output_format: str) -> dict:
+    exporter = FineTuningDataExporter(db_path, output_dir, output_format)
+    exporter.connect()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            for name in EXPORTS:
+                getattr(exporter, f'export_{name}')()
+    finally:
+        exporter.close()
+
+    records = {}
+    for name in EXPORTS:
+        if output_format == 'json':
+            records[name] = json.loads((output_dir / f'{name}.json').read_text(encoding='utf-8'))
+        else:
+            lines = (output_dir / f'{name}.jsonl').read_text(encoding='utf-8').splitlines()
+            records[name] = [json.loads(line) for line in lines]
+    return records
+
+
+def export_both(campaign_ids=CAMPAIGN_IDS, encyclopedia_ids=ENCYCLOPEDIA_IDS):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = build_db(Path(tmp) / 'test.db', campaign_ids, encyclopedia_ids)
+        return (export(db_path, Path(tmp) / 'json', 'json'),
+                export(db_path, Path(tmp) / 'jsonl', 'jsonl'))
+
+
+def test_jsonl_matches_json_with_duplicate_and_null_ids():
+    as_json, as_jsonl = export_both()
+    for name in EXPORTS:
+        assert as_jsonl[name] == as_json[name], name
+
+
+def test_duplicate_ids_merge_once():
+    as_json, as_jsonl = export_both()
+    for records in (as_json, as_jsonl):
+        factions = records['factions']
+        # Every campaign row, then one record per encyclopedia-only id
+        assert [f['id'] for f in factions] == CAMPAIGN_IDS + ['x', 'y', 'z']
+        # The first campaign row with an id gets the description of the last encyclopedia row with it
+        assert factions[0]['description_en'] == 'Wiki kingdom 2'
+        assert 'description_en' not in factions[2]
+        assert factions[3]['description_en'] == 'Wiki kingdom 6'
+        # Encyclopedia-only: first row, description of the last row
+        assert factions[6]['name_en'] == 'Kingdom x'
+        assert factions[6]['description_en'] == 'Encyclopedia text 5'
+        # Clans are not merged: first encyclopedia row only
+        assert [c['description_en'] for c in records['clans'][6:]] == ['Encyclopedia text 1', 'Wiki clan 4',
+                                                                        'Encyclopedia text 9']
+
+
+def test_jsonl_matches_json_with_unique_ids():
+    as_json, as_jsonl = export_both(['a', 'b', 'c'], ['c', 'd', 'a', 'e'])
+    for name in EXPORTS:
+        assert as_jsonl[name] == as_json[name], name
+
+
+if __name__ == '__main__':
+    failed = 0
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            try:
+                test()
+                print(f"✅ {name}")
+            except AssertionError as e:
+                failed += 1
+                print(f"❌ {name}: {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""Tests for minhash_dedup.near_duplicates (python -m pytest test_minhash_dedup.py, or run directly)"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import numpy as np
+
+from minhash_dedup import minhash_signatures, near_duplicates
+
+TEMPLATE = ("{} is a lord of the Vlandian kingdom, a realm of knights and crossbowmen in the west of "
+            "Calradia, who holds fiefs near Pravend and rides with the king's army to every war.")
+NAMES = [f"Lord{i:02d}" for i in range(12)]
+
+
+def test_templated_texts_across_entities():
+    # Different entities with near-identical templated texts land in the same buckets
+    texts = [TEMPLATE.format(name) for name in NAMES]
+    signatures = minhash_signatures(texts * 2)
+    assert near_duplicates(signatures, threshold=0.8).keep.sum() < len(texts)
+
+
+def test_keyed_duplicates_in_mixed_bucket():
+    texts = [TEMPLATE.format(name) for name in NAMES] * 2
+    duplicates = near_duplicates(minhash_signatures(texts), threshold=0.8, keys=NAMES * 2)
+    assert duplicates.keep.tolist() == [True] * len(NAMES) + [False] * len(NAMES)
+
+    # Entities differ only outside the banded positions: every band puts all texts in one
+    # bucket whose first text has another key than most of the copies
+    signatures = np.zeros((2 * len(NAMES), 128), dtype=np.uint32)
+    signatures[:, -1] = np.arange(len(NAMES)).tolist() * 2
+    duplicates = near_duplicates(signatures, threshold=0.8, bands=4, rows=8, keys=NAMES * 2)
+    # Each entity keeps its first text, its exact copy is removed, other entities stay
+    assert duplicates.keep.tolist() == [True] * len(NAMES) + [False] * len(NAMES)
+    assert duplicates.group.tolist() == list(range(len(NAMES))) * 2
+
+
+def test_keys_never_group_different_entities():
+    texts = ["Omor is a Vlandian lord who holds Sargot."] * 3
+    duplicates = near_duplicates(minhash_signatures(texts), keys=['omor', 'aldric', 'omor'])
+    assert duplicates.keep.tolist() == [True, True, False]
+    assert duplicates.group.tolist() == [0, 1, 0]
+
+
+if __name__ == '__main__':
+    failed = 0
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            try:
+                test()
+                print(f"✅ {name}")
+            except AssertionError as e:
+                failed += 1
+                print(f"❌ {name}: {e}")
+    sys.exit(1 if failed else 0)
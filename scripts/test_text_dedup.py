@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Tests for text_dedup.collapse_repeats (python -m pytest test_text_dedup.py, or run directly)"""
+import sys
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from text_dedup import collapse_repeat, collapse_repeats
+
+LORD = "Omor is a Vlandian lord."
+KING = ("Derthert is the king of Vlandia, a realm of knights and crossbowmen "
+        "in the west of Calradia, and rules from Pravend.")
+INTRO = "Vlandia lies in the west. "
+OUTRO = " It is a feudal kingdom."
+
+
+def test_exact_copies():
+    assert collapse_repeat("OmorOmor") == "Omor"
+    assert collapse_repeat(f"{LORD} {LORD}") == LORD
+    assert collapse_repeat(f"{KING} {KING}") == KING
+    assert collapse_repeat(KING + KING) == KING
+    assert collapse_repeat(f"{KING} {KING} {KING}") == KING
+
+
+def test_short_text_with_edited_word():
+    assert collapse_repeat("Omor is a Vlandian lord. Omor is a Vlandic lord.") == LORD
+
+
+def test_short_text_without_final_period():
+    assert collapse_repeat(f"{LORD} {LORD[:-1]}") == LORD
+
+
+def test_name_with_punctuation():
+    assert collapse_repeat("Caladog the Elder Caladog the Elder!") == "Caladog the Elder"
+
+
+def test_long_copy_with_edited_words():
+    edited = KING.replace("knights", "nights")
+    assert collapse_repeat(INTRO + KING + " " + edited + OUTRO) == INTRO + KING + OUTRO
+    edited = KING.replace("king", "ruler").replace("west", "far west")
+    assert collapse_repeat(f"{KING} {edited}") == KING
+    edited = KING.replace("Pravend.", "Pravendia.")
+    assert collapse_repeat(INTRO + KING + " " + edited + OUTRO) == INTRO + KING + OUTRO
+
+
+def test_long_copy_without_final_period():
+    assert collapse_repeat(INTRO + KING + " " + KING[:-1] + OUTRO) == INTRO + KING + OUTRO
+
+
+def test_different_texts_stay():
+    texts = [
+        "Bora Bora",
+        "The lord of Pravend. The lord of Sargot.",
+        INTRO + KING + " Sturgia lies in the north, a land of cold forests, long rivers and hardy infantry." + OUTRO,
+        # The copy is not next to the text it repeats
+        KING + " Omor. " + KING,
+    ]
+    assert collapse_repeats(texts) == texts
+
+
+def test_long_text_memory():
+    # Many offsets of recurring phrases must not be compared over the whole text each
+    phrases = [f"phrase number {i} of the chronicle" for i in range(40)]
+    text = ' '.join(f"{phrases[i % 40]} and entry {i}." for i in range(3000))
+    tracemalloc.start()
+    collapse_repeat(text)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert peak < 200 * len(text) + (64 << 20)
+
+
+if __name__ == '__main__':
+    failed = 0
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            try:
+                test()
+                print(f"✅ {name}")
+            except AssertionError as e:
+                failed += 1
+                print(f"❌ {name}: {e}")
+    sys.exit(1 if failed else 0)
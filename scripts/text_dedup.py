@@ -0,0 +1,576 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate text detection with rolling hashes
+
+Game texts often carry a second copy of themselves ("OmorOmor", a
+description pasted twice, sometimes with a word changed). collapse_repeats()
+finds every span that is a copy of the text just before it and drops the
+later copy; find_shared_spans() finds texts that share spans with other
+texts, across entries and languages.
+
+Both work on whole batches of texts at once with numpy:
+
+- Every text becomes an array of code points, all texts of a batch one
+  concatenated array (texts with the same window length k are hashed
+  together). 32-bit polynomial hashes of all windows of k characters
+  come from log2(k) doubling steps over HASH_CHUNK windows at a time.
+- About one window in m is kept as an anchor, chosen by its hash
+  (content-defined sampling: both copies of a span have anchors at the
+  same places). Sorting the anchors by (hash, position) puts repeated
+  windows of a text next to each other and gives candidate offsets
+  between copies. A batch in which no text repeats an anchor stops here.
+- Each candidate offset d is checked exactly by comparing the text with
+  itself shifted by d around the anchors that gave it (not over the
+  whole text, so memory stays linear in the text length), in vectorized
+  comparisons of up to BATCH_CHARS positions. Runs of equal characters
+  are the pieces of candidate copies. Hash collisions cannot remove text.
+
+An edited word splits a copy into runs, at a slightly different offset
+if its length changed; runs at most MAX_GAP characters and offsets apart
+are joined. A copy is removed only when it is a whole copy: it starts
+and ends on word boundaries, is at least REPEAT_CHARS long, at least
+SIMILARITY of it equals the text it repeats, and that text comes just
+before it (whitespace and punctuation between the two copies aside, so
+a copy may lack the final period). A name or phrase recurring elsewhere
+in a text stays, and a cut never reaches into the copy it repeats.
+Texts too short for that (names, titles) lose an exact second half
+("OmorOmor" becomes "Omor"), or, over SEAM_CHARS, a second half whose
+words are SIMILARITY alike ("Omor is a Vlandian lord. Omor is a Vlandic
+lord" becomes "Omor is a Vlandian lord.", "Bora Bora" stays). m is
+chosen so that a span of exactly REPEAT_CHARS has about ANCHORS_PER_SPAN
+anchors; missing it entirely is an e^-8 event, and longer spans are
+practically always found.
+
+    from text_dedup import collapse_repeats, find_shared_spans
+
+    cleaned = collapse_repeats(texts)
+    for i, j, anchors in find_shared_spans(texts)[:10]:
+        print(i, j, anchors)
+
+Usage:
+    python text_dedup.py ../finetuning_data/encyclopedia_all.json [--field text] [--min-chars 80]
+"""
+
+import argparse
+import difflib
+import re
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+LOCALIZATION_MARKER = re.compile(r'\{=[^}]*\}')
+_WORD = re.compile(r'\w+')
+
+# Shortest copy removed by the repeat search (shorter texts only lose an exact second half)
+REPEAT_CHARS = 80
+
+# Shortest text whose two halves may be separated by whitespace
+SEAM_CHARS = 20
+
+# Share of equal words (halves of a text) or characters (a copy with edits) for a repeat
+SIMILARITY = 0.8
+
+# Differing characters between two equal runs of one copy (an edited word)
+MAX_GAP = 16
+
+# Searches of a text that lost a copy (three copies need two)
+COLLAPSE_ROUNDS = 3
+
+# Longest start of a copy before its first equal run (anchors may miss a short edited head)
+MAX_HEAD = REPEAT_CHARS // 2
+
+# Hash window: the largest power of two up to half the threshold, within these bounds
+MIN_WINDOW = 2
+MAX_WINDOW = 16
+
+# Expected anchors in a repeated span of exactly the threshold length
+ANCHORS_PER_SPAN = 8
+
+# Characters hashed per numpy pass (bounds the memory of one batch)
+BATCH_CHARS = 1 << 22
+
+# Windows hashed at once within a batch (the doubling steps run in the CPU cache)
+HASH_CHUNK = 1 << 16
+
+# Spans shared by more texts than this are boilerplate and are not paired up
+MAX_GROUP = 50
+
+HASH_BASE = 1000003
+_MIX = np.uint32(0x9E3779B1)
+
+
+def strip_markers(text: str) -> str:
+    """Text without {=...} localization markers"""
+    return LOCALIZATION_MARKER.sub('', text)
+
+
+def _batches(indices: Sequence[int], lengths: Sequence[int], limit: int = BATCH_CHARS):
+    """Runs of `indices` with at most `limit` characters together (or a single longer text)"""
+    batch = []
+    total = 0
+    for i in indices:
+        if batch and total + lengths[i] > limit:
+            yield batch
+            batch, total = [], 0
+        batch.append(i)
+        total += lengths[i]
+    if batch:
+        yield batch
+
+
+def _code_points(texts: Sequence[str]) -> np.ndarray:
+    joined = ''.join(texts).encode('utf-32-le', errors='surrogatepass')
+    return np.frombuffer(joined, dtype=np.uint32)
+
+
+def _window_hashes(codes: np.ndarray, window: int) -> np.ndarray:
+    """32-bit polynomial hash of every window of `window` (a power of two) code points.
+
+    Built by doubling: the hash of 2k characters is hash(first k) + BASE^k * hash(next k),
+    a few whole-array operations. Collisions only add candidates
+    that the exact comparison rejects.
+    """
+    hashes = codes[:-1] + codes[1:] * np.uint32(HASH_BASE)
+    power = HASH_BASE * HASH_BASE & 0xFFFFFFFF
+    size = 2
+    while size < window:
+        shifted = hashes[size:] * np.uint32(power)
+        hashes = hashes[:-size]
+        hashes += shifted
+        power = power * power & 0xFFFFFFFF
+        size *= 2
+    return hashes
+
+
+def _anchors(codes: np.ndarray, ends: np.ndarray, window: int, sampling: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Anchor windows of a batch: (position in the batch, hash), in position order.
+
+    ends are the cumulative text lengths; windows crossing the end of a text are left out.
+    Hashed HASH_CHUNK windows at a time, so the arrays of a doubling step stay in the CPU cache.
+    """
+    if len(codes) < window:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint32)
+    threshold = np.uint32((1 << 32) // sampling - 1)
+    positions, hashes = [], []
+    for start in range(0, len(codes) - window + 1, HASH_CHUNK):
+        chunk = _window_hashes(codes[start:start + HASH_CHUNK + window - 1], window)
+        # Low bits of a polynomial hash are weak: sample on the whole of a mixed copy
+        found = np.flatnonzero(chunk * _MIX <= threshold)
+        positions.append(found + start)
+        hashes.append(chunk[found])
+    positions, hashes = np.concatenate(positions), np.concatenate(hashes)
+    crossing = (ends[:-1, None] - np.arange(1, window)).ravel()
+    outside = np.zeros(len(codes), dtype=bool)
+    outside[crossing[crossing >= 0]] = True
+    inside = ~outside[positions]
+    return positions[inside], hashes[inside]
+
+
+def _window_and_sampling(thresholds: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # Largest power of two up to half the threshold
+    windows = 1 << np.log2(np.clip(thresholds // 2, MIN_WINDOW, MAX_WINDOW)).astype(np.int64)
+    sampling = np.maximum(1, (thresholds - windows + 1) // ANCHORS_PER_SPAN)
+    return windows, sampling
+
+
+def _equal_runs(codes: np.ndarray, lows: np.ndarray, highs: np.ndarray, offsets: np.ndarray,
+                shortest: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """For each candidate (positions lows[c] to highs[c], offset d): runs of positions p
+    with codes[p] == codes[p - d], at least `shortest` long. Returns (candidate, start, end).
+
+    Candidates are compared in groups of about BATCH_CHARS positions, so memory is bounded by
+    the batch, not by the number of candidates times the text length.
+    """
+    sizes = highs - lows
+    found = []
+    for group in _batches(range(len(offsets)), sizes + 1):
+        group = np.asarray(group)
+        group_sizes = sizes[group]
+        # One concatenated comparison for the group, a False between two candidates
+        bounds = np.concatenate(([0], np.cumsum(group_sizes + 1)))
+        local = np.arange(bounds[-1]) - np.repeat(bounds[:-1], group_sizes + 1)
+        candidate = np.repeat(group, group_sizes + 1)
+        compared = local < sizes[candidate]
+        positions = lows[candidate] + local
+        equal = np.zeros(len(local) + 1, dtype=np.int8)
+        equal[1:][compared] = (codes[positions[compared]]
+                               == codes[positions[compared] - offsets[candidate[compared]]])
+        edges = np.diff(equal)
+        run_starts = np.flatnonzero(edges == 1)
+        run_ends = np.flatnonzero(edges == -1)
+        long = run_ends - run_starts >= shortest
+        run_starts, run_ends = run_starts[long], run_ends[long]
+        found.append((candidate[run_starts], positions[run_starts],
+                      positions[run_starts] + (run_ends - run_starts)))
+    if not found:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+    return tuple(np.concatenate(parts) for parts in zip(*found))
+
+
+def _chain_runs(runs: List[Tuple[int, int, int]]) -> List[Tuple[int, int, int, int, int]]:
+    """Equal runs (start, end, offset) of one text joined into copies with edited words.
+
+    A run continues a copy when it starts within MAX_GAP characters of the copy's end, at an
+    offset at most MAX_GAP away (an edit may change the length). Returns the copies as
+    (start, end, first offset, last offset, equal characters).
+    """
+    chains: List[List[int]] = []
+    open_chains: List[List[int]] = []
+    for start, end, offset in sorted(runs):
+        # Runs come by start and chain ends only grow: a chain ending too early is finished
+        open_chains = [chain for chain in open_chains if chain[1] >= start - MAX_GAP]
+        for chain in open_chains:
+            if start <= chain[1] + MAX_GAP and abs(offset - chain[3]) <= MAX_GAP:
+                if end > chain[1]:
+                    chain[4] += end - max(start, chain[1])
+                    chain[1], chain[3] = end, offset
+                break
+        else:
+            chains.append([start, end, offset, offset, end - start])
+            open_chains.append(chains[-1])
+    return [tuple(chain) for chain in chains]
+
+
+def _word_boundary(text: str, position: int) -> bool:
+    return (position <= 0 or position >= len(text)
+            or not (text[position - 1].isalnum() and text[position].isalnum()))
+
+
+def _whole_copy(text: str, start: int, end: int, first_offset: int, last_offset: int,
+                equal: int) -> Optional[Tuple[int, int, int]]:
+    """The whole copy in [start, end), whose characters equal those first_offset (at the start)
+    to last_offset (at the end) before them: (cut start, cut end, start of the copy it repeats),
+    or None if the span is not one"""
+    if first_offset == last_offset and end - start > first_offset:
+        return _periodic_copy(text, start, end, first_offset)
+    # A separate copy of the text just before it, with up to one differing word per MAX_GAP
+    source = start - first_offset
+    while start < end and not text[start].isalnum():
+        start, source = start + 1, source + 1
+    source_end = end - last_offset
+    # An edited last word: the copies end at the end of their words, the cut copy with
+    # the punctuation after it
+    while end < len(text) and not _word_boundary(text, end):
+        end += 1
+    while end < len(text) and not text[end].isspace() and not text[end].isalnum():
+        end += 1
+    while source_end < start and not _word_boundary(text, source_end):
+        source_end += 1
+    if source_end > start:
+        return None
+    # Only whitespace and punctuation between the copies (a copy without the final period),
+    # or a short head of the copy with an edited word that no run covers: it must match the
+    # text before the source but for one word, with an equal stretch of MAX_GAP characters
+    head = _WORD.search(text, source_end, start)
+    if head is not None:
+        size = start - head.start()
+        if size > MAX_HEAD:
+            return None
+        source_head = max(source - size, 0)
+        matcher = difflib.SequenceMatcher(None, text[head.start():start], text[source_head:source],
+                                          autojunk=False)
+        blocks = [block.size for block in matcher.get_matching_blocks()]
+        matched = sum(blocks)
+        if size - matched > MAX_GAP or max(blocks) < MAX_GAP:
+            return None
+        start, source, equal = start - size, source_head, equal + matched
+    if equal < SIMILARITY * max(end - start, source_end - source):
+        return None
+    if _word_boundary(text, source) and _word_boundary(text, start):
+        return start, end, source
+    return None
+
+
+def _periodic_copy(text: str, start: int, end: int, offset: int) -> Optional[Tuple[int, int, int]]:
+    """Copies back to back (a periodic stretch from start - offset): keep the first, cut whole
+    periods after it; the period may begin anywhere in the first offset characters"""
+    for shift in range(offset):
+        source = start - offset + shift
+        periods = (end - source) // offset - 1
+        if periods < 1:
+            break
+        cut_end = source + (periods + 1) * offset
+        if (_word_boundary(text, source) and _word_boundary(text, source + offset)
+                and _word_boundary(text, cut_end)):
+            return source + offset, cut_end, source
+    return None
+
+
+def _keep_sources(cuts: List[Tuple[int, int, int]]) -> List[Tuple[int, int]]:
+    """Cuts, longest first, that overlap neither a kept cut nor the copy a kept cut repeats,
+    and do not remove the copy they repeat themselves"""
+    kept: List[Tuple[int, int]] = []
+    sources: List[Tuple[int, int]] = []
+    for start, end, source in sorted(set(cuts), key=lambda cut: (cut[0] - cut[1], cut[0])):
+        # The repeated copy: one period of a periodic stretch, else as long as the cut
+        source_end = source + min(end - start, start - source)
+        if all(end <= other_start or start >= other_end for other_start, other_end in kept + sources) and \
+                all(source_end <= other_start or source >= other_end for other_start, other_end in kept):
+            kept.append((start, end))
+            sources.append((source, source_end))
+    return sorted(kept)
+
+
+def _second_half(text: str) -> Optional[int]:
+    """Start of a second half that repeats the first, or None.
+
+    The halves are equal, or (texts over SEAM_CHARS and too short for the run search) their
+    words, without punctuation, are at least SIMILARITY alike: an edited or missing word, a
+    dropped period.
+    """
+    half = len(text) // 2
+    # The first characters differ in almost every text: no slices for those
+    if half and text[0] == text[half] and text[:half] == text[half:]:
+        return half
+    if not SEAM_CHARS < len(text) < 2 * REPEAT_CHARS:
+        # Longer copies with edits are found by the run search
+        return None
+    tokens = _WORD.findall(text)
+    # A missing or extra word moves the seam by one word
+    for split in sorted({len(tokens) // 2, (len(tokens) + 1) // 2}):
+        if not 0 < split < len(tokens):
+            continue
+        first, second = tokens[:split], tokens[split:]
+        # Words of the first half found in the second bound the similarity from above;
+        # most texts stop here
+        second_words = set(second)
+        if 2 * sum(word in second_words for word in first) < SIMILARITY * len(tokens):
+            continue
+        if difflib.SequenceMatcher(None, first, second).ratio() >= SIMILARITY:
+            # The first half keeps the punctuation after its last word
+            end = list(_WORD.finditer(text))[split - 1].end()
+            while end < len(text) and not text[end].isspace() and not text[end].isalnum():
+                end += 1
+            return end
+    return None
+
+
+def _cut(text: str, spans: List[Tuple[int, int]]) -> str:
+    """text without spans; whitespace on both sides of a cut becomes one whitespace character,
+    and is dropped at a cut at the start or end of the text"""
+    result = ''
+    position = 0
+    for start, end in spans + [(len(text), len(text))]:
+        piece = text[position:start]
+        if result and piece:
+            left, right = result.rstrip(), piece.lstrip()
+            seam = (result[len(left):] + piece[:len(piece) - len(right)])[:1]
+            result = left + seam + right
+        else:
+            result += piece
+        position = end
+    if spans[0][0] == 0:
+        result = result.lstrip()
+    if spans[-1][1] == len(text):
+        result = result.rstrip()
+    return result
+
+
+def _batch_repeats(texts: Sequence[str], window: int, sampling: int) -> Dict[int, list]:
+    """Whole copies of REPEAT_CHARS or more in a batch of texts: {text index: spans}"""
+    lengths = np.fromiter(map(len, texts), dtype=np.int64, count=len(texts))
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    codes = _code_points(texts)
+    positions, hashes = _anchors(codes, ends, window, sampling)
+
+    # Sorted by (hash, position): a text is one range of positions, so the anchors of one
+    # text with one hash end up next to each other, in position order
+    keys = np.sort(hashes.astype(np.uint64) << np.uint64(32) | positions.astype(np.uint64))
+    repeated = np.flatnonzero((keys[1:] >> np.uint64(32)) == (keys[:-1] >> np.uint64(32)))
+    low = np.uint64(0xFFFFFFFF)
+    later = (keys[repeated + 1] & low).astype(np.int64)
+    offsets = later - (keys[repeated] & low).astype(np.int64)
+    # Most equal anchors are in different texts, further apart than the longest text:
+    # only the rest are looked up, and a batch without any (no text with a repeated
+    # anchor window) stops here
+    useful = (offsets >= REPEAT_CHARS) & (offsets < lengths.max())
+    later, offsets = later[useful], offsets[useful]
+    owners = np.searchsorted(ends, later, side='right')
+    useful = later - offsets >= starts[owners]
+    if not useful.any():
+        return {}
+    owners, offsets, later = owners[useful], offsets[useful], later[useful]
+
+    # Anchors of one text and offset close together form one region to compare: the
+    # comparison covers the neighbourhood of the anchors, not the whole text per offset
+    order = np.lexsort((later, offsets, owners))
+    owners, offsets, later = owners[order], offsets[order], later[order]
+    new_region = np.concatenate(([True], (owners[1:] != owners[:-1]) | (offsets[1:] != offsets[:-1])
+                                 | (later[1:] - later[:-1] > REPEAT_CHARS)))
+    first = np.flatnonzero(new_region)
+    last = np.concatenate((first[1:], [len(later)])) - 1
+    owners, offsets = owners[first], offsets[first]
+    lows = np.maximum(later[first] - REPEAT_CHARS, starts[owners] + offsets)
+    highs = np.minimum(later[last] + window + REPEAT_CHARS, ends[owners])
+
+    run_candidates, run_starts, run_ends = _equal_runs(codes, lows, highs, offsets, window)
+    runs: Dict[int, set] = {}
+    for candidate, start, end in zip(run_candidates.tolist(), run_starts.tolist(), run_ends.tolist()):
+        owner, offset = int(owners[candidate]), int(offsets[candidate])
+        text, base = texts[owner], int(starts[owner])
+        start, end = start - base, end - base
+        # A run cut off by the region edge continues outside it
+        while start > offset and text[start - 1] == text[start - 1 - offset]:
+            start -= 1
+        while end < len(text) and text[end] == text[end - offset]:
+            end += 1
+        runs.setdefault(owner, set()).add((start, end, offset))
+
+    cuts: Dict[int, list] = {}
+    for owner, owner_runs in runs.items():
+        # Edited words split a copy into runs, at other offsets if the length changed
+        for chain in _chain_runs(list(owner_runs)):
+            # A phrase recurring by chance: too short for a periodic copy (longer than its
+            # offset), too few equal characters for a whole copy even with an edited head
+            start, end, equal = chain[0], chain[1], chain[4]
+            if end - start <= REPEAT_CHARS and equal + MAX_HEAD < SIMILARITY * REPEAT_CHARS:
+                continue
+            cut = _whole_copy(texts[owner], *chain)
+            if cut is not None and cut[1] - cut[0] >= REPEAT_CHARS:
+                cuts.setdefault(owner, []).append(cut)
+    return {owner: _keep_sources(owner_cuts) for owner, owner_cuts in cuts.items()}
+
+
+def find_repeats(texts: Sequence[str]) -> List[List[Tuple[int, int]]]:
+    """Per text, the spans [start, end) that are whole copies of the text just before them"""
+    result: List[List[Tuple[int, int]]] = [[] for _ in texts]
+    # A second half repeating the first, in texts of any length
+    for i, text in enumerate(texts):
+        half = _second_half(text)
+        if half is not None:
+            result[i] = [(half, len(text))]
+
+    lengths = np.fromiter(map(len, texts), dtype=np.int64, count=len(texts))
+    windows, sampling = _window_and_sampling(np.array([REPEAT_CHARS]))
+    # A copy of at least REPEAT_CHARS characters needs twice that
+    eligible = [i for i in np.flatnonzero(lengths >= 2 * REPEAT_CHARS).tolist() if not result[i]]
+    for batch in _batches(eligible, lengths):
+        found = _batch_repeats([texts[i] for i in batch], int(windows[0]), int(sampling[0]))
+        for local, spans in found.items():
+            result[batch[local]] = spans
+    return result
+
+
+def collapse_repeats(texts: Sequence[str]) -> List[str]:
+    """Texts with every repeated copy of an earlier span removed (texts without one are returned as is).
+
+    Texts that lost a copy are searched again, up to COLLAPSE_ROUNDS times, for copies that
+    overlapped the removed one ("A A A" loses the second copy, then the third).
+    """
+    result = list(texts)
+    pending = list(range(len(result)))
+    for _ in range(COLLAPSE_ROUNDS):
+        changed = []
+        for i, spans in zip(pending, find_repeats([result[i] for i in pending])):
+            if spans:
+                result[i] = _cut(result[i], spans)
+                changed.append(i)
+        if not changed:
+            break
+        pending = changed
+    return result
+
+
+def collapse_repeat(text: str) -> str:
+    """collapse_repeats() for a single text"""
+    return collapse_repeats([text])[0]
+
+
+def find_shared_spans(texts: Sequence[str], min_chars: int = REPEAT_CHARS, max_group: int = MAX_GROUP,
+                      min_anchors: int = ANCHORS_PER_SPAN // 2) -> List[Tuple[int, int, int]]:
+    """Pairs of texts sharing verbatim spans of about min_chars or more: [(i, j, shared anchors)], i < j.
+
+    A shared span of min_chars characters gives about ANCHORS_PER_SPAN shared anchors, longer
+    spans more; pairs with fewer than min_anchors (chance hash collisions) are left out.
+    Sorted by shared anchors, most first.
+    """
+    windows, sampling = _window_and_sampling(np.array([max(min_chars, 2 * MIN_WINDOW)]))
+    window, rate = int(windows[0]), int(sampling[0])
+    lengths = [len(text) for text in texts]
+    anchor_keys = []
+    for batch in _batches(range(len(texts)), lengths):
+        codes = _code_points([texts[i] for i in batch])
+        ends = np.cumsum([lengths[i] for i in batch])
+        positions, hashes = _anchors(codes, ends, window, rate)
+        text_of = np.searchsorted(ends, positions, side='right') + batch[0]
+        # (hash, text); one anchor per hash and text is enough
+        anchor_keys.append(np.unique(hashes.astype(np.uint64) << np.uint64(32) | text_of.astype(np.uint64)))
+    if not anchor_keys:
+        return []
+    keys = np.sort(np.concatenate(anchor_keys))
+    hashes = keys >> np.uint64(32)
+    text_of = (keys & np.uint64(0xFFFFFFFF)).astype(np.int64)
+
+    boundaries = np.flatnonzero(np.concatenate(([True], hashes[1:] != hashes[:-1], [True])))
+    sizes = np.diff(boundaries)
+    pair_counts: Counter = Counter()
+    for group in np.flatnonzero((sizes >= 2) & (sizes <= max_group)):
+        members = text_of[boundaries[group]:boundaries[group + 1]].tolist()
+        for a in range(len(members)):
+            for b in range(a + 1, len(members)):
+                pair_counts[members[a], members[b]] += 1
+    return [(i, j, count) for (i, j), count in pair_counts.most_common() if count >= min_anchors]
+
+
+def longest_common_span(first: str, second: str) -> str:
+    """The longest span two texts share (for reports)"""
+    matcher = difflib.SequenceMatcher(None, first, second, autojunk=False)
+    match = matcher.find_longest_match(0, len(first), 0, len(second))
+    return first[match.a:match.a + match.size]
+
+
+def main():
+    from dataset_io import iter_records
+
+    parser = argparse.ArgumentParser(description='Report repeated spans within and across texts of a dataset')
+    parser.add_argument('path', type=str, help='JSON, JSON Lines or manifest file with records')
+    parser.add_argument('--field', type=str, default='text', help='Record field with the text (default: text)')
+    parser.add_argument('--min-chars', type=int, default=REPEAT_CHARS,
+                        help=f'Shortest shared span reported across texts (default: {REPEAT_CHARS})')
+    parser.add_argument('--top', type=int, default=10, help='Shared pairs to show (default: 10)')
+    args = parser.parse_args()
+
+    path = Path(args.path)
+    if not path.exists():
+        print(f"ERROR: File not found: {path}")
+        sys.exit(1)
+    records = [record for record in iter_records(path) if isinstance(record.get(args.field), str)]
+    texts = [strip_markers(record[args.field]) for record in records]
+    print(f"📖 {len(texts)} texts, {sum(map(len, texts)):,} characters")
+
+    start = time.perf_counter()
+    repeats = find_repeats(texts)
+    elapsed = time.perf_counter() - start
+    repeated = [i for i, spans in enumerate(repeats) if spans]
+    removed = sum(end - start for spans in repeats for start, end in spans)
+    print(f"\n🔁 Repeats within a text: {len(repeated)} texts, {removed:,} characters ({elapsed:.2f}s)")
+    for i in repeated[:args.top]:
+        start, end = repeats[i][0]
+        print(f"   {records[i].get('id', i)}: {texts[i][start:end][:80]!r}")
+
+    start = time.perf_counter()
+    pairs = find_shared_spans(texts, args.min_chars)
+    elapsed = time.perf_counter() - start
+    cross_language = sum(1 for i, j, _ in pairs if records[i].get('language') != records[j].get('language'))
+    print(f"\n🔗 Texts sharing spans of ~{args.min_chars}+ characters: {len(pairs)} pairs, "
+          f"{cross_language} across languages ({elapsed:.2f}s)")
+    for i, j, anchors in pairs[:args.top]:
+        span = longest_common_span(texts[i], texts[j])
+        print(f"   {records[i].get('id', i)} ~ {records[j].get('id', j)}: {anchors} anchors, "
+              f"longest {len(span)} chars: {span[:60]!r}")
+
+
+if __name__ == '__main__':
+    # Настройка кодировки для Windows (только при запуске как скрипт)
+    if sys.platform == 'win32':
+        import io
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+        sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+    main()
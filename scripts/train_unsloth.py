@@ -24,7 +24,7 @@ def main():
                        help='Model name from HuggingFace or local path')
     parser.add_argument('--dataset_path', type=str,
                        default='finetuning_data/unsloth_training_dataset.json',
-                       help='Path to training dataset JSON file')
+                       help='Path to training dataset JSON file or shard manifest (.manifest.json)')
     parser.add_argument('--output_dir', type=str, default='outputs',
                        help='Output directory for trained model')
     parser.add_argument('--max_seq_length', type=int, default=2048,
@@ -70,8 +70,13 @@ def main():
         return
     
     print(f"\nLoading dataset from {dataset_path}...")
-    with open(dataset_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    if dataset_path.name.endswith('.manifest.json'):
+        # Sharded dataset (prepare_unsloth_dataset.py --shard-size)
+        from dataset_io import ShardedDataset
+        data = list(ShardedDataset(dataset_path))
+    else:
+        with open(dataset_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
     
     print(f"Loaded {len(data)} entries")
     
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Single-pass scanner for Travels in Calradia text extracted from the Digital Companion
+
+The extracted files hold the novella in two layouts:
+
+- string tables: <string id="travels_in_calradia_chapter_N_page_M" text="..." />
+  (and ..._chapter_N_title), with C-style escapes (\\" \\n) in some files and
+  XML entities (&quot;) in others, and {newline} markers; texts may be
+  hard-wrapped over several lines
+- book XML: <Chapter Index="N" Title="..."> followed by <Page Index="M" ... Text="..." />
+  up to the next chapter or </Book>
+
+Which escapes a string table uses depends on the file, so callers pass
+them (string_escapes); page texts of the book XML always have entities
+decoded, chapter titles are kept as they are.
+
+scan_travels() walks a memory-mapped file once with one compiled pattern
+that matches the start of all of these tags, reads each text up to its
+terminator and yields (chapter, page, text) records as it goes (page is
+None for a chapter title). The file is never read into memory: the
+scan itself holds one record at a time, plus the mapped pages it has
+touched, which count as resident page cache the OS can drop. Callers
+that keep the records (read_chapters(), TravelsParser.parse_file())
+hold all decoded text, about twice the file size for Cyrillic text
+(a 92 MB file peaks at ~215 MB). scan_strings() does the same for any
+string table ids, e.g. the faction descriptions.
+
+    for chapter, page, text in scan_travels(Path('wiki_data/travels_calradia/1.txt'), join_lines=True):
+        ...
+    chapters, found = read_chapters(Path('wiki_data/travels_calradia/3.txt'))
+"""
+
+import contextlib
+import mmap
+import re
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+# Starts of the tags holding travels text: string table entry, chapter, page, end of the book.
+# The common "<" stays outside the alternation, so the search can skip ahead to it.
+_TRAVELS_TOKEN = re.compile(
+    rb'<(?:(?i:string\s+id="travels_in_calradia_chapter_(\d+)_(?:page_(\d+)|title)"\s+text=")'
+    rb'|Chapter\s+Index="(\d+)"\s+Title="([^"]*)"[^>]*>'
+    rb'|Page\s+Index="(\d+)"[^>]*?Text="'
+    rb'|/Book>)')
+
+# A string table text ends at the quote that closes the tag (quotes inside may be unescaped)
+_STRING_END = re.compile(rb'"\s*/>')
+
+# Line ends of hard-wrapped texts
+_LINE_END = re.compile(r'\r\n|\r|\n')
+
+# Escapes by the character that starts them (replacements are skipped for texts without it)
+_ESCAPES = {
+    '\\': (('\\"', '"'), ('\\n', '\n'), ('\\t', '\t')),
+    '&': (('&quot;', '"'), ('&lt;', '<'), ('&gt;', '>')),
+    '{': (('{newline}', '\n'),),
+}
+
+# String table escapes when the caller does not name them: C-style escapes and {newline}
+STRING_ESCAPES = '\\{'
+
+
+@contextlib.contextmanager
+def map_file(path: Path) -> Iterator[bytes]:
+    """Read-only memory map of a file (an empty bytes object for an empty file)"""
+    with open(path, 'rb') as f:
+        if f.seek(0, 2) == 0:
+            yield b''
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield data
+
+
+def decode_text(raw: bytes, join_lines: bool = False, escapes: str = ''.join(_ESCAPES)) -> str:
+    """Text of a tag: UTF-8 (invalid bytes dropped) with the escapes starting with a character
+    of `escapes` decoded (all by default).
+
+    join_lines: join hard-wrapped lines, dropping line ends and the whitespace before them.
+    """
+    text = raw.decode('utf-8', errors='ignore')
+    if join_lines and ('\n' in text or '\r' in text):
+        *lines, last = _LINE_END.split(text)
+        text = ''.join([line.rstrip() for line in lines] + [last])
+    for start in escapes:
+        if start in text:
+            for escaped, plain in _ESCAPES[start]:
+                text = text.replace(escaped, plain)
+    return text
+
+
+def _string_text(data: bytes, start: int) -> Tuple[bytes, int]:
+    """Raw text of a string table entry starting at `start` and the position after its tag"""
+    end = _STRING_END.search(data, start)
+    if end is None:
+        return data[start:], len(data)
+    return data[start:end.start()], end.end()
+
+
+def scan_travels(path: Path, join_lines: bool = False,
+                 string_escapes: str = STRING_ESCAPES) -> Iterator[Tuple[int, Optional[int], Optional[str]]]:
+    """(chapter, page, text) for every travels text of the file, in file order; page is None for a title.
+
+    String table texts have string_escapes decoded (see decode_text()); the text of an empty
+    book XML chapter title is None, of an empty string table title ''.
+    """
+    with map_file(path) as data:
+        chapter = None
+        position = 0
+        while True:
+            token = _TRAVELS_TOKEN.search(data, position)
+            if token is None:
+                return
+            position = token.end()
+            string_chapter, string_page, chapter_index, title, page_index = token.groups()
+
+            if string_chapter is not None:
+                raw, position = _string_text(data, position)
+                yield (int(string_chapter), int(string_page) if string_page is not None else None,
+                       decode_text(raw, join_lines, string_escapes))
+            elif chapter_index is not None:
+                chapter = int(chapter_index)
+                yield chapter, None, decode_text(title, escapes='') or None
+            elif page_index is not None:
+                # XML attribute: the first quote ends it
+                end = data.find(b'"', position)
+                end = len(data) if end == -1 else end
+                raw, position = data[position:end], end + 1
+                if chapter is not None:
+                    yield chapter, int(page_index), decode_text(raw, escapes='&').strip()
+            else:
+                # </Book>: pages after it belong to no chapter
+                chapter = None
+
+
+def read_chapters(path: Path, join_lines: bool = False,
+                  string_escapes: str = STRING_ESCAPES) -> Tuple[Dict[int, Dict[str, Any]], int]:
+    """Chapters of a file as {number: {'chapter', 'title', 'pages': {page: text}}}, sorted,
+    and the number of texts found. Titles as scan_travels() gives them; None if there is none."""
+    chapters: Dict[int, Dict[str, Any]] = defaultdict(lambda: {
+        'chapter': 0,
+        'title': None,
+        'pages': {}
+    })
+    found = 0
+    for chapter, page, text in scan_travels(path, join_lines, string_escapes):
+        chapters[chapter]['chapter'] = chapter
+        if page is None:
+            chapters[chapter]['title'] = text
+        else:
+            chapters[chapter]['pages'][page] = text
+        found += 1
+    return dict(sorted(chapters.items())), found
+
+
+def scan_strings(path: Path, id_pattern: bytes, join_lines: bool = False,
+                 escapes: str = STRING_ESCAPES) -> Iterator[Tuple[str, str]]:
+    """(id, text) of the string table entries whose id matches id_pattern (a bytes regex), in file order,
+    with `escapes` decoded"""
+    token = re.compile(rb'(?i:<string\s+id="(' + id_pattern + rb')"\s+text=")')
+    with map_file(path) as data:
+        position = 0
+        while True:
+            match = token.search(data, position)
+            if match is None:
+                return
+            raw, position = _string_text(data, match.end())
+            yield match.group(1).decode('utf-8', errors='ignore'), decode_text(raw, join_lines, escapes)
@@ -0,0 +1,677 @@
+#!/usr/bin/env python3
+"""
+Reader for Unity asset bundles (UnityFS) and the localization string tables in them
+
+The Digital Companion keeps its texts in Addressables bundles built with the
+Unity Localization package: StringTable assets (entry id -> text, one per
+language and table collection) and SharedTableData assets (entry id -> key,
+shared by all languages). A bundle is a header, a block table and a stream
+of LZ4 or LZMA compressed blocks holding serialized files (CAB-...) with the
+assets.
+
+UnityBundle memory-maps the file, parses the header and the block table and
+decompresses a block only when a read touches it (an LZMA block only as far
+as read), so the blocks of textures, fonts and audio are never decompressed.
+SerializedFile parses the object table and the type trees of a serialized
+file and reads objects through their type trees, top-level field by field,
+stopping after the last field asked for.
+
+    with UnityBundle(Path('localization-string-tables-english(en)_assets_all.bundle')) as bundle:
+        for table in iter_string_tables(bundle):
+            ...
+    for record in localization_records(bundle_paths):
+        ...   # {'language', 'table', 'id', 'key', 'text'}
+
+LZ4 blocks need the lz4 package (pip install lz4); LZMA uses the standard library.
+"""
+
+import argparse
+import bisect
+import contextlib
+import functools
+import lzma
+import re
+import struct
+import sys
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from travels_scanner import map_file
+
+# Archive flags of the bundle header
+_COMPRESSION_MASK = 0x3F
+_BLOCKS_INFO_AT_END = 0x80
+_BLOCK_INFO_PADDING = 0x200
+# Unity CN encryption: 0x200 before the padding flag took that bit, 0x400 after
+_ENCRYPTION_OLD = 0x200
+_ENCRYPTION = 0x400
+
+# Compression of the block table and of the blocks (flags & _COMPRESSION_MASK)
+COMPRESSIONS = {0: 'none', 1: 'lzma', 2: 'lz4', 3: 'lz4hc'}
+
+# Node flag of serialized files (the others are resources: .resS, .resource)
+_NODE_SERIALIZED_FILE = 0x4
+
+# LZMA blocks are decompressed in steps of at least this much
+_LZMA_STEP = 1024 * 1024
+
+# Type tree meta flag: the value is followed by padding to 4 bytes
+_ALIGN_BYTES = 0x4000
+
+# Class id of MonoBehaviour (the Localization package assets are MonoBehaviours)
+MONO_BEHAVIOUR = 114
+
+# Top-level fields telling the Localization package assets apart (and read from them)
+STRING_TABLE_FIELDS = ('m_Name', 'm_LocaleId', 'm_SharedData', 'm_TableData')
+SHARED_TABLE_FIELDS = ('m_Name', 'm_TableCollectionName', 'm_Entries')
+
+# Type tree names with the high bit set are offsets in this buffer of Unity's common strings
+_COMMON_STRING_NAMES = (
+    'AABB', 'AnimationClip', 'AnimationCurve', 'AnimationState', 'Array', 'Base', 'BitField', 'bitset',
+    'bool', 'char', 'ColorRGBA', 'Component', 'data', 'deque', 'double', 'dynamic_array',
+    'FastPropertyName', 'first', 'float', 'Font', 'GameObject', 'Generic Mono', 'GradientNEW', 'GUID',
+    'GUIStyle', 'int', 'list', 'long long', 'map', 'Matrix4x4f', 'MdFour', 'MonoBehaviour', 'MonoScript',
+    'm_ByteSize', 'm_Curve', 'm_EditorClassIdentifier', 'm_EditorHideFlags', 'm_Enabled', 'm_ExtensionPtr',
+    'm_GameObject', 'm_Index', 'm_IsArray', 'm_IsStatic', 'm_MetaFlag', 'm_Name', 'm_ObjectHideFlags',
+    'm_PrefabInternal', 'm_PrefabParentObject', 'm_Script', 'm_StaticEditorFlags', 'm_Type', 'm_Version',
+    'Object', 'pair', 'PPtr<Component>', 'PPtr<GameObject>', 'PPtr<Material>', 'PPtr<MonoBehaviour>',
+    'PPtr<MonoScript>', 'PPtr<Object>', 'PPtr<Prefab>', 'PPtr<Sprite>', 'PPtr<TextAsset>', 'PPtr<Texture>',
+    'PPtr<Texture2D>', 'PPtr<Transform>', 'Prefab', 'Quaternionf', 'Rectf', 'RectInt', 'RectOffset',
+    'second', 'set', 'short', 'size', 'SInt16', 'SInt32', 'SInt64', 'SInt8', 'staticvector', 'string',
+    'TextAsset', 'TextMesh', 'Texture', 'Texture2D', 'Transform', 'TypelessData', 'UInt16', 'UInt32',
+    'UInt64', 'UInt8', 'unsigned int', 'unsigned long long', 'unsigned short', 'vector', 'Vector2f',
+    'Vector3f', 'Vector4f', 'm_ScriptingClassIdentifier', 'Gradient', 'Type*', 'int2_storage',
+    'int3_storage', 'BoundsInt', 'm_CorrespondingSourceObject', 'm_PrefabInstance', 'm_PrefabAsset',
+    'FileSize', 'Hash128', 'RenderingLayerMask', 'fixed_array', 'EntityId', 'LoadableObjectId',
+    'LoadableSceneId',
+)
+_COMMON_STRINGS: Dict[int, str] = {}
+_offset = 0
+for _name in _COMMON_STRING_NAMES:
+    _COMMON_STRINGS[_offset] = _name
+    _offset += len(_name) + 1
+del _offset, _name
+
+# struct formats of the primitive type tree types
+_PRIMITIVES = {
+    'bool': '?', 'SInt8': 'b', 'UInt8': 'B', 'char': 'B',
+    'short': 'h', 'SInt16': 'h', 'unsigned short': 'H', 'UInt16': 'H',
+    'int': 'i', 'SInt32': 'i', 'unsigned int': 'I', 'UInt32': 'I', 'Type*': 'I',
+    'long long': 'q', 'SInt64': 'q', 'unsigned long long': 'Q', 'UInt64': 'Q', 'FileSize': 'Q',
+    'float': 'f', 'double': 'd',
+}
+# Leaves of other types, read as unsigned integers of their size
+_SIZED_LEAVES = {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}
+
+
+@functools.lru_cache(maxsize=None)
+def _struct(fmt: str) -> struct.Struct:
+    return struct.Struct(fmt)
+
+
+class _BinaryReader:
+    """Cursor over bytes in one byte order ('<' or '>')"""
+
+    def __init__(self, data: bytes, endian: str, position: int = 0):
+        self.data = data
+        self.endian = endian
+        self.position = position
+
+    def unpack(self, fmt: str) -> Tuple[Any, ...]:
+        packed = _struct(self.endian + fmt)
+        values = packed.unpack_from(self.data, self.position)
+        self.position += packed.size
+        return values
+
+    def value(self, fmt: str) -> Any:
+        return self.unpack(fmt)[0]
+
+    def array(self, fmt: str, count: int) -> List[Any]:
+        values = struct.unpack_from(f'{self.endian}{count}{fmt}', self.data, self.position)
+        self.position += struct.calcsize(f'{self.endian}{count}{fmt}')
+        return list(values)
+
+    def bytes(self, size: int) -> bytes:
+        if size < 0 or self.position + size > len(self.data):
+            raise ValueError(f"Read of {size} bytes at {self.position} past the end of {len(self.data)} bytes")
+        value = self.data[self.position:self.position + size]
+        self.position += size
+        return value
+
+    def cstring(self) -> str:
+        end = self.data.find(b'\0', self.position)
+        if end == -1:
+            raise ValueError(f"Unterminated string at {self.position}")
+        value = self.data[self.position:end].decode('utf-8', 'replace')
+        self.position = end + 1
+        return value
+
+    def align(self, size: int):
+        self.position += -self.position % size
+
+
+def _unity_release(version: str) -> Tuple[int, ...]:
+    """(major, minor, patch) of a Unity version string such as 2021.3.5f1 (zeros if unknown)"""
+    match = re.match(r'(\d+)\.(\d+)\.(\d+)', version)
+    return tuple(map(int, match.groups())) if match else (0, 0, 0)
+
+
+def _lzma_decompressor(properties: bytes) -> lzma.LZMADecompressor:
+    """Raw LZMA1 decompressor for Unity's 5-byte header (lc/lp/pb byte, dictionary size)"""
+    packed, dict_size = struct.unpack('<BI', properties)
+    return lzma.LZMADecompressor(format=lzma.FORMAT_RAW, filters=[{
+        'id': lzma.FILTER_LZMA1,
+        'lc': packed % 9,
+        'lp': packed // 9 % 5,
+        'pb': packed // 45,
+        'dict_size': dict_size,
+    }])
+
+
+def decompress(data: bytes, compression: int, size: int) -> bytes:
+    """`size` bytes from data compressed as COMPRESSIONS[compression]"""
+    if compression == 0:
+        return bytes(data)
+    if compression == 1:
+        return _lzma_decompressor(data[:5]).decompress(data[5:], max_length=size)
+    if compression in (2, 3):
+        try:
+            import lz4.block
+        except ImportError:
+            raise ImportError("LZ4 compressed bundles need the lz4 package: pip install lz4")
+        return lz4.block.decompress(data, uncompressed_size=size)
+    raise ValueError(f"Unsupported bundle compression: {compression}")
+
+
+class BundleNode(NamedTuple):
+    """File inside a bundle: a range of the uncompressed data"""
+    offset: int
+    size: int
+    flags: int
+    path: str
+
+
+class _Block(NamedTuple):
+    offset: int     # in the uncompressed data
+    size: int
+    start: int      # in the bundle file
+    compressed_size: int
+    flags: int
+
+
+class _OpenBlock:
+    """The decompressed block; an LZMA block keeps its decompressor to go further on demand"""
+
+    def __init__(self, index: int, data: bytes, decompressor: Optional[lzma.LZMADecompressor] = None,
+                 pending: bytes = b''):
+        self.index = index
+        self.data = data
+        self.decompressor = decompressor
+        self.pending = pending
+
+
+class UnityBundle:
+    """
+    UnityFS bundle, memory-mapped. read() returns a range of the uncompressed
+    data, decompressing only the blocks it is in; `blocks_read` counts the
+    blocks decompressed so far.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.blocks_read = 0
+        self._open: Optional[_OpenBlock] = None
+        self._files = contextlib.ExitStack()
+        self._data = self._files.enter_context(map_file(path))
+        try:
+            self._read_header()
+        except Exception:
+            self.close()
+            raise
+
+    def _read_header(self):
+        reader = _BinaryReader(self._data, '>')
+        signature = reader.cstring() if self._data else ''
+        if signature != 'UnityFS':
+            raise ValueError(f"{self.path.name}: not a UnityFS bundle")
+        self.format_version = reader.value('I')
+        self.player_version = reader.cstring()
+        self.unity_version = reader.cstring()
+        self.size, compressed_size, size, self.flags = reader.unpack('qIII')
+
+        release = _unity_release(self.unity_version)
+        # Unity 2020.3.34, 2021.3.2 and 2022.1.1 moved the encryption flag to make room for the padding flag
+        new_flags = (release >= (2022, 1, 1) or (2021, 3, 2) <= release < (2022,)
+                     or (2020, 3, 34) <= release < (2021,))
+        if self.flags & (_ENCRYPTION if new_flags else _ENCRYPTION_OLD):
+            raise ValueError(f"{self.path.name}: encrypted bundles are not supported")
+        if self.format_version >= 7 or (2019, 4, 15) <= release < (2020,):
+            reader.align(16)
+
+        if self.flags & _BLOCKS_INFO_AT_END:
+            info_start = len(self._data) - compressed_size
+            data_start = reader.position
+        else:
+            info_start = reader.position
+            data_start = info_start + compressed_size
+        if new_flags and self.flags & _BLOCK_INFO_PADDING:
+            data_start += -data_start % 16
+        info = decompress(self._data[info_start:info_start + compressed_size],
+                          self.flags & _COMPRESSION_MASK, size)
+
+        # Hash of the uncompressed data, blocks, nodes
+        reader = _BinaryReader(info, '>', 16)
+        self.blocks: List[_Block] = []
+        offset, start = 0, data_start
+        for _ in range(reader.value('i')):
+            block_size, block_compressed_size, block_flags = reader.unpack('IIH')
+            self.blocks.append(_Block(offset, block_size, start, block_compressed_size, block_flags))
+            offset += block_size
+            start += block_compressed_size
+        self.data_size = offset
+        self._block_offsets = [block.offset for block in self.blocks]
+        self.nodes: List[BundleNode] = []
+        for _ in range(reader.value('i')):
+            node_offset, node_size, node_flags = reader.unpack('qqI')
+            self.nodes.append(BundleNode(node_offset, node_size, node_flags, reader.cstring()))
+
+    def _block_data(self, index: int, needed: int) -> bytes:
+        """Decompressed data of a block, at least its first `needed` bytes"""
+        block = self._open
+        if block is None or block.index != index:
+            info = self.blocks[index]
+            raw = self._data[info.start:info.start + info.compressed_size]
+            compression = info.flags & _COMPRESSION_MASK
+            if compression == 1:
+                block = _OpenBlock(index, bytearray(), _lzma_decompressor(raw[:5]), raw[5:])
+            else:
+                block = _OpenBlock(index, decompress(raw, compression, info.size))
+            self._open = block
+            self.blocks_read += 1
+
+        decompressor = block.decompressor
+        while decompressor is not None and len(block.data) < needed and not decompressor.eof:
+            chunk = decompressor.decompress(block.pending, max_length=max(needed - len(block.data), _LZMA_STEP))
+            block.pending = b''
+            if not chunk and decompressor.needs_input:
+                break
+            block.data += chunk
+        return block.data
+
+    def read(self, offset: int, size: int) -> bytes:
+        """`size` bytes of the uncompressed data from `offset`"""
+        end = offset + size
+        if offset < 0 or end > self.data_size:
+            raise ValueError(f"{self.path.name}: read of {offset}..{end} outside the {self.data_size} bytes of data")
+        parts = []
+        index = bisect.bisect_right(self._block_offsets, offset) - 1
+        while offset < end:
+            block = self.blocks[index]
+            data = self._block_data(index, min(end, block.offset + block.size) - block.offset)
+            parts.append(data[offset - block.offset:end - block.offset])
+            offset = block.offset + block.size
+            index += 1
+        data = b''.join(parts)
+        if len(data) != size:
+            raise ValueError(f"{self.path.name}: truncated block data")
+        return data
+
+    def serialized_files(self) -> Iterator['SerializedFile']:
+        """Serialized files of the bundle (its resource files are skipped)"""
+        for node in self.nodes:
+            if node.flags & _NODE_SERIALIZED_FILE:
+                yield SerializedFile(self, node)
+
+    def close(self):
+        self._open = None
+        self._files.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class TypeTreeNode(NamedTuple):
+    """Field of a type tree: type and field names, flags and the fields inside it"""
+    type: str
+    name: str
+    byte_size: int
+    meta_flag: int
+    children: List['TypeTreeNode']
+
+
+class SerializedObject(NamedTuple):
+    """Entry of the object table; offset is relative to the serialized file"""
+    path_id: int
+    offset: int
+    size: int
+    class_id: int
+    type_tree: Optional[TypeTreeNode]
+
+
+def _read_type_tree(reader: _BinaryReader, version: int) -> TypeTreeNode:
+    """Type tree blob: a flat list of nodes with levels, then a string buffer for their names"""
+    if version >= 23:
+        if reader.bytes(4) != b'mhtt':
+            raise ValueError("Invalid type tree blob")
+        reader.position += 4
+    count, strings_size = reader.unpack('ii')
+    node_struct = _struct(reader.endian + ('hBBIIiiiQ' if version >= 19 else 'hBBIIiii'))
+    nodes = reader.bytes(count * node_struct.size)
+    strings = reader.bytes(strings_size)
+
+    def name(offset: int) -> str:
+        if offset & 0x80000000:
+            offset &= 0x7FFFFFFF
+            return _COMMON_STRINGS.get(offset, str(offset))
+        return strings[offset:strings.index(b'\0', offset)].decode('utf-8', 'replace')
+
+    root = None
+    parents: List[TypeTreeNode] = []
+    for _, level, _, type_offset, name_offset, byte_size, _, meta_flag, *_ in node_struct.iter_unpack(nodes):
+        node = TypeTreeNode(name(type_offset), name(name_offset), byte_size, meta_flag, [])
+        del parents[level:]
+        if parents:
+            parents[-1].children.append(node)
+        else:
+            root = node
+        parents.append(node)
+    if root is None:
+        raise ValueError("Empty type tree")
+    return root
+
+
+def _read_value(reader: _BinaryReader, node: TypeTreeNode) -> Any:
+    """Value of a type tree field: a number, str, bytes, list or dict of the fields inside it"""
+    align = node.meta_flag & _ALIGN_BYTES
+    fmt = _PRIMITIVES.get(node.type)
+    if fmt is not None:
+        value = reader.value(fmt)
+    elif node.type == 'string':
+        value = reader.bytes(reader.value('i')).decode('utf-8', 'surrogateescape')
+        align = True
+    elif node.type == 'TypelessData':
+        value = reader.bytes(reader.value('i'))
+    elif node.type == 'ReferencedObjectData':
+        raise ValueError("SerializeReference data cannot be read without its type")
+    elif node.children and node.children[0].type == 'Array':
+        array = node.children[0]
+        align = align or array.meta_flag & _ALIGN_BYTES
+        count = reader.value('i')
+        if count < 0:
+            raise ValueError(f"Negative array size of {node.name}")
+        item = array.children[1]
+        item_fmt = _PRIMITIVES.get(item.type)
+        if item_fmt is not None and not item.meta_flag & _ALIGN_BYTES:
+            value = reader.array(item_fmt, count)
+        else:
+            value = [_read_value(reader, item) for _ in range(count)]
+    elif not node.children and node.byte_size in _SIZED_LEAVES:
+        value = reader.value(_SIZED_LEAVES[node.byte_size])
+    else:
+        value = {child.name: _read_value(reader, child) for child in node.children}
+    if align:
+        reader.align(4)
+    return value
+
+
+class SerializedFile:
+    """
+    Serialized file (CAB-...) inside a bundle: its object table, type trees
+    and external references. Objects are only read by read_object().
+    """
+
+    def __init__(self, bundle: UnityBundle, node: BundleNode):
+        self.bundle = bundle
+        self.node = node
+        self.name = node.path
+
+        # Header, always big-endian
+        header = _BinaryReader(bundle.read(node.offset, min(48, node.size)), '>')
+        metadata_size, _, self.version, self.data_offset = header.unpack('IIII')
+        if self.version < 9:
+            raise ValueError(f"{self.name}: serialized file version {self.version} is not supported")
+        endian = '>' if header.value('?') else '<'
+        header.position += 3
+        if self.version >= 22:
+            metadata_size, _, self.data_offset, _ = header.unpack('Iqqq')
+
+        # The header is 20 or 48 bytes, so alignment within the metadata is alignment within the file
+        reader = _BinaryReader(bundle.read(node.offset + header.position, metadata_size), endian)
+        self.endian = endian
+        self._read_metadata(reader)
+
+    def _read_type(self, reader: _BinaryReader, has_type_trees: bool) -> Tuple[int, Optional[TypeTreeNode]]:
+        version = self.version
+        class_id = reader.value('i')
+        if version >= 16:
+            reader.position += 1    # stripped
+        if version >= 17:
+            reader.position += 2    # script type index
+        if version >= 13:
+            if (version < 16 and class_id < 0) or (version >= 16 and class_id == MONO_BEHAVIOUR):
+                reader.position += 16   # script id
+            reader.position += 16       # type hash
+
+        type_tree = None
+        if has_type_trees:
+            has_blob = True
+            if version >= 23:
+                reader.position += 16   # type tree hash
+                has_blob = reader.value('i') > 0
+            if version < 12 and version != 10:
+                raise ValueError(f"{self.name}: type trees of version {version} are not supported")
+            if has_blob:
+                type_tree = _read_type_tree(reader, version)
+            if version >= 21:
+                dependencies = reader.value('i')
+                reader.position += 4 * dependencies
+        return class_id, type_tree
+
+    def _read_metadata(self, reader: _BinaryReader):
+        version = self.version
+        self.unity_version = reader.cstring()
+        reader.position += 4    # target platform
+        has_type_trees = reader.value('?') if version >= 13 else True
+        types = [self._read_type(reader, has_type_trees) for _ in range(reader.value('i'))]
+        types_by_class = dict(types)
+        big_ids = reader.value('i') if version < 14 else 0
+
+        self.objects: List[SerializedObject] = []
+        for _ in range(reader.value('i')):
+            if big_ids:
+                path_id = reader.value('q')
+            elif version < 14:
+                path_id = reader.value('i')
+            else:
+                reader.align(4)
+                path_id = reader.value('q')
+            start = reader.value('q' if version >= 22 else 'I')
+            size, type_id = reader.unpack('Ii')
+            if version < 16:
+                class_id = reader.value('H')
+                type_tree = types_by_class.get(type_id)
+            else:
+                class_id, type_tree = types[type_id]
+            if version < 17:
+                reader.position += 2    # destroyed flag or script type index
+            if version in (15, 16):
+                reader.position += 1    # stripped
+            self.objects.append(SerializedObject(path_id, self.data_offset + start, size, class_id, type_tree))
+
+        if version >= 11:
+            for _ in range(reader.value('i')):
+                # Script types: file index and path id
+                if version < 14:
+                    reader.position += 8
+                else:
+                    reader.position += 4
+                    reader.align(4)
+                    reader.position += 8
+
+        # External files, by path (archive:/CAB-.../CAB-...); PPtr file ids count from 1 here
+        self.externals: List[str] = []
+        for _ in range(reader.value('i')):
+            if version >= 6:
+                reader.cstring()
+            if version >= 5:
+                reader.position += 20   # GUID and type
+            self.externals.append(reader.cstring())
+
+    def objects_with_fields(self, class_id: int, fields: Iterable[str]) -> Iterator[SerializedObject]:
+        """Objects of a class whose type trees have all the top-level fields, in file order"""
+        fields = set(fields)
+        matches: Dict[int, bool] = {}
+        for obj in sorted(self.objects, key=lambda obj: obj.offset):
+            if obj.class_id != class_id or obj.type_tree is None:
+                continue
+            tree = id(obj.type_tree)
+            if tree not in matches:
+                matches[tree] = fields <= {child.name for child in obj.type_tree.children}
+            if matches[tree]:
+                yield obj
+
+    def read_object(self, obj: SerializedObject, fields: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """Top-level fields of an object; with `fields`, reading stops after the last of them"""
+        if obj.type_tree is None:
+            raise ValueError(f"{self.name}: object {obj.path_id} has no type tree")
+        reader = _BinaryReader(self.bundle.read(self.node.offset + obj.offset, obj.size), self.endian)
+        wanted = set(fields) if fields is not None else None
+        values = {}
+        for child in obj.type_tree.children:
+            values[child.name] = _read_value(reader, child)
+            if wanted is not None:
+                wanted.discard(child.name)
+                if not wanted:
+                    break
+        return values
+
+    def reference(self, pptr: Dict[str, int]) -> Tuple[str, int]:
+        """(serialized file name, path id) a PPtr points to; names are lower case"""
+        file_id = pptr['m_FileID']
+        name = self.name if file_id == 0 else self.externals[file_id - 1].rsplit('/', 1)[-1]
+        return name.lower(), pptr['m_PathID']
+
+
+class StringTable(NamedTuple):
+    """Texts of one language for a table collection"""
+    name: str
+    locale: str
+    shared_data: Tuple[str, int]        # SerializedFile.reference() of its SharedTableData
+    entries: List[Tuple[int, str]]      # (entry id, text)
+
+
+class SharedTableData(NamedTuple):
+    """Entry keys of a table collection, shared by its string tables"""
+    name: str
+    collection: str
+    entry_keys: Dict[int, str]
+
+
+def iter_string_tables(bundle: UnityBundle) -> Iterator[StringTable]:
+    """String tables of a bundle, in file order"""
+    for serialized in bundle.serialized_files():
+        for obj in serialized.objects_with_fields(MONO_BEHAVIOUR, STRING_TABLE_FIELDS):
+            values = serialized.read_object(obj, STRING_TABLE_FIELDS)
+            yield StringTable(
+                name=values['m_Name'],
+                locale=values['m_LocaleId'].get('m_Code', ''),
+                shared_data=serialized.reference(values['m_SharedData']),
+                entries=[(entry['m_Id'], entry['m_Localized']) for entry in values['m_TableData']]
+            )
+
+
+def iter_shared_tables(bundle: UnityBundle) -> Iterator[Tuple[Tuple[str, int], SharedTableData]]:
+    """(reference, shared table data) of a bundle, the reference as StringTable.shared_data"""
+    for serialized in bundle.serialized_files():
+        for obj in serialized.objects_with_fields(MONO_BEHAVIOUR, SHARED_TABLE_FIELDS):
+            values = serialized.read_object(obj, SHARED_TABLE_FIELDS)
+            yield (serialized.name.lower(), obj.path_id), SharedTableData(
+                name=values['m_Name'],
+                collection=values['m_TableCollectionName'],
+                entry_keys={entry['m_Id']: entry['m_Key'] for entry in values['m_Entries']}
+            )
+
+
+def table_records(table: StringTable, shared: Optional[SharedTableData] = None) -> Iterator[Dict[str, Any]]:
+    """Records of a string table; without its shared table data keys are None"""
+    name = shared.collection if shared is not None else table.name
+    keys = shared.entry_keys if shared is not None else {}
+    for entry_id, text in table.entries:
+        yield {
+            'language': table.locale,
+            'table': name,
+            'id': entry_id,
+            'key': keys.get(entry_id),
+            'text': text
+        }
+
+
+def read_shared_tables(paths: Iterable[Path]) -> Dict[Tuple[str, int], SharedTableData]:
+    """Shared table data of all the bundles, by reference"""
+    shared = {}
+    for path in paths:
+        with UnityBundle(path) as bundle:
+            shared.update(iter_shared_tables(bundle))
+    return shared
+
+
+def localization_records(paths: Iterable[Path]) -> Iterator[Dict[str, Any]]:
+    """Records {'language', 'table', 'id', 'key', 'text'} of the string tables of the bundles,
+    with keys from the shared table data in any of them"""
+    paths = list(paths)
+    shared = read_shared_tables(paths)
+    for path in paths:
+        with UnityBundle(path) as bundle:
+            for table in iter_string_tables(bundle):
+                yield from table_records(table, shared.get(table.shared_data))
+
+
+def main():
+    from dataset_io import JsonArrayWriter
+
+    parser = argparse.ArgumentParser(description='Show Unity bundles and extract their localization string tables')
+    parser.add_argument('bundles', type=str, nargs='+', help='Bundle files (with the shared table data bundle)')
+    parser.add_argument('--output', type=str, help='Write the localization records to this JSON file')
+    args = parser.parse_args()
+
+    paths = [Path(path) for path in args.bundles]
+    for path in paths:
+        if not path.exists():
+            print(f"ERROR: File not found: {path}")
+            sys.exit(1)
+
+    for path in paths:
+        with UnityBundle(path) as bundle:
+            compressions = Counter(COMPRESSIONS.get(block.flags & _COMPRESSION_MASK, '?') for block in bundle.blocks)
+            print(f"📦 {path.name}: UnityFS {bundle.format_version}, Unity {bundle.unity_version}, "
+                  f"{len(bundle.blocks)} blocks ({', '.join(f'{n} {name}' for name, n in compressions.items())}), "
+                  f"{bundle.data_size:,} bytes")
+            for node in bundle.nodes:
+                print(f"   {node.path}: {node.size:,} bytes")
+            tables = list(iter_string_tables(bundle))
+            shared = list(iter_shared_tables(bundle))
+            for table in tables:
+                print(f"   string table {table.name} ({table.locale}): {len(table.entries)} entries")
+            for _, data in shared:
+                print(f"   shared table data {data.name}: {len(data.entry_keys)} keys")
+            print(f"   {bundle.blocks_read} of {len(bundle.blocks)} blocks decompressed")
+
+    if args.output:
+        with JsonArrayWriter(Path(args.output)) as writer:
+            for record in localization_records(paths):
+                writer.write(record)
+        print(f"\n💾 {writer.count} records saved to: {args.output}")
+
+
+if __name__ == '__main__':
+    # Настройка кодировки для Windows (только при запуске как скрипт)
+    if sys.platform == 'win32':
+        import io
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+        sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+    main()
@@ -8,6 +8,8 @@ import sqlite3
 import sys
 from pathlib import Path
 
+from fts_index import create_synced_fts, rebuild as rebuild_fts
+
 # Настройка кодировки для Windows
 if sys.platform == 'win32':
     import io
@@ -18,6 +20,16 @@ if sys.platform == 'win32':
 class EncyclopediaDBManager:
     """Работа с готовой БД encyclopedia.db"""
     
+    # FTS таблица -> (content-таблица, индексируемые колонки)
+    FTS_INDEXES = {
+        'settlements_fts': ('settlements', ['name', 'text', 'wiki_description']),
+        'kingdoms_fts': ('kingdoms', ['name', 'text', 'wiki_description']),
+        'heroes_fts': ('heroes', ['id', 'wiki_biography']),
+        'npc_characters_fts': ('npc_characters', ['name', 'wiki_biography']),
+        'world_lore_fts': ('world_lore', ['text', 'wiki_title']),
+        'clans_fts': ('clans', ['name', 'text', 'wiki_description']),
+    }
+    
     def __init__(self, db_path: Path):
         self.db_path = db_path
         self.conn = None
@@ -26,6 +38,8 @@ class EncyclopediaDBManager:
         """Подключиться к БД"""
         self.conn = sqlite3.connect(str(self.db_path))
         self.conn.row_factory = sqlite3.Row
+        # REPLACE должен запускать DELETE-триггеры FTS для заменяемой строки
+        self.conn.execute('PRAGMA recursive_triggers = ON')
         return self.conn
     
     def close(self):
@@ -117,140 +131,23 @@ class EncyclopediaDBManager:
         print("✅ Indexes created")
     
     def create_fts_tables(self):
-        """Создать FTS5 таблицы для полнотекстового поиска"""
-        cursor = self.conn.cursor()
-        
-        # FTS для settlements
-        cursor.execute('''
-            CREATE VIRTUAL TABLE IF NOT EXISTS settlements_fts USING fts5(
-                name, text, wiki_description,
-                content='settlements',
-                content_rowid='rowid'
-            )
-        ''')
-        
-        # FTS для kingdoms
-        cursor.execute('''
-            CREATE VIRTUAL TABLE IF NOT EXISTS kingdoms_fts USING fts5(
-                name, text, wiki_description,
-                content='kingdoms',
-                content_rowid='rowid'
-            )
-        ''')
-        
-        # FTS для heroes
-        cursor.execute('''
-            CREATE VIRTUAL TABLE IF NOT EXISTS heroes_fts USING fts5(
-                id, wiki_biography,
-                content='heroes',
-                content_rowid='rowid'
-            )
-        ''')
-        
-        # FTS для npc_characters
-        cursor.execute('''
-            CREATE VIRTUAL TABLE IF NOT EXISTS npc_characters_fts USING fts5(
-                name, wiki_biography,
-                content='npc_characters',
-                content_rowid='rowid'
-            )
-        ''')
-        
-        # FTS для world_lore
-        cursor.execute('''
-            CREATE VIRTUAL TABLE IF NOT EXISTS world_lore_fts USING fts5(
-                text, wiki_title,
-                content='world_lore',
-                content_rowid='rowid'
-            )
-        ''')
-        
-        # FTS для clans
-        cursor.execute('''
-            CREATE VIRTUAL TABLE IF NOT EXISTS clans_fts USING fts5(
-                name, text, wiki_description,
-                content='clans',
-                content_rowid='rowid'
-            )
-        ''')
+        """Создать FTS5 таблицы и триггеры, которые поддерживают их в актуальном состоянии"""
+        for fts_table, (content_table, columns) in self.FTS_INDEXES.items():
+            create_synced_fts(self.conn, fts_table, content_table, columns)
         
         self.conn.commit()
         print("✅ FTS tables created")
     
     def populate_fts(self):
-        """Заполнить FTS таблицы"""
-        cursor = self.conn.cursor()
-        
-        # Удаляем и пересоздаём FTS таблицы
-        cursor.execute('DROP TABLE IF EXISTS settlements_fts')
-        cursor.execute('DROP TABLE IF EXISTS kingdoms_fts')
-        cursor.execute('DROP TABLE IF EXISTS heroes_fts')
-        cursor.execute('DROP TABLE IF EXISTS npc_characters_fts')
-        cursor.execute('DROP TABLE IF EXISTS world_lore_fts')
-        cursor.execute('DROP TABLE IF EXISTS clans_fts')
-        
-        # Пересоздаём FTS таблицы
-        self.create_fts_tables()
+        """Полностью перестроить FTS таблицы (только для восстановления).
         
-        # Заполняем FTS для settlements
-        try:
-            cursor.execute('''
-                INSERT INTO settlements_fts(rowid, name, text, wiki_description)
-                SELECT rowid, name, text, COALESCE(wiki_description, '')
-                FROM settlements
-            ''')
-        except Exception as e:
-            print(f"⚠️  Warning: Could not populate settlements_fts: {e}")
-        
-        # Заполняем FTS для kingdoms
-        try:
-            cursor.execute('''
-                INSERT INTO kingdoms_fts(rowid, name, text, wiki_description)
-                SELECT rowid, name, text, COALESCE(wiki_description, '')
-                FROM kingdoms
-            ''')
-        except Exception as e:
-            print(f"⚠️  Warning: Could not populate kingdoms_fts: {e}")
-        
-        # Заполняем FTS для heroes
-        try:
-            cursor.execute('''
-                INSERT INTO heroes_fts(rowid, id, wiki_biography)
-                SELECT rowid, id, COALESCE(wiki_biography, '')
-                FROM heroes
-            ''')
-        except Exception as e:
-            print(f"⚠️  Warning: Could not populate heroes_fts: {e}")
-        
-        # Заполняем FTS для npc_characters
-        try:
-            cursor.execute('''
-                INSERT INTO npc_characters_fts(rowid, name, wiki_biography)
-                SELECT rowid, name, COALESCE(wiki_biography, '')
-                FROM npc_characters
-            ''')
-        except Exception as e:
-            print(f"⚠️  Warning: Could not populate npc_characters_fts: {e}")
-        
-        # Заполняем FTS для world_lore
-        try:
-            cursor.execute('''
-                INSERT INTO world_lore_fts(rowid, text, wiki_title)
-                SELECT rowid, text, COALESCE(wiki_title, '')
-                FROM world_lore
-            ''')
-        except Exception as e:
-            print(f"⚠️  Warning: Could not populate world_lore_fts: {e}")
-        
-        # Заполняем FTS для clans
-        try:
-            cursor.execute('''
-                INSERT INTO clans_fts(rowid, name, text, wiki_description)
-                SELECT rowid, name, text, COALESCE(wiki_description, '')
-                FROM clans
-            ''')
-        except Exception as e:
-            print(f"⚠️  Warning: Could not populate clans_fts: {e}")
+        Обычно индексы обновляются триггерами, см. fts_index.py.
+        """
+        for fts_table in self.FTS_INDEXES:
+            try:
+                rebuild_fts(self.conn, fts_table)
+            except sqlite3.OperationalError as e:
+                print(f"⚠️  Warning: Could not populate {fts_table}: {e}")
         
         self.conn.commit()
         print("✅ FTS tables populated")
@@ -306,8 +203,8 @@ class EncyclopediaDBManager:
         self.connect()
         self.add_wiki_columns()
         self.create_indexes()
+        # Триггеры держат FTS в актуальном состоянии, полная перестройка не нужна
         self.create_fts_tables()
-        self.populate_fts()
         
         stats = self.get_statistics()
         print("\n" + "=" * 60)
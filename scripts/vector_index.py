@@ -0,0 +1,566 @@
+#!/usr/bin/env python3
+"""
+CPU vector index for semantic search over the lore tables
+
+Chunks the text of settlements_lore, characters_lore, factions_lore,
+world_lore and concepts (every language column) and embeds each chunk
+with a small CPU model (model2vec static embeddings by default,
+sentence-transformers as a fallback). The index lives in its own
+directory next to the database:
+
+    vectors.<generation>.f16   float16 matrix, one unit-length row per chunk (memory-mapped)
+    index.db                   chunk metadata, per-row text hashes, model name, IVF centroids
+
+Queries run a brute-force NumPy dot product over the matrix and return
+the top k chunks (scoring uses a float32 copy while the index is small
+enough, otherwise float16 blocks are converted on the fly). For larger corpora an IVF index
+(k-means lists, see --ivf) scores only the rows of the nprobe closest
+lists.
+
+Updates are incremental: each lore row's text is hashed, and only new or
+changed rows are re-embedded. Their old chunks are marked dead and new
+vectors are appended. Once dead rows make up a large share of the
+matrix, it is compacted into a new generation file.
+
+    index = VectorIndex(Path('Database/lore_vectors'))
+    index.update(Path('Database/bannerlord_lore.db'))
+    for hit in index.search('who rules the desert tribes', k=5, language='EN'):
+        print(hit['type'], hit['encyclopedia_id'], hit['score'], hit['text'][:80])
+
+Usage:
+    python vector_index.py [--db-path Database/bannerlord_lore.db] [--index-dir Database/lore_vectors] [--ivf]
+    python vector_index.py --query "text" [--language EN] [--types settlement faction] [-k 10]
+"""
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from context_packer import split_chunks
+from lore_search import LANGUAGES, connect_read_only
+
+# Multilingual static embeddings (EN/RU/TR), fast on CPU; a local model directory also works
+DEFAULT_MODEL = 'minishlab/potion-multilingual-128M'
+
+# Lore table -> (entity type, name column, text columns)
+LORE_SOURCES = {
+    'settlements_lore': ('settlement', 'name', ('description',)),
+    'characters_lore': ('character', 'name', ('description', 'biography')),
+    'factions_lore': ('faction', 'name', ('description',)),
+    'world_lore': ('world_lore', 'title', ('content',)),
+    'concepts': ('concept', 'name', ('description',)),
+}
+SOURCE_TABLES = list(LORE_SOURCES)
+
+# Chunks embedded per model call
+EMBED_BATCH = 256
+
+# Rows converted to float32 at a time while scoring
+SCORE_BLOCK = 32768
+
+# Converting float16 rows costs far more than the dot product itself, so a
+# float32 copy of the matrix is kept for scoring while it fits in this size
+FLOAT32_CACHE_BYTES = 512 * 1024 * 1024
+
+# Compact the matrix once this share of its rows is dead
+COMPACT_RATIO = 0.3
+
+# IVF: lists ~ sqrt(rows), k-means iterations and training sample, lists probed per query
+IVF_ITERATIONS = 10
+IVF_TRAIN_SAMPLE = 50000
+DEFAULT_NPROBE = 8
+
+# Exact search is used below this size even when an IVF index exists
+IVF_MIN_ROWS = 20000
+
+INDEX_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+    CREATE TABLE IF NOT EXISTS sources (
+        source_table TEXT NOT NULL,
+        encyclopedia_id TEXT NOT NULL,
+        text_hash TEXT NOT NULL,
+        PRIMARY KEY (source_table, encyclopedia_id)
+    );
+    CREATE TABLE IF NOT EXISTS chunks (
+        vector_id INTEGER PRIMARY KEY,
+        source_table TEXT NOT NULL,
+        encyclopedia_id TEXT NOT NULL,
+        language TEXT NOT NULL,
+        name TEXT,
+        text TEXT NOT NULL,
+        alive INTEGER NOT NULL DEFAULT 1,
+        list_id INTEGER
+    );
+    CREATE INDEX IF NOT EXISTS idx_chunks_source ON chunks(source_table, encyclopedia_id);
+    CREATE TABLE IF NOT EXISTS centroids (
+        list_id INTEGER PRIMARY KEY,
+        vector BLOB NOT NULL
+    );
+'''
+
+
+class Embedder:
+    """Sentence embeddings on CPU: model2vec, or sentence-transformers if that is what is installed"""
+
+    def __init__(self, model_name: str = DEFAULT_MODEL):
+        self.model_name = model_name
+        try:
+            from model2vec import StaticModel
+            model = StaticModel.from_pretrained(model_name)
+            self._encode = lambda texts: model.encode(list(texts))
+            return
+        except ImportError:
+            pass
+
+        try:
+            from sentence_transformers import SentenceTransformer
+            model = SentenceTransformer(model_name, device='cpu')
+            self._encode = lambda texts: model.encode(list(texts), batch_size=64)
+        except ImportError:
+            raise ImportError("No embedding backend installed: pip install model2vec "
+                              "(or sentence-transformers)")
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        """Unit-length float32 vectors, one row per text"""
+        vectors = np.asarray(self._encode(texts), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+def row_chunks(row: sqlite3.Row, name_column: str, text_columns: Sequence[str]) -> List[Tuple[str, str, str]]:
+    """(language, name, chunk text) for every language column of a lore row"""
+    keys = row.keys()
+    chunks = []
+    for language in LANGUAGES:
+        suffix = language.lower()
+        name = (row[f"{name_column}_{suffix}"] if f"{name_column}_{suffix}" in keys else None) or row[name_column]
+        for column in text_columns:
+            text = row[f"{column}_{suffix}"] if f"{column}_{suffix}" in keys else None
+            if not text:
+                continue
+            for chunk in split_chunks(text):
+                # The name gives short chunks their subject
+                chunks.append((language, name, f"{name}: {chunk}" if name else chunk))
+    return chunks
+
+
+def text_hash(chunks: List[Tuple[str, str, str]]) -> str:
+    return hashlib.sha1(repr(chunks).encode('utf-8')).hexdigest()
+
+
+def kmeans(vectors: np.ndarray, lists: int, iterations: int, rng: np.random.Generator) -> np.ndarray:
+    """Spherical k-means: unit-length centroids maximizing the dot product"""
+    centroids = vectors[rng.choice(len(vectors), lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        for list_id in range(lists):
+            members = vectors[assignment == list_id]
+            if len(members):
+                centroids[list_id] = members.sum(axis=0)
+            else:
+                # Empty list: restart it at a random vector
+                centroids[list_id] = vectors[rng.integers(len(vectors))]
+        centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+    return centroids
+
+
+class VectorIndex:
+    """Memory-mapped float16 embedding index with incremental updates"""
+
+    def __init__(self, index_dir: Path, model_name: Optional[str] = None,
+                 embedder: Optional[Embedder] = None):
+        self.index_dir = Path(index_dir)
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        # Any thread may use the index, one at a time (HybridRetriever queries it from its own thread)
+        self.conn = sqlite3.connect(str(self.index_dir / 'index.db'), check_same_thread=False)
+        self.conn.executescript(INDEX_SCHEMA)
+
+        stored_model = self._meta('model')
+        self.model_name = model_name or stored_model or DEFAULT_MODEL
+        self._embedder = embedder
+        if stored_model and stored_model != self.model_name:
+            # Vectors of different models are not comparable
+            print(f"⚠️  Warning: Index was built with {stored_model}, rebuilding for {self.model_name}")
+            self._reset()
+
+        self._masks: Dict[tuple, np.ndarray] = {}
+        self._load()
+
+    # --- metadata ---
+
+    def _meta(self, key: str, default=None):
+        row = self.conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, key: str, value):
+        self.conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, str(value)))
+
+    def _vectors_path(self, generation: int) -> Path:
+        return self.index_dir / f'vectors.{generation}.f16'
+
+    @property
+    def embedder(self) -> Embedder:
+        if self._embedder is None:
+            self._embedder = Embedder(self.model_name)
+        return self._embedder
+
+    def _release_matrix(self):
+        """Drop every reference to the mapped matrix, so its file can be truncated or deleted
+        (Windows refuses both while the file is mapped)"""
+        self.matrix = None
+        self._scoring = None
+
+    def _remove_stale_vectors(self):
+        """Delete vector files of other generations (left by compact() or an interrupted update)"""
+        current = self._vectors_path(self.generation)
+        for path in self.index_dir.glob('vectors.*.f16'):
+            if path != current:
+                try:
+                    path.unlink()
+                except OSError:
+                    # Still mapped by another process: retried on the next load
+                    pass
+
+    def _reset(self):
+        for table in ('meta', 'sources', 'chunks', 'centroids'):
+            self.conn.execute(f'DELETE FROM {table}')
+        self.conn.commit()
+        self._release_matrix()
+        for path in self.index_dir.glob('vectors.*.f16'):
+            path.unlink()
+
+    def _load(self):
+        """Map the current matrix and load the per-row arrays used for filtering"""
+        self._release_matrix()
+        self.rows = int(self._meta('rows', 0))
+        self.dim = int(self._meta('dim', 0))
+        self.generation = int(self._meta('generation', 0))
+        self._masks.clear()
+
+        path = self._vectors_path(self.generation)
+        if self.rows and (not path.exists() or path.stat().st_size < self.rows * self.dim * 2):
+            # Metadata without its vectors: start over, as with a missing index.db
+            print(f"⚠️  Warning: {path.name} is missing or incomplete, the index will be rebuilt")
+            self._reset()
+            self.rows = self.dim = self.generation = 0
+        self._remove_stale_vectors()
+
+        if self.rows:
+            # Rows appended after the last commit (interrupted update) are not part of the index
+            expected = self.rows * self.dim * 2
+            if path.stat().st_size > expected:
+                with open(path, 'r+b') as f:
+                    f.truncate(expected)
+            self.matrix = np.memmap(path, dtype=np.float16, mode='r', shape=(self.rows, self.dim))
+        else:
+            self.matrix = np.zeros((0, self.dim), dtype=np.float16)
+
+        self.alive = np.zeros(self.rows, dtype=bool)
+        self.languages = np.zeros(self.rows, dtype=np.int8)
+        self.sources = np.zeros(self.rows, dtype=np.int8)
+        self.list_ids = np.full(self.rows, -1, dtype=np.int32)
+        for vector_id, alive, language, source_table, list_id in self.conn.execute(
+                'SELECT vector_id, alive, language, source_table, list_id FROM chunks'):
+            self.alive[vector_id] = alive
+            self.languages[vector_id] = LANGUAGES.index(language)
+            self.sources[vector_id] = SOURCE_TABLES.index(source_table)
+            self.list_ids[vector_id] = -1 if list_id is None else list_id
+
+        centroids = [np.frombuffer(blob, dtype=np.float32)
+                     for _, blob in self.conn.execute('SELECT list_id, vector FROM centroids ORDER BY list_id')]
+        self.centroids = np.vstack(centroids) if centroids else None
+
+    def close(self):
+        self.conn.close()
+
+    # --- updates ---
+
+    def update(self, db_path: Path, full: bool = False) -> Dict[str, int]:
+        """Embed new and changed lore rows, drop deleted ones. Returns counts."""
+        if full:
+            self._reset()
+            self._load()
+
+        lore = connect_read_only(db_path)
+        stored = {(table, encyclopedia_id): digest for table, encyclopedia_id, digest in
+                  self.conn.execute('SELECT source_table, encyclopedia_id, text_hash FROM sources')}
+
+        changed = []   # (table, encyclopedia_id, hash, chunks)
+        seen = set()
+        for table, (_, name_column, text_columns) in LORE_SOURCES.items():
+            if not lore.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone():
+                continue
+            for row in lore.execute(f'SELECT * FROM {table}'):
+                key = (table, row['encyclopedia_id'])
+                seen.add(key)
+                chunks = row_chunks(row, name_column, text_columns)
+                digest = text_hash(chunks)
+                if stored.get(key) != digest:
+                    changed.append((table, row['encyclopedia_id'], digest, chunks))
+        lore.close()
+        deleted = [key for key in stored if key not in seen]
+
+        texts = [(table, encyclopedia_id, language, name, text)
+                 for table, encyclopedia_id, _, chunks in changed for language, name, text in chunks]
+        try:
+            self.conn.execute('BEGIN')
+            for key in [(table, encyclopedia_id) for table, encyclopedia_id, _, _ in changed] + deleted:
+                self.conn.execute('UPDATE chunks SET alive = 0 WHERE source_table = ? AND encyclopedia_id = ?', key)
+            self.conn.executemany('DELETE FROM sources WHERE source_table = ? AND encyclopedia_id = ?', deleted)
+
+            if texts:
+                self._append(texts)
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO sources (source_table, encyclopedia_id, text_hash) VALUES (?, ?, ?)',
+                [(table, encyclopedia_id, digest) for table, encyclopedia_id, digest, _ in changed]
+            )
+            self._set_meta('model', self.model_name)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            # Drops vectors appended by the failed update
+            self._load()
+            raise
+
+        self._load()
+        dead = int(self.rows - self.alive.sum())
+        if self.rows and dead > COMPACT_RATIO * self.rows:
+            self.compact()
+        return {'changed_rows': len(changed), 'deleted_rows': len(deleted), 'chunks': len(texts),
+                'vectors': int(self.alive.sum())}
+
+    def _append(self, texts: List[Tuple[str, str, str, str, str]]):
+        """Embed chunks and append them to the matrix (metadata in the open transaction)"""
+        path = self._vectors_path(self.generation)
+        vector_id = self.rows
+        with open(path, 'ab' if self.rows else 'wb') as f:
+            for start in range(0, len(texts), EMBED_BATCH):
+                batch = texts[start:start + EMBED_BATCH]
+                vectors = self.embedder.encode([text for *_, text in batch])
+                if not self.dim:
+                    self.dim = vectors.shape[1]
+                    self._set_meta('dim', self.dim)
+                list_ids = (np.argmax(vectors @ self.centroids.T, axis=1) if self.centroids is not None
+                            else [None] * len(batch))
+                f.write(vectors.astype(np.float16).tobytes())
+                self.conn.executemany(
+                    'INSERT INTO chunks (vector_id, source_table, encyclopedia_id, language, name, text, list_id) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    [(vector_id + i, table, encyclopedia_id, language, name, text,
+                      None if list_id is None else int(list_id))
+                     for i, ((table, encyclopedia_id, language, name, text), list_id)
+                     in enumerate(zip(batch, list_ids))]
+                )
+                vector_id += len(batch)
+            f.flush()
+            os.fsync(f.fileno())
+        self.rows = vector_id
+        self._set_meta('rows', self.rows)
+
+    def compact(self):
+        """Rewrite the live rows into a new generation file and renumber them"""
+        live = np.flatnonzero(self.alive)
+        generation = self.generation + 1
+        path = self._vectors_path(generation)
+        with open(path, 'wb') as f:
+            for start in range(0, len(live), SCORE_BLOCK):
+                f.write(np.ascontiguousarray(self.matrix[live[start:start + SCORE_BLOCK]]).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+        try:
+            self.conn.execute('BEGIN')
+            self.conn.execute('DELETE FROM chunks WHERE alive = 0')
+            self.conn.execute('CREATE TEMP TABLE renumber (old_id INTEGER PRIMARY KEY, new_id INTEGER)')
+            self.conn.executemany('INSERT INTO renumber VALUES (?, ?)',
+                                  ((int(old_id), new_id) for new_id, old_id in enumerate(live)))
+            # Negative ids first, so new and old ids never collide on the primary key
+            self.conn.execute('UPDATE chunks SET vector_id = -1 - (SELECT new_id FROM renumber WHERE old_id = vector_id)')
+            self.conn.execute('UPDATE chunks SET vector_id = -1 - vector_id')
+            self.conn.execute('DROP TABLE renumber')
+            self._set_meta('rows', len(live))
+            self._set_meta('generation', generation)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            path.unlink(missing_ok=True)
+            raise
+
+        # The old file goes once nothing maps it any more; _load() retries if it is still in use
+        self._release_matrix()
+        self._load()
+
+    def build_ivf(self, lists: Optional[int] = None, seed: int = 0):
+        """Partition the live vectors into k-means lists for approximate search"""
+        live = np.flatnonzero(self.alive)
+        if not len(live):
+            return
+        lists = lists or max(1, int(np.sqrt(len(live))))
+        rng = np.random.default_rng(seed)
+        sample = live if len(live) <= IVF_TRAIN_SAMPLE else rng.choice(live, IVF_TRAIN_SAMPLE, replace=False)
+        centroids = kmeans(self.matrix[np.sort(sample)].astype(np.float32), min(lists, len(sample)),
+                           IVF_ITERATIONS, rng)
+
+        assignment = np.full(self.rows, -1, dtype=np.int32)
+        for start in range(0, self.rows, SCORE_BLOCK):
+            block = self.matrix[start:start + SCORE_BLOCK].astype(np.float32)
+            assignment[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+
+        try:
+            self.conn.execute('BEGIN')
+            self.conn.execute('DELETE FROM centroids')
+            self.conn.executemany('INSERT INTO centroids (list_id, vector) VALUES (?, ?)',
+                                  ((i, centroid.tobytes()) for i, centroid in enumerate(centroids)))
+            self.conn.executemany('UPDATE chunks SET list_id = ? WHERE vector_id = ?',
+                                  ((int(list_id), i) for i, list_id in enumerate(assignment)))
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        self._load()
+
+    # --- queries ---
+
+    def _scoring_matrix(self):
+        """float32 copy of the matrix if it fits in FLOAT32_CACHE_BYTES, else the float16 map"""
+        if self._scoring is None:
+            if self.rows * self.dim * 4 <= FLOAT32_CACHE_BYTES:
+                self._scoring = self.matrix.astype(np.float32)
+            else:
+                self._scoring = self.matrix
+        return self._scoring
+
+    def _mask(self, language: Optional[str], types: Optional[Sequence[str]]) -> np.ndarray:
+        key = (language, tuple(sorted(types)) if types else None)
+        mask = self._masks.get(key)
+        if mask is None:
+            mask = self.alive.copy()
+            if language:
+                mask &= self.languages == LANGUAGES.index(language.upper())
+            if types:
+                wanted = [SOURCE_TABLES.index(table) for table, (entity_type, _, _) in LORE_SOURCES.items()
+                          if entity_type in types]
+                mask &= np.isin(self.sources, wanted)
+            self._masks[key] = mask
+        return mask
+
+    def search_vector(self, query: np.ndarray, k: int = 10, language: Optional[str] = None,
+                      types: Optional[Sequence[str]] = None, nprobe: Optional[int] = DEFAULT_NPROBE,
+                      exact: bool = False) -> List[Tuple[int, float]]:
+        """(vector_id, cosine similarity) of the k best live chunks, best first"""
+        if not self.rows or k <= 0:
+            return []
+        query = np.asarray(query, dtype=np.float32)
+        mask = self._mask(language, types)
+
+        if not exact and self.centroids is not None and self.rows >= IVF_MIN_ROWS:
+            probed = np.argsort(self.centroids @ query)[-nprobe:]
+            ids = np.flatnonzero(mask & np.isin(self.list_ids, probed))
+            scores = self._scoring_matrix()[ids].astype(np.float32, copy=False) @ query
+        else:
+            matrix = self._scoring_matrix()
+            ids = np.flatnonzero(mask)
+            if len(ids) == self.rows:
+                ids = None
+            scores = np.empty(self.rows if ids is None else len(ids), dtype=np.float32)
+            for start in range(0, len(scores), SCORE_BLOCK):
+                block_ids = slice(start, start + SCORE_BLOCK) if ids is None else ids[start:start + SCORE_BLOCK]
+                scores[start:start + SCORE_BLOCK] = matrix[block_ids].astype(np.float32, copy=False) @ query
+            if ids is None:
+                ids = np.arange(self.rows)
+
+        if not len(scores):
+            return []
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(ids[i]), float(scores[i])) for i in top]
+
+    def search(self, text: str, k: int = 10, language: Optional[str] = None,
+               types: Optional[Sequence[str]] = None, nprobe: int = DEFAULT_NPROBE,
+               exact: bool = False) -> List[Dict]:
+        """Chunks most similar to the text: dicts with type, encyclopedia_id, language, name, text, score"""
+        if not self.rows or not text.strip():
+            return []
+        hits = self.search_vector(self.embedder.encode([text])[0], k, language, types, nprobe, exact)
+        if not hits:
+            return []
+        rows = {row[0]: row for row in self.conn.execute(
+            f"SELECT vector_id, source_table, encyclopedia_id, language, name, text FROM chunks "
+            f"WHERE vector_id IN ({', '.join('?' * len(hits))})", [vector_id for vector_id, _ in hits]
+        )}
+        results = []
+        for vector_id, score in hits:
+            _, source_table, encyclopedia_id, language_, name, chunk = rows[vector_id]
+            results.append({
+                'type': LORE_SOURCES[source_table][0],
+                'encyclopedia_id': encyclopedia_id,
+                'language': language_,
+                'name': name,
+                'text': chunk,
+                'score': score,
+            })
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or query the lore vector index')
+    parser.add_argument('--db-path', type=str, default='Database/bannerlord_lore.db',
+                        help='Lore database (default: Database/bannerlord_lore.db)')
+    parser.add_argument('--index-dir', type=str, default='Database/lore_vectors',
+                        help='Index directory (default: Database/lore_vectors)')
+    parser.add_argument('--model', type=str, help=f'Embedding model (default: {DEFAULT_MODEL} or the one indexed)')
+    parser.add_argument('--full', action='store_true', help='Re-embed everything instead of changed rows only')
+    parser.add_argument('--ivf', action='store_true', help='(Re)build the IVF lists after updating')
+    parser.add_argument('--query', type=str, help='Search instead of updating')
+    parser.add_argument('--language', type=str, choices=LANGUAGES, help='Only chunks in this language')
+    parser.add_argument('--types', nargs='+', choices=sorted({t for t, _, _ in LORE_SOURCES.values()}),
+                        help='Entity types (default: all)')
+    parser.add_argument('-k', type=int, default=10, help='Results (default: 10)')
+    parser.add_argument('--exact', action='store_true', help='Brute-force search even with IVF lists')
+    args = parser.parse_args()
+
+    index = VectorIndex(Path(args.index_dir), args.model)
+
+    if args.query:
+        start = time.perf_counter()
+        hits = index.search(args.query, args.k, args.language, args.types, exact=args.exact)
+        elapsed = (time.perf_counter() - start) * 1000
+        for hit in hits:
+            print(f"[{hit['type']}] {hit['encyclopedia_id']} ({hit['language']}, {hit['score']:.3f}): "
+                  f"{hit['text'][:120]}")
+        print(f"\n{len(hits)} result(s) in {elapsed:.1f} ms over {int(index.alive.sum())} vectors")
+    else:
+        db_path = Path(args.db_path)
+        if not db_path.exists():
+            print(f"ERROR: Database not found: {db_path}")
+            sys.exit(1)
+        start = time.perf_counter()
+        counts = index.update(db_path, full=args.full)
+        print(f"✅ {counts['changed_rows']} changed and {counts['deleted_rows']} deleted row(s), "
+              f"{counts['chunks']} chunk(s) embedded, {counts['vectors']} vectors "
+              f"({time.perf_counter() - start:.1f}s)")
+        if args.ivf:
+            index.build_ivf()
+            print(f"✅ IVF index: {len(index.centroids)} lists")
+    index.close()
+
+
+if __name__ == '__main__':
+    # Настройка кодировки для Windows (только при запуске как скрипт)
+    if sys.platform == 'win32':
+        import io
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+        sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+    main()